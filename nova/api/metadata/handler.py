@@ -19,6 +19,7 @@ import hashlib
 import hmac
 import os
 
+from oslo_concurrency import lockutils
 from oslo_log import log as logging
 from oslo_utils import encodeutils
 from oslo_utils import strutils
@@ -56,43 +57,66 @@ class MetadataRequestHandler(wsgi.Application):
                         "the metadata information returned by the proxy "
                         "cannot be trusted")
 
-    def get_metadata_by_remote_address(self, address):
-        if not address:
-            raise exception.FixedIpNotFoundForAddress(address=address)
+    def _get_cached_metadata(self, cache_key, get_metadata):
+        """Get metadata from the cache, or build it with get_metadata.
 
-        cache_key = 'metadata-%s' % address
+        When the metadata is not cached yet, concurrent requests for the same
+        key wait for the first one to build and cache it rather than all
+        building it at the same time, as happens when many instances boot
+        together and each of them sends many metadata requests.
+        """
         data = self._cache.get(cache_key)
         if data:
-            LOG.debug("Using cached metadata for %s", address)
+            LOG.debug("Using cached metadata for %s", cache_key)
             return data
 
-        try:
-            data = base.get_metadata_by_address(address)
-        except exception.NotFound:
-            LOG.exception('Failed to get metadata for IP %s', address)
-            return None
+        if CONF.api.metadata_cache_expiration <= 0:
+            return get_metadata()
 
-        if CONF.api.metadata_cache_expiration > 0:
-            self._cache.set(cache_key, data)
+        with lockutils.lock(cache_key):
+            data = self._cache.get(cache_key)
+            if data:
+                LOG.debug("Using cached metadata for %s", cache_key)
+                return data
+
+            data = get_metadata()
+            if data is not None:
+                self._cache.set(cache_key, data)
 
         return data
 
-    def get_metadata_by_instance_id(self, instance_id, address):
-        cache_key = 'metadata-%s' % instance_id
-        data = self._cache.get(cache_key)
-        if data:
-            LOG.debug("Using cached metadata for instance %s", instance_id)
-            return data
+    def get_metadata_by_remote_address(self, address):
+        if not address:
+            raise exception.FixedIpNotFoundForAddress(address=address)
 
-        try:
-            data = base.get_metadata_by_instance_id(instance_id, address)
-        except exception.NotFound:
-            return None
+        def get_metadata():
+            try:
+                return base.get_metadata_by_address(address)
+            except exception.NotFound:
+                LOG.exception('Failed to get metadata for IP %s', address)
+                return None
 
-        if CONF.api.metadata_cache_expiration > 0:
-            self._cache.set(cache_key, data)
+        return self._get_cached_metadata('metadata-%s' % address,
+                                         get_metadata)
 
-        return data
+    def get_metadata_by_instance_id(self, instance_id, address):
+        def get_metadata():
+            try:
+                return base.get_metadata_by_instance_id(instance_id, address)
+            except exception.NotFound:
+                return None
+
+        return self._get_cached_metadata('metadata-%s' % instance_id,
+                                         get_metadata)
+
+    @staticmethod
+    def _document_cache_key(meta_data, path):
+        # NOTE: The rendered documents only depend on the metadata and the
+        # requested path. The address is part of the key as the same instance
+        # metadata may be cached for different addresses.
+        key = '%s\0%s\0%s' % (meta_data.uuid, meta_data.address, path)
+        return 'metadata-doc-%s' % hashlib.sha256(
+            encodeutils.to_utf8(key)).hexdigest()
 
     @webob.dec.wsgify(RequestClass=wsgi.Request)
     def __call__(self, req):
@@ -124,6 +148,17 @@ class MetadataRequestHandler(wsgi.Application):
         if meta_data is None:
             raise webob.exc.HTTPNotFound()
 
+        # Serve the rendered document from the cache if we can, instead of
+        # looking it up in the metadata and rendering it for every request.
+        doc_cache_key = None
+        if CONF.api.metadata_cache_expiration > 0:
+            doc_cache_key = self._document_cache_key(meta_data,
+                                                     req.path_info)
+            document = self._cache.get(doc_cache_key)
+            if document:
+                req.response.body, req.response.content_type = document
+                return req.response
+
         try:
             data = meta_data.lookup(req.path_info)
         except base.InvalidMetadataPath:
@@ -136,6 +171,9 @@ class MetadataRequestHandler(wsgi.Application):
         req.response.body = encodeutils.to_utf8(resp)
 
         req.response.content_type = meta_data.get_mimetype()
+        if doc_cache_key:
+            self._cache.set(doc_cache_key, (req.response.body,
+                                            req.response.content_type))
         return req.response
 
     def _handle_remote_ip_request(self, req):
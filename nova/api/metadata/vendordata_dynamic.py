@@ -15,19 +15,47 @@
 
 """Render vendordata as stored fetched from REST microservices."""
 
+import collections
 import sys
+import threading
+import time
 
+import futurist.waiters
 from keystoneauth1 import exceptions as ks_exceptions
 from oslo_log import log as logging
+from oslo_reports.models import with_default_views
 from oslo_serialization import jsonutils
 
 from nova.api.metadata import vendordata
 import nova.conf
 from nova import service_auth
+from nova import utils
 
 CONF = nova.conf.CONF
 LOG = logging.getLogger(__name__)
 
+# The session is shared by all the requests of the process so that the
+# connections to the vendordata services are pooled and reused.
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
+
+# Successful responses of the vendordata services keyed by (instance uuid,
+# target name), with the time they expire at.
+_RESULT_CACHE = collections.OrderedDict()
+_RESULT_CACHE_MAX = 4096
+_RESULT_CACHE_LOCK = threading.Lock()
+
+# The requests to the vendordata services which are still running, keyed by
+# (instance uuid, target name). Requests which time out are not cancelled,
+# see VendordataDynamic.get(), so this makes sure that there is at most one of
+# them per instance and target.
+_IN_FLIGHT = {}
+_IN_FLIGHT_LOCK = threading.Lock()
+
+# Request, error and latency counters per target name.
+TARGET_STATS = collections.defaultdict(collections.Counter)
+_TARGET_STATS_LOCK = threading.Lock()
+
 
 def _load_ks_session(conf):
     """Load session.
@@ -49,15 +77,78 @@ def _load_ks_session(conf):
     return session
 
 
+def _get_session():
+    global _SESSION
+
+    # We only create the session if we make a request.
+    with _SESSION_LOCK:
+        if _SESSION is None:
+            _SESSION = _load_ks_session(CONF)
+        return _SESSION
+
+
+def _get_cached_result(instance_uuid, service_name):
+    with _RESULT_CACHE_LOCK:
+        cached = _RESULT_CACHE.get((instance_uuid, service_name))
+        if cached is None:
+            return None
+        expires, result = cached
+        if expires <= time.monotonic():
+            del _RESULT_CACHE[(instance_uuid, service_name)]
+            return None
+        return result
+
+
+def _cache_result(instance_uuid, service_name, result):
+    expiration = CONF.api.vendordata_dynamic_cache_expiration
+    if expiration <= 0:
+        return
+    with _RESULT_CACHE_LOCK:
+        key = (instance_uuid, service_name)
+        _RESULT_CACHE.pop(key, None)
+        _RESULT_CACHE[key] = (time.monotonic() + expiration, result)
+        # All the entries have the same expiration so the oldest are first.
+        while len(_RESULT_CACHE) > _RESULT_CACHE_MAX:
+            _RESULT_CACHE.popitem(last=False)
+
+
+def _forget_request(key, future):
+    with _IN_FLIGHT_LOCK:
+        if _IN_FLIGHT.get(key) is future:
+            del _IN_FLIGHT[key]
+
+
+def _record_request(service_name, latency, error=False, timeout=False):
+    with _TARGET_STATS_LOCK:
+        stats = TARGET_STATS[service_name]
+        stats['requests'] += 1
+        stats['errors'] += int(error)
+        stats['timeouts'] += int(timeout)
+        stats['latency_ms'] += int(latency * 1000)
+
+
+def vendordata_report():
+    """Guru meditation report section with the dynamic vendordata stats."""
+    with _TARGET_STATS_LOCK:
+        data = {}
+        for name, stats in TARGET_STATS.items():
+            data[name] = {
+                'requests': stats['requests'],
+                'errors': stats['errors'],
+                'timeouts': stats['timeouts'],
+                'average_latency_ms': (
+                    stats['latency_ms'] // stats['requests']
+                    if stats['requests'] else 0),
+            }
+    return with_default_views.ModelWithDefaultViews(data=data)
+
+
 class DynamicVendorData(vendordata.VendorDataDriver):
     def __init__(self, instance):
         self.instance = instance
-        # We only create the session if we make a request.
-        self.session = None
 
     def _do_request(self, service_name, url):
-        if self.session is None:
-            self.session = _load_ks_session(CONF)
+        start = time.monotonic()
         try:
             body = {'project-id': self.instance.project_id,
                     'instance-id': self.instance.uuid,
@@ -80,19 +171,25 @@ class DynamicVendorData(vendordata.VendorDataDriver):
             timeout = (CONF.api.vendordata_dynamic_connect_timeout,
                        CONF.api.vendordata_dynamic_read_timeout)
 
-            res = self.session.request(url, 'POST', data=jsonutils.dumps(body),
-                                       verify=verify, headers=headers,
-                                       timeout=timeout)
+            res = _get_session().request(url, 'POST',
+                                         data=jsonutils.dumps(body),
+                                         verify=verify, headers=headers,
+                                         timeout=timeout)
+            result = {}
             if res and res.text:
                 # TODO(mikal): Use the Cache-Control response header to do some
                 # sensible form of caching here.
-                return jsonutils.loads(res.text)
+                result = jsonutils.loads(res.text)
 
-            return {}
+            _record_request(service_name, time.monotonic() - start)
+            _cache_result(self.instance.uuid, service_name, result)
+            return result
 
         except (TypeError, ValueError,
                 ks_exceptions.connection.ConnectionError,
                 ks_exceptions.http.HttpError) as e:
+            _record_request(service_name, time.monotonic() - start,
+                            error=True)
             LOG.warning('Error from dynamic vendordata service '
                         '%(service_name)s at %(url)s: %(error)s',
                         {'service_name': service_name,
@@ -104,8 +201,38 @@ class DynamicVendorData(vendordata.VendorDataDriver):
 
             return {}
 
+    def _get_request(self, service_name, url):
+        """Start a request to a vendordata service, or return the one which
+        is still running for the instance.
+        """
+        key = (self.instance.uuid, service_name)
+        with _IN_FLIGHT_LOCK:
+            future = _IN_FLIGHT.get(key)
+            if future is not None and not future.done():
+                return future
+            future = utils.spawn(self._do_request, service_name, url)
+            _IN_FLIGHT[key] = future
+        future.add_done_callback(lambda f: _forget_request(key, f))
+        return future
+
+    def _handle_timeout(self, service_name, url, timeout):
+        _record_request(service_name, timeout, error=True, timeout=True)
+        LOG.warning('Timed out after %(timeout)s seconds waiting for dynamic '
+                    'vendordata service %(service_name)s at %(url)s',
+                    {'timeout': timeout,
+                     'service_name': service_name,
+                     'url': url},
+                    instance=self.instance)
+        if CONF.api.vendordata_dynamic_failure_fatal:
+            raise TimeoutError(
+                'Timed out waiting for dynamic vendordata service %s' %
+                service_name)
+
+        return {}
+
     def get(self):
         j = {}
+        requests = {}
 
         for target in CONF.api.vendordata_dynamic_targets:
             # NOTE(mikal): a target is composed of the following:
@@ -128,6 +255,38 @@ class DynamicVendorData(vendordata.VendorDataDriver):
                             {'target': target}, instance=self.instance)
                 continue
 
-            j[name] = self._do_request(name, url)
+            cached = _get_cached_result(self.instance.uuid, name)
+            if cached is not None:
+                j[name] = cached
+                continue
+
+            # Reserve the name so the order of the targets is kept.
+            j[name] = {}
+            requests[name] = url
+
+        if not requests:
+            return j
+
+        # Query the targets concurrently so that the slowest one, not the sum
+        # of all of them, bounds the time it takes. The connect and read
+        # timeouts only apply to single socket operations, so we also give
+        # up on a target that does not respond within their sum.
+        # NOTE: A request we give up on cannot be cancelled, so it keeps its
+        # worker until the service responds or one of its socket operations
+        # times out, and its result is still cached if it succeeds. Instances
+        # retry the metadata requests which fail, so we wait for the request
+        # still running for the instance rather than starting another one, to
+        # not pile up workers waiting on a slow service.
+        futures = {name: self._get_request(name, url)
+                   for name, url in requests.items()}
+        timeout = (CONF.api.vendordata_dynamic_connect_timeout +
+                   CONF.api.vendordata_dynamic_read_timeout)
+        futurist.waiters.wait_for_all(futures.values(), timeout)
+
+        for name, future in futures.items():
+            if future.done():
+                j[name] = future.result()
+            else:
+                j[name] = self._handle_timeout(name, requests[name], timeout)
 
         return j
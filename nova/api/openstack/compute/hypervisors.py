@@ -50,9 +50,10 @@ class HypervisorsController(wsgi.Controller):
 
     def _view_hypervisor(
         self, hypervisor, service, detail, req, servers=None,
-        with_servers=False,
+        with_servers=False, alive=None,
     ):
-        alive = self.servicegroup_api.service_is_up(service)
+        if alive is None:
+            alive = self.servicegroup_api.service_is_up(service)
         # The 2.53 microversion returns the compute node uuid rather than id.
         uuid_for_id = api_version_request.is_supported(req, "2.53")
 
@@ -188,7 +189,7 @@ class HypervisorsController(wsgi.Controller):
                 msg = _('marker [%s] not found') % marker
                 raise webob.exc.HTTPBadRequest(explanation=msg)
 
-        hypervisors_list = []
+        found = []
         for hyp in compute_nodes:
             try:
                 instances = None
@@ -208,12 +209,19 @@ class HypervisorsController(wsgi.Controller):
                           'service may be deleted and compute nodes need to '
                           'be manually cleaned up.', hyp.host)
                 continue
-
-            hypervisor = self._view_hypervisor(
+            found.append((hyp, service, instances))
+
+        # Check whether all the services are up at once rather than one at a
+        # time.
+        alive = self.servicegroup_api.service_is_up_multi(
+            [service for hyp, service, instances in found])
+        hypervisors_list = [
+            self._view_hypervisor(
                 hyp, service, detail, req, servers=instances,
-                with_servers=with_servers,
+                with_servers=with_servers, alive=is_up,
             )
-            hypervisors_list.append(hypervisor)
+            for (hyp, service, instances), is_up in zip(found, alive)
+        ]
 
         hypervisors_dict = dict(hypervisors=hypervisors_list)
         if links:
@@ -82,7 +82,7 @@ class ServiceController(wsgi.Controller):
         return _services
 
     def _get_service_detail(self, svc, additional_fields, req,
-                            cell_down_support=False):
+                            cell_down_support=False, alive=None):
         # NOTE(tssurya): The below logic returns a minimal service construct
         # consisting of only the host, binary and status fields for the compute
         # services in the down cell.
@@ -91,7 +91,8 @@ class ServiceController(wsgi.Controller):
                     'host': svc.host,
                     'status': "UNKNOWN"}
 
-        alive = self.servicegroup_api.service_is_up(svc)
+        if alive is None:
+            alive = self.servicegroup_api.service_is_up(svc)
         state = (alive and "up") or "down"
         active = 'enabled'
         if svc['disabled']:
@@ -127,8 +128,16 @@ class ServiceController(wsgi.Controller):
     def _get_services_list(self, req, additional_fields=()):
         _services = self._get_services(req)
         cell_down_support = api_version_request.is_supported(req, '2.69')
+        # Check whether all the services are up at once rather than one at a
+        # time. Services in down cells have no state to check.
+        in_down_cell = [cell_down_support and 'uuid' not in svc
+                        for svc in _services]
+        alive = iter(self.servicegroup_api.service_is_up_multi(
+            [svc for svc, down in zip(_services, in_down_cell) if not down]))
         return [self._get_service_detail(svc, additional_fields, req,
-                cell_down_support=cell_down_support) for svc in _services]
+                cell_down_support=cell_down_support,
+                alive=None if down else next(alive))
+                for svc, down in zip(_services, in_down_cell)]
 
     def _enable(self, body, context):
         """Enable scheduling for a service."""
@@ -22,12 +22,15 @@ from oslo_reports import opts as gmr_opts
 from oslo_service import _options as service_opts
 from paste import deploy
 
+from nova.api.metadata import vendordata_dynamic
 from nova import config
 from nova import context
+from nova.db.main import api as main_db_api
 from nova import exception
 from nova import objects
 from nova.pci import request
 from nova import service
+from nova import service_auth
 from nova import utils
 from nova import version
 
@@ -112,6 +115,14 @@ def init_global_data(conf_files, service_name, prog):
 
     logging.setup(CONF, "nova")
     gmr_opts.set_defaults(CONF)
+    gmr.TextGuruMeditation.register_section('Cells',
+                                            context.cell_health_report)
+    gmr.TextGuruMeditation.register_section('Database Reads',
+                                            main_db_api.read_routing_report)
+    gmr.TextGuruMeditation.register_section(
+        'Dynamic Vendordata', vendordata_dynamic.vendordata_report)
+    gmr.TextGuruMeditation.register_section('Service Endpoints',
+                                            service_auth.endpoint_report)
     gmr.TextGuruMeditation.setup_autorun(
         version, conf=CONF, service_name=service_name)
 
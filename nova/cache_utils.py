@@ -109,6 +109,11 @@ class CacheClient(object):
             return None
         return value
 
+    def get_multi(self, keys):
+        values = self.region.get_multi(keys)
+        return [None if value == cache.NO_VALUE else value
+                for value in values]
+
     def set(self, key, value):
         return self.region.set(key, value)
 
@@ -37,6 +37,7 @@ import nova.db.main.api
 from nova import objects
 from nova.objects import base as objects_base
 from nova import service
+from nova import service_auth
 from nova import utils
 from nova import version
 
@@ -53,6 +54,8 @@ def main():
     # Ensure os-vif objects are registered and plugins loaded
     os_vif.initialize()
 
+    gmr.TextGuruMeditation.register_section('Service Endpoints',
+                                            service_auth.endpoint_report)
     gmr.TextGuruMeditation.setup_autorun(version, conf=CONF)
 
     # disable database access for this service
@@ -27,8 +27,11 @@ from oslo_reports import opts as gmr_opts
 from nova.conductor import rpcapi
 import nova.conf
 from nova import config
+from nova import context
+from nova.db.main import api as main_db_api
 from nova import objects
 from nova import service
+from nova import service_auth
 from nova import utils
 from nova import version
 
@@ -42,6 +45,12 @@ def main():
     gmr_opts.set_defaults(CONF)
     objects.Service.enable_min_version_cache()
 
+    gmr.TextGuruMeditation.register_section('Cells',
+                                            context.cell_health_report)
+    gmr.TextGuruMeditation.register_section('Database Reads',
+                                            main_db_api.read_routing_report)
+    gmr.TextGuruMeditation.register_section('Service Endpoints',
+                                            service_auth.endpoint_report)
     gmr.TextGuruMeditation.setup_autorun(version, conf=CONF)
 
     server = service.Service.create(binary='nova-conductor',
@@ -25,12 +25,14 @@ from nova import monkey_patch; monkey_patch.patch()  # noqa
 # autopep8: on
 
 import collections
+import concurrent.futures
 from contextlib import contextmanager
 import functools
 import os
 import re
 import sys
 import textwrap
+import threading
 import time
 import traceback
 import typing as ty
@@ -226,6 +228,24 @@ class DbCommands(object):
         instance_obj.populate_instance_compute_id,
     )
 
+    # The tables updated by each online migration. Migrations which update
+    # the same tables are not run concurrently with --concurrency, as they
+    # would conflict on the rows they update.
+    online_migration_tables = {
+        'migrate_quota_limits_to_api_db': ('quotas',),
+        'migrate_quota_classes_to_api_db': ('quota_classes',),
+        'migration_migrate_to_uuid': ('migrations',),
+        'populate_uuids': ('block_device_mapping',),
+        'populate_missing_availability_zones': ('instances',),
+        'populate_queued_for_delete': ('instance_mappings',),
+        'migrate_empty_ratio': ('compute_nodes',),
+        # NOTE: This also creates and deletes a fake instance for its marker.
+        'fill_virtual_interface_list': ('instances', 'virtual_interfaces'),
+        'populate_user_id': ('instance_mappings',),
+        'populate_dev_uuids': ('pci_devices',),
+        'populate_instance_compute_id': ('instances',),
+    }
+
     @args('--local_cell', action='store_true',
           help='Only sync db in the local cell: do not attempt to fan-out '
                'to all cells')
@@ -297,18 +317,29 @@ class DbCommands(object):
     @args('--sleep', type=int, metavar='<seconds>', dest='sleep',
           help='The amount of time in seconds to sleep between batches when '
                '``--until-complete`` is used. Defaults to 0.')
+    @args('--throughput-target', type=int, metavar='<rows>',
+          dest='throughput_target',
+          help='Maximum number of rows to archive per second from each cell '
+               'database when ``--until-complete`` is used. Archiving sleeps '
+               'between batches as needed to stay below this rate.')
+    @args('--cell-concurrency', type=int, metavar='<number>',
+          dest='cell_concurrency',
+          help='Number of cell databases to archive concurrently when '
+               '``--all-cells`` and ``--until-complete`` are used. Defaults '
+               'to 1.')
     def archive_deleted_rows(
         self, max_rows=1000, verbose=False,
         until_complete=False, purge=False,
         before=None, all_cells=False, task_log=False, sleep=0,
+        throughput_target=None, cell_concurrency=1,
     ):
         """Move deleted rows from production tables to shadow tables.
 
         Returns 0 if nothing was archived, 1 if some number of rows were
-        archived, 2 if max_rows is invalid, 3 if no connection could be
-        established to the API DB, 4 if before date is invalid. If automating,
-        this should be run continuously while the result
-        is 1, stopping at 0.
+        archived, 2 if max_rows, throughput_target or cell_concurrency is
+        invalid, 3 if no connection could be established to the API DB, 4 if
+        before date is invalid. If automating, this should be run continuously
+        while the result is 1, stopping at 0.
         """
         max_rows = int(max_rows)
         if max_rows < 0:
@@ -318,6 +349,12 @@ class DbCommands(object):
             print(_('max rows must be <= %(max_value)d') %
                   {'max_value': db_const.MAX_INT})
             return 2
+        if throughput_target is not None and throughput_target < 1:
+            print(_('Must supply a positive value for throughput_target'))
+            return 2
+        if cell_concurrency < 1:
+            print(_('Must supply a positive value for cell_concurrency'))
+            return 2
 
         ctxt = context.get_admin_context()
         try:
@@ -368,6 +405,15 @@ class DbCommands(object):
             cell_mappings = [None]
             print_sort_func = None
         total_rows_archived = 0
+        if until_complete and cell_concurrency > 1 and len(cell_mappings) > 1:
+            # NOTE: With until_complete=True there is no total limit to share
+            # between cells, so they can be archived independently.
+            total_rows_archived, interrupt = self._do_archive_cells(
+                table_to_rows_archived, ctxt, cell_mappings, cell_concurrency,
+                max_rows, verbose, before_date, task_log, sleep,
+                throughput_target)
+            # All cells are done, skip the sequential archiving below.
+            cell_mappings = []
         for cell_mapping in cell_mappings:
             # NOTE(Kevin_Zheng): No need to calculate limit for each
             # cell if until_complete=True.
@@ -395,7 +441,8 @@ class DbCommands(object):
                         before_date,
                         cell_name,
                         task_log,
-                        sleep)
+                        sleep,
+                        throughput_target=throughput_target)
                 except KeyboardInterrupt:
                     interrupt = True
                     break
@@ -428,9 +475,73 @@ class DbCommands(object):
         # NOTE(danms): Return nonzero if we archived something
         return int(bool(table_to_rows_archived))
 
+    def _do_archive_cells(
+        self, table_to_rows_archived, ctxt, cell_mappings, concurrency,
+        max_rows, verbose, before_date, task_log, sleep, throughput_target,
+    ):
+        """Helper function for archiving deleted rows for several cells
+        concurrently until there is nothing left to archive.
+
+        :param table_to_rows_archived: Dict tracking the number of rows
+            archived by <cell_name>.<table name>.
+        :param ctxt: nova.context.RequestContext to target at each cell
+        :param cell_mappings: The CellMappingList of cells to archive
+        :param concurrency: Maximum number of cells to archive concurrently
+        :returns: tuple of (number of rows archived, whether the archiving
+            was interrupted)
+        """
+        stop_event = threading.Event()
+        lock = threading.Lock()
+
+        def archive_cell(cell_mapping):
+            # Each cell uses its own dict, since the API_DB entries are
+            # updated by every cell.
+            cell_table_to_rows_archived = {}
+            try:
+                with context.target_cell(ctxt, cell_mapping) as cctxt:
+                    return self._do_archive(
+                        cell_table_to_rows_archived, cctxt, max_rows, True,
+                        verbose, before_date, cell_mapping.name, task_log,
+                        sleep, throughput_target=throughput_target,
+                        stop_event=stop_event)
+            finally:
+                # Keep the rows archived before a failure in the totals.
+                with lock:
+                    for table_name, rows in (
+                            cell_table_to_rows_archived.items()):
+                        table_to_rows_archived.setdefault(table_name, 0)
+                        table_to_rows_archived[table_name] += rows
+
+        executor = utils.create_executor(concurrency)
+        futures = [utils.spawn_on(executor, archive_cell, cell_mapping)
+                   for cell_mapping in cell_mappings]
+        interrupt = False
+        try:
+            concurrent.futures.wait(futures)
+        except KeyboardInterrupt:
+            # Let the cells finish their current batch then stop.
+            interrupt = True
+            stop_event.set()
+            concurrent.futures.wait(futures)
+        finally:
+            executor.shutdown()
+
+        # A cell which failed, e.g. because it is unreachable, does not
+        # prevent reporting what was archived in the other cells.
+        total_rows_archived = 0
+        for cell_mapping, future in zip(cell_mappings, futures):
+            try:
+                total_rows_archived += future.result()
+            except Exception as e:
+                print(_('Failed to archive deleted rows of cell %(cell)s: '
+                        '%(error)s') % {'cell': cell_mapping.name,
+                                        'error': e})
+        return total_rows_archived, interrupt
+
     def _do_archive(
         self, table_to_rows_archived, cctxt, max_rows,
         until_complete, verbose, before_date, cell_name, task_log, sleep,
+        throughput_target=None, stop_event=None,
     ):
         """Helper function for archiving deleted rows for a cell.
 
@@ -456,9 +567,14 @@ class DbCommands(object):
         :param task_log: Whether to archive task_log table rows
         :param sleep: The amount of time in seconds to sleep between batches
             when ``until_complete`` is True.
+        :param throughput_target: Optional maximum number of rows to archive
+            per second when ``until_complete`` is True.
+        :param stop_event: Optional threading.Event which, when set, stops
+            archiving after the current batch.
         """
         ctxt = context.get_admin_context()
         while True:
+            batch_start = time.monotonic()
             # table_to_rows = {table_name: number_of_rows_archived}
             # deleted_instance_uuids = ['uuid1', 'uuid2', ...]
             table_to_rows, deleted_instance_uuids, total_rows_archived = \
@@ -505,10 +621,18 @@ class DbCommands(object):
             # table_to_rows = {'instances': 0} back somehow.
             if not until_complete or not any(table_to_rows.values()):
                 break
+            if stop_event is not None and stop_event.is_set():
+                break
             if verbose:
                 sys.stdout.write('.')
             # Optionally sleep between batches to throttle the archiving.
-            time.sleep(sleep)
+            delay = sleep
+            if throughput_target:
+                # Make the batch take at least as long as archiving its rows
+                # at the target rate would.
+                delay = max(delay, total_rows_archived / throughput_target -
+                            (time.monotonic() - batch_start))
+            time.sleep(delay)
         return total_rows_archived
 
     @args('--before', metavar='<before>', dest='before',
@@ -522,11 +646,26 @@ class DbCommands(object):
           help='Print information about purged records')
     @args('--all-cells', dest='all_cells', action='store_true', default=False,
           help='Run against all cell databases')
+    @args('--max-rows', type=int, metavar='<number>', dest='max_rows',
+          help='Maximum number of rows to purge per cell database. If not '
+               'specified, all matching rows are purged')
+    @args('--batch-size', type=int, metavar='<number>', dest='batch_size',
+          help='Maximum number of rows to purge per transaction. If not '
+               'specified, each table is purged in a single transaction')
+    @args('--sleep', type=int, metavar='<seconds>', dest='sleep',
+          help='The amount of time in seconds to sleep between batches when '
+               '``--batch-size`` is used. Defaults to 0.')
     def purge(self, before=None, purge_all=False, verbose=False,
-              all_cells=False):
+              all_cells=False, max_rows=None, batch_size=None, sleep=0):
         if before is None and purge_all is False:
             print(_('Either --before or --all is required'))
             return 1
+        if max_rows is not None and max_rows < 1:
+            print(_('Invalid value for --max-rows. Must be greater than 0'))
+            return 2
+        if batch_size is not None and batch_size < 1:
+            print(_('Invalid value for --batch-size. Must be greater than 0'))
+            return 2
         if before:
             try:
                 before_date = dateutil_parser.parse(before, fuzzy=True)
@@ -554,43 +693,100 @@ class DbCommands(object):
                 identity = _('Cell %s') % cell.identity
                 with context.target_cell(admin_ctxt, cell) as cctxt:
                     deleted += db.purge_shadow_tables(
-                        cctxt, before_date, status_fn=status)
+                        cctxt, before_date, status_fn=status,
+                        max_rows=max_rows, batch_size=batch_size,
+                        sleep=sleep)
         else:
             identity = _('DB')
             deleted = db.purge_shadow_tables(
-                admin_ctxt, before_date, status_fn=status)
+                admin_ctxt, before_date, status_fn=status,
+                max_rows=max_rows, batch_size=batch_size, sleep=sleep)
         if deleted:
             return 0
         else:
             return 3
 
-    def _run_migration(self, ctxt, max_count):
+    def _run_migration_method(self, ctxt, migration_meth, count):
+        try:
+            found, done = migration_meth(ctxt, count)
+        except Exception:
+            msg = (_("Error attempting to run %(method)s") % dict(
+                   method=migration_meth))
+            print(msg)
+            LOG.exception(msg)
+            return 0, 0, True
+
+        if found:
+            print(_('%(total)i rows matched query %(meth)s, %(done)i '
+                    'migrated') % {'total': found,
+                                   'meth': migration_meth.__name__,
+                                   'done': done})
+        return found, done, False
+
+    def _online_migration_groups(self, migration_meths):
+        """Group the migrations which update the same tables.
+
+        The migrations of a group are kept in order and have to run one after
+        another, while different groups can run concurrently.
+        """
+        groups = []
+        for index, meth in enumerate(migration_meths):
+            # A migration which does not declare its tables is only grouped
+            # with itself.
+            tables = set(self.online_migration_tables.get(
+                meth.__name__, (meth.__name__,)))
+            indexes = [index]
+            for group in list(groups):
+                if group[0] & tables:
+                    tables |= group[0]
+                    indexes.extend(group[1])
+                    groups.remove(group)
+            groups.append((tables, sorted(indexes)))
+        return [[migration_meths[index] for index in indexes]
+                for tables, indexes in sorted(
+                    groups, key=lambda group: group[1][0])]
+
+    def _run_migration_group(self, ctxt, migration_meths, count):
+        return [(meth.__name__,
+                 self._run_migration_method(ctxt, meth, count))
+                for meth in migration_meths]
+
+    def _run_migration(self, ctxt, max_count, skip=(), concurrency=1):
         ran = 0
         exceptions = False
         migrations = {}
-        for migration_meth in self.online_migrations:
-            count = max_count - ran
+        migration_meths = [meth for meth in self.online_migrations
+                           if meth.__name__ not in skip]
+        if concurrency > 1:
+            # Each migration gets a full batch of max_count when running them
+            # concurrently, and each group of conflicting migrations its own
+            # context to run them with.
+            executor = utils.create_executor(concurrency)
             try:
-                found, done = migration_meth(ctxt, count)
-            except Exception:
-                msg = (_("Error attempting to run %(method)s") % dict(
-                       method=migration_meth))
-                print(msg)
-                LOG.exception(msg)
-                exceptions = True
-                found = done = 0
-
-            name = migration_meth.__name__
-            if found:
-                print(_('%(total)i rows matched query %(meth)s, %(done)i '
-                        'migrated') % {'total': found,
-                                       'meth': name,
-                                       'done': done})
+                futures = [
+                    utils.spawn_on(
+                        executor, self._run_migration_group,
+                        context.get_admin_context(), meths, max_count)
+                    for meths in self._online_migration_groups(
+                        migration_meths)]
+                for future in futures:
+                    for name, (found, done, failed) in future.result():
+                        migrations[name] = found, done
+                        exceptions = exceptions or failed
+            finally:
+                executor.shutdown()
+            return migrations, exceptions
+
+        for migration_meth in migration_meths:
+            count = max_count - ran
+            found, done, failed = self._run_migration_method(
+                ctxt, migration_meth, count)
+            exceptions = exceptions or failed
             # This is the per-migration method result for this batch, and
             # _run_migration will either continue on to the next migration,
             # or stop if up to this point we've processed max_count of
             # records across all migration methods.
-            migrations[name] = found, done
+            migrations[migration_meth.__name__] = found, done
             if max_count is not None:
                 ran += done
                 if ran >= max_count:
@@ -599,8 +795,15 @@ class DbCommands(object):
 
     @args('--max-count', metavar='<number>', dest='max_count',
           help='Maximum number of objects to consider')
-    def online_data_migrations(self, max_count=None):
+    @args('--concurrency', type=int, metavar='<number>',
+          dest='concurrency',
+          help='Maximum number of migrations to run concurrently when '
+               '``--max-count`` is not used. Defaults to 1.')
+    def online_data_migrations(self, max_count=None, concurrency=1):
         ctxt = context.get_admin_context()
+        if concurrency < 1:
+            print(_('Must supply a positive value for concurrency'))
+            return 127
         if max_count is not None:
             try:
                 max_count = int(max_count)
@@ -610,6 +813,9 @@ class DbCommands(object):
             if max_count < 1:
                 print(_('Must supply a positive value for max_number'))
                 return 127
+            # The max_count is shared between all migrations, so they have to
+            # run one after another.
+            concurrency = 1
         else:
             unlimited = True
             max_count = 50
@@ -618,8 +824,14 @@ class DbCommands(object):
         ran = None
         migration_info = {}
         exceptions = False
+        # Migrations which found nothing left to migrate, these are not run
+        # again in subsequent batches.
+        completed = set()
+        total_done = 0
+        start = time.monotonic()
         while ran is None or ran != 0:
-            migrations, exceptions = self._run_migration(ctxt, max_count)
+            migrations, exceptions = self._run_migration(
+                ctxt, max_count, skip=completed, concurrency=concurrency)
             ran = 0
             # For each batch of migration method results, build the cumulative
             # set of results.
@@ -632,6 +844,20 @@ class DbCommands(object):
                 ran += migrations[name][1]
             if not unlimited:
                 break
+            # A migration which raised also reports nothing found, keep
+            # retrying those as they may depend on the other migrations.
+            if not exceptions:
+                completed.update(
+                    name for name, (found, done) in migrations.items()
+                    if not found)
+            if ran:
+                total_done += ran
+                elapsed = time.monotonic() - start
+                rate = total_done / elapsed if elapsed else 0
+                print(_('Migrated %(total)i rows in %(elapsed).1f seconds '
+                        '(%(rate).1f rows/sec)') % {
+                            'total': total_done, 'elapsed': elapsed,
+                            'rate': rate})
 
         t = prettytable.PrettyTable([_('Migration'),
                                      _('Total Needed'),  # Really: Total Found
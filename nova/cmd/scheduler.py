@@ -28,6 +28,8 @@ from oslo_reports import opts as gmr_opts
 
 import nova.conf
 from nova import config
+from nova import context
+from nova.db.main import api as main_db_api
 from nova import objects
 from nova.scheduler import rpcapi
 from nova import service
@@ -44,6 +46,10 @@ def main():
     gmr_opts.set_defaults(CONF)
     objects.Service.enable_min_version_cache()
 
+    gmr.TextGuruMeditation.register_section('Cells',
+                                            context.cell_health_report)
+    gmr.TextGuruMeditation.register_section('Database Reads',
+                                            main_db_api.read_routing_report)
     gmr.TextGuruMeditation.setup_autorun(version, conf=CONF)
 
     server = service.Service.create(
@@ -79,6 +79,7 @@ from nova.policies import servers as servers_policies
 from nova.policies import shelve as shelve_policies
 import nova.policy
 from nova import profiler
+from nova import quota
 from nova import rpc
 from nova.scheduler.client import query
 from nova.scheduler.client import report
@@ -1612,6 +1613,10 @@ class API:
             with excutils.save_and_reraise_exception():
                 self._cleanup_build_artifacts(None, instances_to_build)
 
+        num_built = len(instances_to_build)
+        quota.adjust_cached_usage(
+            context.project_id, context.user_id, instances=num_built,
+            cores=num_built * flavor.vcpus, ram=num_built * flavor.memory_mb)
         return instances_to_build
 
     @staticmethod
@@ -2451,6 +2456,10 @@ class API:
             LOG.info('instance termination disabled', instance=instance)
             return
 
+        # The usage freed by the delete is only reflected in the cell database
+        # once the delete completes, so recount it on the next quota checks.
+        quota.invalidate_cached_usage_for_delete(instance.project_id)
+
         cell = None
         # If there is an instance.host (or the instance is shelved-offloaded or
         # in error state), the instance has been scheduled and sent to a
@@ -2812,6 +2821,8 @@ class API:
         is_bfv = compute_utils.is_volume_backed_instance(context, instance)
         placement_limits.enforce_num_instances_and_flavor(context, project_id,
                                                          flavor, is_bfv, 1, 1)
+        quota.adjust_cached_usage(project_id, user_id, instances=1,
+                                  cores=flavor.vcpus, ram=flavor.memory_mb)
 
         self._record_action_start(context, instance, instance_actions.RESTORE)
 
@@ -3214,9 +3225,13 @@ class API:
         if expected_attrs:
             fields.extend(expected_attrs)
 
+        # NOTE: Listing servers is one of the read paths which can tolerate
+        # slightly stale data and is sent to the replica database when
+        # [database]replica_reads is enabled.
         insts, down_cell_uuids = instance_list.get_instance_objects_sorted(
             context, filters, limit, marker, fields, sort_keys, sort_dirs,
-            cell_down_support=cell_down_support)
+            cell_down_support=cell_down_support,
+            use_slave=CONF.database.replica_reads)
 
         def _get_unique_filter_method():
             seen_uuids = set()
@@ -3984,6 +3999,7 @@ class API:
                                                  req=reqs,
                                                  used=useds,
                                                  allowed=total_alloweds)
+            quota.adjust_cached_usage(project_id, user_id, **res_deltas)
 
     @check_instance_lock
     @check_instance_state(vm_state=[vm_states.RESIZED])
@@ -44,11 +44,26 @@ class InstanceSortContext(multi_cell_list.RecordSortContext):
         super(InstanceSortContext, self).__init__(sort_keys, sort_dirs)
 
 
+@db.select_db_reader_mode
+def _instance_get_by_sort_filters(context, sort_keys, sort_dirs, values,
+                                  use_slave=False):
+    return db.instance_get_by_sort_filters(context, sort_keys, sort_dirs,
+                                           values)
+
+
+@db.select_db_reader_mode
+def _instance_get_all_by_filters_sort(context, filters, use_slave=False,
+                                      **kwargs):
+    return db.instance_get_all_by_filters_sort(context, filters, **kwargs)
+
+
 class InstanceLister(multi_cell_list.CrossCellLister):
-    def __init__(self, sort_keys, sort_dirs, cells=None, batch_size=None):
+    def __init__(self, sort_keys, sort_dirs, cells=None, batch_size=None,
+                 use_slave=False):
         super(InstanceLister, self).__init__(
             InstanceSortContext(sort_keys, sort_dirs), cells=cells,
             batch_size=batch_size)
+        self.use_slave = use_slave
 
     @property
     def marker_identifier(self):
@@ -74,13 +89,23 @@ class InstanceLister(multi_cell_list.CrossCellLister):
         return im.cell_mapping.uuid, db_inst
 
     def get_marker_by_values(self, ctx, values):
+        if self.use_slave:
+            return _instance_get_by_sort_filters(ctx,
+                                                 self.sort_ctx.sort_keys,
+                                                 self.sort_ctx.sort_dirs,
+                                                 values, use_slave=True)
         return db.instance_get_by_sort_filters(ctx,
                                                self.sort_ctx.sort_keys,
                                                self.sort_ctx.sort_dirs,
                                                values)
 
     def get_by_filters(self, ctx, filters, limit, marker, **kwargs):
-        return db.instance_get_all_by_filters_sort(
+        if self.use_slave:
+            kwargs['use_slave'] = True
+            get_all = _instance_get_all_by_filters_sort
+        else:
+            get_all = db.instance_get_all_by_filters_sort
+        return get_all(
             ctx, filters, limit=limit, marker=marker,
             sort_keys=self.sort_ctx.sort_keys,
             sort_dirs=self.sort_ctx.sort_dirs,
@@ -91,10 +116,12 @@ class InstanceLister(multi_cell_list.CrossCellLister):
 # replicate these for every data type we implement.
 def get_instances_sorted(ctx, filters, limit, marker, columns_to_join,
                          sort_keys, sort_dirs, cell_mappings=None,
-                         batch_size=None, cell_down_support=False):
+                         batch_size=None, cell_down_support=False,
+                         use_slave=False):
     instance_lister = InstanceLister(sort_keys, sort_dirs,
                                      cells=cell_mappings,
-                                     batch_size=batch_size)
+                                     batch_size=batch_size,
+                                     use_slave=use_slave)
     instance_generator = instance_lister.get_records_sorted(
         ctx, filters, limit, marker, columns_to_join=columns_to_join,
         cell_down_support=cell_down_support)
@@ -133,7 +160,8 @@ def get_instance_list_cells_batch_size(limit, cells):
 
 
 def get_instance_objects_sorted(ctx, filters, limit, marker, expected_attrs,
-                                sort_keys, sort_dirs, cell_down_support=False):
+                                sort_keys, sort_dirs, cell_down_support=False,
+                                use_slave=False):
     """Return a list of instances and information about down cells.
 
     This returns a tuple of (objects.InstanceList, list(of down cell
@@ -142,6 +170,9 @@ def get_instance_objects_sorted(ctx, filters, limit, marker, expected_attrs,
     of any cells that did not respond (or raised an error) are included
     in the list as the second element of the tuple. That list is empty
     if all cells responded.
+
+    If use_slave is True, the instances are read from the replica database
+    when there is one, see [database]replica_reads.
     """
     query_cell_subset = CONF.api.instance_list_per_project_cells
     # NOTE(danms): Replicated in part from instance_get_all_by_sort_filters(),
@@ -163,7 +194,7 @@ def get_instance_objects_sorted(ctx, filters, limit, marker, expected_attrs,
     instance_lister, instance_generator = get_instances_sorted(ctx, filters,
         limit, marker, columns_to_join, sort_keys, sort_dirs,
         cell_mappings=cell_mappings, batch_size=batch_size,
-        cell_down_support=cell_down_support)
+        cell_down_support=cell_down_support, use_slave=use_slave)
 
     if 'fault' in expected_attrs:
         # We join fault above, so we need to make sure we don't ask
@@ -26,6 +26,7 @@ terminating it.
 
 import base64
 import binascii
+import collections
 from collections.abc import Callable, Iterator
 import contextlib
 import copy
@@ -853,11 +854,15 @@ class ComputeManager(manager.Manager):
             LOG.debug('Instance has been destroyed from under us while '
                       'trying to set it to ERROR', instance=instance)
 
-    def _get_instances_on_driver(self, context, filters=None):
+    def _get_instances_on_driver(self, context, filters=None,
+                                 only_fields=None):
         """Return a list of instance records for the instances found
         on the hypervisor which satisfy the specified filters. If filters=None
         return a list of instance records for all the instances found on the
         hypervisor.
+
+        If only_fields is not None, only those fields of the instances are
+        loaded from the database, see InstanceList.get_by_filters().
         """
         if not filters:
             filters = {}
@@ -868,7 +873,7 @@ class ComputeManager(manager.Manager):
                 return objects.InstanceList()
             filters['uuid'] = driver_uuids
             local_instances = objects.InstanceList.get_by_filters(
-                context, filters, use_slave=True)
+                context, filters, use_slave=True, only_fields=only_fields)
             return local_instances
         except NotImplementedError:
             pass
@@ -879,8 +884,8 @@ class ComputeManager(manager.Manager):
         # NOTE(mjozefcz): In this case we need to apply host filter.
         # Without this all instance data would be fetched from db.
         filters['host'] = self.host
-        instances = objects.InstanceList.get_by_filters(context, filters,
-                                                        use_slave=True)
+        instances = objects.InstanceList.get_by_filters(
+            context, filters, use_slave=True, only_fields=only_fields)
         name_map = {instance.name: instance for instance in instances}
         local_instances = []
         for driver_instance in driver_instances:
@@ -2363,9 +2368,24 @@ class ComputeManager(manager.Manager):
             self._add_missing_dev_names(bdms, instance)
             block_device_info = driver.get_block_device_info(instance, bdms)
             mapping = driver.block_device_info_get_mapping(block_device_info)
-            driver_block_device.attach_block_devices(
-                mapping, context, instance, self.volume_api, self.driver,
-                wait_func=self._await_block_device_map_created)
+            # NOTE: Report the time spent creating and attaching the volumes
+            # as separate instance action events as both can take minutes for
+            # servers with many volumes.
+            if driver_block_device.get_volumes_to_create(mapping):
+                with compute_utils.EventReporter(
+                        context, 'compute_create_volumes', self.host,
+                        instance.uuid, graceful_exit=True):
+                    driver_block_device.create_volumes(
+                        mapping, context, instance, self.volume_api,
+                        wait_func=self._await_block_device_map_created)
+            if mapping:
+                with compute_utils.EventReporter(
+                        context, 'compute_attach_volumes', self.host,
+                        instance.uuid, graceful_exit=True):
+                    driver_block_device.attach_block_devices(
+                        mapping, context, instance, self.volume_api,
+                        self.driver,
+                        wait_func=self._await_block_device_map_created)
 
             return block_device_info
 
@@ -4457,24 +4477,30 @@ class ComputeManager(manager.Manager):
             # to cinder should not cause instance reboot to fail.
             return
 
+        cinder_attachments = [each['id'] for each in cinder_attachments]
+
         # attachments present in nova DB, ones nova knows about
         nova_attachments = []
         bdms_to_delete = []
         for bdm in bdms.objects:
             if bdm.volume_id and bdm.attachment_id:
-                try:
-                    self.volume_api.attachment_get(context, bdm.attachment_id)
-                except exception.VolumeAttachmentNotFound:
-                    LOG.info(
-                        f"Removing stale volume attachment "
-                        f"'{bdm.attachment_id}' from instance for "
-                        f"volume '{bdm.volume_id}'.", instance=instance)
-                    bdm.destroy()
-                    bdms_to_delete.append(bdm)
-                else:
-                    nova_attachments.append(bdm.attachment_id)
-
-        cinder_attachments = [each['id'] for each in cinder_attachments]
+                # NOTE: Only the attachments missing from the ones of the
+                # instance listed by cinder are looked up one by one to make
+                # sure they do not exist, rather than all of them, which was
+                # slow for instances with many volumes.
+                if bdm.attachment_id not in cinder_attachments:
+                    try:
+                        self.volume_api.attachment_get(
+                            context, bdm.attachment_id)
+                    except exception.VolumeAttachmentNotFound:
+                        LOG.info(
+                            f"Removing stale volume attachment "
+                            f"'{bdm.attachment_id}' from instance for "
+                            f"volume '{bdm.volume_id}'.", instance=instance)
+                        bdm.destroy()
+                        bdms_to_delete.append(bdm)
+                        continue
+                nova_attachments.append(bdm.attachment_id)
 
         if len(set(cinder_attachments) - set(nova_attachments)):
             LOG.info(
@@ -10776,7 +10802,17 @@ class ComputeManager(manager.Manager):
         list, pull the DB record, and try the call to the network API.
         If anything errors don't fail, as it's possible the instance
         has been deleted, etc.
+
+        If heal_instance_info_cache_batch_size is set, the caches which do
+        not match the ports in neutron are refreshed in batches instead, see
+        _heal_instance_info_caches().
         """
+        if (CONF.heal_instance_info_cache_batch_size and
+                not self.driver.manages_network_binding_host_id()):
+            self._heal_instance_info_caches(
+                context, CONF.heal_instance_info_cache_batch_size)
+            return
+
         instance_uuids = getattr(self, '_instance_uuids_to_heal', [])
         instance = None
 
@@ -10837,38 +10873,131 @@ class ComputeManager(manager.Manager):
 
         if instance:
             # We have an instance now to refresh
-            try:
-                # Fix potential mismatch in port binding if evacuation failed
-                # after reassigning the port binding to the dest host but
-                # before the instance host is changed.
-                # Do this only when instance has no pending task.
-                if instance.task_state is None and \
-                        self._require_nw_info_update(context, instance):
-                    LOG.info("Updating ports in neutron", instance=instance)
-                    self.network_api.setup_instance_network_on_host(
-                        context, instance, self.host)
-                # Call to network API to get instance info.. this will
-                # force an update to the instance's info_cache
-                self.network_api.get_instance_nw_info(
-                    context, instance, force_refresh=True)
-                LOG.debug('Updated the network info_cache for instance',
-                          instance=instance)
-            except exception.InstanceNotFound:
-                # Instance is gone.
-                LOG.debug('Instance no longer exists. Unable to refresh',
-                          instance=instance)
-                return
-            except exception.InstanceInfoCacheNotFound:
-                # InstanceInfoCache is gone.
-                LOG.debug('InstanceInfoCache no longer exists. '
-                          'Unable to refresh', instance=instance)
-            except Exception:
-                LOG.error('An error occurred while refreshing the network '
-                          'cache.', instance=instance, exc_info=True)
+            self._refresh_instance_info_cache(context, instance)
         else:
             LOG.debug("Didn't find any instances for network info cache "
                       "update.")
 
+    def _refresh_instance_info_cache(self, context, instance):
+        try:
+            # Fix potential mismatch in port binding if evacuation failed
+            # after reassigning the port binding to the dest host but
+            # before the instance host is changed.
+            # Do this only when instance has no pending task.
+            if instance.task_state is None and \
+                    self._require_nw_info_update(context, instance):
+                LOG.info("Updating ports in neutron", instance=instance)
+                self.network_api.setup_instance_network_on_host(
+                    context, instance, self.host)
+            # Call to network API to get instance info.. this will
+            # force an update to the instance's info_cache
+            self.network_api.get_instance_nw_info(
+                context, instance, force_refresh=True)
+            LOG.debug('Updated the network info_cache for instance',
+                      instance=instance)
+        except exception.InstanceNotFound:
+            # Instance is gone.
+            LOG.debug('Instance no longer exists. Unable to refresh',
+                      instance=instance)
+        except exception.InstanceInfoCacheNotFound:
+            # InstanceInfoCache is gone.
+            LOG.debug('InstanceInfoCache no longer exists. '
+                      'Unable to refresh', instance=instance)
+        except Exception:
+            LOG.error('An error occurred while refreshing the network '
+                      'cache.', instance=instance, exc_info=True)
+
+    @staticmethod
+    def _nw_info_cache_matches(instance, ports, floating_ips):
+        """Check that the network info cache of an instance matches its ports.
+
+        Only the ports, their fixed IPs and floating IPs are compared, not
+        the networks and subnets which are not part of the port data.
+
+        :param instance: The instance with its info_cache loaded.
+        :param ports: List of the neutron ports of the instance.
+        :param floating_ips: Dict of floating IP lists keyed by (port ID,
+            fixed IP address) tuples.
+        """
+        cached = {
+            (vif['id'], vif['address'], vif['network']['id'], vif['type'],
+             frozenset(ip['address'] for ip in vif.fixed_ips()),
+             frozenset(ip['address'] for ip in vif.floating_ips()))
+            for vif in instance.get_network_info()}
+        current = {
+            (port['id'], port['mac_address'], port['network_id'],
+             port.get('binding:vif_type'),
+             frozenset(ip['ip_address'] for ip in port['fixed_ips']),
+             frozenset(fip['floating_ip_address']
+                       for ip in port['fixed_ips']
+                       for fip in floating_ips.get(
+                           (port['id'], ip['ip_address']), [])))
+            for port in ports}
+        return cached == current
+
+    def _heal_instance_info_caches(self, context, batch_size):
+        """Refresh the network info caches which do not match neutron.
+
+        The ports bound to this host and their floating IPs are listed from
+        neutron at once and compared to the caches of the instances, and up
+        to batch_size of the instances which do not match are refreshed. The
+        rest of the batch is used to refresh the other instances in turn, as
+        _heal_instance_info_cache() does for a single instance per run.
+        """
+        LOG.debug('Starting heal instance info caches')
+        instances = {}
+        db_instances = objects.InstanceList.get_by_host(
+            context, self.host, expected_attrs=['info_cache'], use_slave=True)
+        for inst in db_instances:
+            # We don't want to refresh the cache for instances which are
+            # building or deleting.
+            if (inst.vm_state == vm_states.BUILDING or
+                    inst.task_state == task_states.DELETING):
+                continue
+            instances[inst.uuid] = inst
+        if not instances:
+            LOG.debug("Didn't find any instances for network info cache "
+                      "update.")
+            return
+
+        ports = self.network_api.list_ports(
+            context, **{'binding:host_id': self.host,
+                        'fields': ['id', 'device_id', 'mac_address',
+                                   'network_id', 'fixed_ips',
+                                   'binding:vif_type']})['ports']
+        floating_ips = self.network_api.get_floating_ips_by_ports(
+            context, [port['id'] for port in ports])
+        ports_by_instance = collections.defaultdict(list)
+        for port in ports:
+            ports_by_instance[port['device_id']].append(port)
+
+        to_refresh = [
+            uuid for uuid, inst in instances.items()
+            if not self._nw_info_cache_matches(
+                inst, ports_by_instance[uuid], floating_ips)]
+        if len(to_refresh) > batch_size:
+            LOG.info('The network info cache of %(count)d instances does not '
+                     'match the ports in neutron, only %(batch_size)d will be '
+                     'refreshed now.',
+                     {'count': len(to_refresh), 'batch_size': batch_size})
+            to_refresh = to_refresh[:batch_size]
+
+        # Refresh the other instances in turn with the rest of the batch.
+        instance_uuids = getattr(self, '_instance_uuids_to_heal', [])
+        while len(to_refresh) < batch_size:
+            if not instance_uuids:
+                instance_uuids = [uuid for uuid in instances
+                                  if uuid not in to_refresh]
+                if not instance_uuids:
+                    break
+            uuid = instance_uuids.pop(0)
+            if uuid in instances and uuid not in to_refresh:
+                to_refresh.append(uuid)
+        self._instance_uuids_to_heal = instance_uuids
+
+        for uuid in to_refresh:
+            self._refresh_instance_info_cache(context, instances[uuid])
+
     @periodic_task.periodic_task
     def _poll_rebooting_instances(self, context):
         if CONF.reboot_timeout > 0:
@@ -10878,7 +11007,9 @@ class ComputeManager(manager.Manager):
                         task_states.REBOOT_PENDING],
                        'host': self.host}
             rebooting = objects.InstanceList.get_by_filters(
-                context, filters, expected_attrs=[], use_slave=True)
+                context, filters, expected_attrs=[], use_slave=True,
+                only_fields=['host', 'task_state', 'updated_at',
+                             'vm_state'])
 
             to_poll = []
             for instance in rebooting:
@@ -11144,9 +11275,13 @@ class ComputeManager(manager.Manager):
         loop, one database record at a time, checking if the hypervisor has the
         same power state as is in the database.
         """
-        db_instances = objects.InstanceList.get_by_host(context, self.host,
-                                                        expected_attrs=[],
-                                                        use_slave=True)
+        # NOTE: Only load the fields used to compare the power states, the
+        # instance is refreshed before syncing it and anything else needed to
+        # stop it is lazy-loaded.
+        db_instances = objects.InstanceList.get_by_host(
+            context, self.host, expected_attrs=[], use_slave=True,
+            only_fields=['host', 'power_state', 'shutdown_terminate',
+                         'task_state', 'vm_state'])
 
         try:
             num_vm_instances = self.driver.get_num_instances()
@@ -11672,7 +11807,9 @@ class ComputeManager(manager.Manager):
         timeout = CONF.running_deleted_instance_timeout
         filters = {'deleted': True,
                    'soft_deleted': False}
-        instances = self._get_instances_on_driver(context, filters)
+        instances = self._get_instances_on_driver(
+            context, filters,
+            only_fields=['deleted', 'deleted_at', 'host', 'vm_state'])
         return [i for i in instances if self._deleted_old_enough(i, timeout)]
 
     def _deleted_old_enough(self, instance, timeout):
@@ -12034,8 +12171,10 @@ class ComputeManager(manager.Manager):
         filters = {'deleted': False,
                    'soft_deleted': True,
                    'host': nodes}
-        filtered_instances = objects.InstanceList.get_by_filters(context,
-                                 filters, expected_attrs=[], use_slave=True)
+        filtered_instances = objects.InstanceList.get_by_filters(
+            context, filters, expected_attrs=[], use_slave=True,
+            only_fields=['host', 'image_ref', 'kernel_id', 'os_type',
+                         'ramdisk_id', 'task_state', 'vm_state'])
 
         self.driver.manage_image_cache(context, filtered_instances)
 
@@ -19,6 +19,7 @@ import concurrent.futures
 import contextlib
 import copy
 import functools
+import statistics
 import sys
 import threading
 import time
@@ -58,6 +59,7 @@ from nova import objects
 from nova.objects import base as nova_object
 from nova.objects import fields
 from nova import profiler
+from nova import quota
 from nova import rpc
 from nova.scheduler.client import query
 from nova.scheduler.client import report
@@ -117,7 +119,7 @@ class ConductorManager(manager.Manager):
     namespace.  See the ComputeTaskManager class for details.
     """
 
-    target = messaging.Target(version='3.0')
+    target = messaging.Target(version='3.1')
 
     def __init__(self, *args, **kwargs):
         super(ConductorManager, self).__init__(service_name='conductor',
@@ -169,8 +171,18 @@ class ConductorManager(manager.Manager):
                     version_manifest=object_versions)
         return result
 
-    def object_action(self, context, objinst, objmethod, args, kwargs):
-        """Perform an action on an object."""
+    def object_action(self, context, objinst, objmethod, args, kwargs,
+                      loaded_fields=None):
+        """Perform an action on an object.
+
+        :param loaded_fields: If objinst is a delta of the caller's object,
+            the fingerprints of the fields set on the caller's object which
+            were left out of the delta, see
+            nova.objects.base.obj_to_delta()
+        """
+        loaded_fields = loaded_fields or {}
+        if loaded_fields:
+            objinst._obj_delta_omitted = frozenset(loaded_fields)
         oldobj = objinst.obj_clone()
         result = self._object_dispatch(objinst, objmethod, args, kwargs)
         updates = dict()
@@ -180,10 +192,20 @@ class ConductorManager(manager.Manager):
             if not objinst.obj_attr_is_set(name):
                 # Avoid demand-loading anything
                 continue
-            if (not oldobj.obj_attr_is_set(name) or
-                    getattr(oldobj, name) != getattr(objinst, name)):
-                updates[name] = field.to_primitive(objinst, name,
-                                                   getattr(objinst, name))
+            value = field.to_primitive(objinst, name, getattr(objinst, name))
+            # NOTE: Compare the primitives rather than the values since
+            # objects which are not changed but were reloaded by the action
+            # are not equal to the original ones, and sending them back makes
+            # the reply as large as the whole object.
+            if oldobj.obj_attr_is_set(name):
+                if value == field.to_primitive(oldobj, name,
+                                               getattr(oldobj, name)):
+                    continue
+            elif name in loaded_fields:
+                if (nova_object.obj_field_fingerprint(value) ==
+                        loaded_fields[name]):
+                    continue
+            updates[name] = value
         # This is safe since a field named this would conflict with the
         # method anyway
         updates['obj_what_changed'] = objinst.obj_what_changed()
@@ -250,6 +272,44 @@ def obj_target_cell(obj, cell):
             yield target
 
 
+class PrecacheThrottle(object):
+    """Adaptive limit on the number of computes pre-caching images at once.
+
+    The limit starts at one and is increased by one each time a compute
+    downloads the images without error in a reasonable time, up to
+    ``[image_cache]/precache_concurrency``. It is halved each time a compute
+    reports an error or is much slower than the median of the computes which
+    downloaded images so far, both signs that the image service is saturated.
+    Computes which already had all the images tell nothing about the image
+    service, so they do not change the limit.
+    """
+
+    # A host taking this many times longer than the median of the hosts so
+    # far is considered a sign of congestion.
+    SLOW_FACTOR = 2
+
+    def __init__(self, maximum, adaptive=True):
+        self.maximum = maximum
+        self.adaptive = adaptive
+        self.limit = 1 if adaptive else maximum
+        self.durations = []
+        self._lock = threading.Lock()
+
+    def host_completed(self, duration, errors, downloaded=True):
+        if not self.adaptive or not (errors or downloaded):
+            return
+        with self._lock:
+            slow = False
+            if downloaded:
+                self.durations.append(duration)
+                slow = (duration >
+                        statistics.median(self.durations) * self.SLOW_FACTOR)
+            if errors or slow:
+                self.limit = max(1, self.limit // 2)
+            else:
+                self.limit = min(self.maximum, self.limit + 1)
+
+
 @profiler.trace_cls("rpc")
 class ComputeTaskManager:
     """Namespace for compute methods.
@@ -1012,6 +1072,9 @@ class ComputeTaskManager:
         # created. An example of this would be a large number of requests for
         # the same resource for the same project sent simultaneously.
         if CONF.quota.recheck_quota:
+            # Always recount usage from the cell databases for a recheck
+            # rather than trusting any cached usage.
+            quota.invalidate_cached_usage(project_id or context.project_id)
             # The orig_num_req is the number of instances requested, which is
             # the delta that was quota checked before resources were allocated.
             # This is only used for the exception message is the recheck fails
@@ -2095,16 +2158,17 @@ class ComputeTaskManager:
 
         clock = timeutils.StopWatch()
         cache_image_executor = utils.get_cache_images_executor()
-        futures = []
+        throttle = PrecacheThrottle(
+            CONF.image_cache.precache_concurrency,
+            adaptive=CONF.image_cache.precache_adaptive_concurrency)
 
         hosts_by_cell = {}
         cells_by_uuid = {}
-        # TODO(danms): Make this a much more efficient bulk query
-        for hostname in aggregate.hosts:
-            hmap = objects.HostMapping.get_by_host(context, hostname)
+        for hmap in objects.HostMappingList.get_by_hosts(
+                context, aggregate.hosts):
             cells_by_uuid.setdefault(hmap.cell_mapping.uuid, hmap.cell_mapping)
             hosts_by_cell.setdefault(hmap.cell_mapping.uuid, [])
-            hosts_by_cell[hmap.cell_mapping.uuid].append(hostname)
+            hosts_by_cell[hmap.cell_mapping.uuid].append(hmap.host)
 
         LOG.info('Preparing to request pre-caching of image(s) %(image_ids)s '
                  'on %(hosts)i hosts across %(cells)i cells.',
@@ -2136,29 +2200,48 @@ class ComputeTaskManager:
                         unsupported += 1
                     stats[image_id] = (cached, existing, error, unsupported)
 
-            host_stats['completed'] += 1
+                host_stats['completed'] += 1
+                completed = host_stats['completed']
             compute_utils.notify_about_aggregate_cache(
                 context, aggregate, host, result,
-                host_stats['completed'], host_stats['total'])
+                completed, host_stats['total'])
 
         def wrap_cache_images(ctxt, host, image_ids):
+            host_clock = timeutils.StopWatch()
+            host_clock.start()
             result = self.compute_rpcapi.cache_images(
                 ctxt,
                 host=host,
                 image_ids=image_ids)
+            host_clock.stop()
+            throttle.host_completed(
+                host_clock.elapsed(),
+                any(status == 'error' for status in result.values()),
+                downloaded=any(status == 'cached'
+                               for status in result.values()))
             host_completed(context, host, result)
 
         def skipped_host(context, host, image_ids):
             result = {image: 'skipped' for image in image_ids}
             host_completed(context, host, result)
 
+        # Hosts with an enabled compute service are the ones which can
+        # receive new instances, so pre-cache images there first.
+        enabled_hosts = []
+        disabled_hosts = []
         for cell_uuid, hosts in hosts_by_cell.items():
             cell = cells_by_uuid[cell_uuid]
             with nova_context.target_cell(context, cell) as target_ctxt:
+                services = {
+                    service.host: service
+                    for service in objects.ServiceList.get_by_binary(
+                        target_ctxt, 'nova-compute', include_disabled=True)
+                    if service.host in hosts
+                }
                 for host in hosts:
-                    service = objects.Service.get_by_compute_host(target_ctxt,
-                                                                  host)
-                    if not self.servicegroup_api.service_is_up(service):
+                    service = services.get(host)
+                    if (service is None or
+                            not self.servicegroup_api.service_is_up(service)):
                         down_hosts.add(host)
                         LOG.info(
                             'Skipping image pre-cache request to compute '
@@ -2166,12 +2249,30 @@ class ComputeTaskManager:
                             {'host': host})
                         skipped_host(target_ctxt, host, image_ids)
                         continue
-                    future = utils.spawn_on(cache_image_executor,
-                                    wrap_cache_images,
-                                    target_ctxt, host, image_ids)
-                    futures.append(future)
-        # Wait until all those things finish
-        concurrent.futures.wait(futures)
+                    if service.disabled:
+                        disabled_hosts.append((target_ctxt, host))
+                    else:
+                        enabled_hosts.append((target_ctxt, host))
+
+        unmapped_hosts = set(aggregate.hosts) - set(
+            host for hosts in hosts_by_cell.values() for host in hosts)
+        for host in unmapped_hosts:
+            down_hosts.add(host)
+            LOG.info('Skipping image pre-cache request to compute %(host)r '
+                     'because it is not mapped to a cell', {'host': host})
+            skipped_host(context, host, image_ids)
+
+        pending = collections.deque(enabled_hosts + disabled_hosts)
+        futures = set()
+        while pending or futures:
+            while pending and len(futures) < throttle.limit:
+                target_ctxt, host = pending.popleft()
+                futures.add(utils.spawn_on(cache_image_executor,
+                                           wrap_cache_images,
+                                           target_ctxt, host, image_ids))
+            # Wait until one of those things finishes
+            done, futures = concurrent.futures.wait(
+                futures, return_when=concurrent.futures.FIRST_COMPLETED)
 
         overall_stats = {'cached': 0, 'existing': 0, 'error': 0,
                          'unsupported': 0}
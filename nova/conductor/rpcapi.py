@@ -198,6 +198,8 @@ class ConductorAPI(object):
     that they can handle the version_cap being set to 3.0.
 
     * Remove provider_fw_rule_get_all()
+
+    * 3.1  - Add loaded_fields to object_action()
     """
 
     VERSION_ALIASES = {
@@ -243,9 +245,17 @@ class ConductorAPI(object):
                           args=args, kwargs=kwargs)
 
     def object_action(self, context, objinst, objmethod, args, kwargs):
-        cctxt = self.client.prepare()
+        version = '3.0'
+        extra = {}
+        if (objmethod in objinst.obj_delta_methods and
+                self.client.can_send_version('3.1')):
+            version = '3.1'
+            objinst, extra['loaded_fields'] = objects_base.obj_to_delta(
+                objinst)
+        cctxt = self.client.prepare(version=version)
         return cctxt.call(context, 'object_action', objinst=objinst,
-                          objmethod=objmethod, args=args, kwargs=kwargs)
+                          objmethod=objmethod, args=args, kwargs=kwargs,
+                          **extra)
 
     def object_backport_versions(self, context, objinst, object_versions):
         cctxt = self.client.prepare()
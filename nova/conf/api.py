@@ -154,6 +154,31 @@ Related options:
 * vendordata_dynamic_ssl_certfile
 * vendordata_dynamic_connect_timeout
 * vendordata_dynamic_read_timeout
+"""),
+    cfg.IntOpt('vendordata_dynamic_cache_expiration',
+        default=0,
+        min=0,
+        help="""
+Time (in seconds) to cache the data returned by each external REST service
+for an instance.
+
+Dynamic vendordata is fetched from every configured target each time the
+metadata of an instance is rendered, which happens again whenever the
+metadata cache of the instance expires. Caching the responses avoids calling
+the external services again while they are valid. Failed requests are never
+cached.
+
+Possible values:
+
+* 0: Disables the cache, the services are called every time (default).
+* Any positive integer. Note that changes made by the services take up to this
+  long to be visible to instances.
+
+Related options:
+
+* vendordata_providers
+* vendordata_dynamic_targets
+* metadata_cache_expiration
 """),
     cfg.IntOpt("metadata_cache_expiration",
         default=15,
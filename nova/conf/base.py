@@ -105,6 +105,39 @@ operations requires cross cell data gathering a.k.a scatter-gather, like
 listing instances across multiple cells. This is only used if the service is
 running in native thread mode.
 '''),
+    cfg.IntOpt(
+        'cell_failure_threshold',
+        default=0,
+        min=0,
+        help="""
+Number of consecutive failed calls to a cell after which it is skipped.
+
+Operations gathering data across cells, like listing instances or counting
+quota usage, wait for every cell to respond. When a cell is down or slow, each
+of these operations has to wait for the full cell timeout. When this option is
+set to a positive value, a cell whose last calls timed out or failed
+unexpectedly this many times in a row is treated as not responding without
+calling it, until ``cell_failure_retry_interval`` seconds have passed. A single
+call is then let through to check whether the cell has recovered.
+
+The default value of 0 never skips cells.
+
+Related options:
+
+* ``cell_failure_retry_interval``
+"""),
+    cfg.IntOpt(
+        'cell_failure_retry_interval',
+        default=30,
+        min=1,
+        help="""
+Number of seconds to skip a failing cell for before checking whether it has
+recovered.
+
+Related options:
+
+* ``cell_failure_threshold``
+"""),
     cfg.IntOpt(
         'thread_pool_statistic_period',
         default=-1,
@@ -1017,6 +1017,29 @@ Possible values:
 * Any integer >= 1 represents the maximum allowed. A value of 0 will cause the
   ``nova-compute`` service to fail to start, as 0 disk devices is an invalid
   configuration that would prevent instances from being able to boot.
+"""),
+    cfg.IntOpt('max_concurrent_volume_attaches',
+        default=1,
+        min=1,
+        help="""
+Maximum number of volumes attached concurrently to a single server.
+
+When a server is created, rebuilt or unshelved, the volumes to create from
+snapshots, images or blank are created first, then all its volumes are
+attached. By default the volumes are created and attached one after another,
+which can take minutes for servers with many volumes. Setting this option to a
+value greater than 1 sends the block storage service requests of up to that
+many volumes concurrently. The volumes are connected to the server by the virt
+driver in the order of their device names regardless of this option.
+
+Possible values:
+
+* Any positive integer. 1 means the volumes are created and attached one after
+  another.
+
+Related options:
+
+* ``[DEFAULT] block_device_allocate_retries``
 """),
     cfg.StrOpt('provider_config_location',
         default='/etc/nova/provider_config/',
@@ -1129,6 +1152,36 @@ Possible values:
 
 * Any positive integer in seconds.
 * Any value <=0 will disable the sync.
+
+Related options:
+
+* ``heal_instance_info_cache_batch_size``
+"""),
+    cfg.IntOpt('heal_instance_info_cache_batch_size',
+        default=0,
+        min=0,
+        help="""
+Maximum number of instance network information caches to refresh per run
+of the cache update task.
+
+By default the task refreshes the cache of a single instance per run, in turn,
+so on a host with many instances it can take a long time before a stale cache
+gets refreshed. When this option is set, the task instead lists the ports
+bound to the host and their floating IPs from Neutron in a few requests, and
+refreshes the caches of the instances whose ports, fixed IPs or floating IPs
+do not match their cache, up to this number of instances per run. The rest of
+this budget is used to refresh the other instances in turn, as changes to
+networks and subnets are not visible on the ports. This does not apply to
+drivers which manage the port bindings themselves, like the ironic driver.
+
+Possible values:
+
+* 0: Refresh the cache of one instance per run (default).
+* Any positive integer.
+
+Related options:
+
+* ``heal_instance_info_cache_interval``
 """),
     cfg.IntOpt('reclaim_instance_interval',
         default=0,
@@ -52,6 +52,51 @@ api_db_opts = copy.deepcopy(oslo_db_opts.database_opts)
 main_db_opts = [opt for opt in main_db_opts if opt.name != 'use_db_reconnect']
 api_db_opts = [opt for opt in api_db_opts if opt.name != 'use_db_reconnect']
 
+main_db_opts += [
+    cfg.BoolOpt(
+        'replica_reads',
+        default=False,
+        help="""
+Send more reads to the replica database and let requests see their own writes.
+
+Only a few callers, like periodic tasks of the compute service, explicitly
+read from the database configured by ``slave_connection``. When this option is
+enabled, listing servers through the API is also sent to it. Such reads are
+still sent to the primary database when they are done within a transaction
+which already started, or for a request which wrote to the database less than
+``replica_max_lag`` seconds ago, so that a request always sees its own writes.
+The time of the last write is sent along with the request to the other
+services handling it, so the clocks of the hosts running nova services should
+be kept in sync.
+
+The replica is only used for the database configured by ``connection``.
+Reads for other cell databases always go to the primary database of the cell.
+
+This has no effect if ``slave_connection`` is not set.
+
+Related options:
+
+* ``slave_connection``
+* ``replica_max_lag``
+"""),
+    cfg.IntOpt(
+        'replica_max_lag',
+        default=5,
+        min=0,
+        help="""
+Maximum expected replication lag of the replica database, in seconds.
+
+Reads done for a request within this many seconds after the request wrote to
+the database are sent to the primary database rather than the replica, since
+the replica may not have the write yet. This should be set to a value above
+the replication lag usually observed for the replica database.
+
+Related options:
+
+* ``replica_reads``
+"""),
+]
+
 
 def register_opts(conf):
     conf.register_opts(main_db_opts, group=main_db_group)
@@ -78,6 +78,67 @@ Unused unresized base images younger than this will not be removed.
         deprecated_group='libvirt',
         help="""
 Unused resized base images younger than this will not be removed.
+"""),
+    cfg.BoolOpt('use_manifest',
+        default=False,
+        help="""
+Track the content of the image cache in a manifest file.
+
+When enabled, the compute service records each cached file, its size, the
+time it was last used and the instances using it in a small manifest stored
+in the image cache directory. The manifest is updated when instances are
+created and deleted, so the periodic image cache manager pass only needs to
+look at the files which are candidates for eviction instead of listing and
+inspecting every file in the cache. This is mostly useful when the cache is
+on shared storage used by many compute services.
+
+Currently only the libvirt driver supports this option.
+
+Related options:
+
+* ``[image_cache]/max_size_mb``
+* ``[image_cache]/manager_interval``
+"""),
+    cfg.IntOpt('max_size_mb',
+        default=0,
+        min=0,
+        help="""
+Maximum size of the image cache in MiB.
+
+When the image cache manifest is enabled and the cached files use more than
+this amount of disk space, unused files are evicted in least recently used
+order, regardless of the ``[image_cache]/remove_unused_*_minimum_age_seconds``
+options, until the cache fits in this limit. Files used by instances are
+never evicted.
+
+Possible values:
+
+* 0: no size limit, files are only evicted based on their age
+* Any positive integer
+
+Related options:
+
+* ``[image_cache]/use_manifest``
+"""),
+    cfg.BoolOpt('deduplicate_images',
+        default=False,
+        help="""
+Store images with identical content only once in the image cache.
+
+Cached images are named after their image ID, so images with different IDs
+but the same content, for example copies of an image in several projects,
+are normally downloaded and stored once per image ID. When this option is
+enabled, cached images are also indexed by the content hash computed by the
+image service (the ``os_hash_algo`` and ``os_hash_value`` image properties),
+and an image whose content is already cached is hard linked to the cached
+file instead of being downloaded again.
+
+This requires an extra request to the image service the first time an
+image is cached on a host. Images without a content hash are cached as
+usual.
+
+Currently only the libvirt driver supports this option, and only for
+image backends which use the image cache.
 """),
     cfg.IntOpt('precache_concurrency',
                default=1,
@@ -91,6 +152,28 @@ will happen in parallel. Higher numbers will cause more computes to work
 in parallel and may result in reduced time to complete the operation, but
 may also DDoS the image service. Lower numbers will result in more sequential
 operation, lower image service load, but likely longer runtime to completion.
+
+Related options:
+
+* ``[image_cache] precache_adaptive_concurrency``
+"""),
+    cfg.BoolOpt('precache_adaptive_concurrency',
+                default=False,
+                help="""
+Adapt the number of compute hosts precaching images in parallel to the load.
+
+When enabled, image precaching starts with a single compute host and contacts
+one more host at a time for as long as hosts complete without errors. When a
+host reports an error, or takes more than twice as long as the fastest host
+so far, the number of hosts precaching in parallel is halved. This avoids
+overloading the image service while still completing quickly when it has
+capacity to spare. Hosts with an enabled compute service are always contacted
+before hosts with a disabled one.
+
+Related options:
+
+* ``[image_cache] precache_concurrency``: the upper bound on the number of
+  compute hosts precaching images in parallel.
 """),
 ]
 
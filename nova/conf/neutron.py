@@ -107,6 +107,25 @@ to 3 means total attempts to connect will be 4.
 Possible values:
 
 * Any integer value. 0 means connection is attempted only once
+"""),
+    cfg.IntOpt('port_concurrency',
+               default=1,
+               min=1,
+               help="""
+Maximum number of ports created or updated concurrently for an instance.
+
+When an instance is allocated networking, one port is created for each
+requested network without a port, then each requested or created port is
+updated to be bound to the instance. By default these requests to Neutron are
+sent one after another, which delays the boot of instances with many network
+interfaces. Setting this option to a value greater than 1 sends up to that
+many of these requests concurrently. The ports are attached to the instance in
+the requested order regardless of this option.
+
+Possible values:
+
+* Any positive integer. 1 means the ports are created and updated one after
+  another
 """),
 ]
 
@@ -298,6 +298,62 @@ query during each quota check, if this configuration option is set to True.
 Operators who want to avoid the performance hit from the EXISTS queries should
 wait to set this configuration option to True until after they have completed
 their online data migrations via ``nova-manage db online_data_migrations``.
+"""),
+    cfg.IntOpt(
+        'limits_cache_ttl',
+        default=0,
+        min=0,
+        help="""
+Number of seconds to cache quota limits and quota class defaults.
+
+Quota limits, user limits and quota class defaults looked up from the database
+are always cached for the duration of a single API request, so that the
+several quota checks done for a request only read them once. When this option
+is set to a positive value, the looked up limits are also shared between
+requests handled by the same service process for the given number of seconds.
+
+Changing quota limits or quota classes drops the cache of the service process
+making the change. Other service processes will only see the change once their
+cached limits expire.
+
+The default value of 0 only caches limits for the duration of a request.
+
+Related options:
+
+* ``usage_cache_ttl``
+"""),
+    cfg.IntOpt(
+        'usage_cache_ttl',
+        default=0,
+        min=0,
+        help="""
+Number of seconds to cache instance, cores and ram usage counted from the cell
+databases.
+
+When quota usage is counted from the cell databases, every quota check for
+creating, resizing or restoring a server has to count the usage of the project
+in each cell it has servers in. For projects with a large number of servers
+this can add noticeable latency to each request. When this option is set to a
+positive value, the counted usage is cached per project and user within each
+service process for the given number of seconds. The cached usage is adjusted
+as servers are created, resized or restored through the same process, and is
+recounted from the cell databases once it expires. When a server of the
+project is deleted, the usage of the project is not cached for the given number
+of seconds, as the delete may not have completed yet. Quota rechecks always
+recount usage from the cell databases.
+
+Because the cache is local to each service process, usage consumed through
+other API workers is only taken into account once the cached counts expire, so
+the initial quota check may allow a project to briefly go over quota. Leave
+``recheck_quota`` enabled to catch this.
+
+The default value of 0 disables the cache. This option has no effect when
+``count_usage_from_placement`` is set to True.
+
+Related options:
+
+* ``recheck_quota``
+* ``count_usage_from_placement``
 """),
     cfg.StrOpt(
         'unified_limits_resource_strategy',
@@ -37,6 +37,27 @@ Operations with RPC calls that utilize this value:
 Related options:
 
 * rpc_response_timeout
+"""),
+    cfg.BoolOpt("rpc_compact_objects",
+        default=False,
+        help="""
+Send versioned objects over RPC in a compact binary format.
+
+By default, objects are sent over RPC as nested dictionaries which repeat the
+name, version and field names of every object. When this is enabled, objects
+are instead packed with msgpack using a table of field names per object
+version, which makes large payloads like lists of instances, request specs and
+compute nodes much smaller. Encoding and decoding them takes somewhat more CPU
+time, so this is mostly useful when the size of the messages is a bottleneck,
+for example when the message bus is saturated.
+
+The compact format is only used once all the services are new enough to decode
+it, as advertised by their service versions, so this can be enabled before
+the upgrade of all the services is complete. Services always accept objects
+sent in either format. Services without database access, like nova-compute,
+get the service versions from nova-conductor, which caches them: restart
+nova-conductor or send it SIGHUP once the upgrade is complete for them to start
+using the compact format.
 """),
 ]
 
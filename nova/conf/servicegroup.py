@@ -36,6 +36,35 @@ and Memcache ServiceGroup driver.
 Related Options:
 
 * ``service_down_time`` (maximum time since last check-in for up service)
+"""),
+    cfg.IntOpt('heartbeat_flush_interval',
+        default=0,
+        min=0,
+        help="""
+Number of seconds during which nova-conductor buffers service state reports
+before writing them to the database.
+
+This option only applies to the ``db`` servicegroup driver. When set to a
+value greater than 0 on a service, its state reports are sent as lightweight
+heartbeats which nova-conductor applies with a single UPDATE, rather than by
+loading and saving the whole service record. When set on nova-conductor, the
+heartbeats it receives are buffered for up to this many seconds and written
+for all the buffered services at once, which reduces the number of writes to
+the cell database in deployments with many services. All nova-conductor
+services must be upgraded before enabling this option on other services.
+
+Buffered heartbeats are written at least every this many seconds, so the
+last time a service was seen up in the database may be up to this interval
+older than its last report. To keep services from being considered down
+because of it, the interval is capped to half of the difference between
+``service_down_time`` and ``report_interval``. Services which were deleted
+while still running are not reported as such when this option is enabled.
+
+Related Options:
+
+* ``report_interval``
+* ``service_down_time``
+* ``servicegroup_driver``
 """),
 ]
 
@@ -17,8 +17,11 @@
 
 """RequestContext: context for requests that persist through all of nova."""
 
+import collections
 from contextlib import contextmanager
 import copy
+import threading
+import time
 
 import futurist.waiters
 from keystoneauth1.access import service_catalog as ksa_service_catalog
@@ -26,6 +29,7 @@ from keystoneauth1 import plugin
 from oslo_context import context
 from oslo_db.sqlalchemy import enginefacade
 from oslo_log import log as logging
+from oslo_reports.models import with_default_views
 from oslo_utils import timeutils
 
 import nova.conf
@@ -48,13 +52,19 @@ did_not_respond_sentinel = object()
 CELLS = []
 # Timeout value for waiting for cells to respond
 CELL_TIMEOUT = 60
+# Scatter-gather latency and failure tracking for each cell, keyed by cell
+# uuid.
+CELL_HEALTH = {}
+CELL_HEALTH_LOCK = threading.Lock()
 
 
 def reset_globals():
     global CELL_CACHE
     global CELLS
+    global CELL_HEALTH
     CELL_CACHE = {}
     CELLS = []
+    CELL_HEALTH = {}
     service_auth.reset_globals()
 
 
@@ -94,7 +104,7 @@ class RequestContext(context.RequestContext):
     def __init__(self, user_id=None, project_id=None, is_admin=None,
                  read_deleted="no", remote_address=None, timestamp=None,
                  quota_class=None, service_catalog=None,
-                 user_auth_plugin=None, **kwargs):
+                 user_auth_plugin=None, db_write_time=None, **kwargs):
         """:param read_deleted: 'no' indicates deleted records are hidden,
                 'yes' indicates deleted records are visible,
                 'only' indicates that *only* deleted records are visible.
@@ -104,6 +114,9 @@ class RequestContext(context.RequestContext):
 
            :param user_auth_plugin: The auth plugin for the current request's
                 authentication data.
+
+           :param db_write_time: When the request last wrote to the database,
+                as a time.time() timestamp.
         """
         if user_id:
             kwargs['user_id'] = user_id
@@ -143,6 +156,17 @@ class RequestContext(context.RequestContext):
         self.mq_connection = None
         self.cell_uuid = None
 
+        # NOTE: Quota limits and classes already looked up on behalf of this
+        # request, see nova.objects.quotas. This is deliberately not included
+        # in to_dict() so that it never outlives the request.
+        self.quota_cache = {}
+
+        # NOTE: When the request last wrote to the database, so that reads
+        # which would otherwise go to the replica database see the write, see
+        # nova.db.main.api. This is kept in a dict shared with the copies made
+        # by elevated() and target_cell() so that their writes are seen too.
+        self._db_write = {'time': db_write_time}
+
         self.user_auth_plugin = user_auth_plugin
         if self.is_admin is None:
             self.is_admin = policy.check_is_admin(self)
@@ -168,6 +192,14 @@ class RequestContext(context.RequestContext):
     read_deleted = property(_get_read_deleted, _set_read_deleted,
                             _del_read_deleted)
 
+    @property
+    def db_write_time(self):
+        return self._db_write['time']
+
+    @db_write_time.setter
+    def db_write_time(self, db_write_time):
+        self._db_write['time'] = db_write_time
+
     def to_dict(self):
         values = super(RequestContext, self).to_dict()
         # FIXME(dims): defensive hasattr() checks need to be
@@ -186,6 +218,7 @@ class RequestContext(context.RequestContext):
             'user_name': getattr(self, 'user_name', None),
             'service_catalog': getattr(self, 'service_catalog', None),
             'project_name': getattr(self, 'project_name', None),
+            'db_write_time': getattr(self, 'db_write_time', None),
         })
         # NOTE(tonyb): This can be removed once we're certain to have a
         # RequestContext contains 'is_admin_project', We can only get away with
@@ -210,6 +243,7 @@ class RequestContext(context.RequestContext):
             timestamp=values.get('timestamp'),
             quota_class=values.get('quota_class'),
             service_catalog=values.get('service_catalog'),
+            db_write_time=values.get('db_write_time'),
         )
 
     def elevated(self, read_deleted=None):
@@ -425,10 +459,97 @@ def target_cell(context, cell_mapping):
     # Specifically, this won't include any oslo_db-set transaction context, or
     # any existing cell targeting.
     cctxt = RequestContext.from_dict(context.to_dict())
+    # NOTE: Share when the request last wrote to the database though, so that
+    # the reads done with the original context see the writes done with the
+    # targeted one.
+    cctxt._db_write = context._db_write
     set_target_cell(cctxt, cell_mapping)
     yield cctxt
 
 
+class _CellHealth(object):
+    """Latency and failure tracking for scatter-gather calls to a cell.
+
+    This also acts as a circuit breaker for the cell. Once
+    [DEFAULT]cell_failure_threshold consecutive calls to the cell timed out or
+    failed unexpectedly, the cell is reported as not responding without being
+    called until [DEFAULT]cell_failure_retry_interval seconds have passed.
+    After that a single call is let through to probe the cell, which closes
+    the circuit again if it succeeds.
+    """
+
+    # Number of latency samples kept to compute percentiles from.
+    LATENCY_SAMPLES = 100
+
+    def __init__(self):
+        self.latencies = collections.deque(maxlen=self.LATENCY_SAMPLES)
+        self.failures = 0
+        self.skipped = 0
+        self.opened_at = None
+        self.probing = False
+
+    def allow(self, now):
+        """Return whether the cell should be called."""
+        if self.opened_at is None:
+            return True
+        if (self.probing or
+                now - self.opened_at < CONF.cell_failure_retry_interval):
+            self.skipped += 1
+            return False
+        self.probing = True
+        return True
+
+    def record(self, now, latency, failed):
+        """Record the outcome of a call to the cell."""
+        self.probing = False
+        if not failed:
+            self.failures = 0
+            self.opened_at = None
+            self.latencies.append(latency)
+            return
+        self.failures += 1
+        threshold = CONF.cell_failure_threshold
+        if threshold and self.failures >= threshold:
+            self.opened_at = now
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        return 'half-open' if self.probing else 'open'
+
+    def stats(self):
+        stats = {'state': self.state,
+                 'consecutive_failures': self.failures,
+                 'skipped_calls': self.skipped}
+        latencies = sorted(self.latencies)
+        for percentile in (50, 95, 99):
+            key = 'p%i_ms' % percentile
+            if latencies:
+                index = min(len(latencies) - 1,
+                            len(latencies) * percentile // 100)
+                stats[key] = round(latencies[index] * 1000, 1)
+            else:
+                stats[key] = None
+        return stats
+
+
+def _get_cell_health(cell_uuid):
+    # NOTE: Must be called with CELL_HEALTH_LOCK held.
+    health = CELL_HEALTH.get(cell_uuid)
+    if health is None:
+        health = CELL_HEALTH[cell_uuid] = _CellHealth()
+    return health
+
+
+def cell_health_report():
+    """Guru meditation report section with scatter-gather stats per cell."""
+    with CELL_HEALTH_LOCK:
+        data = {cell_uuid: health.stats()
+                for cell_uuid, health in CELL_HEALTH.items()}
+    return with_default_views.ModelWithDefaultViews(data=data)
+
+
 def scatter_gather_cells(context, cell_mappings, timeout, fn, *args, **kwargs):
     """Target cells in parallel and return their results.
 
@@ -445,27 +566,40 @@ def scatter_gather_cells(context, cell_mappings, timeout, fn, *args, **kwargs):
     :param kwargs: The kwargs for the function to call for each cell
     :returns: A dict {cell_uuid: result} containing the joined results. The
               did_not_respond_sentinel will be returned if a cell did not
-              respond within the timeout. The exception object will
-              be returned if the call to a cell raised an exception. The
-              exception will be logged.
+              respond within the timeout, or was skipped after failing
+              repeatedly (see [DEFAULT]cell_failure_threshold). The exception
+              object will be returned if the call to a cell raised an
+              exception. The exception will be logged.
     """
     tasks = {}
     results = {}
 
     def gather_result(cell_uuid, fn, *args, **kwargs):
+        start = time.monotonic()
+        failed = False
         try:
             result = fn(*args, **kwargs)
         except Exception as e:
             # Only log the exception traceback for non-nova exceptions.
             if not isinstance(e, exception.NovaException):
                 LOG.exception('Error gathering result from cell %s', cell_uuid)
+                failed = True
             result = e
 
-        return result
+        return result, time.monotonic() - start, failed
 
     executor = utils.get_scatter_gather_executor()
 
+    now = time.monotonic()
     for cell_mapping in cell_mappings:
+        with CELL_HEALTH_LOCK:
+            allowed = _get_cell_health(cell_mapping.uuid).allow(now)
+        if not allowed:
+            LOG.debug('Skipping cell %s which failed to respond to the last '
+                      '%i calls.', cell_mapping.uuid,
+                      CONF.cell_failure_threshold)
+            results[cell_mapping.uuid] = did_not_respond_sentinel
+            continue
         with target_cell(context, cell_mapping) as cctxt:
             future = utils.spawn_on(
                 executor,
@@ -474,8 +608,11 @@ def scatter_gather_cells(context, cell_mappings, timeout, fn, *args, **kwargs):
 
     futurist.waiters.wait_for_all(tasks.values(), timeout)
 
+    now = time.monotonic()
     for cell_uuid, future in tasks.items():
         if not future.done():
+            with CELL_HEALTH_LOCK:
+                _get_cell_health(cell_uuid).record(now, timeout, True)
             results[cell_uuid] = did_not_respond_sentinel
             cancelled = future.cancel()
             if cancelled:
@@ -497,7 +634,10 @@ def scatter_gather_cells(context, cell_mappings, timeout, fn, *args, **kwargs):
                     'cell worker thread to finish in the background.',
                     cell_uuid)
         else:
-            results[cell_uuid] = future.result()
+            result, latency, failed = future.result()
+            with CELL_HEALTH_LOCK:
+                _get_cell_health(cell_uuid).record(now, latency, failed)
+            results[cell_uuid] = result
 
     return results
 
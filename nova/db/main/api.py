@@ -22,6 +22,8 @@ import copy
 import datetime
 import functools
 import inspect
+import threading
+import time
 import traceback
 
 from oslo_db import api as oslo_db_api
@@ -30,6 +32,7 @@ from oslo_db.sqlalchemy import enginefacade
 from oslo_db.sqlalchemy import update_match
 from oslo_db.sqlalchemy import utils as sqlalchemyutils
 from oslo_log import log as logging
+from oslo_reports.models import with_default_views
 from oslo_utils import excutils
 from oslo_utils import importutils
 from oslo_utils import timeutils
@@ -63,9 +66,17 @@ DISABLE_DB_ACCESS = False
 
 context_manager = enginefacade.transaction_context()
 
+_READ_ROUTING_LOCK = threading.Lock()
+# Number of reads which asked for the replica database that were sent to the
+# primary and replica databases, see _use_replica().
+READ_ROUTING_COUNTS = collections.Counter()
+
 
 def _get_db_conf(conf_group, connection=None):
     kw = dict(conf_group.items())
+    # NOTE: These options are handled by nova itself, not by oslo.db.
+    kw.pop('replica_reads', None)
+    kw.pop('replica_max_lag', None)
     if connection is not None:
         kw['connection'] = connection
     return kw
@@ -117,13 +128,30 @@ def configure(conf):
             lambda eng: profiler_sqlalchemy.add_tracing(sa, eng, "db"))
 
 
+def _same_connection(connection, other):
+    """Return whether two database connection strings are equivalent."""
+    if connection is None or other is None:
+        return connection == other
+    try:
+        return sa.engine.make_url(connection) == sa.engine.make_url(other)
+    except sqla_exc.ArgumentError:
+        return connection == other
+
+
 def create_context_manager(connection=None):
     """Create a database context manager object for a cell database connection.
 
     :param connection: The database connection string
     """
+    db_conf = _get_db_conf(CONF.database, connection=connection)
+    # NOTE: [database]slave_connection is a replica of [database]connection,
+    # so do not route the replica eligible reads of other cell databases to
+    # it.
+    if (CONF.database.replica_reads and
+            not _same_connection(connection, CONF.database.connection)):
+        db_conf.pop('slave_connection', None)
     ctxt_mgr = enginefacade.transaction_context()
-    ctxt_mgr.configure(**_get_db_conf(CONF.database, connection=connection))
+    ctxt_mgr.configure(**db_conf)
     return ctxt_mgr
 
 
@@ -170,7 +198,7 @@ def select_db_reader_mode(f):
         context = keyed_args['context']
         use_slave = keyed_args.get('use_slave', False)
 
-        if use_slave:
+        if use_slave and _use_replica(context):
             reader_mode = get_context_manager(context).async_
         else:
             reader_mode = get_context_manager(context).reader
@@ -192,6 +220,60 @@ def _check_db_access():
         raise exception.DBNotAllowed(binary=service_name)
 
 
+def _record_write(context):
+    """Remember on the context that its request wrote to the database.
+
+    The time of the write is kept on the RequestContext, which is sent along
+    with the request over RPC, so that the other services handling the
+    request also see it.
+    """
+    if CONF.database.replica_reads and hasattr(context, 'db_write_time'):
+        context.db_write_time = time.time()
+
+
+def _in_transaction(context):
+    try:
+        return context.transaction_ctx is not None
+    except (AttributeError, db_exc.NoEngineContextEstablished):
+        return False
+
+
+def _use_replica(context):
+    """Pick the database a read which asked for the replica is sent to.
+
+    Reads which tolerate slightly stale data ask for the replica database
+    with use_slave=True. If [database]replica_reads is enabled, they are sent
+    to the primary database instead if they are done within an already
+    started transaction or if the request of the context wrote to the
+    database less than [database]replica_max_lag seconds ago.
+
+    :returns: True if the read should be sent to the replica database, False
+        if it should be sent to the primary database.
+    """
+    if not CONF.database.replica_reads:
+        return True
+
+    use_replica = not _in_transaction(context)
+    written_at = getattr(context, 'db_write_time', None)
+    if use_replica and written_at is not None:
+        lag = time.time() - written_at
+        use_replica = lag >= CONF.database.replica_max_lag
+
+    with _READ_ROUTING_LOCK:
+        READ_ROUTING_COUNTS['replica' if use_replica else 'primary'] += 1
+    return use_replica
+
+
+def read_routing_report():
+    """Guru meditation report section with the database read routing stats."""
+    with _READ_ROUTING_LOCK:
+        data = {
+            'primary_reads': READ_ROUTING_COUNTS['primary'],
+            'replica_reads': READ_ROUTING_COUNTS['replica'],
+        }
+    return with_default_views.ModelWithDefaultViews(data=data)
+
+
 def pick_context_manager_writer(f):
     """Decorator to use a writer db context manager.
 
@@ -204,7 +286,9 @@ def pick_context_manager_writer(f):
         _check_db_access()
         ctxt_mgr = get_context_manager(context)
         with ctxt_mgr.writer.using(context):
-            return f(context, *args, **kwargs)
+            result = f(context, *args, **kwargs)
+        _record_write(context)
+        return result
     wrapper.__signature__ = inspect.signature(f)
     return wrapper
 
@@ -579,6 +663,25 @@ def service_update(context, service_id, values):
     return service_ref
 
 
+@oslo_db_api.wrap_db_retry(max_retries=5, retry_on_deadlock=True)
+@pick_context_manager_writer
+def service_heartbeat(context, service_ids):
+    """Record a state report for each of the given services.
+
+    This increments the report count and sets the last seen up time of all
+    the services in a single UPDATE, without loading them first.
+
+    :returns: The number of services updated
+    """
+    now = timeutils.utcnow()
+    return model_query(context, models.Service, read_deleted='no').\
+        filter(models.Service.id.in_(service_ids)).\
+        update({'report_count': models.Service.report_count + 1,
+                'last_seen_up': now,
+                'updated_at': now},
+               synchronize_session=False)
+
+
 ###################
 
 
@@ -1477,7 +1580,24 @@ def _build_instance_get(context, columns_to_join=None):
     return query.order_by(models.Instance.id)
 
 
-def _instances_fill_metadata(context, instances, manual_joins=None):
+def _instance_load_only(query, columns):
+    """Only load the given columns of the instances returned by a query.
+
+    The id and uuid columns are always loaded.
+
+    :param query: query on the instances table
+    :param columns: list of instance columns to load or None to load all of
+                    them
+    """
+    if columns is None:
+        return query
+    columns = set(columns) | {'id', 'uuid'}
+    return query.options(orm.load_only(
+        *[getattr(models.Instance, column) for column in sorted(columns)]))
+
+
+def _instances_fill_metadata(context, instances, manual_joins=None,
+                             columns=None):
     """Selectively fill instances with manually-joined metadata. Note that
     instance will be converted to a dict.
 
@@ -1486,6 +1606,8 @@ def _instances_fill_metadata(context, instances, manual_joins=None):
     :param manual_joins: list of tables to manually join (can be any
                          combination of 'metadata' and 'system_metadata' or
                          None to take the default of both)
+    :param columns: the columns passed to _instance_load_only() when querying
+                    the instances
     """
     uuids = [inst['uuid'] for inst in instances]
 
@@ -1515,7 +1637,14 @@ def _instances_fill_metadata(context, instances, manual_joins=None):
 
     filled_instances = []
     for inst in instances:
-        inst = dict(inst)
+        if columns is None:
+            inst = dict(inst)
+        else:
+            # NOTE: dict() would load each column left out by
+            # _instance_load_only() with one query per instance, only copy
+            # what was loaded.
+            inst = {key: value for key, value in inst.__dict__.items()
+                    if not key.startswith('_')}
         inst['system_metadata'] = sys_meta[inst['uuid']]
         inst['metadata'] = meta[inst['uuid']]
         if 'pci_devices' in manual_joins:
@@ -1590,7 +1719,7 @@ def instance_get_all(context, columns_to_join=None):
 @pick_context_manager_reader_allow_async
 def instance_get_all_by_filters(
     context, filters, sort_key='created_at', sort_dir='desc', limit=None,
-    marker=None, columns_to_join=None,
+    marker=None, columns_to_join=None, columns=None,
 ):
     """Get all instances matching all filters sorted by the primary key.
 
@@ -1602,7 +1731,8 @@ def instance_get_all_by_filters(
                                             marker=marker,
                                             columns_to_join=columns_to_join,
                                             sort_keys=[sort_key],
-                                            sort_dirs=[sort_dir])
+                                            sort_dirs=[sort_dir],
+                                            columns=columns)
 
 
 def _get_query_nova_resource_by_changes_time(query, filters, model_object):
@@ -1635,7 +1765,7 @@ def _get_query_nova_resource_by_changes_time(query, filters, model_object):
 @pick_context_manager_reader_allow_async
 def instance_get_all_by_filters_sort(context, filters, limit=None, marker=None,
                                      columns_to_join=None, sort_keys=None,
-                                     sort_dirs=None):
+                                     sort_dirs=None, columns=None):
     """Get all instances that match all filters sorted by the given keys.
 
     Deleted instances will be returned by default, unless there's a filter that
@@ -1697,6 +1827,9 @@ def instance_get_all_by_filters_sort(context, filters, limit=None, marker=None,
     |        'not-tags: [some-not-tag, some-another-not-tag],
     |        'not-tags-any: [some-not-any-tag, some-another-not-any-tag]
     |    }
+
+    Only the instance table columns listed in `columns` are loaded, along with
+    the id and uuid columns, when it is not None.
     """
     # NOTE(mriedem): If the limit is 0 there is no point in even going
     # to the database since nothing is going to be returned anyway.
@@ -1723,6 +1856,7 @@ def instance_get_all_by_filters_sort(context, filters, limit=None, marker=None,
         else:
             column_ref = getattr(models.Instance, column)
             query_prefix = query_prefix.options(orm.joinedload(column_ref))
+    query_prefix = _instance_load_only(query_prefix, columns)
 
     # Note: order_by is done in the sqlalchemy.utils.py paginate_query(),
     # no need to do it here as well
@@ -1859,7 +1993,8 @@ def instance_get_all_by_filters_sort(context, filters, limit=None, marker=None,
 
     instances = query_prefix.all()
 
-    return _instances_fill_metadata(context, instances, manual_joins)
+    return _instances_fill_metadata(context, instances, manual_joins,
+                                    columns=columns)
 
 
 @require_context
@@ -2125,14 +2260,21 @@ def _instance_get_all_query(context, project_only=False, joins=None):
 
 
 @pick_context_manager_reader_allow_async
-def instance_get_all_by_host(context, host, columns_to_join=None):
-    """Get all instances belonging to a host."""
+def instance_get_all_by_host(context, host, columns_to_join=None,
+                             columns=None):
+    """Get all instances belonging to a host.
+
+    Only the instance table columns listed in `columns` are loaded, along with
+    the id and uuid columns, when it is not None.
+    """
     query = _instance_get_all_query(context, joins=columns_to_join)
+    query = _instance_load_only(query, columns)
     instances = query.filter_by(host=host).all()
     return _instances_fill_metadata(
         context,
         instances,
         manual_joins=columns_to_join,
+        columns=columns,
     )
 
 
@@ -4192,6 +4334,23 @@ def task_log_end_task(
 ##################
 
 
+@functools.lru_cache(maxsize=None)
+def _get_fk_graph():
+    """Get the foreign key (FK) dependency graph of the main tables.
+
+    The models never change at runtime so the graph is only computed once,
+    rather than every time the FK tree of an archived row is walked.
+
+    :returns: A dict mapping table names to the list of Table objects that
+        refer to that table by FK
+    """
+    graph = collections.defaultdict(list)
+    for t in models.BASE.metadata.tables.values():
+        for fk in t.foreign_keys:
+            graph[fk.column.table.name].append(t)
+    return dict(graph)
+
+
 def _get_tables_with_fk_to_table(table):
     """Get a list of tables that refer to the given table by foreign key (FK).
 
@@ -4199,12 +4358,7 @@ def _get_tables_with_fk_to_table(table):
 
     :returns: A list of Table objects that refer to the specified table by FK
     """
-    tables = []
-    for t in models.BASE.metadata.tables.values():
-        for fk in t.foreign_keys:
-            if fk.references(table):
-                tables.append(t)
-    return tables
+    return _get_fk_graph().get(table.name, [])
 
 
 def _get_fk_stmts(metadata, conn, table, column, records):
@@ -4582,7 +4736,78 @@ def _purgeable_tables(metadata):
     ]
 
 
-def purge_shadow_tables(context, before_date, status_fn=None):
+def _purge_shadow_table(conn, table, col, before_date, status_fn,
+                        max_rows=None, batch_size=None, sleep=0):
+    """Delete rows from a single shadow table.
+
+    When ``batch_size`` is given, rows are deleted in batches of at most
+    ``batch_size`` rows, each in its own transaction, walking the primary key
+    in ascending order. This keeps every transaction, and thus the locks and
+    undo log it holds, small. Since purged rows are gone, a purge that is
+    stopped early simply resumes from the lowest remaining primary key the
+    next time it runs.
+
+    :returns: The number of rows deleted from the table
+    """
+    def where(query):
+        if col is not None:
+            query = query.where(col < before_date)
+        return query
+
+    pk_columns = list(table.primary_key.columns)
+    if (batch_size is None and max_rows is None) or not pk_columns:
+        with conn.begin():
+            return conn.execute(where(table.delete())).rowcount
+
+    # Tables with a composite primary key are walked by the tuple of its
+    # columns.
+    if len(pk_columns) == 1:
+        pk = pk_columns[0]
+    else:
+        pk = sa.tuple_(*pk_columns)
+    deleted = 0
+    marker = None
+    while max_rows is None or deleted < max_rows:
+        limit = batch_size or max_rows
+        if max_rows is not None:
+            limit = min(limit, max_rows - deleted)
+        query = where(sa.select(*pk_columns)).order_by(
+            *pk_columns).limit(limit)
+        if marker is not None:
+            query = query.where(pk > marker)
+        with conn.begin():
+            ids = [row[0] if len(row) == 1 else tuple(row)
+                   for row in conn.execute(query)]
+            if not ids:
+                break
+            deleted += conn.execute(
+                table.delete().where(pk.in_(ids))).rowcount
+        marker = ids[-1]
+        if batch_size is not None:
+            status_fn(_('Deleted %(rows)i rows from %(table)s so far') % {
+                'rows': deleted, 'table': table.name})
+        if len(ids) < limit:
+            break
+        # Optionally sleep between batches to throttle the purge.
+        if sleep:
+            time.sleep(sleep)
+    return deleted
+
+
+def purge_shadow_tables(context, before_date, status_fn=None, max_rows=None,
+                        batch_size=None, sleep=0):
+    """Delete rows from the shadow tables.
+
+    :param context: nova.context.RequestContext for database access
+    :param before_date: Only delete rows older than this datetime, or delete
+        all rows if None
+    :param status_fn: Optional callable used to report progress
+    :param max_rows: Optional maximum number of rows to delete in total
+    :param batch_size: Optional maximum number of rows to delete per
+        transaction
+    :param sleep: The amount of time in seconds to sleep between batches
+    :returns: The total number of rows deleted
+    """
     engine = get_engine(context=context)
     conn = engine.connect()
     metadata = sa.MetaData()
@@ -4602,6 +4827,8 @@ def purge_shadow_tables(context, before_date, status_fn=None):
     }
 
     for table in _purgeable_tables(metadata):
+        if max_rows is not None and total_deleted >= max_rows:
+            break
         if before_date is None:
             col = None
         elif table.name in overrides:
@@ -4618,20 +4845,18 @@ def purge_shadow_tables(context, before_date, status_fn=None):
                             'table': table.name})
             continue
 
-        if col is not None:
-            delete = table.delete().where(col < before_date)
-        else:
-            delete = table.delete()
-
-        with conn.begin():
-            deleted = conn.execute(delete)
-        if deleted.rowcount > 0:
+        deleted = _purge_shadow_table(
+            conn, table, col, before_date, status_fn,
+            max_rows=(max_rows - total_deleted
+                      if max_rows is not None else None),
+            batch_size=batch_size, sleep=sleep)
+        if deleted > 0:
             status_fn(_('Deleted %(rows)i rows from %(table)s based on '
                         'timestamp column %(col)s') % {
-                            'rows': deleted.rowcount,
+                            'rows': deleted,
                             'table': table.name,
                             'col': col is None and '(n/a)' or col.name})
-        total_deleted += deleted.rowcount
+        total_deleted += deleted
 
     conn.close()
 
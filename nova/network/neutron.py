@@ -54,6 +54,10 @@ CONF = nova.conf.CONF
 
 LOG = logging.getLogger(__name__)
 
+# Maximum number of port IDs to filter on in a single request, so that the
+# request URIs stay within the limits of the networking API.
+MAX_PORT_IDS_PER_REQUEST = 100
+
 
 def _load_auth_plugin():
     auth_plugin = service_auth.get_service_auth_plugin(
@@ -229,24 +233,15 @@ def get_client(context, admin=False):
     auth_plugin = _get_auth_plugin(context, admin=admin)
     session = service_auth.get_service_auth_session(
             nova.conf.neutron.NEUTRON_GROUP)
+    # NOTE: The session, and so its connection pool, and the admin and
+    # service user auth plugins, and so their tokens, are shared by all the
+    # clients. Only the user auth and the global request id are per client.
     client_args = dict(session=session,
                        auth=auth_plugin,
                        global_request_id=context.global_id,
-                       connect_retries=CONF.neutron.http_retries)
-
-    # NOTE(efried): We build an adapter
-    #               to pull conf options
-    #               to pass to neutronclient
-    #               which uses them to build an Adapter.
-    # This should be unwound at some point.
-    adap = utils.get_ksa_adapter(
-        'network', ksa_auth=auth_plugin, ksa_session=session)
-    client_args = dict(client_args,
-                       service_type=adap.service_type,
-                       service_name=adap.service_name,
-                       interface=adap.interface,
-                       region_name=adap.region_name,
-                       endpoint_override=adap.endpoint_override)
+                       connect_retries=CONF.neutron.http_retries,
+                       **service_auth.get_service_adapter_parameters(
+                           nova.conf.neutron.NEUTRON_GROUP))
 
     return ClientWrapper(clientv20.Client(**client_args),
                          admin=admin or context.is_admin)
@@ -1013,8 +1008,7 @@ class API:
             created_port_uuid will be None for the pair where a pre-existing
             port was part of the user request
         """
-        created_port_ids = []
-        requests_and_created_ports = []
+        requests = []
         for request in ordered_networks:
             network = nets.get(request.network_id)
             # if network_id did not pass validate_networks() and not available
@@ -1022,47 +1016,53 @@ class API:
             if not network:
                 continue
 
+            port_security_enabled = network.get(
+                'port_security_enabled', True)
+            if port_security_enabled:
+                if not network.get('subnets'):
+                    # Neutron can't apply security groups to a port
+                    # for a network without L3 assignments.
+                    LOG.debug('Network with port security enabled does '
+                              'not have subnets so security groups '
+                              'cannot be applied: %s',
+                              network, instance=instance)
+                    raise exception.SecurityGroupCannotBeApplied()
+            else:
+                if security_group_ids:
+                    # We don't want to apply security groups on port
+                    # for a network defined with
+                    # 'port_security_enabled=False'.
+                    LOG.debug('Network has port security disabled so '
+                              'security groups cannot be applied: %s',
+                              network, instance=instance)
+                    raise exception.SecurityGroupCannotBeApplied()
+
+            requests.append(request)
+
+        def create_port(request):
+            if request.port_id:
+                return None
+            # create minimal port, if port not already created by user
+            created_port = self._create_port_minimal(
+                context, neutron, instance, request.network_id,
+                request.address, security_group_ids)
+            return created_port['id']
+
+        results = utils.run_concurrently(create_port, requests,
+                                         CONF.neutron.port_concurrency)
+        created_port_ids = [port_id for port_id, _ in results if port_id]
+        errors = [error for _, error in results if error]
+        if errors:
             try:
-                port_security_enabled = network.get(
-                    'port_security_enabled', True)
-                if port_security_enabled:
-                    if not network.get('subnets'):
-                        # Neutron can't apply security groups to a port
-                        # for a network without L3 assignments.
-                        LOG.debug('Network with port security enabled does '
-                                  'not have subnets so security groups '
-                                  'cannot be applied: %s',
-                                  network, instance=instance)
-                        raise exception.SecurityGroupCannotBeApplied()
-                else:
-                    if security_group_ids:
-                        # We don't want to apply security groups on port
-                        # for a network defined with
-                        # 'port_security_enabled=False'.
-                        LOG.debug('Network has port security disabled so '
-                                  'security groups cannot be applied: %s',
-                                  network, instance=instance)
-                        raise exception.SecurityGroupCannotBeApplied()
-
-                created_port_id = None
-                if not request.port_id:
-                    # create minimal port, if port not already created by user
-                    created_port = self._create_port_minimal(
-                        context, neutron, instance, request.network_id,
-                        request.address, security_group_ids)
-                    created_port_id = created_port['id']
-                    created_port_ids.append(created_port_id)
-
-                requests_and_created_ports.append((
-                    request, created_port_id))
-
+                raise errors[0]
             except Exception:
                 with excutils.save_and_reraise_exception():
                     if created_port_ids:
                         self._delete_ports(
                             neutron, instance, created_port_ids)
 
-        return requests_and_created_ports
+        return [(request, created_port_id)
+                for request, (created_port_id, _) in zip(requests, results)]
 
     def _has_resource_request(self, context, port, neutron):
         resource_request = port.get(constants.RESOURCE_REQUEST) or {}
@@ -1318,33 +1318,36 @@ class API:
         # We currently require admin creds to set port bindings.
         port_client = admin_client
 
-        preexisting_port_ids = []
-        created_port_ids = []
+        created_port_ids = [created_port_id for _, created_port_id in
+                            requests_and_created_ports if created_port_id]
         ports_in_requested_order = []
         nets_in_requested_order = []
-        created_vifs = []   # this list is for cleanups if we fail
-        for request, created_port_id in requests_and_created_ports:
-            vifobj = objects.VirtualInterface(context)
-            vifobj.instance_uuid = instance.uuid
-            vifobj.tag = request.tag if 'tag' in request else None
-
-            network = nets.get(request.network_id)
-            # if network_id did not pass validate_networks() and not available
-            # here then skip it safely not continuing with a None Network
-            if not network:
-                continue
+        port_updates = []
+        # these lists are for cleanups if we fail
+        updated_preexisting_port_ids = []
+        created_vifs = []
 
-            nets_in_requested_order.append(network)
+        try:
+            for request, created_port_id in requests_and_created_ports:
+                network = nets.get(request.network_id)
+                # if network_id did not pass validate_networks() and not
+                # available here then skip it safely not continuing with a
+                # None Network
+                if not network:
+                    continue
 
-            zone = 'compute:%s' % instance.availability_zone
-            port_req_body = {'port': {'device_id': instance.uuid,
-                                      'device_owner': zone}}
-            if (requested_ports_dict and
-                request.port_id in requested_ports_dict and
-                get_binding_profile(requested_ports_dict[request.port_id])):
-                port_req_body['port'][constants.BINDING_PROFILE] = \
-                    get_binding_profile(requested_ports_dict[request.port_id])
-            try:
+                nets_in_requested_order.append(network)
+
+                zone = 'compute:%s' % instance.availability_zone
+                port_req_body = {'port': {'device_id': instance.uuid,
+                                          'device_owner': zone}}
+                if (requested_ports_dict and
+                    request.port_id in requested_ports_dict and
+                    get_binding_profile(
+                        requested_ports_dict[request.port_id])):
+                    port_req_body['port'][constants.BINDING_PROFILE] = \
+                        get_binding_profile(
+                            requested_ports_dict[request.port_id])
                 port_arq = None
                 if network_arqs:
                     port_arq = network_arqs.get(request.arq_uuid, None)
@@ -1360,47 +1363,64 @@ class API:
                 self._populate_pci_mac_address(instance,
                     request.pci_request_id, port_req_body)
 
-                if created_port_id:
-                    port_id = created_port_id
-                    created_port_ids.append(port_id)
-                else:
-                    port_id = request.port_id
+                port_id = created_port_id or request.port_id
                 ports_in_requested_order.append(port_id)
+                port_updates.append((request, network, port_id,
+                                     created_port_id, port_req_body))
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                self._delete_ports(neutron, instance, created_port_ids)
 
-                # After port is created, update other bits
-                updated_port = self._update_port(
-                    port_client, instance, port_id, port_req_body)
-
-                # NOTE(danms): The virtual_interfaces table enforces global
-                # uniqueness on MAC addresses, which clearly does not match
-                # with neutron's view of the world. Since address is a 255-char
-                # string we can namespace it with our port id. Using '/' should
-                # be safely excluded from MAC address notations as well as
-                # UUIDs. We can stop doing this now that we've removed
-                # nova-network, but we need to leave the read translation in
-                # for longer than that of course.
-                vifobj.address = '%s/%s' % (updated_port['mac_address'],
-                                            updated_port['id'])
-                vifobj.uuid = port_id
-                vifobj.create()
-                created_vifs.append(vifobj)
-
-                if not created_port_id:
-                    # only add if update worked and port create not called
-                    preexisting_port_ids.append(port_id)
-
-                self._update_port_dns_name(context, instance, network,
-                                           ports_in_requested_order[-1],
-                                           neutron)
+        def update_port(port_update):
+            request, network, port_id, created_port_id, port_req_body = (
+                port_update)
+            vifobj = objects.VirtualInterface(context)
+            vifobj.instance_uuid = instance.uuid
+            vifobj.tag = request.tag if 'tag' in request else None
+
+            # After port is created, update other bits
+            updated_port = self._update_port(
+                port_client, instance, port_id, port_req_body)
+
+            # NOTE(danms): The virtual_interfaces table enforces global
+            # uniqueness on MAC addresses, which clearly does not match
+            # with neutron's view of the world. Since address is a 255-char
+            # string we can namespace it with our port id. Using '/' should
+            # be safely excluded from MAC address notations as well as
+            # UUIDs. We can stop doing this now that we've removed
+            # nova-network, but we need to leave the read translation in
+            # for longer than that of course.
+            vifobj.address = '%s/%s' % (updated_port['mac_address'],
+                                        updated_port['id'])
+            vifobj.uuid = port_id
+            vifobj.create()
+            created_vifs.append(vifobj)
+
+            if not created_port_id:
+                # only add if update worked and port create not called
+                updated_preexisting_port_ids.append(port_id)
+
+            self._update_port_dns_name(context, instance, network, port_id,
+                                       neutron)
+
+        errors = [error for _, error in utils.run_concurrently(
+            update_port, port_updates, CONF.neutron.port_concurrency)
+            if error]
+        if errors:
+            try:
+                raise errors[0]
             except Exception:
                 with excutils.save_and_reraise_exception():
                     self._unbind_ports(context,
-                                       preexisting_port_ids,
+                                       updated_preexisting_port_ids,
                                        neutron, port_client)
                     self._delete_ports(neutron, instance, created_port_ids)
                     for vif in created_vifs:
                         vif.destroy()
 
+        preexisting_port_ids = [
+            port_id for _, _, port_id, created_port_id, _ in port_updates
+            if not created_port_id]
         return (nets_in_requested_order, ports_in_requested_order,
             preexisting_port_ids, created_port_ids)
 
@@ -1411,7 +1431,9 @@ class API:
              CONF.neutron.extension_sync_interval)):
             extensions_list = client.list_extensions()['extensions']
             self.last_neutron_extension_sync = time.time()
-            self.extensions.clear()
+            # NOTE: Replace the cache at once rather than clearing it first as
+            # it can be read while updating the ports of an instance
+            # concurrently, see _update_ports_for_instance().
             self.extensions = {ext['alias']: ext for ext in extensions_list}
 
     def _has_extension(self, extension, context=None, client=None):
@@ -2948,6 +2970,25 @@ class API:
         data = client.list_networks(**{constants.NET_EXTERNAL: True})
         return data['networks']
 
+    def get_floating_ips_by_ports(self, context, port_ids):
+        """Return the floating IPs of the given ports.
+
+        The floating IPs are listed with as few requests as possible, the
+        port IDs being split in chunks to keep the request URIs short.
+
+        :param context: The request context.
+        :param port_ids: List of port IDs.
+        :returns: A dict of floating IP lists keyed by (port ID, fixed IP
+            address) tuples.
+        """
+        client = get_client(context, admin=True)
+        port_ids = sorted(port_ids)
+        floating_ips = {}
+        for i in range(0, len(port_ids), MAX_PORT_IDS_PER_REQUEST):
+            floating_ips.update(self._get_floating_ips_by_ports(
+                client, port_ids[i:i + MAX_PORT_IDS_PER_REQUEST]))
+        return floating_ips
+
     def get_floating_ips_by_project(self, context):
         client = get_client(context)
         project_id = context.project_id
@@ -3075,10 +3116,20 @@ class API:
             raise exception.FloatingIpMultipleFoundForAddress(address=address)
         return fips[0]
 
-    def _get_floating_ips_by_fixed_and_port(self, client, fixed_ip, port):
-        """Get floating IPs from fixed IP and port."""
-        return self._safe_get_floating_ips(client, fixed_ip_address=fixed_ip,
-                                           port_id=port)
+    def _get_floating_ips_by_ports(self, client, port_ids):
+        """Get the floating IPs of the given ports.
+
+        :returns: A dict of floating IP lists keyed by (port ID, fixed IP
+            address) tuples.
+        """
+        floating_ips = {}
+        if not port_ids:
+            return floating_ips
+        for fip in self._safe_get_floating_ips(client,
+                                               port_id=sorted(port_ids)):
+            key = (fip['port_id'], fip['fixed_ip_address'])
+            floating_ips.setdefault(key, []).append(fip)
+        return floating_ips
 
     def release_floating_ip(self, context, address,
                             affect_auto_assigned=False):
@@ -3260,12 +3311,38 @@ class API:
             context, instance, migration.dest_compute, migration=migration,
             provider_mappings=provider_mappings)
 
-    def _nw_info_get_ips(self, client, port):
+    def _get_nw_info_resources(self, context, client, ports):
+        """Get the neutron resources needed to build the VIFs of ports.
+
+        Rather than querying neutron for every port, fixed IP and subnet,
+        each type of resource is fetched for all the ports at once, so this
+        can be used to build the VIFs of one or many instances.
+
+        :param context: Request context.
+        :param client: Neutron admin client.
+        :param ports: List of neutron port dicts.
+        :returns: A dict with the floating IPs of the ports, as returned by
+            _get_floating_ips_by_ports, their subnets, as returned by
+            _get_subnets_from_ports, and the physnet and tunneled status of
+            their networks keyed by network ID.
+        """
+        physnets = {}
+        for net_id in {port['network_id'] for port in ports}:
+            physnets[net_id] = self._get_physnet_tunneled_info(
+                context, client, net_id)
+        return {
+            'floating_ips': self._get_floating_ips_by_ports(
+                client, [port['id'] for port in ports]),
+            'subnets': self._get_subnets_from_ports(context, ports, client),
+            'physnets': physnets,
+        }
+
+    def _nw_info_get_ips(self, port, floating_ips):
         network_IPs = []
         for fixed_ip in port['fixed_ips']:
             fixed = network_model.FixedIP(address=fixed_ip['ip_address'])
-            floats = self._get_floating_ips_by_fixed_and_port(
-                client, fixed_ip['ip_address'], port['id'])
+            floats = floating_ips.get(
+                (port['id'], fixed_ip['ip_address']), [])
             for ip in floats:
                 fip = network_model.IP(address=ip['floating_ip_address'],
                                        type='floating')
@@ -3273,16 +3350,13 @@ class API:
             network_IPs.append(fixed)
         return network_IPs
 
-    def _nw_info_get_subnets(self, context, port, network_IPs, client=None):
-        subnets = self._get_subnets_from_port(context, port, client)
+    def _nw_info_get_subnets(self, network_IPs, subnets):
         for subnet in subnets:
             subnet['ips'] = [fixed_ip for fixed_ip in network_IPs
                              if fixed_ip.is_in_subnet(subnet)]
         return subnets
 
-    def _nw_info_build_network(self, context, port, networks, subnets):
-        # TODO(stephenfin): Pass in an existing admin client if available.
-        neutron = get_client(context, admin=True)
+    def _nw_info_build_network(self, port, networks, subnets, physnet_info):
         network_name = None
         network_mtu = None
         for net in networks:
@@ -3334,8 +3408,7 @@ class API:
         if bridge is not None and vif_type != network_model.VIF_TYPE_DVS:
             bridge = bridge[:network_model.NIC_NAME_LEN]
 
-        physnet, tunneled = self._get_physnet_tunneled_info(
-            context, neutron, port['network_id'])
+        physnet, tunneled = physnet_info
         network = network_model.Network(
             id=port['network_id'],
             bridge=bridge,
@@ -3365,12 +3438,12 @@ class API:
                 if vif.get('preserve_on_delete')]
 
     def _build_vif_model(self, context, client, current_neutron_port,
-                         networks, preexisting_port_ids):
+                         networks, preexisting_port_ids, resources=None):
         """Builds a ``nova.network.model.VIF`` object based on the parameters
         and current state of the port in Neutron.
 
         :param context: Request context.
-        :param client: Neutron client.
+        :param client: Neutron admin client.
         :param current_neutron_port: The current state of a Neutron port
             from which to build the VIF object model.
         :param networks: List of dicts which represent Neutron networks
@@ -3379,26 +3452,31 @@ class API:
         :param preexisting_port_ids: List of IDs of ports attached to a
             given server instance which Nova did not create and therefore
             should not delete when the port is detached from the server.
+        :param resources: The neutron resources of the port, as returned by
+            _get_nw_info_resources. If None they are fetched for this port.
         :return: nova.network.model.VIF object which represents a port in the
             instance network info cache.
         """
+        if resources is None:
+            resources = self._get_nw_info_resources(
+                context, client, [current_neutron_port])
+
         vif_active = False
         if (current_neutron_port['admin_state_up'] is False or
             current_neutron_port['status'] == 'ACTIVE'):
             vif_active = True
 
-        network_IPs = self._nw_info_get_ips(client,
-                                            current_neutron_port)
-        subnets = self._nw_info_get_subnets(context,
-                                            current_neutron_port,
-                                            network_IPs, client)
+        network_IPs = self._nw_info_get_ips(current_neutron_port,
+                                            resources['floating_ips'])
+        subnets = self._nw_info_get_subnets(
+            network_IPs, resources['subnets'][current_neutron_port['id']])
 
         devname = "tap" + current_neutron_port['id']
         devname = devname[:network_model.NIC_NAME_LEN]
 
-        network, ovs_interfaceid = (
-            self._nw_info_build_network(context, current_neutron_port,
-                                        networks, subnets))
+        network, ovs_interfaceid = self._nw_info_build_network(
+            current_neutron_port, networks, subnets,
+            resources['physnets'][current_neutron_port['network_id']])
         preserve_on_delete = (current_neutron_port['id'] in
                               preexisting_port_ids)
 
@@ -3565,6 +3643,13 @@ class API:
             networks, port_ids = self._gather_port_ids_and_networks(
                     context, instance, networks, port_ids, client)
 
+        # Fetch what is needed to build all the VIFs at once rather than port
+        # by port.
+        resources = self._get_nw_info_resources(
+            context, client,
+            [current_neutron_port_map[port_id] for port_id in port_ids
+             if port_id in current_neutron_port_map])
+
         old_nw_info = instance.get_network_info()
         nw_info = network_model.NetworkInfo()
         for port_id in port_ids:
@@ -3572,7 +3657,7 @@ class API:
             if current_neutron_port:
                 vif = self._build_vif_model(
                     context, client, current_neutron_port, networks,
-                    preexisting_port_ids)
+                    preexisting_port_ids, resources)
                 for old_vif in old_nw_info:
                     if old_vif['id'] == port_id:
                         self._log_error_if_vnic_type_changed(
@@ -3627,70 +3712,95 @@ class API:
 
         return port_order_list
 
-    def _get_subnets_from_port(self, context, port, client=None):
-        """Return the subnets for a given port."""
+    def _get_subnets_from_ports(self, context, ports, client=None):
+        """Return the subnets of the given ports.
+
+        The subnets and the DHCP ports of their networks are listed once for
+        all the ports.
 
-        fixed_ips = port['fixed_ips']
-        # No fixed_ips for the port means there is no subnet associated
-        # with the network the port is created on.
+        :returns: A dict of nova.network.model.Subnet lists keyed by port ID.
+        """
+        subnet_ids = {ip['subnet_id']
+                      for port in ports for ip in port['fixed_ips']}
+        subnets = {port['id']: [] for port in ports}
+        # No fixed_ips for the ports means there is no subnet associated
+        # with the networks the ports are created on.
         # Since list_subnets(id=[]) returns all subnets visible for the
         # current tenant, returned subnets may contain subnets which is not
-        # related to the port. To avoid this, the method returns here.
-        if not fixed_ips:
-            return []
+        # related to the ports. To avoid this, the method returns here.
+        if not subnet_ids:
+            return subnets
         if not client:
             client = get_client(context)
-        search_opts = {'id': list(set(ip['subnet_id'] for ip in fixed_ips))}
-        data = client.list_subnets(**search_opts)
+        data = client.list_subnets(id=sorted(subnet_ids))
         ipam_subnets = data.get('subnets', [])
-        subnets = []
-
-        for subnet in ipam_subnets:
-            subnet_dict = {'cidr': subnet['cidr'],
-                           'gateway': network_model.IP(
-                                address=subnet['gateway_ip'],
-                                type='gateway'),
-                           'enable_dhcp': False,
-            }
-            if subnet.get('ipv6_address_mode'):
-                subnet_dict['ipv6_address_mode'] = subnet['ipv6_address_mode']
-
-            # attempt to populate DHCP server field
-            dhcp_search_opts = {
-                'network_id': subnet['network_id'],
-                'device_owner': 'network:dhcp'}
-            data = client.list_ports(**dhcp_search_opts)
-            dhcp_ports = data.get('ports', [])
-            for p in dhcp_ports:
-                for ip_pair in p['fixed_ips']:
-                    if ip_pair['subnet_id'] == subnet['id']:
-                        subnet_dict['dhcp_server'] = ip_pair['ip_address']
-                        break
-
-            # NOTE(stblatzheim): If enable_dhcp is set on subnet, but subnet
-            # has ovn native dhcp and no dhcp-agents. Network owner will be
-            # network:distributed
-            # Just rely on enable_dhcp flag given by neutron
-            # Fix for https://bugs.launchpad.net/nova/+bug/2055245
-
-            if subnet.get('enable_dhcp'):
-                subnet_dict['enable_dhcp'] = True
-
-            subnet_object = network_model.Subnet(**subnet_dict)
-            for dns in subnet.get('dns_nameservers', []):
-                subnet_object.add_dns(
-                    network_model.IP(address=dns, type='dns'))
-
-            for route in subnet.get('host_routes', []):
-                subnet_object.add_route(
-                    network_model.Route(cidr=route['destination'],
-                                        gateway=network_model.IP(
-                                            address=route['nexthop'],
-                                            type='gateway')))
-
-            subnets.append(subnet_object)
+        if not ipam_subnets:
+            return subnets
+
+        # attempt to populate DHCP server field
+        dhcp_servers = {}
+        dhcp_search_opts = {
+            'network_id': sorted({subnet['network_id']
+                                  for subnet in ipam_subnets}),
+            'device_owner': 'network:dhcp'}
+        data = client.list_ports(**dhcp_search_opts)
+        dhcp_ports = data.get('ports', [])
+        for p in dhcp_ports:
+            port_subnet_ids = set()
+            for ip_pair in p['fixed_ips']:
+                if ip_pair['subnet_id'] not in port_subnet_ids:
+                    port_subnet_ids.add(ip_pair['subnet_id'])
+                    dhcp_servers[ip_pair['subnet_id']] = ip_pair['ip_address']
+
+        for port in ports:
+            port_subnet_ids = {ip['subnet_id'] for ip in port['fixed_ips']}
+            subnets[port['id']] = [
+                self._build_subnet_model(subnet, dhcp_servers)
+                for subnet in ipam_subnets if subnet['id'] in port_subnet_ids]
         return subnets
 
+    @staticmethod
+    def _build_subnet_model(subnet, dhcp_servers):
+        """Build a nova.network.model.Subnet from a neutron subnet.
+
+        :param subnet: The neutron subnet dict.
+        :param dhcp_servers: Dict of DHCP server addresses keyed by subnet ID.
+        """
+        subnet_dict = {'cidr': subnet['cidr'],
+                       'gateway': network_model.IP(
+                            address=subnet['gateway_ip'],
+                            type='gateway'),
+                       'enable_dhcp': False,
+        }
+        if subnet.get('ipv6_address_mode'):
+            subnet_dict['ipv6_address_mode'] = subnet['ipv6_address_mode']
+
+        if subnet['id'] in dhcp_servers:
+            subnet_dict['dhcp_server'] = dhcp_servers[subnet['id']]
+
+        # NOTE(stblatzheim): If enable_dhcp is set on subnet, but subnet
+        # has ovn native dhcp and no dhcp-agents. Network owner will be
+        # network:distributed
+        # Just rely on enable_dhcp flag given by neutron
+        # Fix for https://bugs.launchpad.net/nova/+bug/2055245
+
+        if subnet.get('enable_dhcp'):
+            subnet_dict['enable_dhcp'] = True
+
+        subnet_object = network_model.Subnet(**subnet_dict)
+        for dns in subnet.get('dns_nameservers', []):
+            subnet_object.add_dns(
+                network_model.IP(address=dns, type='dns'))
+
+        for route in subnet.get('host_routes', []):
+            subnet_object.add_route(
+                network_model.Route(cidr=route['destination'],
+                                    gateway=network_model.IP(
+                                        address=route['nexthop'],
+                                        type='gateway')))
+
+        return subnet_object
+
     def setup_instance_network_on_host(
             self, context, instance, host, migration=None,
             provider_mappings=None):
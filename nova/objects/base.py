@@ -17,23 +17,58 @@
 import contextlib
 import datetime
 import functools
+import hashlib
+import time
 import traceback
 
+import msgpack
 import netaddr
 from oslo_log import log as logging
 import oslo_messaging as messaging
+from oslo_serialization import base64
+from oslo_serialization import jsonutils
 from oslo_utils import versionutils
 from oslo_versionedobjects import base as ovoo_base
 from oslo_versionedobjects import exception as ovoo_exc
 
+import nova.conf
 from nova import exception
 from nova import objects
 from nova.objects import fields as obj_fields
 from nova import utils
 
 
+CONF = nova.conf.CONF
 LOG = logging.getLogger(__name__)
 
+# The key of the single entry dict an object is sent as over RPC when it is
+# encoded in the compact format, see obj_to_compact().
+COMPACT_KEY = 'nova_object.compact'
+# The msgpack extension types marking objects and unset fields in the compact
+# format.
+_COMPACT_OBJECT = msgpack.ExtType(33, b'')
+_COMPACT_UNSET = msgpack.ExtType(34, b'')
+_COMPACT_EXT_TYPES = {ext.code: ext for ext in (_COMPACT_OBJECT,
+                                                _COMPACT_UNSET)}
+_COMPACT_KEYS = frozenset(['nova_object.name', 'nova_object.namespace',
+                           'nova_object.version', 'nova_object.data',
+                           'nova_object.changes'])
+# Whether all the services can decode the compact format, and when that was
+# last checked if they could not.
+_COMPACT_SUPPORTED = False
+_COMPACT_CHECKED_AT = None
+_COMPACT_CHECK_INTERVAL = 60
+_COMPACT_BINARIES = ['nova-compute', 'nova-conductor', 'nova-scheduler',
+                     'nova-osapi_compute', 'nova-metadata']
+
+
+def reset_globals():
+    global _COMPACT_SUPPORTED
+    global _COMPACT_CHECKED_AT
+
+    _COMPACT_SUPPORTED = False
+    _COMPACT_CHECKED_AT = None
+
 
 def all_things_equal(obj_a, obj_b):
     if obj_b is None:
@@ -158,6 +193,27 @@ class NovaObject(ovoo_base.VersionedObject):
     # service, which is fine for what we need.
     _lazy_loads = None
 
+    # The remotable methods which can be sent to conductor with a delta of the
+    # object rather than the whole object, see obj_to_delta(). They must only
+    # use the changed fields and the obj_delta_fields of the object, and use
+    # obj_attr_is_loaded() to know whether its other fields are set.
+    obj_delta_methods = ()
+    obj_delta_fields = ()
+    # Groups of fields which are read together by the obj_delta_methods, so
+    # all the fields of a group are put in a delta when any of them changed.
+    obj_delta_groups = ()
+
+    # The fields which were set on the object a delta was made from but left
+    # out of the delta. This is not serialized.
+    _obj_delta_omitted = frozenset()
+
+    def obj_attr_is_loaded(self, attrname):
+        """Return whether an attribute is set on the object or, for a delta
+        of an object, on the object the delta was made from.
+        """
+        return (self.obj_attr_is_set(attrname) or
+                attrname in self._obj_delta_omitted)
+
     # NOTE(ndipanov): This is nova-specific
     @staticmethod
     def should_migrate_data():
@@ -310,6 +366,66 @@ class NovaObjectSerializer(messaging.NoOpSerializer):
                 iterable = list
             return iterable([action_fn(context, value) for value in values])
 
+    @staticmethod
+    def _compact_supported():
+        """Return whether objects can be sent in the compact format.
+
+        The compact format is only used when enabled with the
+        [DEFAULT]/rpc_compact_objects option and once every service is new
+        enough to decode it, as advertised by its service version.
+        """
+        global _COMPACT_SUPPORTED
+        global _COMPACT_CHECKED_AT
+
+        if not CONF.rpc_compact_objects:
+            return False
+        # NOTE: Services are not downgraded, so once every service supports
+        # the compact format there is no need to check again.
+        if _COMPACT_SUPPORTED:
+            return True
+        now = time.monotonic()
+        if (_COMPACT_CHECKED_AT is not None and
+                now - _COMPACT_CHECKED_AT < _COMPACT_CHECK_INTERVAL):
+            return False
+        _COMPACT_CHECKED_AT = now
+
+        from nova import context as nova_context
+        from nova.objects import service as service_obj
+        ctxt = nova_context.get_admin_context()
+        try:
+            # NOTE: Like the compute RPC API version cap, look at every cell
+            # if we have access to the API database and only locally if not.
+            # Like get_minimum_version_all_cells(), query the database
+            # directly when we can to defeat the minimum version cache, which
+            # would otherwise hide services upgraded after we started.
+            if CONF.api_database.connection:
+                version = service_obj.get_minimum_version_all_cells(
+                    ctxt, _COMPACT_BINARIES)
+            elif objects.Service.indirection_api is None:
+                min_versions = (
+                    service_obj.Service._db_service_get_minimum_version(
+                        ctxt, _COMPACT_BINARIES))
+                version = min(
+                    (version or 0 for version in min_versions.values()),
+                    default=0)
+            else:
+                # NOTE: Without database access this is answered by
+                # nova-conductor, which caches the minimum versions until it
+                # is restarted or sent SIGHUP.
+                version = objects.Service.get_minimum_version_multi(
+                    ctxt, _COMPACT_BINARIES)
+        except Exception as e:
+            LOG.debug('Unable to get the minimum service version, not using '
+                      'the compact RPC object format: %s', e)
+            return False
+
+        _COMPACT_SUPPORTED = (
+            version >= service_obj.COMPACT_RPC_OBJECTS_VERSION)
+        if _COMPACT_SUPPORTED:
+            LOG.info('All services support the compact RPC object format, '
+                     'using it to send objects.')
+        return _COMPACT_SUPPORTED
+
     def serialize_entity(self, context, entity):
         if isinstance(entity, (tuple, list, set, dict)):
             entity = self._process_iterable(context, self.serialize_entity,
@@ -317,10 +433,16 @@ class NovaObjectSerializer(messaging.NoOpSerializer):
         elif (hasattr(entity, 'obj_to_primitive') and
               callable(entity.obj_to_primitive)):
             entity = entity.obj_to_primitive()
+            if (isinstance(entity, dict) and 'nova_object.name' in entity and
+                    self._compact_supported()):
+                entity = {COMPACT_KEY: obj_to_compact(entity)}
         return entity
 
     def deserialize_entity(self, context, entity):
-        if isinstance(entity, dict) and 'nova_object.name' in entity:
+        if isinstance(entity, dict) and COMPACT_KEY in entity:
+            entity = self._process_object(
+                context, obj_from_compact(entity[COMPACT_KEY]))
+        elif isinstance(entity, dict) and 'nova_object.name' in entity:
             entity = self._process_object(context, entity)
         elif isinstance(entity, (tuple, list, set, dict)):
             entity = self._process_iterable(context, self.deserialize_entity,
@@ -328,6 +450,147 @@ class NovaObjectSerializer(messaging.NoOpSerializer):
         return entity
 
 
+def obj_to_compact(primitive):
+    """Encode an object primitive in the compact format.
+
+    The primitive, as returned by obj_to_primitive() on the object, is packed
+    with msgpack and base64 encoded so that it can be sent in the JSON
+    messages. Each object in the primitive is replaced by a reference to a
+    table of the name, namespace, version and field names of the objects of
+    that version, followed by the indexes of the changed fields and by the
+    field values in the order of the table. The envelope keys and field names
+    are thus only sent once per object version rather than once per object,
+    which is most of the size of lists of objects.
+
+    :param primitive: The primitive of the object to encode
+    :returns: The encoded object as a string, see obj_from_compact()
+    """
+    tables = []
+    table_indexes = {}
+    field_indexes = []
+
+    def encode(value):
+        if isinstance(value, dict):
+            if _COMPACT_KEYS.issuperset(value) and 'nova_object.name' in value:
+                return encode_object(value)
+            return {k: encode(v) for k, v in value.items()}
+        elif isinstance(value, (list, tuple)):
+            return [encode(v) for v in value]
+        return value
+
+    def encode_object(objprim):
+        key = (objprim['nova_object.name'], objprim['nova_object.namespace'],
+               objprim['nova_object.version'])
+        if key not in table_indexes:
+            table_indexes[key] = len(tables)
+            tables.append(list(key) + [[]])
+            field_indexes.append({})
+        table = table_indexes[key]
+        fields = tables[table][3]
+        indexes = field_indexes[table]
+
+        data = objprim['nova_object.data']
+        for field in data:
+            if field not in indexes:
+                indexes[field] = len(fields)
+                fields.append(field)
+        values = [_COMPACT_UNSET] * len(fields)
+        for field, value in data.items():
+            if isinstance(value, (dict, list, tuple)):
+                value = encode(value)
+            values[indexes[field]] = value
+
+        changes = objprim.get('nova_object.changes')
+        if changes is not None:
+            changes = [indexes[field] for field in changes]
+        return [_COMPACT_OBJECT, table, changes] + values
+
+    payload = encode(primitive)
+    return base64.encode_as_text(msgpack.packb([tables, payload]))
+
+
+def obj_from_compact(compact):
+    """Decode an object primitive encoded with obj_to_compact().
+
+    :param compact: The encoded object
+    :returns: The primitive of the object, as returned by obj_to_primitive()
+    """
+    # NOTE: Decode the extension types as our constants so that they can be
+    # compared by identity.
+    tables, payload = msgpack.unpackb(
+        base64.decode_as_bytes(compact),
+        ext_hook=lambda code, data: _COMPACT_EXT_TYPES[code])
+
+    def decode(value):
+        if isinstance(value, dict):
+            return {k: decode(v) for k, v in value.items()}
+        elif isinstance(value, list):
+            if value and value[0] is _COMPACT_OBJECT:
+                return decode_object(value)
+            return [decode(v) for v in value]
+        return value
+
+    def decode_object(value):
+        table, changes = value[1:3]
+        name, namespace, version, fields = tables[table]
+        objprim = {
+            'nova_object.name': name,
+            'nova_object.namespace': namespace,
+            'nova_object.version': version,
+            'nova_object.data': {
+                field: decode(v) if isinstance(v, (dict, list)) else v
+                for field, v in zip(fields, value[3:])
+                if v is not _COMPACT_UNSET},
+        }
+        if changes is not None:
+            objprim['nova_object.changes'] = [fields[i] for i in changes]
+        return objprim
+
+    return decode(payload)
+
+
+def obj_field_fingerprint(primitive):
+    """Return a short fingerprint of the primitive of a field value."""
+    return hashlib.blake2b(jsonutils.dump_as_bytes(primitive, sort_keys=True),
+                           digest_size=8).hexdigest()
+
+
+def obj_to_delta(obj):
+    """Make a delta of an object to call one of its remotable methods.
+
+    The delta only has the changed fields and the obj_delta_fields of the
+    object, along with its changes, and all the fields of the obj_delta_groups
+    with a changed field. The other fields which are set on the object are
+    replaced by fingerprints of their values, which lets the remote side only
+    send back the fields whose values differ after the call.
+
+    :param obj: The object to make a delta of
+    :returns: A tuple of the delta object and of a dict of the fingerprints of
+              the fields left out of the delta, keyed by field name
+    """
+    changes = obj.obj_what_changed()
+    sent = changes | set(obj.obj_delta_fields)
+    for group in obj.obj_delta_groups:
+        if changes.intersection(group):
+            sent.update(group)
+    delta = obj.__class__()
+    delta.VERSION = obj.VERSION
+    delta._context = obj._context
+    fingerprints = {}
+    for name, field in obj.fields.items():
+        if not obj.obj_attr_is_set(name):
+            continue
+        if name in sent:
+            # NOTE: Set the attribute directly to not coerce the value again.
+            setattr(delta, get_attrname(name),
+                    getattr(obj, get_attrname(name)))
+        else:
+            fingerprints[name] = obj_field_fingerprint(
+                field.to_primitive(obj, name, getattr(obj, name)))
+    delta._changed_fields = set(changes)
+    return delta, fingerprints
+
+
 def obj_to_primitive(obj):
     """Recursively turn an object into a python primitive.
 
@@ -161,7 +161,8 @@ class HostMapping(base.NovaTimestampObject, base.NovaObject):
 class HostMappingList(base.ObjectListBase, base.NovaObject):
     # Version 1.0: Initial version
     # Version 1.1: Add get_all method
-    VERSION = '1.1'
+    # Version 1.2: Add get_by_hosts method
+    VERSION = '1.2'
 
     fields = {
         'objects': fields.ListOfObjectsField('HostMapping'),
@@ -169,12 +170,14 @@ class HostMappingList(base.ObjectListBase, base.NovaObject):
 
     @staticmethod
     @api_db_api.context_manager.reader
-    def _get_from_db(context, cell_id=None):
+    def _get_from_db(context, cell_id=None, hosts=None):
         query = context.session.query(api_models.HostMapping).options(
             orm.joinedload(api_models.HostMapping.cell_mapping)
         )
         if cell_id:
             query = query.filter(api_models.HostMapping.cell_id == cell_id)
+        if hosts is not None:
+            query = query.filter(api_models.HostMapping.host.in_(hosts))
         return query.all()
 
     @base.remotable_classmethod
@@ -187,6 +190,11 @@ class HostMappingList(base.ObjectListBase, base.NovaObject):
         db_mappings = cls._get_from_db(context)
         return base.obj_make_list(context, cls(), HostMapping, db_mappings)
 
+    @base.remotable_classmethod
+    def get_by_hosts(cls, context, hosts):
+        db_mappings = cls._get_from_db(context, hosts=hosts)
+        return base.obj_make_list(context, cls(), HostMapping, db_mappings)
+
 
 def _create_host_mapping(host_mapping):
     try:
@@ -238,6 +238,15 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
 
     obj_extra_fields = ['name']
 
+    # NOTE: save() only uses the changed fields besides the uuid, and
+    # pci_requests which it always writes back as in-place changes to its
+    # requests are not tracked. The flavors are written back together when
+    # any of them changed, so they must all be sent, otherwise the unchanged
+    # ones would be lazy-loaded and override the pending changes.
+    obj_delta_methods = ('save',)
+    obj_delta_fields = ('uuid', 'pci_requests')
+    obj_delta_groups = (('flavor', 'old_flavor', 'new_flavor'),)
+
     def obj_make_compatible(self, primitive, target_version):
         super(Instance, self).obj_make_compatible(primitive, target_version)
         target_version = versionutils.convert_version_to_tuple(target_version)
@@ -382,10 +391,14 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
         self.obj_reset_changes(['flavor', 'old_flavor', 'new_flavor'])
 
     @staticmethod
-    def _from_db_object(context, instance, db_inst, expected_attrs=None):
+    def _from_db_object(context, instance, db_inst, expected_attrs=None,
+                        only_fields=None):
         """Method to help with migration to objects.
 
         Converts a database entity to a formal object.
+
+        If only_fields is not None, only those fields are set from the
+        database entity and the others are left to be lazy-loaded.
         """
         instance._context = context
         if expected_attrs is None:
@@ -394,6 +407,8 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
         for field in instance.fields:
             if field in INSTANCE_OPTIONAL_ATTRS:
                 continue
+            elif only_fields is not None and field not in only_fields:
+                continue
             elif field == 'deleted':
                 instance.deleted = db_inst['deleted'] == db_inst['id']
             elif field == 'cleaned':
@@ -872,7 +887,7 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
             updates['expected_vm_state'] = expected_vm_state
 
         expected_attrs = [attr for attr in _INSTANCE_OPTIONAL_JOINED_FIELDS
-                               if self.obj_attr_is_set(attr)]
+                               if self.obj_attr_is_loaded(attr)]
         if 'pci_devices' in expected_attrs:
             # NOTE(danms): We don't refresh pci_devices on save right now
             expected_attrs.remove('pci_devices')
@@ -1320,7 +1335,25 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
         return devs
 
 
-def _make_instance_list(context, inst_list, db_inst_list, expected_attrs):
+def _instance_columns(only_fields):
+    """Return the instance columns to load from the database for some fields.
+
+    :param only_fields: list of instance fields needed by the caller or None
+                        for all of them
+    :returns: list of instance columns or None to load all of them
+    """
+    if only_fields is None:
+        return None
+    # NOTE: Instance.name may be built from any field when the name template
+    # is not based on the id, and it silently falls back to the uuid for the
+    # fields which are not set, so load them all in that case.
+    if '%(' in CONF.instance_name_template:
+        return None
+    return sorted(set(only_fields) | {'id', 'uuid'})
+
+
+def _make_instance_list(context, inst_list, db_inst_list, expected_attrs,
+                        only_fields=None):
     get_fault = expected_attrs and 'fault' in expected_attrs
     inst_faults = {}
     if get_fault:
@@ -1339,7 +1372,7 @@ def _make_instance_list(context, inst_list, db_inst_list, expected_attrs):
     for db_inst in db_inst_list:
         inst_obj = inst_cls._from_db_object(
                 context, inst_cls(context), db_inst,
-                expected_attrs=expected_attrs)
+                expected_attrs=expected_attrs, only_fields=only_fields)
         if get_fault:
             inst_obj.fault = inst_faults.get(inst_obj.uuid, None)
         inst_list.objects.append(inst_obj)
@@ -1396,7 +1429,8 @@ class InstanceList(base.ObjectListBase, base.NovaObject):
     # Version 2.4: Add get_counts()
     # Version 2.5: Add get_uuids_by_host_and_node()
     # Version 2.6: Add get_uuids_by_hosts()
-    VERSION = '2.6'
+    # Version 2.7: Add only_fields to get_by_filters() and get_by_host()
+    VERSION = '2.7'
 
     fields = {
         'objects': fields.ListOfObjectsField('Instance'),
@@ -1407,49 +1441,67 @@ class InstanceList(base.ObjectListBase, base.NovaObject):
     def _get_by_filters_impl(cls, context, filters,
                        sort_key='created_at', sort_dir='desc', limit=None,
                        marker=None, expected_attrs=None, use_slave=False,
-                       sort_keys=None, sort_dirs=None):
+                       sort_keys=None, sort_dirs=None, columns=None):
         if sort_keys or sort_dirs:
             db_inst_list = db.instance_get_all_by_filters_sort(
                 context, filters, limit=limit, marker=marker,
                 columns_to_join=_expected_cols(expected_attrs),
-                sort_keys=sort_keys, sort_dirs=sort_dirs)
+                sort_keys=sort_keys, sort_dirs=sort_dirs, columns=columns)
         else:
             db_inst_list = db.instance_get_all_by_filters(
                 context, filters, sort_key, sort_dir, limit=limit,
-                marker=marker, columns_to_join=_expected_cols(expected_attrs))
+                marker=marker, columns_to_join=_expected_cols(expected_attrs),
+                columns=columns)
         return db_inst_list
 
     @base.remotable_classmethod
     def get_by_filters(cls, context, filters,
                        sort_key='created_at', sort_dir='desc', limit=None,
                        marker=None, expected_attrs=None, use_slave=False,
-                       sort_keys=None, sort_dirs=None):
+                       sort_keys=None, sort_dirs=None, only_fields=None):
+        """Get instances matching the filters.
+
+        :param only_fields: If not None, a list of the instance fields which
+            are needed, in addition to expected_attrs. Only those fields are
+            loaded from the database and the others are lazy-loaded on access,
+            which makes listing many instances cheaper when only a few fields
+            are used.
+        """
+        columns = _instance_columns(only_fields)
         db_inst_list = cls._get_by_filters_impl(
             context, filters, sort_key=sort_key, sort_dir=sort_dir,
             limit=limit, marker=marker, expected_attrs=expected_attrs,
-            use_slave=use_slave, sort_keys=sort_keys, sort_dirs=sort_dirs)
+            use_slave=use_slave, sort_keys=sort_keys, sort_dirs=sort_dirs,
+            columns=columns)
         # NOTE(melwitt): _make_instance_list could result in joined objects'
         # (from expected_attrs) _from_db_object methods being called during
         # Instance._from_db_object, each of which might choose to perform
         # database writes. So, we call this outside of _get_by_filters_impl to
         # avoid being nested inside a 'reader' database transaction context.
         return _make_instance_list(context, cls(), db_inst_list,
-                                   expected_attrs)
+                                   expected_attrs, only_fields=columns)
 
     @staticmethod
     @db.select_db_reader_mode
     def _db_instance_get_all_by_host(context, host, columns_to_join,
-                                     use_slave=False):
+                                     use_slave=False, columns=None):
         return db.instance_get_all_by_host(context, host,
-                                           columns_to_join=columns_to_join)
+                                           columns_to_join=columns_to_join,
+                                           columns=columns)
 
     @base.remotable_classmethod
-    def get_by_host(cls, context, host, expected_attrs=None, use_slave=False):
+    def get_by_host(cls, context, host, expected_attrs=None, use_slave=False,
+                    only_fields=None):
+        """Get the instances on a host.
+
+        :param only_fields: See get_by_filters().
+        """
+        columns = _instance_columns(only_fields)
         db_inst_list = cls._db_instance_get_all_by_host(
             context, host, columns_to_join=_expected_cols(expected_attrs),
-            use_slave=use_slave)
+            use_slave=use_slave, columns=columns)
         return _make_instance_list(context, cls(), db_inst_list,
-                                   expected_attrs)
+                                   expected_attrs, only_fields=columns)
 
     @base.remotable_classmethod
     def get_by_host_and_node(cls, context, host, node, expected_attrs=None):
@@ -13,9 +13,13 @@
 #    under the License.
 
 import collections
+import functools
+import threading
+import time
 
 from oslo_db import exception as db_exc
 
+import nova.conf
 from nova.db.api import api as api_db_api
 from nova.db.api import models as api_models
 from nova.db.main import api as main_db_api
@@ -36,6 +40,60 @@ __all__ = [
     'migrate_quota_limits_to_api_db',
 ]
 
+CONF = nova.conf.CONF
+
+# Quota limit lookups cached across requests, keyed like the per-request
+# RequestContext.quota_cache and stored along with the time they were looked
+# up. Only used when [quota]limits_cache_ttl is set.
+_LIMITS_CACHE = {}
+_LIMITS_CACHE_LOCK = threading.Lock()
+
+
+def _memoize_limits(fn):
+    """Memoize a quota limit lookup for the request and optionally process.
+
+    The looked up limits are cached on the RequestContext so that the quota
+    checks done while handling a single request only read each set of limits
+    from the database once. If [quota]limits_cache_ttl is set, they are also
+    shared between requests for that many seconds.
+    """
+    @functools.wraps(fn)
+    def wrapper(cls, context, *args):
+        key = (fn.__name__,) + args
+        request_cache = getattr(context, 'quota_cache', None)
+        if request_cache is not None and key in request_cache:
+            return dict(request_cache[key])
+
+        ttl = CONF.quota.limits_cache_ttl
+        if ttl:
+            with _LIMITS_CACHE_LOCK:
+                cached = _LIMITS_CACHE.get(key)
+            if cached and time.monotonic() - cached[0] < ttl:
+                if request_cache is not None:
+                    request_cache[key] = cached[1]
+                return dict(cached[1])
+
+        looked_up_at = time.monotonic()
+        result = fn(cls, context, *args)
+        # Callers are free to modify the returned dict so only ever cache and
+        # hand out copies of it.
+        if request_cache is not None:
+            request_cache[key] = dict(result)
+        if ttl:
+            with _LIMITS_CACHE_LOCK:
+                _LIMITS_CACHE[key] = (looked_up_at, dict(result))
+        return result
+    return wrapper
+
+
+def _invalidate_limits(context):
+    """Drop cached quota limits after they have been changed."""
+    request_cache = getattr(context, 'quota_cache', None)
+    if request_cache is not None:
+        request_cache.clear()
+    with _LIMITS_CACHE_LOCK:
+        _LIMITS_CACHE.clear()
+
 
 def ids_from_instance(context, instance):
     if (context.is_admin and
@@ -387,6 +445,7 @@ class Quotas(base.NovaObject):
         except exception.QuotaNotFound:
             cls._create_limit_in_db(context, project_id, resource, limit,
                                     user_id=user_id)
+            _invalidate_limits(context)
         else:
             raise exception.QuotaExists(project_id=project_id,
                                         resource=resource)
@@ -399,6 +458,8 @@ class Quotas(base.NovaObject):
         except exception.QuotaNotFound:
             main_db_api.quota_update(context, project_id, resource, limit,
                             user_id=user_id)
+        finally:
+            _invalidate_limits(context)
 
     @classmethod
     def create_class(cls, context, class_name, resource, limit):
@@ -406,6 +467,7 @@ class Quotas(base.NovaObject):
             main_db_api.quota_class_get(context, class_name, resource)
         except exception.QuotaClassNotFound:
             cls._create_class_in_db(context, class_name, resource, limit)
+            _invalidate_limits(context)
         else:
             raise exception.QuotaClassExists(class_name=class_name,
                                              resource=resource)
@@ -417,6 +479,8 @@ class Quotas(base.NovaObject):
         except exception.QuotaClassNotFound:
             main_db_api.quota_class_update(
                 context, class_name, resource, limit)
+        finally:
+            _invalidate_limits(context)
 
     # NOTE(melwitt): The following methods are not remotable and return
     # dict-like database model objects. We are using classmethods to provide
@@ -438,6 +502,7 @@ class Quotas(base.NovaObject):
         return api_db_quotas + main_db_quotas
 
     @classmethod
+    @_memoize_limits
     def get_all_by_project(cls, context, project_id):
         api_db_quotas_dict = cls._get_all_from_db_by_project(context,
                                                              project_id)
@@ -448,6 +513,7 @@ class Quotas(base.NovaObject):
         return main_db_quotas_dict
 
     @classmethod
+    @_memoize_limits
     def get_all_by_project_and_user(cls, context, project_id, user_id):
         api_db_quotas_dict = cls._get_all_from_db_by_project_and_user(
                 context, project_id, user_id)
@@ -463,6 +529,8 @@ class Quotas(base.NovaObject):
             cls._destroy_all_in_db_by_project(context, project_id)
         except exception.ProjectQuotaNotFound:
             main_db_api.quota_destroy_all_by_project(context, project_id)
+        finally:
+            _invalidate_limits(context)
 
     @classmethod
     def destroy_all_by_project_and_user(cls, context, project_id, user_id):
@@ -472,6 +540,8 @@ class Quotas(base.NovaObject):
         except exception.ProjectUserQuotaNotFound:
             main_db_api.quota_destroy_all_by_project_and_user(
                 context, project_id, user_id)
+        finally:
+            _invalidate_limits(context)
 
     @classmethod
     def get_class(cls, context, class_name, resource):
@@ -482,6 +552,7 @@ class Quotas(base.NovaObject):
         return qclass
 
     @classmethod
+    @_memoize_limits
     def get_default_class(cls, context):
         try:
             qclass = cls._get_all_class_from_db_by_name(
@@ -491,6 +562,7 @@ class Quotas(base.NovaObject):
         return qclass
 
     @classmethod
+    @_memoize_limits
     def get_all_class_by_name(cls, context, class_name):
         api_db_quotas_dict = cls._get_all_class_from_db_by_name(context,
                                                                 class_name)
@@ -12,11 +12,16 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import threading
+import time
+
 from oslo_log import log as logging
+from oslo_utils import excutils
 from oslo_utils import uuidutils
 from oslo_utils import versionutils
 
 from nova import availability_zones
+import nova.conf
 from nova import context as nova_context
 from nova.db.main import api as db
 from nova import exception
@@ -27,6 +32,7 @@ from nova.objects import base
 from nova.objects import fields
 
 
+CONF = nova.conf.CONF
 LOG = logging.getLogger(__name__)
 
 __all__ = [
@@ -37,7 +43,7 @@ __all__ = [
 
 
 # NOTE(danms): This is the global service version counter
-SERVICE_VERSION = 72
+SERVICE_VERSION = 73
 
 
 # NOTE(danms): This is our SERVICE_VERSION history. The idea is that any
@@ -255,12 +261,19 @@ SERVICE_VERSION_HISTORY = (
     # Version 72: Compute RPC v6.5:
     # Add support for vTPM live migration
     {'compute_rpc': '6.5'},
+    # Version 73: Compute RPC v6.5:
+    # Services can decode objects sent in the compact RPC format
+    {'compute_rpc': '6.5'},
 )
 
 # This is the version after which we can rely on having a persistent
 # local node identity for single-node systems.
 NODE_IDENTITY_VERSION = 65
 
+# This is the version after which all services can decode objects sent in the
+# compact RPC format.
+COMPACT_RPC_OBJECTS_VERSION = 73
+
 # This is used to raise an error at service startup if older than supported
 # computes are detected.
 # NOTE(sbauza) : Please modify it this way :
@@ -325,7 +338,8 @@ class Service(base.NovaPersistentObject, base.NovaObject,
     # Version 1.20: Added get_minimum_version_multi()
     # Version 1.21: Added uuid
     # Version 1.22: Added get_by_uuid()
-    VERSION = '1.22'
+    # Version 1.23: Added heartbeat()
+    VERSION = '1.23'
 
     fields = {
         'id': fields.IntegerField(read_only=True),
@@ -346,6 +360,12 @@ class Service(base.NovaPersistentObject, base.NovaObject,
     _MIN_VERSION_CACHE = {}
     _SERVICE_VERSION_CACHING = False
 
+    # Services with a heartbeat which has not been written to the database
+    # yet, and when pending heartbeats were last written.
+    _PENDING_HEARTBEATS = set()
+    _HEARTBEATS_FLUSHED_AT = 0
+    _HEARTBEAT_LOCK = threading.Lock()
+
     def __init__(self, *args, **kwargs):
         # NOTE(danms): We're going against the rules here and overriding
         # init. The reason is that we want to *ensure* that we're always
@@ -566,6 +586,43 @@ class Service(base.NovaPersistentObject, base.NovaObject,
         db.service_destroy(self._context, self.id)
         self._send_notification(fields.NotificationAction.DELETE)
 
+    @base.remotable
+    def heartbeat(self):
+        """Record a state report for this service.
+
+        Unlike incrementing report_count and calling save(), this neither
+        reads nor returns the service record. Heartbeats received within
+        get_heartbeat_flush_interval() seconds of the last write are
+        buffered, and written for all the buffered services at once by
+        flush_heartbeats() or by the next heartbeat received after that
+        interval.
+        """
+        cls = self.__class__
+        with cls._HEARTBEAT_LOCK:
+            cls._PENDING_HEARTBEATS.add(self.id)
+            if (time.monotonic() - cls._HEARTBEATS_FLUSHED_AT <
+                    get_heartbeat_flush_interval()):
+                return
+        cls.flush_heartbeats(self._context)
+
+    @classmethod
+    def flush_heartbeats(cls, context):
+        """Write the buffered heartbeats of all the services."""
+        with cls._HEARTBEAT_LOCK:
+            service_ids = cls._PENDING_HEARTBEATS
+            cls._PENDING_HEARTBEATS = set()
+            cls._HEARTBEATS_FLUSHED_AT = time.monotonic()
+        if not service_ids:
+            return
+
+        try:
+            db.service_heartbeat(context, list(service_ids))
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                # Keep the heartbeats so that the next flush writes them.
+                with cls._HEARTBEAT_LOCK:
+                    cls._PENDING_HEARTBEATS.update(service_ids)
+
     @classmethod
     def enable_min_version_cache(cls):
         cls.clear_min_version_cache()
@@ -618,6 +675,21 @@ class Service(base.NovaPersistentObject, base.NovaObject,
                                              use_slave=use_slave)
 
 
+def get_heartbeat_flush_interval():
+    """Get the number of seconds for which heartbeats are buffered.
+
+    This is ``[DEFAULT]/heartbeat_flush_interval``, capped to half of the time
+    between the last report of a service and the moment it would be
+    considered down, so that services do not appear down because their
+    heartbeats were buffered.
+    """
+    interval = CONF.heartbeat_flush_interval
+    if not interval:
+        return 0
+    return max(1, min(interval,
+                      (CONF.service_down_time - CONF.report_interval) // 2))
+
+
 def get_minimum_version_all_cells(context, binaries, require_all=False):
     """Get the minimum service version, checking all cells.
 
@@ -17,6 +17,8 @@
 """Quotas for resources per project."""
 
 import copy
+import threading
+import time
 
 from oslo_log import log as logging
 from oslo_utils import importutils
@@ -45,6 +47,15 @@ UID_QFD_POPULATED_CACHE_BY_PROJECT = set()
 # user_id and queued_for_delete are populated for all projects, cache the
 # result to avoid doing unnecessary EXISTS database queries.
 UID_QFD_POPULATED_CACHE_ALL = False
+# Legacy instances, cores and ram usage counts keyed by (project_id, user_id),
+# each stored along with the time at which they were counted. Only used when
+# [quota]usage_cache_ttl is set.
+USAGE_CACHE = {}
+# The time at which a server was last deleted, keyed by project_id. The counts
+# of these projects are not cached until [quota]usage_cache_ttl has passed, as
+# the compute services may not have completed the deletes yet.
+USAGE_DELETED_AT = {}
+USAGE_CACHE_LOCK = threading.Lock()
 
 
 class DbQuotaDriver(object):
@@ -1317,6 +1328,14 @@ def _instances_cores_ram_count_legacy(context, project_id, user_id=None):
     # this filtering if there is more than one non-cell0 cell.
     # TODO(tssurya): Consider adding a scatter_gather_cells_for_project
     # variant that makes this native to nova.context.
+    ttl = CONF.quota.usage_cache_ttl
+    if ttl:
+        key = (project_id, user_id)
+        with USAGE_CACHE_LOCK:
+            cached = USAGE_CACHE.get(key)
+            if cached and time.monotonic() - cached[0] < ttl:
+                return copy.deepcopy(cached[1])
+        counted_at = time.monotonic()
     if CONF.api.instance_list_per_project_cells:
         cell_mappings = objects.CellMappingList.get_by_project_id(
             context, project_id)
@@ -1329,16 +1348,91 @@ def _instances_cores_ram_count_legacy(context, project_id, user_id=None):
     total_counts = {'project': {'instances': 0, 'cores': 0, 'ram': 0}}
     if user_id:
         total_counts['user'] = {'instances': 0, 'cores': 0, 'ram': 0}
+    complete = True
     for result in results.values():
-        if not nova_context.is_cell_failure_sentinel(result):
-            for resource, count in result['project'].items():
-                total_counts['project'][resource] += count
-            if user_id:
-                for resource, count in result['user'].items():
-                    total_counts['user'][resource] += count
+        if nova_context.is_cell_failure_sentinel(result):
+            complete = False
+            continue
+        for resource, count in result['project'].items():
+            total_counts['project'][resource] += count
+        if user_id:
+            for resource, count in result['user'].items():
+                total_counts['user'][resource] += count
+    # Don't cache partial counts from a down cell, we want the next check to
+    # try counting that cell again.
+    if ttl and complete:
+        with USAGE_CACHE_LOCK:
+            deleted_at = USAGE_DELETED_AT.get(project_id)
+            if deleted_at is not None and counted_at - deleted_at >= ttl:
+                del USAGE_DELETED_AT[project_id]
+                deleted_at = None
+            # Don't cache counts which may include servers which are still
+            # being deleted, they would be stale until they expire.
+            if deleted_at is None:
+                USAGE_CACHE[key] = (counted_at, copy.deepcopy(total_counts))
     return total_counts
 
 
+def adjust_cached_usage(project_id, user_id, instances=0, cores=0, ram=0):
+    """Apply a usage delta to the cached usage counts of a project.
+
+    This is used to keep the counts cached by [quota]usage_cache_ttl in step
+    with resources consumed through this service, before they are reconciled
+    with the cell databases when the cached entries expire.
+
+    :param project_id: The project_id the resources were consumed by
+    :param user_id: The user_id the resources were consumed by
+    :param instances: The change in the number of instances
+    :param cores: The change in the number of cores
+    :param ram: The change in the amount of ram
+    """
+    if not CONF.quota.usage_cache_ttl:
+        return
+    deltas = {'instances': instances, 'cores': cores, 'ram': ram}
+    with USAGE_CACHE_LOCK:
+        for (cached_project_id, cached_user_id), (_, counts) in (
+                USAGE_CACHE.items()):
+            if cached_project_id != project_id:
+                continue
+            for resource, delta in deltas.items():
+                counts['project'][resource] += delta
+                if cached_user_id is not None and cached_user_id == user_id:
+                    counts['user'][resource] += delta
+
+
+def invalidate_cached_usage(project_id=None):
+    """Drop cached usage counts so that they are recounted on the next check.
+
+    :param project_id: The project_id to drop cached counts for. If not
+                       specified, the counts for all projects are dropped.
+    """
+    with USAGE_CACHE_LOCK:
+        if project_id is None:
+            USAGE_CACHE.clear()
+            USAGE_DELETED_AT.clear()
+            return
+        for key in [k for k in USAGE_CACHE if k[0] == project_id]:
+            del USAGE_CACHE[key]
+
+
+def invalidate_cached_usage_for_delete(project_id):
+    """Drop the cached usage counts of a project a server is deleted from.
+
+    The usage freed by the delete is only reflected in the cell databases once
+    the compute service completes it, which this service is not told about.
+    So the counts of the project are also not cached for
+    [quota]usage_cache_ttl seconds, rather than caching a count which still
+    includes the server being deleted for that long.
+
+    :param project_id: The project_id of the deleted server
+    """
+    if not CONF.quota.usage_cache_ttl:
+        return
+    invalidate_cached_usage(project_id)
+    with USAGE_CACHE_LOCK:
+        USAGE_DELETED_AT[project_id] = time.monotonic()
+
+
 def _cores_ram_count_placement(context, project_id, user_id=None):
     return report.report_client_singleton().get_usages_counts_for_quota(
         context, project_id, user_id=user_id)
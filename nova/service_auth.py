@@ -11,14 +11,20 @@
 #    under the License.
 
 
+import collections
+import functools
+import threading
 import typing as ty
+from urllib import parse as urlparse
 
 if ty.TYPE_CHECKING:
     import keystoneauth1.plugin
 
 from keystoneauth1 import loading as ks_loading
 from keystoneauth1 import service_token
+from keystoneauth1 import session as ks_session
 from oslo_log import log as logging
+from oslo_reports.models import with_default_views
 
 import nova.conf
 
@@ -26,16 +32,53 @@ import nova.conf
 CONF = nova.conf.CONF
 LOG = logging.getLogger(__name__)
 
-# Auth plugins and auth sessions keyed by configuration group name
+# Auth plugins, auth sessions and adapter parameters keyed by configuration
+# group name
 _AUTHS = {}
 _SESSIONS = {}
+_ADAPTER_PARAMS = {}
+
+# Request stats of the service sessions keyed by (configuration group name,
+# endpoint)
+ENDPOINT_STATS = collections.defaultdict(collections.Counter)
+_ENDPOINT_STATS_LOCK = threading.Lock()
 
 
 def reset_globals():
     """For async unit test consistency."""
-    global _AUTHS, _SESSIONS
+    global _AUTHS, _SESSIONS, _ADAPTER_PARAMS
     _AUTHS = {}
     _SESSIONS = {}
+    _ADAPTER_PARAMS = {}
+    with _ENDPOINT_STATS_LOCK:
+        ENDPOINT_STATS.clear()
+
+
+def _record_response(conf_group, response, *args, **kwargs):
+    """Record the latency of a response received by a service session."""
+    url = urlparse.urlparse(response.url)
+    endpoint = '%s://%s' % (url.scheme, url.netloc)
+    with _ENDPOINT_STATS_LOCK:
+        stats = ENDPOINT_STATS[(conf_group, endpoint)]
+        stats['requests'] += 1
+        if response.status_code >= 500:
+            stats['errors'] += 1
+        stats['latency_ms'] += int(response.elapsed.total_seconds() * 1000)
+
+
+def endpoint_report():
+    """Guru meditation report section with the service endpoint stats."""
+    with _ENDPOINT_STATS_LOCK:
+        data = {}
+        for (conf_group, endpoint), stats in ENDPOINT_STATS.items():
+            data['[%s] %s' % (conf_group, endpoint)] = {
+                'requests': stats['requests'],
+                'errors': stats['errors'],
+                'average_latency_ms': (
+                    stats['latency_ms'] // stats['requests']
+                    if stats['requests'] else 0),
+            }
+    return with_default_views.ModelWithDefaultViews(data=data)
 
 
 def get_service_auth_plugin(
@@ -62,10 +105,35 @@ def get_service_auth_session(
     if not session:
         session = ks_loading.load_session_from_conf_options(
                 CONF, conf_group, auth=auth)
+        # NOTE: The session is shared by every client of the service, so
+        # record the latency of its requests per endpoint here, including the
+        # ones to keystone to get or refresh the tokens.
+        if isinstance(session, ks_session.Session):
+            session.session.hooks['response'].append(
+                functools.partial(_record_response, conf_group))
         _SESSIONS[conf_group] = session
     return session
 
 
+def get_service_adapter_parameters(conf_group: str) -> dict:
+    """Get the keystoneauth adapter parameters of a service.
+
+    The parameters are loaded from the adapter options of the configuration
+    group once rather than every time a client of the service is built.
+    """
+    params = _ADAPTER_PARAMS.get(conf_group)
+    if params is None:
+        adap = ks_loading.load_adapter_from_conf_options(
+            CONF, conf_group, session=None)
+        params = {'service_type': adap.service_type,
+                  'service_name': adap.service_name,
+                  'interface': adap.interface,
+                  'region_name': adap.region_name,
+                  'endpoint_override': adap.endpoint_override}
+        _ADAPTER_PARAMS[conf_group] = params
+    return params
+
+
 def get_service_user_token_auth_plugin(context, user_auth=None):
     """Dynamically get an auth plugin based on service user token config.
 
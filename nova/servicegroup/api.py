@@ -78,6 +78,24 @@ class API(object):
 
         return self._driver.is_up(member)
 
+    def service_is_up_multi(self, members):
+        """Check which of the given members are up.
+
+        This is more efficient than calling service_is_up() for each member
+        since drivers can check all the members at once.
+
+        :param members: A list of members to check
+        :returns: A list of booleans indicating whether the member at the same
+            index in members is up
+        """
+        # NOTE: This is called by the scheduler for every host it considers,
+        # so don't log here to not slow it down.
+        to_check = [member for member in members
+                    if not member.get('forced_down')]
+        is_up = iter(self._driver.is_up_multi(to_check))
+        return [False if member.get('forced_down') else next(is_up)
+                for member in members]
+
     def get_updated_time(self, member):
         """Get the updated time from drivers except db"""
         return self._driver.updated_time(member)
@@ -18,8 +18,11 @@ import oslo_messaging as messaging
 from oslo_utils import timeutils
 
 import nova.conf
+from nova import context as nova_context
 from nova import exception
 from nova.i18n import _
+from nova import objects
+from nova.objects import service as service_obj
 from nova.servicegroup import api
 from nova.servicegroup.drivers import base
 
@@ -54,10 +57,32 @@ class DbDriver(base.Driver):
                 report_interval, self._report_state, args=[service],
                 initial_delay=api.INITIAL_REPORTING_DELAY)
 
+        # NOTE: nova-conductor buffers the heartbeats of the services, so it
+        # also writes them periodically in case no other heartbeat arrives to
+        # trigger the write.
+        flush_interval = service_obj.get_heartbeat_flush_interval()
+        if flush_interval and service.binary == 'nova-conductor':
+            if flush_interval < CONF.heartbeat_flush_interval:
+                LOG.warning('heartbeat_flush_interval is capped to %d '
+                            'seconds, so that services are not considered '
+                            'down because of it. Increase service_down_time '
+                            'to use a longer interval.', flush_interval)
+            service.tg.add_timer_args(
+                flush_interval, self._flush_heartbeats,
+                initial_delay=flush_interval)
+
     def is_up(self, service_ref):
         """Moved from nova.utils
         Check whether a service is up based on last heartbeat.
         """
+        return self._is_up(service_ref, timeutils.utcnow())
+
+    def is_up_multi(self, service_refs):
+        """Check whether each service is up based on its last heartbeat."""
+        now = timeutils.utcnow()
+        return [self._is_up(service_ref, now) for service_ref in service_refs]
+
+    def _is_up(self, service_ref, now):
         last_heartbeat = (service_ref.get('last_seen_up') or
             service_ref['created_at'])
         if isinstance(last_heartbeat, str):
@@ -70,7 +95,7 @@ class DbDriver(base.Driver):
             # below does not (and will fail)
             last_heartbeat = last_heartbeat.replace(tzinfo=None)
         # Timestamps in DB are UTC.
-        elapsed = timeutils.delta_seconds(last_heartbeat, timeutils.utcnow())
+        elapsed = timeutils.delta_seconds(last_heartbeat, now)
         is_up = abs(elapsed) <= self.service_down_time
         if not is_up:
             LOG.debug('Seems service %(binary)s on host %(host)s is down. '
@@ -84,12 +109,25 @@ class DbDriver(base.Driver):
         """Get the updated time from db"""
         return service_ref['updated_at']
 
+    def _flush_heartbeats(self):
+        """Write the heartbeats buffered by nova-conductor."""
+        try:
+            objects.Service.flush_heartbeats(
+                nova_context.get_admin_context())
+        except Exception:
+            # NOTE: Do not stop the timer, the heartbeats are kept to be
+            # written by the next flush.
+            LOG.exception('Unexpected error while writing service heartbeats')
+
     def _report_state(self, service):
         """Update the state of this service in the datastore."""
 
         try:
-            service.service_ref.report_count += 1
-            service.service_ref.save()
+            if CONF.heartbeat_flush_interval:
+                service.service_ref.heartbeat()
+            else:
+                service.service_ref.report_count += 1
+                service.service_ref.save()
 
             # TODO(termie): make this pattern be more elegant.
             if getattr(service, 'model_disconnected', False):
@@ -70,6 +70,20 @@ class MemcachedDriver(base.Driver):
 
         return is_up
 
+    def is_up_multi(self, service_refs):
+        """Check whether each service is up based on its last heartbeat,
+        fetching the heartbeats of all the services at once.
+        """
+        if not service_refs:
+            return []
+        keys = [str("%(topic)s:%(host)s" % service_ref)
+                for service_ref in service_refs]
+        heartbeats = self.mc.get_multi(keys)
+        for key, heartbeat in zip(keys, heartbeats):
+            if heartbeat is None:
+                LOG.debug('Seems service %s is down', key)
+        return [heartbeat is not None for heartbeat in heartbeats]
+
     def updated_time(self, service_ref):
         """Get the updated time from memcache"""
         key = "%(topic)s:%(host)s" % service_ref
@@ -58,6 +58,7 @@ from nova.db.main import api as db_api
 from nova import exception
 from nova import objects
 from nova.objects import base as objects_base
+from nova.objects import quotas as quotas_obj
 from nova.pci import request
 from nova import quota
 from nova.scheduler.client import report
@@ -67,6 +68,7 @@ from nova.tests import fixtures as nova_fixtures
 from nova.tests.unit import matchers
 from nova import utils
 from nova.virt import images
+from nova.volume import cinder
 
 CONF = cfg.CONF
 
@@ -241,6 +243,7 @@ class TestCase(base.BaseTestCase):
             objects_base.NovaObjectRegistry._registry._obj_classes)
         self.addCleanup(self._restore_obj_registry)
         objects.Service.clear_min_version_cache()
+        objects_base.reset_globals()
 
         # NOTE(danms): Reset the cached list of cells
         from nova.compute import api
@@ -297,6 +300,8 @@ class TestCase(base.BaseTestCase):
         # NOTE(melwitt): Reset the cached set of projects
         quota.UID_QFD_POPULATED_CACHE_BY_PROJECT = set()
         quota.UID_QFD_POPULATED_CACHE_ALL = False
+        quota.invalidate_cached_usage()
+        quotas_obj._LIMITS_CACHE.clear()
 
         self.useFixture(nova_fixtures.GenericPoisonFixture())
         self.useFixture(nova_fixtures.SysFsPoisonFixture())
@@ -340,6 +345,9 @@ class TestCase(base.BaseTestCase):
         # Reset the global service auths and sessions
         nova.service_auth.reset_globals()
 
+        # Reset the cached cinder API versions
+        cinder.reset_globals()
+
     def _setup_cells(self):
         """Setup a normal cellsv2 environment.
 
@@ -337,6 +337,32 @@ class TestDatabaseArchive(integrated_helpers._IntegratedTestBase):
         results = self._get_table_counts()
         self.assertFalse(any(results.values()))
 
+    def test_archive_then_purge_batched(self):
+        server = self._create_server()
+        self._delete_server(server)
+        db.archive_deleted_rows(max_rows=1000)
+        admin_context = context.get_admin_context()
+        total = sum(self._get_table_counts().values())
+        self.assertGreater(total, 3)
+
+        lines = []
+
+        def status(msg):
+            lines.append(msg)
+
+        # Stop after max_rows even though more rows could be purged.
+        deleted = db.purge_shadow_tables(admin_context, None,
+                                         status_fn=status, max_rows=3,
+                                         batch_size=2)
+        self.assertEqual(3, deleted)
+        self.assertEqual(total - 3, sum(self._get_table_counts().values()))
+        self.assertIn('so far', lines[0])
+
+        # Running again resumes the purge until everything is gone.
+        deleted = db.purge_shadow_tables(admin_context, None, batch_size=2)
+        self.assertEqual(total - 3, deleted)
+        self.assertFalse(any(self._get_table_counts().values()))
+
     def test_purge_with_real_date(self):
         """Make sure the result of dateutil's parser works with the
            query we're making to sqlalchemy.
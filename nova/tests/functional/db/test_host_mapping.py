@@ -139,6 +139,24 @@ class HostMappingTestCase(test.NoDBTestCase):
         self.assertEqual(1, len(host_mapping_list))
         self.assertEqual(db_host_mapping['id'], host_mapping_list[0].id)
 
+    def test_host_mapping_list_get_by_hosts(self):
+        """Tests getting the HostMappings for a given list of hosts."""
+        cell = create_cell_mapping()
+        db_host_mapping1 = create_mapping(host='host1', cell_mapping=cell)
+        db_host_mapping2 = create_mapping(host='host2', cell_mapping=cell)
+        create_mapping(host='host3', cell_mapping=cell)
+
+        host_mapping_list = host_mapping.HostMappingList.get_by_hosts(
+            self.context, ['host1', 'host2', 'unmapped-host'])
+
+        self.assertEqual(
+            sorted([db_host_mapping1['id'], db_host_mapping2['id']]),
+            sorted(mapping.id for mapping in host_mapping_list))
+        self.assertEqual(cell['uuid'],
+                         host_mapping_list[0].cell_mapping.uuid)
+        self.assertEqual(0, len(host_mapping.HostMappingList.get_by_hosts(
+            self.context, [])))
+
 
 class HostMappingDiscoveryTest(test.TestCase):
     def _setup_cells(self):
@@ -245,6 +245,10 @@ class HypervisorsTestV21(test.NoDBTestCase):
         self.controller = hypervisors_v21.HypervisorsController()
         self.controller.servicegroup_api.service_is_up = mock.MagicMock(
             return_value=True)
+        self.controller.servicegroup_api.service_is_up_multi = (
+            mock.MagicMock(side_effect=lambda services: [
+                self.controller.servicegroup_api.service_is_up(service)
+                for service in services]))
 
         host_api = self.controller.host_api
         host_api.compute_node_get_all = mock.MagicMock(
@@ -782,7 +782,8 @@ class ServicesTestV21(test.TestCase):
 
     # This test is just to verify that the servicegroup API gets used when
     # calling the API
-    @mock.patch.object(db_driver.DbDriver, 'is_up', side_effect=KeyError)
+    @mock.patch.object(db_driver.DbDriver, 'is_up_multi',
+                       side_effect=KeyError)
     def test_services_with_exception(self, mock_is_up):
         url = self.base_path_with_query % 'host=host1&binary=nova-compute'
         req = fakes.HTTPRequest.blank(url, use_admin_context=True)
@@ -1143,6 +1144,9 @@ class FakeServiceGroupAPI(object):
     def service_is_up(self, *args, **kwargs):
         return True
 
+    def service_is_up_multi(self, members):
+        return [True] * len(members)
+
     def get_updated_time(self, *args, **kwargs):
         return '2024-11-18T18:38:54.000000'
 
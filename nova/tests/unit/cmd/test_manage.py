@@ -17,6 +17,7 @@ import datetime
 from io import StringIO
 import sys
 import textwrap
+import time
 from unittest import mock
 import warnings
 
@@ -282,6 +283,123 @@ Archiving.....complete
         self.assertEqual(expected, output)
         self.assertEqual(1, result)
 
+    @mock.patch.object(db, 'archive_deleted_rows')
+    def test_archive_deleted_rows_all_cells_concurrently(self,
+                                                         mock_db_archive):
+        # Each cell archives one batch then finds nothing left to archive.
+        def fake_archive(cctxt, max_rows, before=None, task_log=False):
+            if cctxt.db_connection not in archived:
+                archived.add(cctxt.db_connection)
+                return dict(instances=10, consoles=5), list(), 15
+            return dict(), list(), 0
+
+        archived = set()
+        mock_db_archive.side_effect = fake_archive
+        cell_dbs = nova_fixtures.CellDatabases()
+        cell_dbs.add_cell_database('fake:///db1')
+        cell_dbs.add_cell_database('fake:///db2')
+        self.useFixture(cell_dbs)
+
+        ctxt = context.RequestContext()
+        for i in (1, 2):
+            objects.CellMapping(context=ctxt,
+                                uuid=uuidutils.generate_uuid(),
+                                database_connection='fake:///db%d' % i,
+                                transport_url='fake:///mq%d' % i,
+                                name='cell%d' % i).create()
+
+        result = self.commands.archive_deleted_rows(30, verbose=True,
+                                                    all_cells=True,
+                                                    until_complete=True,
+                                                    cell_concurrency=2)
+
+        self.assertEqual(1, result)
+        mock_db_archive.assert_has_calls([
+            mock.call(
+                test.MatchType(context.RequestContext), 30, before=None,
+                task_log=False)] * 4)
+        output = self.output.getvalue()
+        expected = '''\
++-----------------+-------------------------+
+| Table           | Number of Rows Archived |
++-----------------+-------------------------+
+| cell1.consoles  | 5                       |
+| cell1.instances | 10                      |
+| cell2.consoles  | 5                       |
+| cell2.instances | 10                      |
++-----------------+-------------------------+
+'''
+        self.assertIn('complete', output)
+        self.assertTrue(output.endswith(expected), output)
+
+    @mock.patch.object(db, 'archive_deleted_rows')
+    def test_archive_deleted_rows_all_cells_concurrently_cell_failure(
+            self, mock_db_archive):
+        def fake_archive(cctxt, max_rows, before=None, task_log=False):
+            if cctxt.cell_uuid == cell_uuids[0]:
+                raise db_exc.CantStartEngineError()
+            if cctxt.db_connection not in archived:
+                archived.add(cctxt.db_connection)
+                return dict(instances=10), list(), 10
+            return dict(), list(), 0
+
+        archived = set()
+        mock_db_archive.side_effect = fake_archive
+        cell_dbs = nova_fixtures.CellDatabases()
+        cell_dbs.add_cell_database('fake:///db1')
+        cell_dbs.add_cell_database('fake:///db2')
+        self.useFixture(cell_dbs)
+
+        ctxt = context.RequestContext()
+        cell_uuids = [uuidutils.generate_uuid() for i in (1, 2)]
+        for i, cell_uuid in enumerate(cell_uuids, 1):
+            objects.CellMapping(context=ctxt,
+                                uuid=cell_uuid,
+                                database_connection='fake:///db%d' % i,
+                                transport_url='fake:///mq%d' % i,
+                                name='cell%d' % i).create()
+
+        result = self.commands.archive_deleted_rows(30, verbose=True,
+                                                    all_cells=True,
+                                                    until_complete=True,
+                                                    cell_concurrency=2)
+
+        # The rows archived in the other cell are still reported.
+        self.assertEqual(1, result)
+        output = self.output.getvalue()
+        self.assertIn('Failed to archive deleted rows of cell cell1', output)
+        self.assertIn('| cell2.instances | 10 ', output)
+        self.assertNotIn('cell1.instances', output)
+
+    def test_archive_deleted_rows_invalid_cell_concurrency(self):
+        self.assertEqual(2, self.commands.archive_deleted_rows(
+            all_cells=True, until_complete=True, cell_concurrency=0))
+
+    def test_archive_deleted_rows_invalid_throughput_target(self):
+        self.assertEqual(2, self.commands.archive_deleted_rows(
+            until_complete=True, throughput_target=0))
+
+    @mock.patch('time.sleep')
+    @mock.patch('time.monotonic', return_value=100)
+    @mock.patch.object(db, 'archive_deleted_rows')
+    @mock.patch.object(objects.CellMappingList, 'get_all')
+    def test_archive_deleted_rows_throughput_target(self, mock_get_all,
+                                                    mock_db_archive,
+                                                    mock_monotonic,
+                                                    mock_sleep):
+        mock_db_archive.side_effect = [
+            ({'instances': 10, 'instance_extra': 5}, list(), 15),
+            ({'instances': 5, 'instance_faults': 1}, list(), 6),
+            ({}, list(), 0)]
+
+        result = self.commands.archive_deleted_rows(20, until_complete=True,
+                                                    throughput_target=3)
+
+        self.assertEqual(1, result)
+        # The batches took no time at all, so we sleep for as long as
+        # archiving them at 3 rows per second would take.
+        mock_sleep.assert_has_calls([mock.call(5), mock.call(2)])
+
     @mock.patch.object(db, 'archive_deleted_rows',
                        return_value=(
                                dict(instances=10, consoles=5), list(), 15))
@@ -406,7 +524,9 @@ Rows were archived, running purge...
                 task_log=False),
         ])
         mock_db_purge.assert_called_once_with(mock.ANY, None,
-                                              status_fn=mock.ANY)
+                                              status_fn=mock.ANY,
+                                              max_rows=None, batch_size=None,
+                                              sleep=0)
 
     @mock.patch.object(db, 'archive_deleted_rows')
     def test_archive_deleted_rows_until_stopped_cells(self, mock_db_archive,
@@ -601,7 +721,31 @@ is set and run this command again.
         mock_purge.return_value = 1
         ret = self.commands.purge(purge_all=True)
         self.assertEqual(0, ret)
-        mock_purge.assert_called_once_with(mock.ANY, None, status_fn=mock.ANY)
+        mock_purge.assert_called_once_with(mock.ANY, None, status_fn=mock.ANY,
+                                           max_rows=None, batch_size=None,
+                                           sleep=0)
+
+    @mock.patch('nova.db.main.api.purge_shadow_tables')
+    def test_purge_batched(self, mock_purge):
+        mock_purge.return_value = 1
+        ret = self.commands.purge(purge_all=True, max_rows=100,
+                                  batch_size=10, sleep=1)
+        self.assertEqual(0, ret)
+        mock_purge.assert_called_once_with(mock.ANY, None, status_fn=mock.ANY,
+                                           max_rows=100, batch_size=10,
+                                           sleep=1)
+
+    @mock.patch('nova.db.main.api.purge_shadow_tables')
+    def test_purge_invalid_max_rows(self, mock_purge):
+        ret = self.commands.purge(purge_all=True, max_rows=0)
+        self.assertEqual(2, ret)
+        self.assertFalse(mock_purge.called)
+
+    @mock.patch('nova.db.main.api.purge_shadow_tables')
+    def test_purge_invalid_batch_size(self, mock_purge):
+        ret = self.commands.purge(purge_all=True, batch_size=-1)
+        self.assertEqual(2, ret)
+        self.assertFalse(mock_purge.called)
 
     @mock.patch('nova.db.main.api.purge_shadow_tables')
     def test_purge_date(self, mock_purge):
@@ -610,7 +754,9 @@ is set and run this command again.
         self.assertEqual(0, ret)
         mock_purge.assert_called_once_with(mock.ANY,
                                            datetime.datetime(2015, 10, 21),
-                                           status_fn=mock.ANY)
+                                           status_fn=mock.ANY,
+                                           max_rows=None, batch_size=None,
+                                           sleep=0)
 
     @mock.patch('nova.db.main.api.purge_shadow_tables')
     def test_purge_date_fail(self, mock_purge):
@@ -725,7 +871,7 @@ Error: invalid connection
 """
         self.assertEqual(expected, self.output.getvalue())
 
-    def _fake_db_command(self, migrations=None):
+    def _fake_db_command(self, migrations=None, tables=None):
         if migrations is None:
             mock_mig_1 = mock.MagicMock(__name__="mock_mig_1")
             mock_mig_2 = mock.MagicMock(__name__="mock_mig_2")
@@ -735,6 +881,7 @@ Error: invalid connection
 
         class _CommandSub(manage.DbCommands):
             online_migrations = migrations
+            online_migration_tables = tables or {}
 
         return _CommandSub
 
@@ -759,8 +906,10 @@ Error: invalid connection
 """
         self.assertEqual(expected, sys.stdout.getvalue())
 
+    @mock.patch('time.monotonic', side_effect=[0, 1, 2, 3])
     @mock.patch('nova.context.get_admin_context')
-    def test_online_migrations_no_max_count(self, mock_get_context):
+    def test_online_migrations_no_max_count(self, mock_get_context,
+                                            mock_time):
         self.useFixture(fixtures.MonkeyPatch('sys.stdout', StringIO()))
         total = [120]
         batches = [50, 40, 30, 0]
@@ -779,8 +928,11 @@ Error: invalid connection
         expected = """\
 Running batches of 50 until complete
 50 rows matched query fake_migration, 50 migrated
+Migrated 50 rows in 1.0 seconds (50.0 rows/sec)
 40 rows matched query fake_migration, 40 migrated
+Migrated 90 rows in 2.0 seconds (45.0 rows/sec)
 30 rows matched query fake_migration, 30 migrated
+Migrated 120 rows in 3.0 seconds (40.0 rows/sec)
 +----------------+--------------+-----------+
 |   Migration    | Total Needed | Completed |
 +----------------+--------------+-----------+
@@ -825,6 +977,102 @@ Running batches of 50 until complete
         good_remaining = [125]
         self.assertEqual(2, command.online_data_migrations(None))
 
+    @mock.patch('nova.context.get_admin_context')
+    def test_online_migrations_skips_completed(self, mock_get_context):
+        self.useFixture(fixtures.MonkeyPatch('sys.stdout', StringIO()))
+        done_migration = mock.MagicMock(__name__='done_migration',
+                                        return_value=(0, 0))
+        batches = [50, 20, 0]
+
+        def fake_migration(context, count):
+            count = batches.pop(0)
+            return count, count
+
+        command_cls = self._fake_db_command((done_migration, fake_migration))
+        command = command_cls()
+        self.assertEqual(0, command.online_data_migrations(None))
+        self.assertEqual([], batches)
+        # The migration which had nothing to migrate only ran once.
+        done_migration.assert_called_once_with(
+            mock_get_context.return_value, 50)
+
+    @mock.patch('nova.context.get_admin_context')
+    def test_online_migrations_concurrency(self, mock_get_context):
+        self.useFixture(fixtures.MonkeyPatch('sys.stdout', StringIO()))
+        remaining = {'mig_1': 120, 'mig_2': 30}
+
+        def fake_migration(name):
+            def migrate(context, count):
+                done = min(remaining[name], count)
+                remaining[name] -= done
+                return done, done
+            return mock.MagicMock(__name__=name, side_effect=migrate)
+
+        migrations = (fake_migration('mig_1'), fake_migration('mig_2'))
+        command_cls = self._fake_db_command(migrations)
+        command = command_cls()
+        self.assertEqual(
+            0, command.online_data_migrations(None, concurrency=2))
+        self.assertEqual({'mig_1': 0, 'mig_2': 0}, remaining)
+        # Both migrations get a full batch each.
+        migrations[0].assert_has_calls([mock.call(mock.ANY, 50)] * 4)
+        # The second migration is not run again once it found nothing left.
+        migrations[1].assert_has_calls([mock.call(mock.ANY, 50)] * 2)
+        self.assertEqual(2, migrations[1].call_count)
+        self.assertIn('|   mig_1   |     120      |    120    |',
+                      sys.stdout.getvalue())
+
+    @mock.patch('nova.context.get_admin_context')
+    def test_online_migrations_concurrency_conflicts(self, mock_get_context):
+        self.useFixture(fixtures.MonkeyPatch('sys.stdout', StringIO()))
+        remaining = {'mig_1': 120, 'mig_2': 30, 'mig_3': 70}
+        running = set()
+        overlaps = []
+
+        def fake_migration(name):
+            def migrate(context, count):
+                running.add(name)
+                # Let the other migrations run before this one completes.
+                time.sleep(0.01)
+                overlaps.append(set(running))
+                running.remove(name)
+                done = min(remaining[name], count)
+                remaining[name] -= done
+                return done, done
+            return mock.MagicMock(__name__=name, side_effect=migrate)
+
+        migrations = tuple(
+            fake_migration(name) for name in ('mig_1', 'mig_2', 'mig_3'))
+        command_cls = self._fake_db_command(migrations, tables={
+            'mig_1': ('instances',),
+            'mig_2': ('instance_mappings',),
+            'mig_3': ('instances', 'virtual_interfaces')})
+        command = command_cls()
+        self.assertEqual(
+            [[migrations[0], migrations[2]], [migrations[1]]],
+            command._online_migration_groups(list(migrations)))
+        self.assertEqual(
+            0, command.online_data_migrations(None, concurrency=3))
+        self.assertEqual({'mig_1': 0, 'mig_2': 0, 'mig_3': 0}, remaining)
+        # The migrations updating the instances table never overlap, while
+        # the other one runs concurrently with them.
+        for running_migrations in overlaps:
+            self.assertFalse({'mig_1', 'mig_3'} <= running_migrations)
+        self.assertTrue(any('mig_2' in running_migrations and
+                            len(running_migrations) > 1
+                            for running_migrations in overlaps))
+
+    def test_online_migration_tables(self):
+        # Every online migration declares the tables it updates so that
+        # conflicting migrations are not run concurrently.
+        names = {m.__name__ for m in self.commands.online_migrations}
+        self.assertEqual(
+            names, set(self.commands.online_migration_tables))
+
+    def test_online_migrations_bad_concurrency(self):
+        self.assertEqual(
+            127, self.commands.online_data_migrations(concurrency=0))
+
     def test_online_migrations_bad_max(self):
         self.assertEqual(127,
                          self.commands.online_data_migrations(max_count=-2))
@@ -1488,6 +1488,25 @@ class _ComputeAPIUnitTestMixIn(object):
         inst.disable_terminate = True
         self.compute_api.delete(self.context, inst)
 
+    @mock.patch('nova.quota.invalidate_cached_usage_for_delete')
+    def test_delete_disabled_keeps_cached_usage(self, mock_invalidate):
+        inst = self._create_instance_obj()
+        inst.disable_terminate = True
+        self.compute_api.delete(self.context, inst)
+        mock_invalidate.assert_not_called()
+
+    @mock.patch('nova.quota.invalidate_cached_usage_for_delete')
+    @mock.patch('nova.compute.api.API._local_delete_cleanup')
+    @mock.patch('nova.compute.api.API._delete_while_booting',
+                return_value=True)
+    def test_delete_invalidates_cached_usage(self, mock_dwb, mock_cleanup,
+                                             mock_invalidate):
+        inst = self._create_instance_obj()
+        inst.host = None
+        self.compute_api.delete(self.context, inst)
+        mock_invalidate.assert_called_once_with(inst.project_id)
+        mock_cleanup.assert_called_once_with(self.context, inst.uuid)
+
     @mock.patch.object(objects.Instance, 'save',
                        side_effect=test.TestingException)
     @mock.patch.object(objects.BlockDeviceMappingList, 'get_by_instance_uuid',
@@ -6679,11 +6698,25 @@ class _ComputeAPIUnitTestMixIn(object):
                 cell_down_support=False)
             fields = ['metadata', 'info_cache', 'security_groups']
             mock_inst_get.assert_called_once_with(self.context, {}, None, None,
-                fields, None, None, cell_down_support=False)
+                fields, None, None, cell_down_support=False,
+                use_slave=False)
             for i, instance in enumerate(cell_instances):
                 self.assertEqual(instance, insts[i])
             mock_get_ims.assert_not_called()
 
+    @mock.patch.object(objects.BuildRequestList, 'get_by_filters',
+                       return_value=objects.BuildRequestList())
+    @mock.patch('nova.compute.instance_list.get_instance_objects_sorted')
+    def test_get_all_replica_reads(self, mock_inst_get, mock_buildreq_get):
+        self.flags(replica_reads=True, group='database')
+        mock_inst_get.return_value = objects.InstanceList(
+            self.context, objects=[]), []
+        self.compute_api.get_all(self.context)
+        fields = ['metadata', 'info_cache', 'security_groups']
+        mock_inst_get.assert_called_once_with(
+            self.context, {}, None, None, fields, None, None,
+            cell_down_support=False, use_slave=True)
+
     @mock.patch.object(objects.BuildRequestList, 'get_by_filters')
     @mock.patch.object(objects.InstanceMappingList,
                        'get_not_deleted_by_cell_and_project')
@@ -6709,7 +6742,8 @@ class _ComputeAPIUnitTestMixIn(object):
             fields = ['metadata', 'info_cache', 'security_groups']
             mock_inst_get.assert_called_once_with(self.context, {},
                                                   3, None, fields, None, None,
-                                                  cell_down_support=True)
+                                                  cell_down_support=True,
+                                                  use_slave=False)
             for i, instance in enumerate(partial_instances + full_instances):
                 self.assertTrue(obj_base.obj_equal_prims(instance, insts[i]))
             # With an original limit of 3, and 0 build requests but 2 instances
@@ -7055,7 +7089,8 @@ class _ComputeAPIUnitTestMixIn(object):
             fields = ['metadata', 'info_cache', 'security_groups']
             mock_inst_get.assert_called_once_with(
                 self.context, {'foo': 'bar'}, None, None,
-                fields, ['baz'], ['desc'], cell_down_support=False)
+                fields, ['baz'], ['desc'], cell_down_support=False,
+                use_slave=False)
             for i, instance in enumerate(build_req_instances + cell_instances):
                 self.assertEqual(instance, instances[i])
 
@@ -7090,7 +7125,8 @@ class _ComputeAPIUnitTestMixIn(object):
             fields = ['metadata', 'info_cache', 'security_groups']
             mock_inst_get.assert_called_once_with(
                 self.context, {'foo': 'bar'}, None, None,
-                fields, ['baz'], ['desc'], cell_down_support=False)
+                fields, ['baz'], ['desc'], cell_down_support=False,
+                use_slave=False)
             for i, instance in enumerate(build_req_instances + cell_instances):
                 self.assertEqual(instance, instances[i])
 
@@ -7125,7 +7161,8 @@ class _ComputeAPIUnitTestMixIn(object):
             fields = ['metadata', 'info_cache', 'security_groups']
             mock_inst_get.assert_called_once_with(
                 self.context, {'foo': 'bar'}, 8, None,
-                fields, ['baz'], ['desc'], cell_down_support=False)
+                fields, ['baz'], ['desc'], cell_down_support=False,
+                use_slave=False)
             for i, instance in enumerate(build_req_instances + cell_instances):
                 self.assertEqual(instance, instances[i])
 
@@ -7163,7 +7200,8 @@ class _ComputeAPIUnitTestMixIn(object):
             mock_inst_get.assert_called_once_with(
                 mock.ANY, {'foo': 'bar'},
                 8, None,
-                fields, ['baz'], ['desc'], cell_down_support=False)
+                fields, ['baz'], ['desc'], cell_down_support=False,
+                use_slave=False)
             for i, instance in enumerate(build_req_instances +
                                          cell_instances):
                 self.assertEqual(instance, instances[i])
@@ -7986,7 +8024,8 @@ class ComputeAPIUnitTestCase(_ComputeAPIUnitTestMixIn, test.NoDBTestCase):
             fields = ['metadata', 'info_cache', 'security_groups']
             mock_inst_get.assert_called_once_with(
                 self.context, {'ip': 'fake', 'uuid': ['fake_device_id']},
-                None, None, fields, ['baz'], ['desc'], cell_down_support=False)
+                None, None, fields, ['baz'], ['desc'], cell_down_support=False,
+                use_slave=False)
 
     @mock.patch.object(neutron_api.API, 'has_substr_port_filtering_extension')
     @mock.patch.object(neutron_api.API, 'list_ports')
@@ -8014,7 +8053,8 @@ class ComputeAPIUnitTestCase(_ComputeAPIUnitTestMixIn, test.NoDBTestCase):
             fields = ['metadata', 'info_cache', 'security_groups']
             mock_inst_get.assert_called_once_with(
                 self.context, {'ip6': 'fake', 'uuid': ['fake_device_id']},
-                None, None, fields, ['baz'], ['desc'], cell_down_support=False)
+                None, None, fields, ['baz'], ['desc'], cell_down_support=False,
+                use_slave=False)
 
     @mock.patch.object(neutron_api.API, 'has_substr_port_filtering_extension')
     @mock.patch.object(neutron_api.API, 'list_ports')
@@ -8048,7 +8088,8 @@ class ComputeAPIUnitTestCase(_ComputeAPIUnitTestMixIn, test.NoDBTestCase):
             mock_inst_get.assert_called_once_with(
                 self.context, {'ip': 'fake1', 'ip6': 'fake2',
                                'uuid': ['fake_device_id', 'fake_device_id']},
-                None, None, fields, ['baz'], ['desc'], cell_down_support=False)
+                None, None, fields, ['baz'], ['desc'], cell_down_support=False,
+                use_slave=False)
 
     @mock.patch.object(neutron_api.API, 'has_substr_port_filtering_extension')
     @mock.patch.object(neutron_api.API, 'list_ports')
@@ -1656,6 +1656,44 @@ class ComputeVolumeTestCase(BaseTestCase):
             uuids.not_in_nova_bdms)
         self.assertEqual(len(bdms), 1)
 
+    @mock.patch.object(cinder.API, 'attachment_delete')
+    @mock.patch.object(cinder.API, 'attachment_get_all')
+    @mock.patch.object(cinder.API, 'attachment_get')
+    @mock.patch.object(objects.BlockDeviceMapping, 'destroy')
+    def test_dangling_bdms_only_get_missing_attachments(
+            self, mock_destroy, mock_attach_get, mock_all_attachments,
+            mock_attachment_delete):
+        """Only the attachments not listed by cinder are looked up"""
+        instance = self._create_fake_instance_obj()
+        bdms = objects.BlockDeviceMappingList(objects=[
+            objects.BlockDeviceMapping(
+                **fake_block_device.AnonFakeDbBlockDeviceDict(
+                    {
+                        'instance_uuid': instance.uuid,
+                        'volume_id': getattr(uuids, 'fake_vol%d' % i),
+                        'attachment_id': getattr(
+                            uuids, 'fake_attachment_%d' % i),
+                        'source_type': 'volume',
+                        'destination_type': 'volume'}))
+            for i in range(3)
+        ])
+        mock_all_attachments.return_value = [
+            {'id': uuids.fake_attachment_0},
+            {'id': uuids.fake_attachment_1},
+        ]
+        mock_attach_get.side_effect = exception.VolumeAttachmentNotFound(
+            attachment_id=uuids.fake_attachment_2)
+
+        self.compute._delete_dangling_bdms(self.context, instance, bdms)
+
+        mock_attach_get.assert_called_once_with(
+            self.context, uuids.fake_attachment_2)
+        mock_destroy.assert_called_once_with()
+        mock_attachment_delete.assert_not_called()
+        self.assertEqual(
+            [uuids.fake_attachment_0, uuids.fake_attachment_1],
+            [bdm.attachment_id for bdm in bdms])
+
 
 class ComputeTestCase(BaseTestCase,
                       test_diagnostics.DiagnosticsComparisonMixin,
@@ -7578,9 +7616,9 @@ class ComputeTestCase(BaseTestCase,
         mock_get_uuid.assert_has_calls([
             mock.call(ctxt, inst1.uuid, use_slave=True),
             mock.call(ctxt, inst2.uuid, use_slave=True)])
-        mock_get_inst.assert_called_once_with(ctxt,
-                                              {'deleted': True,
-                                               'soft_deleted': False})
+        mock_get_inst.assert_called_once_with(
+            ctxt, {'deleted': True, 'soft_deleted': False},
+            only_fields=['deleted', 'deleted_at', 'host', 'vm_state'])
 
     @mock.patch.object(compute_manager.ComputeManager,
                        '_get_instances_on_driver')
@@ -7593,9 +7631,9 @@ class ComputeTestCase(BaseTestCase,
 
         self.compute._cleanup_running_deleted_instances(ctxt)
 
-        mock_get.assert_called_once_with(ctxt,
-                                              {'deleted': True,
-                                               'soft_deleted': False})
+        mock_get.assert_called_once_with(
+            ctxt, {'deleted': True, 'soft_deleted': False},
+            only_fields=['deleted', 'deleted_at', 'host', 'vm_state'])
         mock_power.assert_has_calls(
                 [mock.call(ctxt, inst1), mock.call(ctxt, inst2)])
 
@@ -7612,9 +7650,9 @@ class ComputeTestCase(BaseTestCase,
 
         self.compute._cleanup_running_deleted_instances(ctxt)
 
-        mock_get.assert_called_once_with(ctxt,
-                                         {'deleted': True,
-                                          'soft_deleted': False})
+        mock_get.assert_called_once_with(
+            ctxt, {'deleted': True, 'soft_deleted': False},
+            only_fields=['deleted', 'deleted_at', 'host', 'vm_state'])
         mock_power.assert_has_calls(
                 [mock.call(ctxt, inst1), mock.call(ctxt, inst2)])
 
@@ -7635,8 +7673,8 @@ class ComputeTestCase(BaseTestCase,
 
         self.assertEqual(val, [instance])
         mock_get.assert_called_once_with(
-            admin_context, {'deleted': True,
-                            'soft_deleted': False})
+            admin_context, {'deleted': True, 'soft_deleted': False},
+            only_fields=['deleted', 'deleted_at', 'host', 'vm_state'])
         mock_is_older.assert_called_once_with(now,
                     CONF.running_deleted_instance_timeout)
 
@@ -7728,7 +7766,8 @@ class ComputeTestCase(BaseTestCase,
                 'require_nw_info': 0, 'setup_network': 0}
 
         def fake_instance_get_all_by_host(context, host,
-                                          columns_to_join, use_slave=False):
+                                          columns_to_join, use_slave=False,
+                                          columns=None):
             call_info['get_all_by_host'] += 1
             self.assertEqual([], columns_to_join)
             return instances[:]
@@ -7877,6 +7916,146 @@ class ComputeTestCase(BaseTestCase,
         self._heal_instance_info_cache(_require_nw_info_update=True,
                                        _task_state_not_none=True)
 
+    @staticmethod
+    def _fake_heal_vif(port_id, fixed_ip, floating_ip=None):
+        fixed = network_model.FixedIP(address=fixed_ip)
+        if floating_ip:
+            fixed.add_floating_ip(
+                network_model.IP(address=floating_ip, type='floating'))
+        subnet = network_model.Subnet(cidr='10.0.0.0/24', ips=[fixed])
+        return network_model.VIF(
+            id=port_id, address='fa:16:3e:00:00:01', type='ovs',
+            network=network_model.Network(id=uuids.network,
+                                          subnets=[subnet]))
+
+    @staticmethod
+    def _fake_heal_port(port_id, instance_uuid, fixed_ip):
+        return {'id': port_id, 'device_id': instance_uuid,
+                'mac_address': 'fa:16:3e:00:00:01',
+                'network_id': uuids.network,
+                'fixed_ips': [{'ip_address': fixed_ip}],
+                'binding:vif_type': 'ovs'}
+
+    def _setup_heal_instance_info_caches(self, mock_get_by_host,
+                                         mock_list_ports, mock_get_fips):
+        ctxt = context.get_admin_context()
+        vifs = {
+            uuids.instance1: [self._fake_heal_vif(uuids.port1, '10.0.0.1')],
+            # The fixed IP of the port changed.
+            uuids.instance2: [self._fake_heal_vif(uuids.port2, '10.0.0.2')],
+            # A floating IP was associated to the port.
+            uuids.instance3: [self._fake_heal_vif(uuids.port3, '10.0.0.3')],
+            # The port was detached.
+            uuids.instance4: [self._fake_heal_vif(uuids.port4, '10.0.0.4')],
+            uuids.instance5: [],
+            # The instance is building and is skipped.
+            uuids.instance6: [],
+        }
+        instances = []
+        for uuid, instance_vifs in vifs.items():
+            instances.append(objects.Instance(
+                uuid=uuid, vm_state=vm_states.ACTIVE, task_state=None,
+                info_cache=objects.InstanceInfoCache(
+                    network_info=network_model.NetworkInfo(instance_vifs))))
+        instances[-1].vm_state = vm_states.BUILDING
+        mock_get_by_host.return_value = instances
+        mock_list_ports.return_value = {'ports': [
+            self._fake_heal_port(uuids.port1, uuids.instance1, '10.0.0.1'),
+            self._fake_heal_port(uuids.port2, uuids.instance2, '10.0.0.12'),
+            self._fake_heal_port(uuids.port3, uuids.instance3, '10.0.0.3'),
+            self._fake_heal_port(uuids.port6, uuids.instance6, '10.0.0.6'),
+        ]}
+        mock_get_fips.return_value = {
+            (uuids.port3, '10.0.0.3'): [
+                {'floating_ip_address': '172.24.4.3'}]}
+        return ctxt, instances
+
+    @mock.patch.object(compute_manager.ComputeManager,
+                       '_refresh_instance_info_cache')
+    @mock.patch('nova.network.neutron.API.get_floating_ips_by_ports')
+    @mock.patch('nova.network.neutron.API.list_ports')
+    @mock.patch.object(objects.InstanceList, 'get_by_host')
+    def test_heal_instance_info_caches(self, mock_get_by_host,
+                                       mock_list_ports, mock_get_fips,
+                                       mock_refresh):
+        self.flags(heal_instance_info_cache_batch_size=3)
+        ctxt, instances = self._setup_heal_instance_info_caches(
+            mock_get_by_host, mock_list_ports, mock_get_fips)
+
+        self.compute._heal_instance_info_cache(ctxt)
+
+        # Only the instances which do not match neutron are refreshed.
+        mock_refresh.assert_has_calls([
+            mock.call(ctxt, instances[1]), mock.call(ctxt, instances[2]),
+            mock.call(ctxt, instances[3])])
+        self.assertEqual(3, mock_refresh.call_count)
+        mock_get_by_host.assert_called_once_with(
+            ctxt, self.compute.host, expected_attrs=['info_cache'],
+            use_slave=True)
+        mock_list_ports.assert_called_once_with(
+            ctxt, **{'binding:host_id': self.compute.host,
+                     'fields': ['id', 'device_id', 'mac_address',
+                                'network_id', 'fixed_ips',
+                                'binding:vif_type']})
+        mock_get_fips.assert_called_once_with(
+            ctxt, [uuids.port1, uuids.port2, uuids.port3, uuids.port6])
+
+        # The instances which still do not match are refreshed first, and
+        # those which are over the batch size are left for the next run.
+        mock_refresh.reset_mock()
+        self.flags(heal_instance_info_cache_batch_size=2)
+        self.compute._heal_instance_info_cache(ctxt)
+        mock_refresh.assert_has_calls([
+            mock.call(ctxt, instances[1]), mock.call(ctxt, instances[2])])
+        self.assertEqual(2, mock_refresh.call_count)
+
+    @mock.patch.object(compute_manager.ComputeManager,
+                       '_refresh_instance_info_cache')
+    @mock.patch('nova.network.neutron.API.get_floating_ips_by_ports')
+    @mock.patch('nova.network.neutron.API.list_ports')
+    @mock.patch.object(objects.InstanceList, 'get_by_host')
+    def test_heal_instance_info_caches_in_turn(self, mock_get_by_host,
+                                               mock_list_ports, mock_get_fips,
+                                               mock_refresh):
+        self.flags(heal_instance_info_cache_batch_size=5)
+        ctxt, instances = self._setup_heal_instance_info_caches(
+            mock_get_by_host, mock_list_ports, mock_get_fips)
+
+        # The rest of the batch is used to refresh the other instances in
+        # turn.
+        self.compute._heal_instance_info_cache(ctxt)
+        mock_refresh.assert_has_calls([
+            mock.call(ctxt, instances[1]), mock.call(ctxt, instances[2]),
+            mock.call(ctxt, instances[3]), mock.call(ctxt, instances[0]),
+            mock.call(ctxt, instances[4])])
+        self.assertEqual(5, mock_refresh.call_count)
+        self.assertEqual([], self.compute._instance_uuids_to_heal)
+
+        # Once all the caches match, the instances are refreshed in turn.
+        mock_refresh.reset_mock()
+        mock_get_by_host.return_value = [instances[0], instances[4]]
+        self.flags(heal_instance_info_cache_batch_size=1)
+        for instance in [instances[0], instances[4], instances[0]]:
+            self.compute._heal_instance_info_cache(ctxt)
+            mock_refresh.assert_called_once_with(ctxt, instance)
+            mock_refresh.reset_mock()
+
+    @mock.patch.object(compute_manager.ComputeManager,
+                       '_heal_instance_info_caches')
+    @mock.patch.object(objects.InstanceList, 'get_by_host',
+                       return_value=objects.InstanceList(objects=[]))
+    def test_heal_instance_info_caches_driver_manages_binding(
+            self, mock_get_by_host, mock_heal_caches):
+        self.flags(heal_instance_info_cache_batch_size=10)
+        ctxt = context.get_admin_context()
+        with mock.patch.object(self.compute.driver,
+                               'manages_network_binding_host_id',
+                               return_value=True):
+            self.compute._heal_instance_info_cache(ctxt)
+        mock_heal_caches.assert_not_called()
+        mock_get_by_host.assert_called_once_with(
+            ctxt, self.compute.host, expected_attrs=[], use_slave=True)
+
     @mock.patch('nova.objects.InstanceList.get_by_filters')
     @mock.patch('nova.compute.api.API.unrescue')
     def test_poll_rescued_instances(self, unrescue, get):
@@ -7949,8 +8128,9 @@ class ComputeTestCase(BaseTestCase,
                    'task_state': [
                        task_states.REBOOTING, task_states.REBOOT_STARTED,
                        task_states.REBOOT_PENDING]}
-        get.assert_called_once_with(ctxt, filters,
-                                    expected_attrs=[], use_slave=True)
+        get.assert_called_once_with(
+            ctxt, filters, expected_attrs=[], use_slave=True,
+            only_fields=['host', 'task_state', 'updated_at', 'vm_state'])
 
     def test_poll_unconfirmed_resizes(self):
         instances = [
@@ -8104,7 +8284,7 @@ class ComputeTestCase(BaseTestCase,
                                             sort_dir,
                                             marker=None,
                                             columns_to_join=[],
-                                            limit=None)
+                                            limit=None, columns=None)
             self.assertThat(conductor_instance_update.mock_calls,
                             testtools_matchers.HasLength(len(old_instances)))
             for inst in old_instances:
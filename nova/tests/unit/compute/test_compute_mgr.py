@@ -4090,7 +4090,8 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase,
                          [x['uuid'] for x in result])
         expected_filters = {'uuid': driver_uuids}
         mock_instance_list.assert_called_with(self.context, expected_filters,
-                                              use_slave=True)
+                                              use_slave=True,
+                                              only_fields=None)
 
     @mock.patch('nova.objects.InstanceList.get_by_filters')
     def test_get_instances_on_driver_empty(self, mock_instance_list):
@@ -4145,7 +4146,8 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase,
                          [x['uuid'] for x in result])
         expected_filters = {'host': self.compute.host}
         mock_instance_list.assert_called_with(self.context, expected_filters,
-                                              use_slave=True)
+                                              use_slave=True,
+                                              only_fields=None)
 
     @mock.patch.object(compute_utils, 'notify_usage_exists')
     @mock.patch.object(objects.TaskLog, 'end_task')
@@ -4188,9 +4190,11 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase,
         ) as mock_sync:
             self.compute._sync_power_states(mock.sentinel.context)
 
-        mock_get.assert_called_with(mock.sentinel.context,
-                                    self.compute.host, expected_attrs=[],
-                                    use_slave=True)
+        mock_get.assert_called_with(
+            mock.sentinel.context, self.compute.host, expected_attrs=[],
+            use_slave=True,
+            only_fields=['host', 'power_state', 'shutdown_terminate',
+                         'task_state', 'vm_state'])
         mock_sync.assert_called_once_with(mock.sentinel.context, instance)
 
     @mock.patch('nova.objects.InstanceList.get_by_host', new=mock.Mock())
@@ -10105,10 +10109,11 @@ class ComputeManagerBuildInstanceTestCase(test.NoDBTestCase):
         mock_prepspawn.assert_called_once_with(self.instance)
         mock_failedspawn.assert_called_once_with(self.instance)
 
-    @mock.patch('nova.virt.block_device.attach_block_devices',
+    @mock.patch('nova.compute.utils.EventReporter')
+    @mock.patch('nova.virt.block_device.create_volumes',
                 side_effect=exception.VolumeNotCreated('oops!'))
-    def test_prep_block_device_maintain_original_error_message(self,
-                                                               mock_attach):
+    def test_prep_block_device_maintain_original_error_message(
+            self, mock_create, mock_event):
         """Tests that when attach_block_devices raises an Exception, the
         re-raised InvalidBDM has the original error message which contains
         the actual details of the failure.
@@ -10127,6 +10132,54 @@ class ComputeManagerBuildInstanceTestCase(test.NoDBTestCase):
                                self.context, self.instance, bdms)
         self.assertEqual('oops!', str(ex))
 
+    @mock.patch('nova.compute.utils.EventReporter')
+    @mock.patch('nova.virt.block_device.attach_block_devices')
+    @mock.patch('nova.virt.block_device.create_volumes')
+    def test_prep_block_device_reports_events(self, mock_create,
+                                              mock_attach, mock_event):
+        bdms = objects.BlockDeviceMappingList(
+            objects=[fake_block_device.fake_bdm_object(
+                self.context,
+                dict(source_type='image',
+                     destination_type='volume',
+                     boot_index=0,
+                     image_id=uuids.image_id,
+                     device_name='/dev/vda',
+                     volume_size=1))])
+
+        block_device_info = self.compute._prep_block_device(
+            self.context, self.instance, bdms)
+
+        mapping = block_device_info['block_device_mapping']
+        self.assertEqual(1, len(mapping))
+        mock_create.assert_called_once_with(
+            mapping, self.context, self.instance, self.compute.volume_api,
+            wait_func=self.compute._await_block_device_map_created)
+        mock_attach.assert_called_once_with(
+            mapping, self.context, self.instance, self.compute.volume_api,
+            self.compute.driver,
+            wait_func=self.compute._await_block_device_map_created)
+        mock_event.assert_has_calls([
+            mock.call(self.context, 'compute_create_volumes',
+                      self.compute.host, self.instance.uuid,
+                      graceful_exit=True),
+            mock.call(self.context, 'compute_attach_volumes',
+                      self.compute.host, self.instance.uuid,
+                      graceful_exit=True)], any_order=True)
+        self.assertEqual(2, mock_event.call_count)
+
+    @mock.patch('nova.compute.utils.EventReporter')
+    @mock.patch('nova.virt.block_device.attach_block_devices')
+    @mock.patch('nova.virt.block_device.create_volumes')
+    def test_prep_block_device_no_volumes(self, mock_create, mock_attach,
+                                          mock_event):
+        self.compute._prep_block_device(
+            self.context, self.instance, objects.BlockDeviceMappingList())
+
+        mock_create.assert_not_called()
+        mock_attach.assert_not_called()
+        mock_event.assert_not_called()
+
     @mock.patch('nova.objects.InstanceGroup.get_by_hint')
     def test_validate_policy_honors_workaround_disabled(self, mock_get):
         instance = objects.Instance(uuid=uuids.instance)
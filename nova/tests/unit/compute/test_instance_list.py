@@ -87,6 +87,20 @@ class TestInstanceList(test.NoDBTestCase):
 
         self.assertEqual(insts_one, insts_two)
 
+    @mock.patch('nova.db.main.api.instance_get_all_by_filters_sort')
+    @mock.patch('nova.db.main.api.get_context_manager')
+    def test_get_by_filters_use_slave(self, mock_get_cm, mock_inst):
+        self.flags(replica_reads=True, group='database')
+        lister = instance_list.InstanceLister(None, None, use_slave=True)
+        lister.get_by_filters(self.context, {}, 10, None,
+                              columns_to_join=[])
+        mock_get_cm.return_value.async_.using.assert_called_once_with(
+            self.context)
+        mock_inst.assert_called_once_with(
+            self.context, {}, limit=10, marker=None,
+            sort_keys=['created_at', 'id', 'uuid'],
+            sort_dirs=['desc', 'desc', 'asc'], columns_to_join=[])
+
     @mock.patch('nova.objects.BuildRequestList.get_by_filters')
     @mock.patch('nova.compute.instance_list.get_instances_sorted')
     @mock.patch('nova.objects.CellMappingList.get_by_project_id')
@@ -101,7 +115,8 @@ class TestInstanceList(test.NoDBTestCase):
                                         None, None,
                                         cell_mappings=mock_cm.return_value,
                                         batch_size=1000,
-                                        cell_down_support=False)
+                                        cell_down_support=False,
+                                        use_slave=False)
 
     @mock.patch('nova.context.CELLS', new=FAKE_CELLS)
     @mock.patch('nova.context.load_cells')
@@ -119,7 +134,8 @@ class TestInstanceList(test.NoDBTestCase):
                                         None, None,
                                         cell_mappings=FAKE_CELLS,
                                         batch_size=100,
-                                        cell_down_support=False)
+                                        cell_down_support=False,
+                                        use_slave=False)
         mock_cm.assert_not_called()
         mock_lc.assert_called_once_with()
 
@@ -139,7 +155,8 @@ class TestInstanceList(test.NoDBTestCase):
                                         None, None,
                                         cell_mappings=FAKE_CELLS,
                                         batch_size=100,
-                                        cell_down_support=False)
+                                        cell_down_support=False,
+                                        use_slave=False)
         mock_lc.assert_called_once_with()
 
     @mock.patch('nova.context.CELLS', new=FAKE_CELLS)
@@ -160,7 +177,8 @@ class TestInstanceList(test.NoDBTestCase):
                                         None, None,
                                         cell_mappings=FAKE_CELLS,
                                         batch_size=100,
-                                        cell_down_support=False)
+                                        cell_down_support=False,
+                                        use_slave=False)
         mock_cm.assert_not_called()
         mock_lc.assert_called_once_with()
 
@@ -227,6 +227,131 @@ class ConductorTestCase(_BaseTestCase, test.TestCase):
         self.assertIn('dict', updates)
         self.assertEqual({'foo': 'bar'}, updates['dict'])
 
+    def test_object_action_unchanged_objects_not_returned(self):
+        @obj_base.NovaObjectRegistry.register
+        class TestObject(obj_base.NovaObject):
+            fields = {'foo': fields.IntegerField(),
+                      'child': fields.ObjectField('TestObject')}
+
+            def reload(self):
+                # Replace the child with an equal but different object, like
+                # a save() refreshing the fields from the database does.
+                self.child = TestObject(foo=self.child.foo)
+                self.foo = 2
+                self.obj_reset_changes(recursive=True)
+
+        obj = TestObject(foo=1, child=TestObject(foo=1))
+        obj.obj_reset_changes(recursive=True)
+        updates, result = self.conductor.object_action(
+            self.context, obj, 'reload', tuple(), {})
+        self.assertEqual({'foo': 2, 'obj_what_changed': set()}, updates)
+
+    def test_object_action_delta(self):
+        @obj_base.NovaObjectRegistry.register
+        class TestObject(obj_base.NovaObject):
+            fields = {'foo': fields.IntegerField(),
+                      'bar': fields.IntegerField(),
+                      'baz': fields.IntegerField(),
+                      'qux': fields.IntegerField()}
+
+            def reload(self):
+                test.assertFalse(self.obj_attr_is_set('bar'))
+                test.assertTrue(self.obj_attr_is_loaded('bar'))
+                test.assertFalse(self.obj_attr_is_loaded('qux'))
+                # Like a save() refreshing the fields from the database, with
+                # baz changed by someone else in the meantime.
+                self.bar = 1
+                self.baz = 2
+                self.qux = 3
+                self.obj_reset_changes()
+
+        test = self
+        obj = TestObject(foo=1)
+        loaded_fields = {'bar': obj_base.obj_field_fingerprint(1),
+                         'baz': obj_base.obj_field_fingerprint(1)}
+        updates, result = self.conductor.object_action(
+            self.context, obj, 'reload', tuple(), {},
+            loaded_fields=loaded_fields)
+        self.assertEqual({'baz': 2, 'qux': 3, 'obj_what_changed': set()},
+                         updates)
+
+    def _test_object_action_instance_save(self, delta):
+        objects.Instance(
+            self.context, uuid=uuids.instance, project_id=self.project_id,
+            user_id=self.user_id, vm_state=vm_states.BUILDING,
+            metadata={'foo': 'bar'}, system_metadata={'foo': 'bar'},
+        ).create()
+        instance = objects.Instance.get_by_uuid(
+            self.context, uuids.instance,
+            expected_attrs=['metadata', 'system_metadata', 'info_cache'])
+        # Someone else changes the metadata in the meantime.
+        main_db_api.instance_metadata_update(
+            self.context, uuids.instance, {'foo': 'baz'}, True)
+        instance.task_state = task_states.SPAWNING
+
+        objinst = instance
+        kwargs = {}
+        if delta:
+            objinst, kwargs['loaded_fields'] = obj_base.obj_to_delta(
+                instance)
+        ser = obj_base.NovaObjectSerializer()
+        primitive = jsonutils.loads(jsonutils.dumps(
+            ser.serialize_entity(self.context, objinst)))
+        updates, result = self.conductor.object_action(
+            self.context, ser.deserialize_entity(self.context, primitive),
+            'save', [], {}, **kwargs)
+
+        instance = objects.Instance.get_by_uuid(
+            self.context, uuids.instance,
+            expected_attrs=['metadata', 'system_metadata'])
+        self.assertEqual(task_states.SPAWNING, instance.task_state)
+        # Only the fields which changed in the database are sent back.
+        self.assertEqual({'metadata', 'obj_what_changed'},
+                         set(updates) - {'updated_at'})
+        self.assertEqual({'foo': 'baz'}, updates['metadata'])
+        return primitive
+
+    def test_object_action_instance_save_delta(self):
+        primitive = self._test_object_action_instance_save(True)
+        # Only the changed fields and the ones save() always needs are sent.
+        self.assertEqual({'task_state', 'uuid'},
+                         set(primitive['nova_object.data']))
+
+    def test_object_action_instance_save_full(self):
+        primitive = self._test_object_action_instance_save(False)
+        self.assertIn('info_cache', primitive['nova_object.data'])
+
+    def test_object_action_instance_save_delta_old_flavor(self):
+        flavor = objects.Flavor.get_by_name(self.context, 'm1.small')
+        objects.Instance(
+            self.context, uuid=uuids.instance, project_id=self.project_id,
+            user_id=self.user_id, vm_state=vm_states.ACTIVE, flavor=flavor,
+            old_flavor=flavor, new_flavor=flavor,
+        ).create()
+        attrs = ['metadata', 'system_metadata', 'flavor']
+        instance = objects.Instance.get_by_uuid(
+            self.context, uuids.instance, expected_attrs=attrs)
+        instance.old_flavor = None
+        instance.new_flavor = None
+
+        delta, loaded_fields = obj_base.obj_to_delta(instance)
+        # The unchanged flavor is sent along with the changed ones, it would
+        # otherwise be lazy-loaded with the old ones by _save_flavor().
+        self.assertIn('flavor', delta)
+        self.assertNotIn('flavor', loaded_fields)
+        ser = obj_base.NovaObjectSerializer()
+        primitive = jsonutils.loads(jsonutils.dumps(
+            ser.serialize_entity(self.context, delta)))
+        self.conductor.object_action(
+            self.context, ser.deserialize_entity(self.context, primitive),
+            'save', [], {}, loaded_fields=loaded_fields)
+
+        instance = objects.Instance.get_by_uuid(
+            self.context, uuids.instance, expected_attrs=attrs)
+        self.assertEqual(flavor.flavorid, instance.flavor.flavorid)
+        self.assertIsNone(instance.old_flavor)
+        self.assertIsNone(instance.new_flavor)
+
     def test_object_class_action_versions(self):
         @obj_base.NovaObjectRegistry.register
         class TestObject(obj_base.NovaObject):
@@ -348,6 +473,56 @@ class ConductorRPCAPITestCase(_BaseTestCase, test.TestCase):
         self.conductor_manager = self.conductor_service.manager
         self.conductor = conductor_rpcapi.ConductorAPI()
 
+    def _test_object_action(self, can_send_version):
+        instance = objects.Instance(self.context, uuid=uuids.instance,
+                                    host='fake-host', task_state=None)
+        instance.obj_reset_changes()
+        instance.task_state = task_states.SPAWNING
+        with test.nested(
+            mock.patch.object(self.conductor.client, 'can_send_version',
+                              return_value=can_send_version),
+            mock.patch.object(self.conductor.client, 'prepare'),
+        ) as (mock_can_send, mock_prepare):
+            mock_prepare.return_value.call.return_value = ({}, None)
+            self.conductor.object_action(
+                self.context, instance, 'save', (), {})
+        mock_can_send.assert_called_once_with('3.1')
+        call = mock_prepare.return_value.call
+        call.assert_called_once_with(
+            self.context, 'object_action', objinst=mock.ANY,
+            objmethod='save', args=(), kwargs={}, **(
+                {'loaded_fields': {'host': mock.ANY}}
+                if can_send_version else {}))
+        return mock_prepare, call.call_args.kwargs['objinst']
+
+    def test_object_action_delta(self):
+        mock_prepare, objinst = self._test_object_action(True)
+        mock_prepare.assert_called_once_with(version='3.1')
+        self.assertEqual({'uuid', 'task_state'},
+                         {f for f in objinst.fields if f in objinst})
+        self.assertEqual({'task_state'}, objinst.obj_what_changed())
+
+    def test_object_action_full(self):
+        mock_prepare, objinst = self._test_object_action(False)
+        mock_prepare.assert_called_once_with(version='3.0')
+        self.assertIn('host', objinst)
+
+    def test_object_action_not_delta_method(self):
+        instance = objects.Instance(self.context, uuid=uuids.instance,
+                                    host='fake-host')
+        with test.nested(
+            mock.patch.object(self.conductor.client, 'can_send_version'),
+            mock.patch.object(self.conductor.client, 'prepare'),
+        ) as (mock_can_send, mock_prepare):
+            mock_prepare.return_value.call.return_value = ({}, None)
+            self.conductor.object_action(
+                self.context, instance, 'refresh', (), {})
+        mock_can_send.assert_not_called()
+        mock_prepare.assert_called_once_with(version='3.0')
+        mock_prepare.return_value.call.assert_called_once_with(
+            self.context, 'object_action', objinst=instance,
+            objmethod='refresh', args=(), kwargs={})
+
 
 class ConductorAPITestCase(_BaseTestCase, test.TestCase):
     """Conductor API Tests."""
@@ -5265,29 +5440,32 @@ class ConductorTaskAPITestCase(_BaseTaskTestCase, test_compute.BaseTestCase):
 
         _test()
 
-    @mock.patch('nova.objects.HostMapping.get_by_host')
+    @mock.patch('nova.objects.HostMappingList.get_by_hosts')
     @mock.patch('nova.context.target_cell')
-    @mock.patch('nova.objects.Service.get_by_compute_host')
-    def test_cache_images_failed_compute(self, mock_service, mock_target,
+    @mock.patch('nova.objects.ServiceList.get_by_binary')
+    def test_cache_images_failed_compute(self, mock_services, mock_target,
                                          mock_gbh):
         """Test the edge cases for cache_images(), specifically the
         error, skip, and down situations.
         """
 
-        fake_service = objects.Service(disabled=False, forced_down=False,
-                                       last_seen_up=timeutils.utcnow())
-        fake_down_service = objects.Service(disabled=False, forced_down=True,
+        fake_down_service = objects.Service(host='host3', disabled=False,
+                                            forced_down=True,
                                             last_seen_up=None)
-        mock_service.side_effect = [fake_service, fake_service,
-                                    fake_down_service]
+        mock_services.return_value = [
+            objects.Service(host=host, disabled=False, forced_down=False,
+                            last_seen_up=timeutils.utcnow())
+            for host in ('host1', 'host2')] + [fake_down_service]
         mock_target.__return_value.__enter__.return_value = self.context
         fake_cell = objects.CellMapping(uuid=uuids.cell,
                                         database_connection='',
                                         transport_url='')
-        fake_mapping = objects.HostMapping(cell_mapping=fake_cell)
-        mock_gbh.return_value = fake_mapping
+        mock_gbh.return_value = [
+            objects.HostMapping(host=host, cell_mapping=fake_cell)
+            for host in ('host1', 'host2', 'host3')]
         fake_agg = objects.Aggregate(name='agg', uuid=uuids.agg, id=1,
-                                     hosts=['host1', 'host2', 'host3'])
+                                     hosts=['host1', 'host2', 'host3',
+                                            'host4'])
 
         @mock.patch.object(self.conductor_manager.compute_rpcapi,
                            'cache_images')
@@ -5302,13 +5480,98 @@ class ConductorTaskAPITestCase(_BaseTaskTestCase, test_compute.BaseTestCase):
 
         _test()
 
+        mock_gbh.assert_called_once_with(self.context, fake_agg.hosts)
+        mock_services.assert_called_once_with(
+            mock.ANY, 'nova-compute', include_disabled=True)
         logtext = self.stdlog.logger.output
         self.assertIn(
-            '0 cached, 0 existing, 1 errors, 1 unsupported, 1 skipped',
+            '0 cached, 0 existing, 1 errors, 1 unsupported, 2 skipped',
             logtext)
         self.assertIn('host3\' because it is not up', logtext)
+        self.assertIn('host4\' because it is not mapped to a cell', logtext)
         self.assertIn('image1 failed 1 times', logtext)
 
+    @mock.patch('nova.objects.HostMappingList.get_by_hosts')
+    @mock.patch('nova.context.target_cell')
+    @mock.patch('nova.objects.ServiceList.get_by_binary')
+    def test_cache_images_enabled_hosts_first(self, mock_services,
+                                              mock_target, mock_gbh):
+        mock_services.return_value = [
+            objects.Service(host='host1', disabled=True, forced_down=False,
+                            last_seen_up=timeutils.utcnow()),
+            objects.Service(host='host2', disabled=False, forced_down=False,
+                            last_seen_up=timeutils.utcnow()),
+        ]
+        fake_cell = objects.CellMapping(uuid=uuids.cell,
+                                        database_connection='',
+                                        transport_url='')
+        mock_gbh.return_value = [
+            objects.HostMapping(host=host, cell_mapping=fake_cell)
+            for host in ('host1', 'host2')]
+        fake_agg = objects.Aggregate(name='agg', uuid=uuids.agg, id=1,
+                                     hosts=['host1', 'host2'])
+
+        with mock.patch.object(self.conductor_manager.compute_rpcapi,
+                               'cache_images',
+                               return_value={'image1': 'cached'}) as mock_c:
+            self.conductor_manager.cache_images(self.context, fake_agg,
+                                                ['image1'])
+
+        self.assertEqual(['host2', 'host1'],
+                         [c.kwargs['host'] for c in mock_c.call_args_list])
+
+
+class PrecacheThrottleTestCase(test.NoDBTestCase):
+    def test_not_adaptive(self):
+        throttle = conductor_manager.PrecacheThrottle(4, adaptive=False)
+        self.assertEqual(4, throttle.limit)
+        throttle.host_completed(10, True)
+        self.assertEqual(4, throttle.limit)
+
+    def test_additive_increase(self):
+        throttle = conductor_manager.PrecacheThrottle(3)
+        self.assertEqual(1, throttle.limit)
+        for expected in (2, 3, 3):
+            throttle.host_completed(1, False)
+            self.assertEqual(expected, throttle.limit)
+
+    def test_decrease_on_error(self):
+        throttle = conductor_manager.PrecacheThrottle(8)
+        throttle.limit = 8
+        throttle.host_completed(1, True)
+        self.assertEqual(4, throttle.limit)
+        throttle.limit = 1
+        throttle.host_completed(1, True)
+        self.assertEqual(1, throttle.limit)
+
+    def test_decrease_on_slow_host(self):
+        throttle = conductor_manager.PrecacheThrottle(8)
+        throttle.limit = 6
+        throttle.host_completed(1, False)
+        self.assertEqual(7, throttle.limit)
+        throttle.host_completed(2, False)
+        self.assertEqual(8, throttle.limit)
+        throttle.host_completed(5, False)
+        self.assertEqual(4, throttle.limit)
+
+    def test_not_slow_after_fast_host(self):
+        throttle = conductor_manager.PrecacheThrottle(8)
+        for duration in (10, 10, 0.1, 15, 12):
+            throttle.host_completed(duration, False)
+        # A single fast host does not make the others look slow.
+        self.assertEqual(6, throttle.limit)
+
+    def test_hosts_without_download_ignored(self):
+        throttle = conductor_manager.PrecacheThrottle(8)
+        throttle.host_completed(0.01, False, downloaded=False)
+        self.assertEqual(1, throttle.limit)
+        self.assertEqual([], throttle.durations)
+        throttle.host_completed(10, False)
+        self.assertEqual(2, throttle.limit)
+        # Errors still decrease the limit.
+        throttle.host_completed(0.01, True, downloaded=False)
+        self.assertEqual(1, throttle.limit)
+
 
 @ddt.ddt
 class TestConductorTaskManager(test.NoDBTestCase):
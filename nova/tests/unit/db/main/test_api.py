@@ -16,6 +16,7 @@
 
 """Unit tests for the DB API."""
 
+import collections
 import copy
 import datetime
 from unittest import mock
@@ -298,6 +299,112 @@ class DecoratorTestCase(test.TestCase):
         self._test_pick_context_manager_disable_db_access(func)
 
 
+@mock.patch.object(db, 'READ_ROUTING_COUNTS', new_callable=collections.Counter)
+class ReadRoutingTestCase(test.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.flags(replica_reads=True, group='database')
+        self.ctxt = context.get_admin_context()
+
+        @db.select_db_reader_mode
+        def read(context, use_slave=False):
+            pass
+
+        @db.pick_context_manager_writer
+        def write(context):
+            pass
+
+        self.read = read
+        self.write = write
+
+    @mock.patch.object(db, 'get_context_manager')
+    def _test_read(self, expect_replica, mock_get_cm, ctxt=None,
+                   use_slave=True):
+        ctxt = ctxt or self.ctxt
+        ctxt_mgr = mock_get_cm.return_value
+        self.read(ctxt, use_slave=use_slave)
+        if expect_replica:
+            ctxt_mgr.async_.using.assert_called_once_with(ctxt)
+            ctxt_mgr.reader.using.assert_not_called()
+        else:
+            ctxt_mgr.reader.using.assert_called_once_with(ctxt)
+            ctxt_mgr.async_.using.assert_not_called()
+
+    def test_disabled(self, mock_counts):
+        self.flags(replica_reads=False, group='database')
+        self.write(self.ctxt)
+        self.assertIsNone(self.ctxt.db_write_time)
+        self._test_read(True)
+        self._test_read(False, use_slave=False)
+        self.assertEqual({}, mock_counts)
+
+    def test_replica(self, mock_counts):
+        self._test_read(True)
+        # Only the reads asking for the replica database are routed.
+        self._test_read(False, use_slave=False)
+        self.assertEqual({'replica': 1}, mock_counts)
+
+    def test_allow_async_not_routed(self, mock_counts):
+        @db.pick_context_manager_reader_allow_async
+        def read(context):
+            pass
+
+        with mock.patch.object(db, 'get_context_manager') as mock_get_cm:
+            read(self.ctxt)
+        ctxt_mgr = mock_get_cm.return_value
+        ctxt_mgr.reader.allow_async.using.assert_called_once_with(self.ctxt)
+        ctxt_mgr.async_.using.assert_not_called()
+        self.assertEqual({}, mock_counts)
+
+    def test_primary_after_write(self, mock_counts):
+        self.write(self.ctxt)
+        self.assertIsNotNone(self.ctxt.db_write_time)
+        self._test_read(False)
+        # Other requests are not affected by the write.
+        self._test_read(True, ctxt=context.get_admin_context())
+        self.assertEqual({'primary': 1, 'replica': 1}, mock_counts)
+
+    def test_primary_after_write_other_service(self, mock_counts):
+        # The write is seen by the other services handling the request, which
+        # get the context over RPC.
+        self.write(self.ctxt)
+        ctxt = context.RequestContext.from_dict(self.ctxt.to_dict())
+        self._test_read(False, ctxt=ctxt)
+
+    @mock.patch('time.time')
+    def test_replica_after_max_lag(self, mock_time, mock_counts):
+        self.flags(replica_max_lag=5, group='database')
+        mock_time.return_value = 100
+        self.write(self.ctxt)
+        mock_time.return_value = 104
+        self._test_read(False)
+        mock_time.return_value = 105
+        self._test_read(True)
+
+    def test_primary_in_transaction(self, mock_counts):
+        @db.select_db_reader_mode
+        def read(context, use_slave=False):
+            return context.session
+
+        ctxt_mgr = db.get_context_manager(self.ctxt)
+        with ctxt_mgr.reader.using(self.ctxt) as session:
+            # This would raise TypeError if the read tried to switch to the
+            # async reader within the transaction.
+            self.assertIs(session, read(self.ctxt, use_slave=True))
+        self.assertEqual({'primary': 1}, mock_counts)
+        self.assertIsNotNone(read(self.ctxt, use_slave=True))
+        self.assertEqual({'primary': 1, 'replica': 1}, mock_counts)
+
+    def test_read_routing_report(self, mock_counts):
+        self.write(self.ctxt)
+        self._test_read(False)
+        self._test_read(True, ctxt=context.get_admin_context())
+        self.assertEqual(
+            {'primary_reads': 1, 'replica_reads': 1},
+            dict(db.read_routing_report().data))
+
+
 def _get_fake_aggr_values():
     return {'name': 'fake_aggregate'}
 
@@ -747,6 +854,43 @@ class SqlAlchemyDbApiNoDbTestCase(test.NoDBTestCase):
         mock_get.assert_called_once_with(mock.sentinel.elevated, 'foo')
         ctxt.elevated.assert_called_once_with(read_deleted='yes')
 
+    @mock.patch.object(enginefacade._TransactionContextManager, 'configure')
+    def test_create_context_manager_slave_connection(self, mock_configure):
+        self.flags(replica_reads=True, group='database')
+        self.flags(connection='mysql+pymysql://cell1', group='database')
+        self.flags(slave_connection='mysql+pymysql://cell1-replica',
+                   group='database')
+
+        db.create_context_manager('mysql+pymysql://cell1')
+        kwargs = mock_configure.call_args.kwargs
+        self.assertEqual('mysql+pymysql://cell1-replica',
+                         kwargs['slave_connection'])
+
+        db.create_context_manager('mysql+pymysql://cell2')
+        kwargs = mock_configure.call_args.kwargs
+        self.assertEqual('mysql+pymysql://cell2', kwargs['connection'])
+        self.assertNotIn('slave_connection', kwargs)
+
+        # Equivalent connection strings use the replica.
+        self.flags(connection='mysql+pymysql://cell1?a=1&b=2',
+                   group='database')
+        db.create_context_manager('mysql+pymysql://cell1?b=2&a=1')
+        kwargs = mock_configure.call_args.kwargs
+        self.assertEqual('mysql+pymysql://cell1-replica',
+                         kwargs['slave_connection'])
+
+    @mock.patch.object(enginefacade._TransactionContextManager, 'configure')
+    def test_create_context_manager_slave_connection_replica_reads_disabled(
+            self, mock_configure):
+        self.flags(connection='mysql+pymysql://cell1', group='database')
+        self.flags(slave_connection='mysql+pymysql://cell1-replica',
+                   group='database')
+
+        db.create_context_manager('mysql+pymysql://cell2')
+        kwargs = mock_configure.call_args.kwargs
+        self.assertEqual('mysql+pymysql://cell1-replica',
+                         kwargs['slave_connection'])
+
 
 class SqlAlchemyDbApiTestCase(DbTestCase):
     def test_instance_get_all_by_host(self):
@@ -787,6 +931,20 @@ class SqlAlchemyDbApiTestCase(DbTestCase):
         self.assertNotIn('info_cache', instance)
         self.assertNotIn('security_groups', instance)
 
+    def test_instance_get_all_by_host_columns(self):
+        self.create_instance_with_args(vm_state=vm_states.ACTIVE)
+
+        result = db.instance_get_all_by_host(
+            context.get_admin_context(), 'host1', columns_to_join=[],
+            columns=['vm_state'])
+
+        self.assertEqual(1, len(result))
+        instance = result[0]
+        self.assertEqual(vm_states.ACTIVE, instance['vm_state'])
+        self.assertIn('id', instance)
+        self.assertIn('uuid', instance)
+        self.assertNotIn('hostname', instance)
+
     def test_instance_get_all_uuids_by_hosts(self):
         ctxt = context.get_admin_context()
         self.create_instance_with_args()
@@ -929,7 +1087,7 @@ class SqlAlchemyDbApiTestCase(DbTestCase):
             columns_to_join='columns')
         mock_get_all_filters_sort.assert_called_once_with(ctxt, {'foo': 'bar'},
             limit=100, marker='uuid', columns_to_join='columns',
-            sort_keys=['sort_key'], sort_dirs=['sort_dir'])
+            sort_keys=['sort_key'], sort_dirs=['sort_dir'], columns=None)
 
     def test_instance_get_all_by_filters_sort_key_invalid(self):
         '''InvalidSortKey raised if an invalid key is given.'''
@@ -1704,6 +1862,18 @@ class InstanceTestCase(test.TestCase, ModelsObjectComparatorMixin):
         filtered_instances = db.instance_get_all_by_filters(self.ctxt, {})
         self._assertEqualListsOfInstances(instances, filtered_instances)
 
+    def test_instance_get_all_by_filters_columns(self):
+        instance = self.create_instance_with_args()
+
+        result = db.instance_get_all_by_filters(
+            self.ctxt, {}, columns_to_join=[], columns=['host'])
+
+        self.assertEqual(1, len(result))
+        self.assertEqual(
+            {'id', 'uuid', 'host', 'metadata', 'system_metadata', 'fault'},
+            set(result[0]))
+        self.assertEqual(instance['host'], result[0]['host'])
+
     def test_instance_get_all_by_filters_zero_limit(self):
         self.create_instance_with_args()
         instances = db.instance_get_all_by_filters(self.ctxt, {}, limit=0)
@@ -2947,6 +3117,27 @@ class ServiceTestCase(test.TestCase, ModelsObjectComparatorMixin):
         updated_service = db.service_get(self.ctxt, service['id'])
         self.assertFalse(updated_service['forced_down'])
 
+    def test_service_heartbeat(self):
+        service1 = self._create_service({'report_count': 3})
+        service2 = self._create_service({'host': 'fake_host2',
+                                         'report_count': 5})
+        service3 = self._create_service({'host': 'fake_host3'})
+        now = timeutils.utcnow().replace(microsecond=0)
+        self.useFixture(utils_fixture.TimeFixture(now))
+
+        updated = db.service_heartbeat(
+            self.ctxt, [service1['id'], service2['id']])
+
+        self.assertEqual(2, updated)
+        service1 = db.service_get(self.ctxt, service1['id'])
+        service2 = db.service_get(self.ctxt, service2['id'])
+        service3 = db.service_get(self.ctxt, service3['id'])
+        self.assertEqual(4, service1['report_count'])
+        self.assertEqual(6, service2['report_count'])
+        self.assertEqual(now, service1['last_seen_up'])
+        self.assertEqual(now, service2['last_seen_up'])
+        self.assertIsNone(service3['last_seen_up'])
+
     def test_service_get(self):
         service1 = self._create_service({})
         self._create_service({'host': 'some_other_fake_host'})
@@ -6537,6 +6728,93 @@ class ArchiveTestCase(test.TestCase, ModelsObjectComparatorMixin):
             rows = conn.execute(qstl).fetchall()
             self.assertEqual(len(rows), 6)
 
+    def _add_shadow_task_logs(self, count):
+        for i in range(1, count + 1):
+            ins_stmt = self.shadow_task_log.insert().values(
+                id=i, task_name='instance_usage_audit', state='DONE',
+                host='host', message='message',
+                period_beginning=timeutils.parse_strtime(
+                    '2016-12-01T00:00:00.0'),
+                period_ending=timeutils.parse_strtime('2017-01-01T00:00:00.0'),
+                updated_at=timeutils.parse_strtime('2017-01-01T00:00:00.0'))
+            with self.engine.connect() as conn, conn.begin():
+                conn.execute(ins_stmt)
+
+    def _get_shadow_task_log_ids(self):
+        with self.engine.connect() as conn, conn.begin():
+            return [row.id for row in conn.execute(
+                sql.select(self.shadow_task_log.c.id).order_by(
+                    self.shadow_task_log.c.id))]
+
+    @mock.patch('time.sleep')
+    def test_purge_shadow_tables_batched(self, mock_sleep):
+        self._add_shadow_task_logs(5)
+        status = mock.Mock()
+
+        deleted = db.purge_shadow_tables(
+            None, None, status_fn=status, batch_size=2, sleep=1)
+
+        self.assertEqual(5, deleted)
+        self.assertEqual([], self._get_shadow_task_log_ids())
+        status.assert_has_calls([
+            mock.call('Deleted 2 rows from shadow_task_log so far'),
+            mock.call('Deleted 4 rows from shadow_task_log so far'),
+            mock.call('Deleted 5 rows from shadow_task_log so far'),
+        ])
+        # We only sleep between full batches.
+        self.assertEqual(2, mock_sleep.call_args_list.count(mock.call(1)))
+
+    def test_purge_shadow_tables_max_rows(self):
+        self._add_shadow_task_logs(5)
+
+        deleted = db.purge_shadow_tables(None, None, max_rows=3,
+                                         batch_size=2)
+
+        self.assertEqual(3, deleted)
+        self.assertEqual([4, 5], self._get_shadow_task_log_ids())
+
+        # Purging again resumes with the remaining rows.
+        deleted = db.purge_shadow_tables(None, None, max_rows=3)
+
+        self.assertEqual(2, deleted)
+        self.assertEqual([], self._get_shadow_task_log_ids())
+
+    def test_purge_shadow_tables_batched_before(self):
+        self._add_shadow_task_logs(4)
+        update_statement = self.shadow_task_log.update().where(
+            self.shadow_task_log.c.id.in_([1, 3])
+        ).values(updated_at=timeutils.utcnow())
+        with self.engine.connect() as conn, conn.begin():
+            conn.execute(update_statement)
+
+        before_date = dateutil_parser.parse('2017-01-02', fuzzy=True)
+        deleted = db.purge_shadow_tables(None, before_date, batch_size=1)
+
+        self.assertEqual(2, deleted)
+        self.assertEqual([1, 3], self._get_shadow_task_log_ids())
+
+    def test_purge_shadow_table_composite_primary_key(self):
+        table = sa.Table(
+            'shadow_composite', sa.MetaData(),
+            sa.Column('a', sa.Integer, primary_key=True),
+            sa.Column('b', sa.Integer, primary_key=True))
+        with self.engine.connect() as conn:
+            with conn.begin():
+                table.create(conn)
+                conn.execute(table.insert(), [
+                    {'a': a, 'b': b} for a in range(2) for b in range(3)])
+            status = mock.Mock()
+
+            deleted = db._purge_shadow_table(
+                conn, table, None, None, status, max_rows=5, batch_size=2)
+
+            self.assertEqual(5, deleted)
+            self.assertEqual(3, status.call_count)
+            with conn.begin():
+                self.assertEqual(
+                    [(1, 2)], [tuple(row) for row in conn.execute(
+                        sa.select(table.c.a, table.c.b))])
+
 
 class PciDeviceDBApiTestCase(test.TestCase, ModelsObjectComparatorMixin):
     def setUp(self):
@@ -16,6 +16,7 @@
 
 import collections
 import copy
+import threading
 from unittest import mock
 
 from keystoneauth1.fixture import V2Token
@@ -838,32 +839,26 @@ class TestAPI(TestAPIBase):
         nets = number == 1 and self.nets1 or self.nets2
         mocked_client.list_networks.return_value = {'networks': nets}
 
-        list_subnets_values = []
-        expected_list_subnets_calls = []
-        list_floatingips_values = []
-        expected_list_floatingips_calls = []
+        # The floating IPs, subnets and DHCP ports of all the ports are
+        # listed at once.
+        float_data = number == 1 and self.float_data1 or self.float_data2
+        mocked_client.list_floatingips.return_value = {
+            'floatingips': float_data}
+        expected_list_floatingips_calls = [
+            mock.call(port_id=sorted(port['id'] for port in port_data))]
 
-        for i in range(1, number + 1):
-            float_data = number == 1 and self.float_data1 or self.float_data2
-            for ip in port_data[i - 1]['fixed_ips']:
-                float_data = [x for x in float_data
-                              if x['fixed_ip_address'] == ip['ip_address']]
-                list_floatingips_values.append({'floatingips': float_data})
-                expected_list_floatingips_calls.append(
-                    mock.call(fixed_ip_address=ip['ip_address'],
-                              port_id=port_data[i - 1]['id']))
-            subnet_data = i == 1 and self.subnet_data1 or self.subnet_data2
-            list_subnets_values.append({'subnets': subnet_data})
-            expected_list_subnets_calls.append(
-                mock.call(id=['my_subid%s' % i]))
-            list_ports_values.append({'ports': []})
-            expected_list_ports_calls.append(mock.call(
-                network_id=subnet_data[0]['network_id'],
-                device_owner='network:dhcp'))
+        subnet_data = self.subnet_data1
+        if number == 2:
+            subnet_data = subnet_data + self.subnet_data2
+        mocked_client.list_subnets.return_value = {'subnets': subnet_data}
+        expected_list_subnets_calls = [
+            mock.call(id=['my_subid%s' % i for i in range(1, number + 1)])]
+        list_ports_values.append({'ports': []})
+        expected_list_ports_calls.append(mock.call(
+            network_id=sorted(subnet['network_id'] for subnet in subnet_data),
+            device_owner='network:dhcp'))
 
         mocked_client.list_ports.side_effect = list_ports_values
-        mocked_client.list_subnets.side_effect = list_subnets_values
-        mocked_client.list_floatingips.side_effect = list_floatingips_values
 
         self.instance['info_cache'] = self._fake_instance_info_cache(
             net_info_cache, self.instance['uuid'])
@@ -1069,33 +1064,31 @@ class TestAPI(TestAPIBase):
             current_neutron_port_map[current_neutron_port['id']] = (
                 current_neutron_port)
 
-        list_floatingips_values = []
         expected_list_floatingips_calls = []
-        list_subnets_values = []
         expected_list_subnets_calls = []
 
-        for port_id in port_ids:
-            current_neutron_port = current_neutron_port_map.get(port_id)
-            if current_neutron_port:
-                for ip in current_neutron_port['fixed_ips']:
-                    list_floatingips_values.append(
-                        {'floatingips': [self.float_data2[index]]})
-                    expected_list_floatingips_calls.append(
-                        mock.call(fixed_ip_address=ip['ip_address'],
-                                  port_id=current_neutron_port['id']))
-                    list_subnets_values.append(
-                        {'subnets': [self.subnet_data_n[index]]})
-                    expected_list_subnets_calls.append(
-                        mock.call(id=[ip['subnet_id']]))
-                    list_ports_values.append({'ports': self.dhcp_port_data1})
-                    expected_list_ports_calls.append(
-                        mock.call(
-                            network_id=current_neutron_port['network_id'],
-                            device_owner='network:dhcp'))
-                    index += 1
-
-        mocked_client.list_floatingips.side_effect = list_floatingips_values
-        mocked_client.list_subnets.side_effect = list_subnets_values
+        # The floating IPs, subnets and DHCP ports of all the ports are
+        # listed at once.
+        ports = [current_neutron_port_map[port_id] for port_id in port_ids
+                 if port_id in current_neutron_port_map]
+        index = len(ports)
+        if ports:
+            mocked_client.list_floatingips.return_value = {
+                'floatingips': self.float_data2[:index]}
+            expected_list_floatingips_calls.append(
+                mock.call(port_id=sorted(port['id'] for port in ports)))
+            mocked_client.list_subnets.return_value = {
+                'subnets': self.subnet_data_n[:index]}
+            expected_list_subnets_calls.append(mock.call(
+                id=sorted({ip['subnet_id']
+                           for port in ports for ip in port['fixed_ips']})))
+            list_ports_values.append({'ports': self.dhcp_port_data1})
+            expected_list_ports_calls.append(mock.call(
+                network_id=sorted(
+                    subnet['network_id']
+                    for subnet in self.subnet_data_n[:index]),
+                device_owner='network:dhcp'))
+
         mocked_client.list_ports.side_effect = list_ports_values
 
         self.instance['info_cache'] = self._fake_instance_info_cache(
@@ -1172,8 +1165,7 @@ class TestAPI(TestAPIBase):
         self.assertEqual('my_mac%s' % id_suffix, nw_inf[0]['address'])
         self.assertEqual(0, len(nw_inf[0]['network']['subnets']))
 
-        mock_get_client.assert_has_calls([mock.call(mock.ANY, admin=True)] * 2,
-                                         any_order=True)
+        mock_get_client.assert_called_once_with(mock.ANY, admin=True)
         mock_cache_update.assert_called_once_with(
             mock.ANY, self.instance['uuid'], mock.ANY)
         mock_cache_get.assert_called_once_with(mock.ANY, self.instance['uuid'])
@@ -1720,20 +1712,17 @@ class TestAPI(TestAPIBase):
         net_ids = [port['network_id'] for port in port_data]
         mocked_client.list_networks.return_value = {'networks': nets}
 
-        list_floatingips_values = []
         expected_list_floatingips_calls = []
         float_data = number == 1 and self.float_data1 or self.float_data2
-        for data in port_data[1:]:
-            for ip in data['fixed_ips']:
-                list_floatingips_values.append({'floatingips': float_data[1:]})
-                expected_list_floatingips_calls.append(
-                    mock.call(fixed_ip_address=ip['ip_address'],
-                              port_id=data['id']))
-        mocked_client.list_floatingips.side_effect = list_floatingips_values
+        mocked_client.list_floatingips.return_value = {
+            'floatingips': float_data[1:]}
+        if port_data[1:]:
+            expected_list_floatingips_calls.append(
+                mock.call(port_id=[port['id'] for port in port_data[1:]]))
 
         mocked_client.list_subnets.return_value = {}
         expected_list_subnets_calls = []
-        for port in port_data[1:]:
+        if port_data[1:]:
             expected_list_subnets_calls.append(mock.call(id=['my_subid2']))
 
         mock_cache_get.return_value = self.instance['info_cache']
@@ -1748,14 +1737,14 @@ class TestAPI(TestAPIBase):
         mocked_client.delete_port.assert_called_once_with(port_data[0]['id'])
         mocked_client.show_port.assert_called_once_with(port_data[0]['id'])
         expected_get_client_calls = [
+            mock.call(self.context),
             mock.call(self.context, admin=True),
             mock.call(self.context, admin=True),
         ]
-        if number == 2:
-            expected_get_client_calls.append(mock.call(self.context,
-                                                       admin=True))
         mock_get_client.assert_has_calls(expected_get_client_calls,
                                          any_order=True)
+        self.assertEqual(len(expected_get_client_calls),
+                         mock_get_client.call_count)
         mocked_client.list_ports.assert_called_once_with(
             tenant_id=self.instance['project_id'],
             device_id=self.instance['uuid'])
@@ -2912,33 +2901,82 @@ class TestAPI(TestAPIBase):
         mocked_client = mock.create_autospec(client.Client)
         mocked_client.list_floatingips.side_effect = exceptions.NotFound
 
-        floatingips = self.api._get_floating_ips_by_fixed_and_port(
-            mocked_client, '1.1.1.1', 1)
+        floatingips = self.api._get_floating_ips_by_ports(
+            mocked_client, ['port-id'])
+
+        self.assertEqual({}, floatingips)
+        mocked_client.list_floatingips.assert_called_once_with(
+            port_id=['port-id'])
+
+    def test_get_floating_ips_by_ports(self):
+        mocked_client = mock.create_autospec(client.Client)
+        fip1 = {'port_id': 'port-id1', 'fixed_ip_address': '1.1.1.1',
+                'floating_ip_address': '10.0.0.1'}
+        fip2 = {'port_id': 'port-id1', 'fixed_ip_address': '1.1.1.1',
+                'floating_ip_address': '10.0.0.2'}
+        fip3 = {'port_id': 'port-id2', 'fixed_ip_address': '1.1.1.2',
+                'floating_ip_address': '10.0.0.3'}
+        mocked_client.list_floatingips.return_value = {
+            'floatingips': [fip1, fip2, fip3]}
+
+        floatingips = self.api._get_floating_ips_by_ports(
+            mocked_client, ['port-id2', 'port-id1'])
 
-        self.assertEqual([], floatingips)
+        self.assertEqual({('port-id1', '1.1.1.1'): [fip1, fip2],
+                          ('port-id2', '1.1.1.2'): [fip3]}, floatingips)
         mocked_client.list_floatingips.assert_called_once_with(
-            fixed_ip_address='1.1.1.1', port_id=1)
+            port_id=['port-id1', 'port-id2'])
+
+    @mock.patch.object(neutronapi, 'MAX_PORT_IDS_PER_REQUEST', 2)
+    @mock.patch.object(neutronapi, 'get_client')
+    def test_get_floating_ips_by_ports_public(self, mock_get_client):
+        mocked_client = mock_get_client.return_value
+        fip1 = {'port_id': 'port-id1', 'fixed_ip_address': '1.1.1.1',
+                'floating_ip_address': '10.0.0.1'}
+        fip3 = {'port_id': 'port-id3', 'fixed_ip_address': '1.1.1.3',
+                'floating_ip_address': '10.0.0.3'}
+        mocked_client.list_floatingips.side_effect = [
+            {'floatingips': [fip1]}, {'floatingips': [fip3]}]
+
+        floatingips = self.api.get_floating_ips_by_ports(
+            self.context, ['port-id3', 'port-id2', 'port-id1'])
+
+        self.assertEqual({('port-id1', '1.1.1.1'): [fip1],
+                          ('port-id3', '1.1.1.3'): [fip3]}, floatingips)
+        mock_get_client.assert_called_once_with(self.context, admin=True)
+        # The port IDs are split in chunks.
+        mocked_client.list_floatingips.assert_has_calls([
+            mock.call(port_id=['port-id1', 'port-id2']),
+            mock.call(port_id=['port-id3'])])
 
-    @mock.patch.object(neutronapi.API, '_get_floating_ips_by_fixed_and_port')
-    def test_nw_info_get_ips(self, mock_get_floating):
+    def test_get_floating_ips_by_ports_no_ports(self):
         mocked_client = mock.create_autospec(client.Client)
+        self.assertEqual(
+            {}, self.api._get_floating_ips_by_ports(mocked_client, []))
+        mocked_client.list_floatingips.assert_not_called()
+
+    def test_nw_info_get_ips(self):
         fake_port = {
             'fixed_ips': [
-                {'ip_address': '1.1.1.1'}],
+                {'ip_address': '1.1.1.1'},
+                {'ip_address': '1.1.1.2'}],
             'id': 'port-id',
             }
-        mock_get_floating.return_value = [{'floating_ip_address': '10.0.0.1'}]
+        floating_ips = {
+            ('port-id', '1.1.1.1'): [{'floating_ip_address': '10.0.0.1'}],
+            ('other-port-id', '1.1.1.2'): [
+                {'floating_ip_address': '10.0.0.2'}],
+        }
 
-        result = self.api._nw_info_get_ips(mocked_client, fake_port)
+        result = self.api._nw_info_get_ips(fake_port, floating_ips)
 
-        self.assertEqual(1, len(result))
+        self.assertEqual(2, len(result))
         self.assertEqual('1.1.1.1', result[0]['address'])
         self.assertEqual('10.0.0.1', result[0]['floating_ips'][0]['address'])
-        mock_get_floating.assert_called_once_with(mocked_client, '1.1.1.1',
-                                                  'port-id')
+        self.assertEqual('1.1.1.2', result[1]['address'])
+        self.assertEqual([], result[1]['floating_ips'])
 
-    @mock.patch.object(neutronapi.API, '_get_subnets_from_port')
-    def test_nw_info_get_subnets(self, mock_get_subnets):
+    def test_nw_info_get_subnets(self):
         fake_port = {
             'fixed_ips': [
                 {'ip_address': '1.1.1.1'},
@@ -2947,23 +2985,14 @@ class TestAPI(TestAPIBase):
             }
         fake_subnet = model.Subnet(cidr='1.0.0.0/8')
         fake_ips = [model.IP(x['ip_address']) for x in fake_port['fixed_ips']]
-        mock_get_subnets.return_value = [fake_subnet]
 
-        subnets = self.api._nw_info_get_subnets(self.context, fake_port,
-                                                fake_ips)
+        subnets = self.api._nw_info_get_subnets(fake_ips, [fake_subnet])
 
         self.assertEqual(1, len(subnets))
         self.assertEqual(1, len(subnets[0]['ips']))
         self.assertEqual('1.1.1.1', subnets[0]['ips'][0]['address'])
-        mock_get_subnets.assert_called_once_with(self.context, fake_port, None)
 
-    @mock.patch.object(neutronapi.API, '_get_physnet_tunneled_info',
-                       return_value=(None, False))
-    @mock.patch.object(neutronapi, 'get_client')
-    def _test_nw_info_build_network(self, vif_type, mock_get_client,
-                                    mock_get_physnet):
-        mocked_client = mock.create_autospec(client.Client)
-        mock_get_client.return_value = mocked_client
+    def _test_nw_info_build_network(self, vif_type):
         fake_port = {
             'fixed_ips': [{'ip_address': '1.1.1.1'}],
             'id': 'port-id',
@@ -2974,8 +3003,8 @@ class TestAPI(TestAPIBase):
         fake_nets = [{'id': 'net-id', 'name': 'foo', 'tenant_id': 'tenant',
                       'mtu': 9000}]
 
-        net, iid = self.api._nw_info_build_network(self.context, fake_port,
-                                                   fake_nets, fake_subnets)
+        net, iid = self.api._nw_info_build_network(
+            fake_port, fake_nets, fake_subnets, ('physnet1', False))
 
         self.assertEqual(fake_subnets, net['subnets'])
         self.assertEqual('net-id', net['id'])
@@ -2983,10 +3012,8 @@ class TestAPI(TestAPIBase):
         self.assertEqual('tenant', net.get_meta('tenant_id'))
         self.assertEqual(9000, net.get_meta('mtu'))
         self.assertEqual(CONF.flat_injected, net.get_meta('injected'))
-
-        mock_get_client.assert_called_once_with(mock.ANY, admin=True)
-        mock_get_physnet.assert_called_once_with(self.context, mocked_client,
-                                                 'net-id')
+        self.assertEqual('physnet1', net.get_meta('physical_network'))
+        self.assertFalse(net.get_meta('tunneled'))
 
         return net, iid
 
@@ -3021,12 +3048,7 @@ class TestAPI(TestAPIBase):
         self.assertNotIn('should_create_bridge', net)
         self.assertIsNone(iid)
 
-    @mock.patch.object(neutronapi.API, '_get_physnet_tunneled_info',
-                       return_value=(None, False))
-    @mock.patch.object(neutronapi, 'get_client')
-    def test_nw_info_build_no_match(self, mock_get_client, mock_get_physnet):
-        mocked_client = mock.create_autospec(client.Client)
-        mock_get_client.return_value = mocked_client
+    def test_nw_info_build_no_match(self):
         fake_port = {
             'fixed_ips': [{'ip_address': '1.1.1.1'}],
             'id': 'port-id',
@@ -3036,22 +3058,13 @@ class TestAPI(TestAPIBase):
             }
         fake_subnets = [model.Subnet(cidr='1.0.0.0/8')]
         fake_nets = [{'id': 'net-id2', 'name': 'foo', 'tenant_id': 'tenant'}]
-        net, iid = self.api._nw_info_build_network(self.context, fake_port,
-                                                   fake_nets, fake_subnets)
+        net, iid = self.api._nw_info_build_network(
+            fake_port, fake_nets, fake_subnets, ('physnet1', False))
         self.assertEqual(fake_subnets, net['subnets'])
         self.assertEqual('net-id1', net['id'])
         self.assertEqual('tenant', net['meta']['tenant_id'])
-        mock_get_client.assert_called_once_with(mock.ANY, admin=True)
-        mock_get_physnet.assert_called_once_with(self.context, mocked_client,
-                                                 'net-id1')
 
-    @mock.patch.object(neutronapi.API, '_get_physnet_tunneled_info',
-                       return_value=(None, False))
-    @mock.patch.object(neutronapi, 'get_client')
-    def test_nw_info_build_network_vhostuser(self, mock_get_client,
-                                             mock_get_physnet):
-        mocked_client = mock.create_autospec(client.Client)
-        mock_get_client.return_value = mocked_client
+    def test_nw_info_build_network_vhostuser(self):
         fake_port = {
             'fixed_ips': [{'ip_address': '1.1.1.1'}],
             'id': 'port-id',
@@ -3063,8 +3076,8 @@ class TestAPI(TestAPIBase):
             }
         fake_subnets = [model.Subnet(cidr='1.0.0.0/8')]
         fake_nets = [{'id': 'net-id', 'name': 'foo', 'tenant_id': 'tenant'}]
-        net, iid = self.api._nw_info_build_network(self.context, fake_port,
-                                                   fake_nets, fake_subnets)
+        net, iid = self.api._nw_info_build_network(
+            fake_port, fake_nets, fake_subnets, ('physnet1', False))
         self.assertEqual(fake_subnets, net['subnets'])
         self.assertEqual('net-id', net['id'])
         self.assertEqual('foo', net['label'])
@@ -3073,17 +3086,8 @@ class TestAPI(TestAPIBase):
         self.assertEqual(CONF.neutron.ovs_bridge, net['bridge'])
         self.assertNotIn('should_create_bridge', net)
         self.assertEqual('port-id', iid)
-        mock_get_client.assert_called_once_with(mock.ANY, admin=True)
-        mock_get_physnet.assert_called_once_with(self.context, mocked_client,
-                                                 'net-id')
 
-    @mock.patch.object(neutronapi.API, '_get_physnet_tunneled_info',
-                       return_value=(None, False))
-    @mock.patch.object(neutronapi, 'get_client')
-    def test_nw_info_build_network_vhostuser_fp(self, mock_get_client,
-                                                mock_get_physnet):
-        mocked_client = mock.create_autospec(client.Client)
-        mock_get_client.return_value = mocked_client
+    def test_nw_info_build_network_vhostuser_fp(self):
         fake_port = {
             'fixed_ips': [{'ip_address': '1.1.1.1'}],
             'id': 'port-id',
@@ -3097,25 +3101,16 @@ class TestAPI(TestAPIBase):
         fake_subnets = [model.Subnet(cidr='1.0.0.0/8')]
         fake_nets = [{'id': 'net-id', 'name': 'foo', 'tenant_id': 'tenant'}]
         net, ovs_interfaceid = self.api._nw_info_build_network(
-            self.context, fake_port, fake_nets, fake_subnets)
+            fake_port, fake_nets, fake_subnets, ('physnet1', False))
         self.assertEqual(fake_subnets, net['subnets'])
         self.assertEqual('net-id', net['id'])
         self.assertEqual('foo', net['label'])
         self.assertEqual('tenant', net.get_meta('tenant_id'))
         self.assertEqual('brqnet-id', net['bridge'])
         self.assertIsNone(ovs_interfaceid)
-        mock_get_client.assert_called_once_with(mock.ANY, admin=True)
-        mock_get_physnet.assert_called_once_with(self.context, mocked_client,
-                                                 'net-id')
 
-    @mock.patch.object(neutronapi.API, '_get_physnet_tunneled_info',
-                       return_value=(None, False))
-    @mock.patch.object(neutronapi, 'get_client')
-    def _test_nw_info_build_custom_bridge(self, vif_type, mock_get_client,
-                                          mock_get_physnet,
+    def _test_nw_info_build_custom_bridge(self, vif_type,
                                           extra_details=None):
-        mocked_client = mock.create_autospec(client.Client)
-        mock_get_client.return_value = mocked_client
         fake_port = {
             'fixed_ips': [{'ip_address': '1.1.1.1'}],
             'id': 'port-id',
@@ -3129,13 +3124,10 @@ class TestAPI(TestAPIBase):
             fake_port['binding:vif_details'].update(extra_details)
         fake_subnets = [model.Subnet(cidr='1.0.0.0/8')]
         fake_nets = [{'id': 'net-id', 'name': 'foo', 'tenant_id': 'tenant'}]
-        net, iid = self.api._nw_info_build_network(self.context, fake_port,
-                                                   fake_nets, fake_subnets)
+        net, iid = self.api._nw_info_build_network(
+            fake_port, fake_nets, fake_subnets, ('physnet1', False))
         self.assertNotEqual(CONF.neutron.ovs_bridge, net['bridge'])
         self.assertEqual('custom-bridge', net['bridge'])
-        mock_get_client.assert_called_once_with(mock.ANY, admin=True)
-        mock_get_physnet.assert_called_once_with(self.context, mocked_client,
-                                                 'net-id')
 
     def test_nw_info_build_custom_ovs_bridge(self):
         self._test_nw_info_build_custom_bridge(model.VIF_TYPE_OVS)
@@ -3151,10 +3143,8 @@ class TestAPI(TestAPIBase):
                        return_value=(None, False))
     @mock.patch.object(neutronapi.API, '_get_preexisting_port_ids',
                        return_value=['port5'])
-    @mock.patch.object(neutronapi.API, '_get_subnets_from_port',
-                       return_value=[model.Subnet(cidr='1.0.0.0/8')])
-    @mock.patch.object(neutronapi.API, '_get_floating_ips_by_fixed_and_port',
-                       return_value=[{'floating_ip_address': '10.0.0.1'}])
+    @mock.patch.object(neutronapi.API, '_get_subnets_from_ports')
+    @mock.patch.object(neutronapi.API, '_get_floating_ips_by_ports')
     @mock.patch.object(neutronapi, 'get_client')
     def test_build_network_info_model(self, mock_get_client,
                                       mock_get_floating, mock_get_subnets,
@@ -3259,15 +3249,11 @@ class TestAPI(TestAPIBase):
 
         requested_ports = [fake_ports[2], fake_ports[0], fake_ports[1],
                            fake_ports[3], fake_ports[4], fake_ports[5]]
-        expected_get_floating_calls = []
-        for requested_port in requested_ports:
-            expected_get_floating_calls.append(mock.call(mocked_client,
-                                                         '1.1.1.1',
-                                                         requested_port['id']))
-        expected_get_subnets_calls = []
-        for requested_port in requested_ports:
-            expected_get_subnets_calls.append(
-                mock.call(self.context, requested_port, mocked_client))
+        mock_get_floating.return_value = {
+            ('port1', '1.1.1.1'): [{'floating_ip_address': '10.0.0.1'}]}
+        mock_get_subnets.return_value = {
+            port['id']: [model.Subnet(cidr='1.0.0.0/8')]
+            for port in requested_ports}
 
         fake_inst.info_cache = objects.InstanceInfoCache.new(
             self.context, uuids.instance)
@@ -3330,19 +3316,21 @@ class TestAPI(TestAPIBase):
         self.assertFalse(nw_infos[4]['preserve_on_delete'])
         self.assertTrue(nw_infos[5]['preserve_on_delete'])
 
-        mock_get_client.assert_has_calls([
-            mock.call(self.context, admin=True)] * 7, any_order=True)
+        self.assertEqual(
+            ['10.0.0.1'], nw_infos[1].fixed_ips()[0].floating_ip_addresses())
+        self.assertEqual([], nw_infos[0].floating_ips())
+
+        # The resources of all the ports are fetched at once.
+        mock_get_client.assert_called_once_with(self.context, admin=True)
         mocked_client.list_ports.assert_called_once_with(
             tenant_id=uuids.fake, device_id=uuids.instance)
-        mock_get_floating.assert_has_calls(expected_get_floating_calls)
-        self.assertEqual(len(expected_get_floating_calls),
-                         mock_get_floating.call_count)
-        mock_get_subnets.assert_has_calls(expected_get_subnets_calls)
-        self.assertEqual(len(expected_get_subnets_calls),
-                         mock_get_subnets.call_count)
+        mock_get_floating.assert_called_once_with(
+            mocked_client, [port['id'] for port in requested_ports])
+        mock_get_subnets.assert_called_once_with(
+            self.context, requested_ports, mocked_client)
         mock_get_preexisting.assert_called_once_with(fake_inst)
-        mock_get_physnet.assert_has_calls([
-            mock.call(self.context, mocked_client, 'net-id')] * 6)
+        mock_get_physnet.assert_called_once_with(
+            self.context, mocked_client, 'net-id')
 
     @mock.patch.object(neutronapi, 'get_client')
     @mock.patch('nova.network.neutron.API._nw_info_get_subnets')
@@ -3407,12 +3395,13 @@ class TestAPI(TestAPIBase):
         new=mock.Mock(return_value=[]))
     @mock.patch.object(
         neutronapi.API,
-        '_get_subnets_from_port',
-        new=mock.Mock(return_value=[model.Subnet(cidr='1.0.0.0/8')]))
+        '_get_subnets_from_ports',
+        new=mock.Mock(side_effect=lambda context, ports, client: {
+            port['id']: [model.Subnet(cidr='1.0.0.0/8')] for port in ports}))
     @mock.patch.object(
         neutronapi.API,
-        '_get_floating_ips_by_fixed_and_port',
-        new=mock.Mock(return_value=[{'floating_ip_address': '10.0.0.1'}]))
+        '_get_floating_ips_by_ports',
+        new=mock.Mock(return_value={}))
     @mock.patch.object(neutronapi, 'get_client')
     def test_build_network_info_model_full_vnic_type_change(
         self, mock_get_client
@@ -3476,12 +3465,13 @@ class TestAPI(TestAPIBase):
         new=mock.Mock(return_value=[]))
     @mock.patch.object(
         neutronapi.API,
-        '_get_subnets_from_port',
-        new=mock.Mock(return_value=[model.Subnet(cidr='1.0.0.0/8')]))
+        '_get_subnets_from_ports',
+        new=mock.Mock(side_effect=lambda context, ports, client: {
+            port['id']: [model.Subnet(cidr='1.0.0.0/8')] for port in ports}))
     @mock.patch.object(
         neutronapi.API,
-        '_get_floating_ips_by_fixed_and_port',
-        new=mock.Mock(return_value=[{'floating_ip_address': '10.0.0.1'}]))
+        '_get_floating_ips_by_ports',
+        new=mock.Mock(return_value={}))
     @mock.patch.object(neutronapi, 'get_client')
     def test_build_network_info_model_single_vnic_type_change(
         self, mock_get_client
@@ -3561,7 +3551,8 @@ class TestAPI(TestAPIBase):
         mocked_client.list_subnets.return_value = {'subnets': subnet_data1}
         mocked_client.list_ports.return_value = {'ports': []}
 
-        subnets = self.api._get_subnets_from_port(self.context, port_data)
+        subnets = self.api._get_subnets_from_ports(
+            self.context, [port_data])[port_data['id']]
 
         self.assertEqual(1, len(subnets))
         self.assertEqual(1, len(subnets[0]['routes']))
@@ -3573,7 +3564,7 @@ class TestAPI(TestAPIBase):
         mocked_client.list_subnets.assert_called_once_with(
             id=[port_data['fixed_ips'][0]['subnet_id']])
         mocked_client.list_ports.assert_called_once_with(
-            network_id=subnet_data1[0]['network_id'],
+            network_id=[subnet_data1[0]['network_id']],
             device_owner='network:dhcp')
 
     @mock.patch.object(neutronapi, 'get_client')
@@ -3591,7 +3582,8 @@ class TestAPI(TestAPIBase):
         mocked_client.list_subnets.return_value = {'subnets': subnet_data1}
         mocked_client.list_ports.return_value = {'ports': self.dhcp_port_data1}
 
-        subnets = self.api._get_subnets_from_port(self.context, port_data)
+        subnets = self.api._get_subnets_from_ports(
+            self.context, [port_data])[port_data['id']]
 
         self.assertEqual(self.dhcp_port_data1[0]['fixed_ips'][0]['ip_address'],
                          subnets[0]['meta']['dhcp_server'])
@@ -3612,11 +3604,49 @@ class TestAPI(TestAPIBase):
         mocked_client.list_subnets.return_value = {'subnets': subnet_data1}
         mocked_client.list_ports.return_value = {'ports': []}
 
-        subnets = self.api._get_subnets_from_port(self.context, port_data)
+        subnets = self.api._get_subnets_from_ports(
+            self.context, [port_data])[port_data['id']]
 
         self.assertEqual(subnet_data1[0]['enable_dhcp'],
                          subnets[0]['meta']['enable_dhcp'])
 
+    @mock.patch.object(neutronapi, 'get_client')
+    def test_get_subnets_from_ports(self, mock_get_client):
+        mocked_client = mock.create_autospec(client.Client)
+        mock_get_client.return_value = mocked_client
+        port_data = copy.deepcopy(self.port_data2)
+        port_data.append(copy.deepcopy(self.port_data3[0]))
+        mocked_client.list_subnets.return_value = {
+            'subnets': self.subnet_data_n}
+        mocked_client.list_ports.return_value = {
+            'ports': self.dhcp_port_data1}
+
+        subnets = self.api._get_subnets_from_ports(self.context, port_data)
+
+        # Each port only gets its own subnets.
+        self.assertEqual(
+            {uuids.portid_1: ['10.0.1.0/24'], uuids.portid_2: ['20.0.1.0/24'],
+             uuids.portid_3: []},
+            {port_id: [subnet['cidr'] for subnet in port_subnets]
+             for port_id, port_subnets in subnets.items()})
+        self.assertEqual('10.0.1.9',
+                         subnets[uuids.portid_1][0]['meta']['dhcp_server'])
+        self.assertNotIn('dhcp_server', subnets[uuids.portid_2][0]['meta'])
+        # The subnets and DHCP ports are listed once for all the ports.
+        mocked_client.list_subnets.assert_called_once_with(
+            id=['my_subid1', 'my_subid2'])
+        mocked_client.list_ports.assert_called_once_with(
+            network_id=sorted([uuids.my_netid1, uuids.my_netid2]),
+            device_owner='network:dhcp')
+
+    @mock.patch.object(neutronapi, 'get_client')
+    def test_get_subnets_from_ports_no_fixed_ips(self, mock_get_client):
+        subnets = self.api._get_subnets_from_ports(
+            self.context, self.port_data3)
+
+        self.assertEqual({uuids.portid_3: []}, subnets)
+        mock_get_client.assert_not_called()
+
     @mock.patch.object(neutronapi, 'get_client', return_value=mock.Mock())
     def test_get_physnet_tunneled_info_multi_segment(self, mock_get_client):
         test_net = {'network': {'segments':
@@ -9020,7 +9050,7 @@ class TestAllocateForInstance(test.NoDBTestCase):
         'nova.network.neutron.API.has_extended_resource_request_extension',
         new=mock.Mock(return_value=False),
     )
-    def test_create_ports_for_instance_with_cleanup_after_sg_failure(self):
+    def test_create_ports_for_instance_no_ports_after_sg_failure(self):
         api = neutronapi.API()
         ordered_networks = [
             objects.NetworkRequest(network_id=uuids.net1),
@@ -9033,19 +9063,91 @@ class TestAllocateForInstance(test.NoDBTestCase):
             uuids.net3: {"id": uuids.net3, "port_security_enabled": True}
         }
         mock_client = mock.Mock()
-        mock_client.create_port.side_effect = [
-            {"port": {"id": uuids.port1}},
-            {"port": {"id": uuids.port2}}
-        ]
 
         self.assertRaises(exception.SecurityGroupCannotBeApplied,
             api._create_ports_for_instance,
             self.context, self.instance, ordered_networks, nets,
             mock_client, None)
 
-        self.assertEqual([mock.call(uuids.port1), mock.call(uuids.port2)],
-            mock_client.delete_port.call_args_list)
-        self.assertEqual(2, mock_client.create_port.call_count)
+        # The networks are all checked before any port is created.
+        mock_client.create_port.assert_not_called()
+        mock_client.delete_port.assert_not_called()
+
+    @mock.patch(
+        'nova.network.neutron.API.has_extended_resource_request_extension',
+        new=mock.Mock(return_value=False),
+    )
+    def test_create_ports_for_instance_concurrent(self):
+        self.flags(port_concurrency=3, group='neutron')
+        api = neutronapi.API()
+        ordered_networks = [
+            objects.NetworkRequest(network_id=uuids.net1),
+            objects.NetworkRequest(network_id=uuids.net2,
+                                   port_id=uuids.port2),
+            objects.NetworkRequest(network_id=uuids.net3),
+            objects.NetworkRequest(network_id=uuids.net4),
+        ]
+        nets = {net.network_id: {"id": net.network_id,
+                                 "port_security_enabled": False}
+                for net in ordered_networks}
+        # Each port creation waits for the two others, so this would time out
+        # if the ports were created one after another.
+        barrier = threading.Barrier(3, timeout=10)
+
+        def create_port(body):
+            barrier.wait()
+            network_id = body['port']['network_id']
+            return {'port': {'id': network_id + '-port'}}
+
+        mock_client = mock.Mock()
+        mock_client.create_port.side_effect = create_port
+
+        result = api._create_ports_for_instance(self.context, self.instance,
+            ordered_networks, nets, mock_client, None)
+
+        self.assertEqual([(ordered_networks[0], uuids.net1 + '-port'),
+                          (ordered_networks[1], None),
+                          (ordered_networks[2], uuids.net3 + '-port'),
+                          (ordered_networks[3], uuids.net4 + '-port')],
+                         result)
+        self.assertEqual(3, mock_client.create_port.call_count)
+
+    @mock.patch(
+        'nova.network.neutron.API.has_extended_resource_request_extension',
+        new=mock.Mock(return_value=False),
+    )
+    def test_create_ports_for_instance_concurrent_cleanup(self):
+        self.flags(port_concurrency=3, group='neutron')
+        api = neutronapi.API()
+        ordered_networks = [
+            objects.NetworkRequest(network_id=uuids.net1),
+            objects.NetworkRequest(network_id=uuids.net2),
+            objects.NetworkRequest(network_id=uuids.net3),
+        ]
+        nets = {net.network_id: {"id": net.network_id,
+                                 "port_security_enabled": False}
+                for net in ordered_networks}
+        barrier = threading.Barrier(3, timeout=10)
+
+        def create_port(body):
+            barrier.wait()
+            network_id = body['port']['network_id']
+            if network_id == uuids.net2:
+                raise exception.PortLimitExceeded()
+            return {'port': {'id': network_id + '-port'}}
+
+        mock_client = mock.Mock()
+        mock_client.create_port.side_effect = create_port
+
+        self.assertRaises(exception.PortLimitExceeded,
+            api._create_ports_for_instance,
+            self.context, self.instance, ordered_networks, nets,
+            mock_client, None)
+
+        # All the ports created concurrently with the failed one are deleted.
+        self.assertEqual([mock.call(uuids.net1 + '-port'),
+                          mock.call(uuids.net3 + '-port')],
+                         mock_client.delete_port.call_args_list)
 
     def test_create_ports_for_instance_raises_subnets_missing(self):
         api = neutronapi.API()
@@ -9115,6 +9217,93 @@ class TestAllocateForInstance(test.NoDBTestCase):
                 constants.BINDING_HOST_ID: bind_host_id,
                 'device_id': self.instance.uuid}})
 
+    @mock.patch('nova.network.neutron.API.has_dns_extension',
+                new=mock.Mock(return_value=False))
+    @mock.patch.object(objects.VirtualInterface, "destroy")
+    @mock.patch.object(objects.VirtualInterface, "create")
+    def test_update_ports_for_instance_concurrent(self, mock_create,
+                                                  mock_destroy):
+        self.flags(port_concurrency=3, group='neutron')
+        api = neutronapi.API()
+        self.instance.availability_zone = "test_az"
+        requests_and_created_ports = [
+            (objects.NetworkRequest(network_id=uuids.net1), uuids.port1),
+            (objects.NetworkRequest(network_id=uuids.net2,
+                                    port_id=uuids.port2), None),
+            (objects.NetworkRequest(network_id=uuids.net3), uuids.port3)]
+        nets = {net_id: {"id": net_id}
+                for net_id in (uuids.net1, uuids.net2, uuids.net3)}
+        # Each port update waits for the two others, so this would time out
+        # if the ports were updated one after another.
+        barrier = threading.Barrier(3, timeout=10)
+
+        def update_port(port_id, body):
+            barrier.wait()
+            return {'port': {'id': port_id, 'mac_address': 'mac'}}
+
+        mock_admin = mock.Mock()
+        mock_admin.update_port.side_effect = update_port
+
+        ordered_nets, ordered_ports, preexisting_port_ids, \
+            created_port_ids = api._update_ports_for_instance(
+                self.context, self.instance, mock.Mock(), mock_admin,
+                requests_and_created_ports, nets, None, None, None)
+
+        self.assertEqual([nets[uuids.net1], nets[uuids.net2],
+                          nets[uuids.net3]], ordered_nets)
+        self.assertEqual([uuids.port1, uuids.port2, uuids.port3],
+                         ordered_ports)
+        self.assertEqual([uuids.port2], preexisting_port_ids)
+        self.assertEqual([uuids.port1, uuids.port3], created_port_ids)
+        self.assertEqual(3, mock_create.call_count)
+        mock_destroy.assert_not_called()
+
+    @mock.patch('nova.network.neutron.API.has_dns_extension',
+                new=mock.Mock(return_value=False))
+    @mock.patch('nova.network.neutron.API._delete_ports')
+    @mock.patch('nova.network.neutron.API._unbind_ports')
+    @mock.patch.object(objects.VirtualInterface, "destroy")
+    @mock.patch.object(objects.VirtualInterface, "create")
+    def test_update_ports_for_instance_concurrent_rollback(
+            self, mock_create, mock_destroy, mock_unbind, mock_delete):
+        self.flags(port_concurrency=3, group='neutron')
+        api = neutronapi.API()
+        self.instance.availability_zone = "test_az"
+        requests_and_created_ports = [
+            (objects.NetworkRequest(network_id=uuids.net1), uuids.port1),
+            (objects.NetworkRequest(network_id=uuids.net2,
+                                    port_id=uuids.port2), None),
+            (objects.NetworkRequest(network_id=uuids.net3), uuids.port3)]
+        nets = {net_id: {"id": net_id}
+                for net_id in (uuids.net1, uuids.net2, uuids.net3)}
+        barrier = threading.Barrier(3, timeout=10)
+
+        def update_port(port_id, body):
+            barrier.wait()
+            if port_id == uuids.port3:
+                raise exceptions.MacAddressInUseClient()
+            return {'port': {'id': port_id, 'mac_address': 'mac'}}
+
+        mock_neutron = mock.Mock()
+        mock_admin = mock.Mock()
+        mock_admin.update_port.side_effect = update_port
+
+        self.assertRaises(exception.PortInUse,
+                          api._update_ports_for_instance,
+                          self.context, self.instance, mock_neutron,
+                          mock_admin, requests_and_created_ports, nets,
+                          None, None, None)
+
+        # The VIFs of the ports updated concurrently with the failed one are
+        # destroyed, the pre-existing port is unbound and all the created
+        # ports are deleted.
+        self.assertEqual(2, mock_create.call_count)
+        self.assertEqual(2, mock_destroy.call_count)
+        mock_unbind.assert_called_once_with(
+            self.context, [uuids.port2], mock_neutron, mock_admin)
+        mock_delete.assert_called_once_with(
+            mock_neutron, self.instance, [uuids.port1, uuids.port3])
+
 
 class TestAPINeutronHostnameDNS(TestAPIBase):
 
@@ -9999,6 +10188,7 @@ class TestGetInstanceNetworkInfo(test.NoDBTestCase):
         with test.nested(
             mock.patch.object(self.api, '_get_available_networks',
                               return_value=[{'id': uuids.network_id}]),
+            mock.patch.object(self.api, '_get_nw_info_resources'),
             mock.patch.object(self.api, '_build_vif_model',
                               return_value=model.VIF(uuids.port_id)),
             # We should not call _gather_port_ids_and_networks since that uses
@@ -10010,7 +10200,7 @@ class TestGetInstanceNetworkInfo(test.NoDBTestCase):
             mock.patch.object(self.api, '_get_ordered_port_list',
                               return_value=ordered_port_list)
         ) as (
-            get_nets, build_vif, gather_ports, mock_port_map
+            get_nets, get_resources, build_vif, gather_ports, mock_port_map
         ):
             nwinfo = self.api._get_instance_nw_info(
                 self.context, self.instance, force_refresh=True)
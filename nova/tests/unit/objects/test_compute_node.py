@@ -491,6 +491,16 @@ class _TestComputeNodeObject(object):
                          subs=self.subs(),
                          comparators=self.comparators())
 
+    def test_compact_serialization(self):
+        compute = compute_node.ComputeNode._from_db_object(
+            self.context, compute_node.ComputeNode(), fake_compute_node)
+        primitive = jsonutils.loads(
+            jsonutils.dumps(compute.obj_to_primitive()))
+        compact = base.obj_to_compact(compute.obj_to_primitive())
+        self.assertEqual(primitive, base.obj_from_compact(compact))
+        self.assertLess(len(jsonutils.dumps({base.COMPACT_KEY: compact})),
+                        len(jsonutils.dumps(primitive)))
+
     def test_compat_numa_topology(self):
         compute = compute_node.ComputeNode(numa_topology='fake-numa-topology')
         versions = ovo_base.obj_tree_get_versions('ComputeNode')
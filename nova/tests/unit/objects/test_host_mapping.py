@@ -170,6 +170,22 @@ class _TestHostMappingListObject(object):
                          comparators={
                              'cell_mapping': self._check_cell_map_value})
 
+    @mock.patch.object(host_mapping.HostMappingList, '_get_from_db')
+    def test_get_by_hosts(self, get_from_db):
+        fake_cell = test_cell_mapping.get_db_mapping(id=1)
+        db_mapping = get_db_mapping(mapped_cell=fake_cell)
+        get_from_db.return_value = [db_mapping]
+
+        mapping_obj = objects.HostMappingList.get_by_hosts(
+            self.context, ['fake-host'])
+
+        get_from_db.assert_called_once_with(self.context,
+                                            hosts=['fake-host'])
+        self.compare_obj(mapping_obj.objects[0], db_mapping,
+                         subs={'cell_mapping': 'cell_id'},
+                         comparators={
+                             'cell_mapping': self._check_cell_map_value})
+
 
 class TestCellMappingListObject(test_objects._LocalTest,
                                 _TestHostMappingListObject):
@@ -32,6 +32,7 @@ from nova import exception
 from nova.network import model as network_model
 from nova import notifications
 from nova import objects
+from nova.objects import base
 from nova.objects import fields
 from nova.objects import instance
 from nova.objects import instance_info_cache
@@ -1627,6 +1628,45 @@ class _TestInstanceObject(object):
         inst1 = inst1.obj_clone()
         self.assertEqual(len(inst1.obj_what_changed()), 0)
 
+    def test_obj_to_delta(self):
+        inst = objects.Instance(
+            self.context, uuid=uuids.instance, host='fake-host',
+            metadata={'foo': 'bar'}, system_metadata={'foo': 'bar'},
+            pci_requests=objects.InstancePCIRequests(requests=[]))
+        inst.obj_reset_changes(recursive=True)
+        inst.metadata = {}
+        inst.task_state = task_states.SPAWNING
+
+        delta, fingerprints = base.obj_to_delta(inst)
+        self.assertEqual(inst.VERSION, delta.VERSION)
+        self.assertEqual({'metadata', 'task_state'}, delta.obj_what_changed())
+        self.assertEqual(
+            {'metadata', 'pci_requests', 'task_state', 'uuid'},
+            {field for field in delta.fields if field in delta})
+        self.assertEqual({}, delta.metadata)
+        self.assertEqual({'host', 'system_metadata'}, set(fingerprints))
+        self.assertEqual(
+            base.obj_field_fingerprint({'foo': 'bar'}),
+            fingerprints['system_metadata'])
+        # The original object is not modified.
+        self.assertEqual({'metadata', 'task_state'}, inst.obj_what_changed())
+
+    def test_obj_to_delta_flavors(self):
+        flavor = objects.Flavor(flavorid='1')
+        inst = objects.Instance(self.context, uuid=uuids.instance,
+                                flavor=flavor, old_flavor=flavor,
+                                new_flavor=None, host='fake-host')
+        inst.obj_reset_changes(recursive=True)
+        inst.old_flavor = None
+
+        delta, fingerprints = base.obj_to_delta(inst)
+        self.assertEqual({'old_flavor'}, delta.obj_what_changed())
+        # All the flavors are sent as save() writes them back together.
+        self.assertEqual(flavor, delta.flavor)
+        self.assertIsNone(delta.old_flavor)
+        self.assertIsNone(delta.new_flavor)
+        self.assertEqual({'host'}, set(fingerprints))
+
     def test_obj_make_compatible(self):
         inst_obj = objects.Instance(
             # trusted_certs were added in 2.4
@@ -1643,6 +1683,22 @@ class _TestInstanceObject(object):
 
 class TestInstanceObject(test_objects._LocalTest,
                          _TestInstanceObject):
+    # NOTE: This is local only as the omitted fields are never serialized,
+    # they are set by the conductor on the object it received.
+    def test_save_delta_loaded_fields(self):
+        inst = objects.Instance(self.context, uuid=uuids.instance)
+        inst.obj_reset_changes()
+        inst.task_state = task_states.SPAWNING
+        inst._obj_delta_omitted = frozenset(['metadata', 'info_cache'])
+        with mock.patch.object(db, 'instance_update_and_get_original',
+                               return_value=(None, None)) as mock_update, \
+                mock.patch.object(inst, '_from_db_object'), \
+                mock.patch.object(notifications, 'send_update'):
+            inst.save()
+        mock_update.assert_called_once_with(
+            self.context, uuids.instance, {'task_state': 'spawning'},
+            columns_to_join=['metadata', 'info_cache', 'system_metadata'])
+
     def _test_save_objectfield_fk_constraint_fails(self, foreign_key,
                                                    expected_exception):
         # NOTE(danms): Do this here and not in the remote test because
@@ -1733,7 +1789,7 @@ class _TestInstanceListObject(object):
 
         mock_get_all.assert_called_once_with(self.context, {'foo': 'bar'},
             'uuid', 'asc', limit=None, marker=None,
-            columns_to_join=['metadata'])
+            columns_to_join=['metadata'], columns=None)
 
     @mock.patch.object(db, 'instance_get_all_by_filters_sort')
     def test_get_all_by_filters_sorted(self, mock_get_all):
@@ -1752,7 +1808,8 @@ class _TestInstanceListObject(object):
                                             limit=None, marker=None,
                                             columns_to_join=['metadata'],
                                             sort_keys=['uuid'],
-                                            sort_dirs=['asc'])
+                                            sort_dirs=['asc'],
+                                            columns=None)
 
     @mock.patch.object(db, 'instance_get_all_by_filters_sort')
     @mock.patch.object(db, 'instance_get_all_by_filters')
@@ -1766,7 +1823,7 @@ class _TestInstanceListObject(object):
             limit=100, marker='uuid', use_slave=True)
         mock_get_by_filters.assert_called_once_with(
             self.context, {'foo': 'bar'}, 'key', 'dir', limit=100,
-            marker='uuid', columns_to_join=None)
+            marker='uuid', columns_to_join=None, columns=None)
         self.assertEqual(0, mock_get_by_filters_sort.call_count)
 
     @mock.patch.object(db, 'instance_get_all_by_filters_sort')
@@ -1783,7 +1840,8 @@ class _TestInstanceListObject(object):
         mock_get_by_filters_sort.assert_called_once_with(
             self.context, {'foo': 'bar'}, limit=100,
             marker='uuid', columns_to_join=None,
-            sort_keys=['key1', 'key2'], sort_dirs=['dir1', 'dir2'])
+            sort_keys=['key1', 'key2'], sort_dirs=['dir1', 'dir2'],
+            columns=None)
         self.assertEqual(0, mock_get_by_filters.call_count)
 
     @mock.patch.object(db, 'instance_get_all_by_filters')
@@ -1807,7 +1865,7 @@ class _TestInstanceListObject(object):
             {'deleted': True, 'cleaned': False},
             'uuid', 'asc',
             limit=None, marker=None,
-            columns_to_join=['metadata'])
+            columns_to_join=['metadata'], columns=None)
 
     @mock.patch.object(db, 'instance_get_all_by_host')
     def test_get_by_host(self, mock_get_all):
@@ -1823,7 +1881,43 @@ class _TestInstanceListObject(object):
         self.assertEqual(set(), inst_list.obj_what_changed())
 
         mock_get_all.assert_called_once_with(self.context, 'foo',
-                                             columns_to_join=None)
+                                             columns_to_join=None,
+                                             columns=None)
+
+    @mock.patch.object(db, 'instance_get_all_by_host')
+    def test_get_by_host_only_fields(self, mock_get_all):
+        fakes = [self.fake_instance(1), self.fake_instance(2)]
+        mock_get_all.return_value = [
+            {'id': fake['id'], 'uuid': fake['uuid'],
+             'vm_state': fake['vm_state']} for fake in fakes]
+
+        inst_list = objects.InstanceList.get_by_host(
+            self.context, 'foo', expected_attrs=[],
+            only_fields=['vm_state'])
+
+        mock_get_all.assert_called_once_with(
+            self.context, 'foo', columns_to_join=[],
+            columns=['id', 'uuid', 'vm_state'])
+        for fake, inst in zip(fakes, inst_list):
+            self.assertEqual(fake['uuid'], inst.uuid)
+            self.assertEqual(fake['vm_state'], inst.vm_state)
+            self.assertNotIn('host', inst)
+
+    @mock.patch.object(db, 'instance_get_all_by_filters')
+    def test_get_by_filters_only_fields_name_template(self, mock_get_all):
+        # The instance name can be built from any field so all of them are
+        # loaded.
+        self.flags(instance_name_template='%(hostname)s')
+        fakes = [self.fake_instance(1)]
+        mock_get_all.return_value = fakes
+
+        inst_list = objects.InstanceList.get_by_filters(
+            self.context, {}, expected_attrs=[], only_fields=['vm_state'])
+
+        mock_get_all.assert_called_once_with(
+            self.context, {}, 'created_at', 'desc', limit=None, marker=None,
+            columns_to_join=[], columns=None)
+        self.assertEqual(fakes[0]['host'], inst_list[0].host)
 
     @mock.patch.object(db, 'instance_get_all_by_host_and_node')
     def test_get_by_host_and_node(self, mock_get_all):
@@ -1933,7 +2027,7 @@ class _TestInstanceListObject(object):
         self.assertIsNone(instances[1].fault)
 
         mock_get_all.assert_called_once_with(self.context, 'host',
-            columns_to_join=['fault'])
+            columns_to_join=['fault'], columns=None)
         mock_fault_get.assert_called_once_with(self.context,
             [x['uuid'] for x in fake_insts])
 
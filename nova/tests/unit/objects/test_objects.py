@@ -22,6 +22,7 @@ import pprint
 from unittest import mock
 
 import fixtures
+from oslo_serialization import jsonutils
 from oslo_utils.fixture import uuidsentinel as uuids
 from oslo_utils import timeutils
 from oslo_versionedobjects import base as ovo_base
@@ -33,9 +34,12 @@ from nova import exception
 from nova import objects
 from nova.objects import base
 from nova.objects import fields
+from nova.objects import service as service_obj
 from nova.objects import virt_device_metadata
 from nova import test
 from nova.tests import fixtures as nova_fixtures
+from nova.tests.unit import fake_instance
+from nova.tests.unit import fake_request_spec
 from nova import utils
 
 
@@ -1000,6 +1004,134 @@ class TestObjectSerializer(_BaseTestCase):
         thing2 = ser.deserialize_entity(self.context, thing)
         self.assertIsInstance(thing2['foo'], base.NovaObject)
 
+    def _test_object_serialization_compact(self, min_version, compact):
+        self.flags(rpc_compact_objects=True)
+        ser = base.NovaObjectSerializer()
+        obj = MyObj(foo=2, bar='bar', rel_objects=[
+            MyOwnedObject(baz=1), MyOwnedObject()])
+        obj.obj_reset_changes(['foo'])
+        with mock.patch.object(service_obj, 'get_minimum_version_all_cells',
+                               return_value=min_version) as mock_min:
+            primitive = ser.serialize_entity(self.context, [obj])[0]
+            ser.serialize_entity(self.context, obj)
+        mock_min.assert_called_once_with(mock.ANY, base._COMPACT_BINARIES)
+        if compact:
+            self.assertEqual([base.COMPACT_KEY], list(primitive))
+        else:
+            self.assertEqual(obj.obj_to_primitive(), primitive)
+
+        obj2 = ser.deserialize_entity(self.context, primitive)
+        self.assertIsInstance(obj2, MyObj)
+        self.assertEqual(self.context, obj2._context)
+        self.assertEqual(obj.obj_what_changed(), obj2.obj_what_changed())
+        self.assertEqual(obj.obj_to_primitive(), obj2.obj_to_primitive())
+
+    def test_object_serialization_compact(self):
+        self._test_object_serialization_compact(
+            service_obj.COMPACT_RPC_OBJECTS_VERSION, True)
+
+    def test_object_serialization_compact_not_supported(self):
+        self._test_object_serialization_compact(
+            service_obj.COMPACT_RPC_OBJECTS_VERSION - 1, False)
+
+    @mock.patch.object(objects.Service, 'get_minimum_version_multi')
+    @mock.patch.object(objects.Service, '_db_service_get_minimum_version')
+    def test_object_serialization_compact_local(self, mock_db_min,
+                                                mock_min):
+        self.flags(rpc_compact_objects=True)
+        self.flags(connection=None, group='api_database')
+        # The minimum version cache is bypassed.
+        objects.Service.enable_min_version_cache()
+        mock_db_min.return_value = {
+            'nova-compute': service_obj.COMPACT_RPC_OBJECTS_VERSION,
+            'nova-conductor': service_obj.COMPACT_RPC_OBJECTS_VERSION + 1}
+        ser = base.NovaObjectSerializer()
+        primitive = ser.serialize_entity(self.context, MyObj(foo=2))
+        self.assertIn(base.COMPACT_KEY, primitive)
+        mock_db_min.assert_called_once_with(mock.ANY, base._COMPACT_BINARIES)
+        mock_min.assert_not_called()
+
+    @mock.patch.object(objects.Service, 'get_minimum_version_multi',
+                       return_value=service_obj.COMPACT_RPC_OBJECTS_VERSION)
+    @mock.patch.object(objects.Service, '_db_service_get_minimum_version')
+    def test_object_serialization_compact_indirection(self, mock_db_min,
+                                                      mock_min):
+        self.flags(rpc_compact_objects=True)
+        self.flags(connection=None, group='api_database')
+        self.useFixture(fixtures.MonkeyPatch(
+            'nova.objects.Service.indirection_api', mock.sentinel.api))
+        ser = base.NovaObjectSerializer()
+        primitive = ser.serialize_entity(self.context, MyObj(foo=2))
+        self.assertIn(base.COMPACT_KEY, primitive)
+        mock_min.assert_called_once_with(mock.ANY, base._COMPACT_BINARIES)
+        mock_db_min.assert_not_called()
+
+    @mock.patch.object(service_obj, 'get_minimum_version_all_cells')
+    def test_object_serialization_compact_disabled(self, mock_min):
+        ser = base.NovaObjectSerializer()
+        obj = MyObj(foo=2)
+        self.assertEqual(obj.obj_to_primitive(),
+                         ser.serialize_entity(self.context, obj))
+        mock_min.assert_not_called()
+
+    @mock.patch('time.monotonic')
+    @mock.patch.object(service_obj, 'get_minimum_version_all_cells')
+    def test_object_serialization_compact_recheck(self, mock_min,
+                                                  mock_monotonic):
+        self.flags(rpc_compact_objects=True)
+        ser = base.NovaObjectSerializer()
+        obj = MyObj(foo=2)
+        mock_min.side_effect = [
+            exception.DBNotAllowed(binary='nova-compute'),
+            service_obj.COMPACT_RPC_OBJECTS_VERSION - 1,
+            service_obj.COMPACT_RPC_OBJECTS_VERSION]
+        for now, compact in ((100, False), (159, False), (160, False),
+                             (200, False), (220, True), (1000, True)):
+            mock_monotonic.return_value = now
+            primitive = ser.serialize_entity(self.context, obj)
+            self.assertEqual(compact, base.COMPACT_KEY in primitive)
+        self.assertEqual(3, mock_min.call_count)
+
+
+class TestCompactSerialization(test.NoDBTestCase):
+
+    def _test_round_trip(self, obj):
+        primitive = jsonutils.loads(jsonutils.dumps(obj.obj_to_primitive()))
+        compact = base.obj_to_compact(obj.obj_to_primitive())
+        self.assertEqual(primitive, base.obj_from_compact(compact))
+        self.assertLess(len(jsonutils.dumps({base.COMPACT_KEY: compact})),
+                        len(jsonutils.dumps(primitive)))
+        return primitive, compact
+
+    def test_request_spec(self):
+        self._test_round_trip(fake_request_spec.fake_spec_obj())
+
+    def test_instance_list(self):
+        ctxt = context.get_admin_context()
+        instances = objects.InstanceList(objects=[
+            fake_instance.fake_instance_obj(
+                ctxt, expected_attrs=['flavor', 'info_cache', 'metadata',
+                                      'system_metadata'])
+            for _ in range(1000)])
+        primitive, compact = self._test_round_trip(instances)
+        # The field names are only sent once for all the instances.
+        self.assertLess(len(compact) * 5, len(jsonutils.dumps(primitive)))
+
+    def test_unset_and_changed_fields(self):
+        obj = objects.Flavor(flavorid='1', name='foo', memory_mb=512)
+        obj.obj_reset_changes(['flavorid'])
+        primitive = obj.obj_to_primitive()
+        self.assertEqual(
+            primitive, base.obj_from_compact(base.obj_to_compact(primitive)))
+
+    def test_plain_values(self):
+        # Plain lists and dicts, including ones looking like our extension
+        # types or object envelopes with extra keys, are left alone.
+        value = {'a': [33, ''], 'b': [[], {}], 'c': None,
+                 'd': {'nova_object.name': 'foo', 'other': 1}}
+        self.assertEqual(
+            value, base.obj_from_compact(base.obj_to_compact(value)))
+
 
 class TestArgsSerializer(test.NoDBTestCase):
     def setUp(self):
@@ -1100,7 +1232,7 @@ object_data = {
     'Flavor': '1.2-4ce99b41327bb230262e5a8f45ff0ce3',
     'FlavorList': '1.1-52b5928600e7ca973aa4fc1e46f3934c',
     'HostMapping': '1.0-1a3390a696792a552ab7bd31a77ba9ac',
-    'HostMappingList': '1.1-18ac2bfb8c1eb5545bed856da58a79bc',
+    'HostMappingList': '1.2-01f824239f3c168f004f652701e74a40',
     'HVSpec': '1.2-de06bcec472a2f04966b855a49c46b41',
     'HyperVLiveMigrateData': '1.5-b424b27305f259fb3c15d720856585c7',
     'IDEDeviceBus': '1.0-29d4c9f27ac44197f01b6ac1b7e16502',
@@ -1118,7 +1250,7 @@ object_data = {
     'InstanceGroup': '1.11-852ac511d30913ee88f3c3a869a8f30a',
     'InstanceGroupList': '1.8-90f8f1a445552bb3bbc9fa1ae7da27d4',
     'InstanceInfoCache': '1.5-cd8b96fefe0fc8d4d337243ba0bf0e1e',
-    'InstanceList': '2.6-238f125650c25d6d12722340d726f723',
+    'InstanceList': '2.7-40a38acd4d2fd391ed217f93d15ae5ea',
     'InstanceMapping': '1.2-3bd375e65c8eb9c45498d2f87b882e03',
     'InstanceMappingList': '1.3-d34b6ebb076d542ae0f8b440534118da',
     'InstanceNUMACell': '1.6-25d9120d83a18356f4146f2a6fe2cc8d',
@@ -1166,7 +1298,7 @@ object_data = {
     'SecurityGroup': '1.2-86d67d8d3ab0c971e1dc86e02f9524a8',
     'SecurityGroupList': '1.1-c655ed13298e630f4d398152f7d08d71',
     'Selection': '1.1-548e3c2f04da2a61ceaf9c4e1589f264',
-    'Service': '1.22-8a740459ab9bf258a19c8fcb875c2d9a',
+    'Service': '1.23-5581ad5198fa5d1b9988e2faaf8d080c',
     'ServiceList': '1.19-5325bce13eebcbf22edc9678285270cc',
     'ShareMapping': '1.2-ae6ba712dc8022d08c4de34fb8b6e015',
     'ShareMappingList': '1.0-634980d5efdf3656e28c8dec3d862ab9',
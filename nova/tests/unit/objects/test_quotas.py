@@ -278,6 +278,66 @@ class _TestQuotasObject(object):
                     'instances': 5, 'cores': 10, 'ram': 8192}
         self.assertEqual(expected, quotas_dict)
 
+    @mock.patch('nova.objects.Quotas._get_all_from_db_by_project')
+    @mock.patch('nova.db.main.api.quota_get_all_by_project')
+    def test_get_all_by_project_cached_on_context(self, mock_get_all_main,
+                                                  mock_get_all):
+        mock_get_all.return_value = {'project_id': 'fake-project',
+                                     'cores': 20}
+        mock_get_all_main.return_value = {}
+        quotas_dict = quotas_obj.Quotas.get_all_by_project(self.context,
+                                                           'fake-project')
+        # Modifying the returned dict must not modify the cached limits.
+        quotas_dict['cores'] = 40
+        quotas_dict = quotas_obj.Quotas.get_all_by_project(
+            self.context.elevated(), 'fake-project')
+        self.assertEqual({'project_id': 'fake-project', 'cores': 20},
+                         quotas_dict)
+        mock_get_all.assert_called_once_with(self.context, 'fake-project')
+
+        # Another request looks the limits up again.
+        other_context = context.RequestContext('fake_user1', 'fake_proj1')
+        quotas_obj.Quotas.get_all_by_project(other_context, 'fake-project')
+        self.assertEqual(2, mock_get_all.call_count)
+
+    @mock.patch('nova.objects.Quotas._get_all_class_from_db_by_name')
+    @mock.patch('nova.db.main.api.quota_class_get_all_by_name')
+    def test_get_all_class_by_name_cached_in_process(self, mock_get_all_main,
+                                                     mock_get_all):
+        self.flags(limits_cache_ttl=60, group='quota')
+        mock_get_all.return_value = {'class_name': 'foo', 'cores': 10}
+        mock_get_all_main.return_value = {}
+        for user in ('fake_user1', 'fake_user2'):
+            ctxt = context.RequestContext(user, 'fake_proj1')
+            quotas_dict = quotas_obj.Quotas.get_all_class_by_name(ctxt, 'foo')
+            self.assertEqual({'class_name': 'foo', 'cores': 10}, quotas_dict)
+        mock_get_all.assert_called_once()
+
+        expired = quotas_obj.time.monotonic() + 61
+        with mock.patch.object(quotas_obj.time, 'monotonic',
+                               return_value=expired):
+            quotas_obj.Quotas.get_all_class_by_name(self.context, 'foo')
+        self.assertEqual(2, mock_get_all.call_count)
+
+    @mock.patch('nova.objects.Quotas._update_limit_in_db')
+    @mock.patch('nova.objects.Quotas._get_all_from_db_by_project')
+    @mock.patch('nova.db.main.api.quota_get_all_by_project')
+    def test_update_limit_invalidates_cached_limits(
+            self, mock_get_all_main, mock_get_all, mock_update):
+        self.flags(limits_cache_ttl=60, group='quota')
+        mock_get_all.return_value = {'project_id': 'fake-project',
+                                     'cores': 20}
+        mock_get_all_main.return_value = {}
+        quotas_obj.Quotas.get_all_by_project(self.context, 'fake-project')
+        quotas_obj.Quotas.update_limit(self.context, 'fake-project', 'cores',
+                                       40)
+        mock_get_all.return_value = {'project_id': 'fake-project',
+                                     'cores': 40}
+        quotas_dict = quotas_obj.Quotas.get_all_by_project(self.context,
+                                                           'fake-project')
+        self.assertEqual(40, quotas_dict['cores'])
+        self.assertEqual(2, mock_get_all.call_count)
+
     @mock.patch('nova.objects.Quotas._destroy_all_in_db_by_project')
     def test_destroy_all_by_project(self, mock_destroy_all):
         quotas_obj.Quotas.destroy_all_by_project(self.context, 'fake-project')
@@ -173,6 +173,79 @@ class _TestServiceObject(object):
             self.context, 123, {'host': 'fake-host',
                                 'version': fake_service['version']})
 
+    @mock.patch.object(service.Service, '_HEARTBEATS_FLUSHED_AT', 0)
+    @mock.patch.object(service.Service, '_PENDING_HEARTBEATS', set())
+    @mock.patch('time.monotonic')
+    @mock.patch.object(db, 'service_heartbeat')
+    def test_heartbeat(self, mock_heartbeat, mock_monotonic):
+        self.flags(heartbeat_flush_interval=10)
+        service1 = service.Service(context=self.context, id=1)
+        service2 = service.Service(context=self.context, id=2)
+
+        # The first heartbeat is written right away.
+        mock_monotonic.return_value = 100
+        service1.heartbeat()
+        mock_heartbeat.assert_called_once_with(self.context, [1])
+        mock_heartbeat.reset_mock()
+
+        # Heartbeats within the flush interval are buffered.
+        mock_monotonic.return_value = 105
+        service2.heartbeat()
+        service1.heartbeat()
+        mock_heartbeat.assert_not_called()
+
+        # And written together once the interval has passed.
+        mock_monotonic.return_value = 110
+        service2.heartbeat()
+        mock_heartbeat.assert_called_once_with(self.context, mock.ANY)
+        self.assertEqual([1, 2], sorted(mock_heartbeat.call_args[0][1]))
+        self.assertEqual(set(), service.Service._PENDING_HEARTBEATS)
+
+    @mock.patch.object(service.Service, '_HEARTBEATS_FLUSHED_AT', 0)
+    @mock.patch.object(service.Service, '_PENDING_HEARTBEATS', set())
+    @mock.patch.object(db, 'service_heartbeat',
+                       side_effect=test.TestingException)
+    def test_heartbeat_failure(self, mock_heartbeat):
+        service_obj = service.Service(context=self.context, id=1)
+
+        self.assertRaises(test.TestingException, service_obj.heartbeat)
+
+        # The heartbeat is kept to be written next time.
+        self.assertEqual({1}, service.Service._PENDING_HEARTBEATS)
+
+    @mock.patch.object(service.Service, '_HEARTBEATS_FLUSHED_AT', 0)
+    @mock.patch.object(service.Service, '_PENDING_HEARTBEATS', set())
+    @mock.patch('time.monotonic', return_value=100)
+    @mock.patch.object(db, 'service_heartbeat')
+    def test_flush_heartbeats(self, mock_heartbeat, mock_monotonic):
+        self.flags(heartbeat_flush_interval=10)
+        service.Service(context=self.context, id=1).heartbeat()
+        mock_heartbeat.reset_mock()
+        service.Service(context=self.context, id=2).heartbeat()
+        mock_heartbeat.assert_not_called()
+
+        # The buffered heartbeats are written without waiting for another one.
+        service.Service.flush_heartbeats(self.context)
+        mock_heartbeat.assert_called_once_with(self.context, [2])
+        self.assertEqual(set(), service.Service._PENDING_HEARTBEATS)
+
+        # Nothing is written when there is no buffered heartbeat.
+        mock_heartbeat.reset_mock()
+        service.Service.flush_heartbeats(self.context)
+        mock_heartbeat.assert_not_called()
+
+    def test_get_heartbeat_flush_interval(self):
+        self.flags(heartbeat_flush_interval=0)
+        self.assertEqual(0, service.get_heartbeat_flush_interval())
+        self.flags(heartbeat_flush_interval=10, report_interval=10,
+                   service_down_time=60)
+        self.assertEqual(10, service.get_heartbeat_flush_interval())
+        # The interval is capped so that services are not considered down.
+        self.flags(heartbeat_flush_interval=60)
+        self.assertEqual(25, service.get_heartbeat_flush_interval())
+        self.flags(service_down_time=10)
+        self.assertEqual(1, service.get_heartbeat_flush_interval())
+
     @mock.patch.object(db, 'service_create',
                        return_value=fake_service)
     def test_set_id_failure(self, db_mock):
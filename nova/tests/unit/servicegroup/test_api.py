@@ -61,6 +61,22 @@ class ServiceGroupApiTestCase(test.NoDBTestCase):
         self.assertIs(result, False)
         driver.is_up.assert_not_called()
 
+    def test_service_is_up_multi(self):
+        members = [{"host": "fake-host1", "topic": "compute",
+                    "forced_down": False},
+                   {"host": "fake-host2", "topic": "compute",
+                    "forced_down": True},
+                   {"host": "fake-host3", "topic": "compute",
+                    "forced_down": False}]
+        driver = self.servicegroup_api._driver
+        driver.is_up_multi = mock.MagicMock(return_value=[False, True])
+
+        result = self.servicegroup_api.service_is_up_multi(members)
+
+        self.assertEqual([False, False, True], result)
+        # Forced down members are not checked by the driver.
+        driver.is_up_multi.assert_called_once_with([members[0], members[2]])
+
     def test_get_updated_time(self):
         member = {"host": "fake-host",
                   "topic": "compute",
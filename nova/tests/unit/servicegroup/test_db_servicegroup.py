@@ -12,6 +12,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import datetime
 from unittest import mock
 
 import oslo_messaging as messaging
@@ -73,6 +74,26 @@ class DBServiceGroupTestCase(test.NoDBTestCase):
         result = self.servicegroup_api.service_is_up(service)
         self.assertTrue(result)
 
+    def test_is_up_multi(self):
+        now = timeutils.utcnow()
+        self.useFixture(utils_fixture.TimeFixture(now))
+        services = [
+            objects.Service(host='fake-host1', topic='compute',
+                            binary='nova-compute', created_at=now,
+                            last_seen_up=now, forced_down=False),
+            objects.Service(host='fake-host2', topic='compute',
+                            binary='nova-compute', created_at=now,
+                            last_seen_up=now - datetime.timedelta(
+                                seconds=self.down_time + 1),
+                            forced_down=False),
+            objects.Service(host='fake-host3', topic='compute',
+                            binary='nova-compute', created_at=now,
+                            last_seen_up=now, forced_down=True),
+        ]
+
+        self.assertEqual([True, False, False],
+                         self.servicegroup_api.service_is_up_multi(services))
+
     def test_join(self):
         service = mock.MagicMock(report_interval=1)
 
@@ -81,6 +102,33 @@ class DBServiceGroupTestCase(test.NoDBTestCase):
         service.tg.add_timer_args.assert_called_once_with(
             1, fn, args=[service], initial_delay=5)
 
+    def test_join_conductor_heartbeats(self):
+        self.flags(heartbeat_flush_interval=3, service_down_time=60)
+        service = mock.MagicMock(report_interval=1, binary='nova-conductor')
+
+        self.servicegroup_api.join('fake-host', 'fake-topic', service)
+        driver = self.servicegroup_api._driver
+        service.tg.add_timer_args.assert_has_calls([
+            mock.call(1, driver._report_state, args=[service],
+                      initial_delay=5),
+            mock.call(3, driver._flush_heartbeats, initial_delay=3)])
+
+    def test_join_heartbeats_not_conductor(self):
+        self.flags(heartbeat_flush_interval=3)
+        service = mock.MagicMock(report_interval=1, binary='nova-compute')
+
+        self.servicegroup_api.join('fake-host', 'fake-topic', service)
+        service.tg.add_timer_args.assert_called_once_with(
+            1, self.servicegroup_api._driver._report_state, args=[service],
+            initial_delay=5)
+
+    @mock.patch.object(objects.Service, 'flush_heartbeats',
+                       side_effect=test.TestingException)
+    def test_flush_heartbeats_error(self, mock_flush):
+        # The error is logged rather than stopping the timer.
+        self.servicegroup_api._driver._flush_heartbeats()
+        mock_flush.assert_called_once_with(mock.ANY)
+
     @mock.patch.object(objects.Service, 'save')
     def test_report_state(self, upd_mock):
         service_ref = objects.Service(host='fake-host', topic='compute',
@@ -93,6 +141,21 @@ class DBServiceGroupTestCase(test.NoDBTestCase):
         self.assertEqual(11, service_ref.report_count)
         self.assertFalse(service.model_disconnected)
 
+    @mock.patch.object(objects.Service, 'heartbeat')
+    @mock.patch.object(objects.Service, 'save')
+    def test_report_state_heartbeat(self, upd_mock, hb_mock):
+        self.flags(heartbeat_flush_interval=5)
+        service_ref = objects.Service(host='fake-host', topic='compute',
+                                      report_count=10)
+        service = mock.MagicMock(model_disconnected=True,
+                                 service_ref=service_ref)
+        fn = self.servicegroup_api._driver._report_state
+        fn(service)
+        hb_mock.assert_called_once_with()
+        upd_mock.assert_not_called()
+        self.assertEqual(10, service_ref.report_count)
+        self.assertFalse(service.model_disconnected)
+
     @mock.patch.object(objects.Service, 'save')
     def _test_report_state_error(self, exc_cls, upd_mock):
         upd_mock.side_effect = exc_cls("service save failed")
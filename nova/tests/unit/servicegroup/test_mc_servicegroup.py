@@ -47,6 +47,22 @@ class MemcachedServiceGroupTestCase(test.NoDBTestCase):
         self.assertTrue(self.servicegroup_api.service_is_up(service_ref))
         self.mc_client.get.assert_called_once_with('compute:fake-host')
 
+    def test_is_up_multi(self):
+        service_refs = [{'host': 'fake-host1', 'topic': 'compute'},
+                        {'host': 'fake-host2', 'topic': 'compute'}]
+        self.mc_client.get_multi.return_value = [timeutils.utcnow(), None]
+
+        self.assertEqual(
+            [True, False],
+            self.servicegroup_api.service_is_up_multi(service_refs))
+        self.mc_client.get_multi.assert_called_once_with(
+            ['compute:fake-host1', 'compute:fake-host2'])
+        self.mc_client.get.assert_not_called()
+
+    def test_is_up_multi_empty(self):
+        self.assertEqual([], self.servicegroup_api.service_is_up_multi([]))
+        self.mc_client.get_multi.assert_not_called()
+
     def test_join(self):
         service = mock.MagicMock(report_interval=1)
 
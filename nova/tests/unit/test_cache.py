@@ -57,3 +57,12 @@ class TestOsloCache(test.NoDBTestCase):
 
         methods_called = [a[0] for n, a, k in mock_cacheregion.mock_calls]
         self.assertEqual(['dogpile.cache.null'], methods_called)
+
+    def test_cache_client_get_multi(self):
+        region = cache_utils._get_custom_cache_region(
+            backend='oslo_cache.dict')
+        client = cache_utils.CacheClient(region)
+        client.set('foo', 1)
+        client.set('baz', 2)
+
+        self.assertEqual([1, None, 2], client.get_multi(['foo', 'bar', 'baz']))
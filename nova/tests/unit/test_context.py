@@ -292,6 +292,7 @@ class ContextTestCase(test.NoDBTestCase):
             timestamp='2015-03-02T22:31:56.641629')
         values2 = ctx.to_dict()
         expected_values = {'auth_token': None,
+                           'db_write_time': None,
                            'domain': None,
                            'is_admin': False,
                            'is_admin_project': True,
@@ -318,6 +319,26 @@ class ContextTestCase(test.NoDBTestCase):
             self.assertIn(k, values2)
             self.assertEqual(values2[k], v)
 
+    @mock.patch('nova.rpc.create_transport')
+    @mock.patch('nova.db.main.api.create_context_manager')
+    def test_db_write_time(self, mock_create_ctxt_mgr, mock_rpc):
+        ctxt = context.RequestContext('111', '222')
+        self.assertIsNone(ctxt.db_write_time)
+        # Writes done with copies of the context are seen by the original.
+        ctxt.elevated().db_write_time = 100.5
+        self.assertEqual(100.5, ctxt.db_write_time)
+        mapping = objects.CellMapping(
+            uuid=uuids.cell, database_connection='fake://',
+            transport_url='fake://')
+        with context.target_cell(ctxt, mapping) as cctxt:
+            cctxt.db_write_time = 200.5
+        self.assertEqual(200.5, ctxt.db_write_time)
+        # It follows the request over RPC.
+        ctxt2 = context.RequestContext.from_dict(ctxt.to_dict())
+        self.assertEqual(200.5, ctxt2.db_write_time)
+        ctxt2.db_write_time = 300.5
+        self.assertEqual(200.5, ctxt.db_write_time)
+
     @mock.patch.object(context.policy, 'authorize')
     def test_can(self, mock_authorize):
         mock_authorize.return_value = True
@@ -615,6 +636,91 @@ class ContextTestCase(test.NoDBTestCase):
         # NovaExceptions are not logged, the caller should handle them.
         mock_log_exception.assert_not_called()
 
+    @mock.patch('nova.context.LOG.exception', new=mock.Mock())
+    def test_scatter_gather_cells_circuit_breaker(self):
+        self.flags(cell_failure_threshold=2, cell_failure_retry_interval=30)
+        ctxt = context.get_context()
+        mapping0 = objects.CellMapping(database_connection='fake://db0',
+                                       transport_url='none:///',
+                                       uuid=objects.CellMapping.CELL0_UUID)
+        mapping1 = objects.CellMapping(database_connection='fake://db1',
+                                       transport_url='fake://mq1',
+                                       uuid=uuids.cell1)
+        mappings = objects.CellMappingList(objects=[mapping0, mapping1])
+        called = []
+        cell1_fails = [True]
+
+        def task(cctxt):
+            called.append(cctxt.cell_uuid)
+            if cctxt.cell_uuid == uuids.cell1 and cell1_fails[0]:
+                raise test.TestingException()
+            return mock.sentinel.result
+
+        # The first two calls to cell1 fail, which opens its circuit.
+        for i in range(2):
+            results = context.scatter_gather_cells(ctxt, mappings, 30, task)
+            self.assertIsInstance(results[uuids.cell1], Exception)
+        self.assertEqual(4, len(called))
+        self.assertEqual('open', context.CELL_HEALTH[uuids.cell1].state)
+
+        # cell1 is now skipped without being called.
+        results = context.scatter_gather_cells(ctxt, mappings, 30, task)
+        self.assertEqual(context.did_not_respond_sentinel,
+                         results[uuids.cell1])
+        self.assertEqual(mock.sentinel.result,
+                         results[objects.CellMapping.CELL0_UUID])
+        self.assertEqual(5, len(called))
+        self.assertNotIn(uuids.cell1, called[4:])
+
+        # Once the retry interval passed cell1 is probed again, and a
+        # successful call closes the circuit.
+        cell1_fails[0] = False
+        later = context.time.monotonic() + 31
+        with mock.patch.object(context.time, 'monotonic', return_value=later):
+            results = context.scatter_gather_cells(ctxt, mappings, 30, task)
+        self.assertEqual(mock.sentinel.result, results[uuids.cell1])
+        self.assertEqual('closed', context.CELL_HEALTH[uuids.cell1].state)
+        stats = context.CELL_HEALTH[uuids.cell1].stats()
+        self.assertEqual(0, stats['consecutive_failures'])
+        self.assertEqual(1, stats['skipped_calls'])
+
+    @mock.patch('nova.objects.InstanceList.get_by_filters')
+    def test_scatter_gather_cells_nova_exception_not_failure(self,
+                                                           mock_get_inst):
+        self.flags(cell_failure_threshold=1)
+        ctxt = context.get_context()
+        mapping1 = objects.CellMapping(database_connection='fake://db1',
+                                       transport_url='fake://mq1',
+                                       uuid=uuids.cell1)
+        mock_get_inst.side_effect = exception.NotFound()
+
+        for i in range(2):
+            context.scatter_gather_cells(
+                ctxt, [mapping1], 30, objects.InstanceList.get_by_filters, {})
+        self.assertEqual(2, mock_get_inst.call_count)
+        self.assertEqual('closed', context.CELL_HEALTH[uuids.cell1].state)
+
+    def test_cell_health_stats(self):
+        health = context._CellHealth()
+        self.assertEqual(
+            {'state': 'closed', 'consecutive_failures': 0,
+             'skipped_calls': 0, 'p50_ms': None, 'p95_ms': None,
+             'p99_ms': None},
+            health.stats())
+        for i in range(1, 101):
+            health.record(0, i / 1000.0, False)
+        stats = health.stats()
+        self.assertEqual(51.0, stats['p50_ms'])
+        self.assertEqual(96.0, stats['p95_ms'])
+        self.assertEqual(100.0, stats['p99_ms'])
+
+    def test_cell_health_report(self):
+        context.CELL_HEALTH[uuids.cell1] = context._CellHealth()
+        report = context.cell_health_report()
+        self.assertEqual(['state', 'consecutive_failures', 'skipped_calls',
+                          'p50_ms', 'p95_ms', 'p99_ms'],
+                         list(report[uuids.cell1].keys()))
+
     @mock.patch('nova.context.scatter_gather_cells')
     @mock.patch('nova.objects.CellMappingList.get_all')
     def test_scatter_gather_all_cells(self, mock_get_all, mock_scatter):
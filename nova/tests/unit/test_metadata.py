@@ -16,14 +16,18 @@
 
 """Tests for metadata service."""
 
+import collections
 import copy
 import hashlib
 import hmac
 import os
 import pickle
 import re
+import threading
 from unittest import mock
 
+import fixtures
+import futurist.waiters
 from keystoneauth1 import exceptions as ks_exceptions
 from keystoneauth1 import session
 from oslo_config import cfg
@@ -677,6 +681,17 @@ class OpenStackMetadataTestCase(test.TestCase):
         super(OpenStackMetadataTestCase, self).setUp()
         self.context = context.RequestContext('fake', 'fake')
         self.instance = fake_inst_obj(self.context)
+        # Reset the process-wide state of the dynamic vendordata driver.
+        self.useFixture(fixtures.MonkeyPatch(
+            'nova.api.metadata.vendordata_dynamic._SESSION', None))
+        self.useFixture(fixtures.MonkeyPatch(
+            'nova.api.metadata.vendordata_dynamic._RESULT_CACHE',
+            collections.OrderedDict()))
+        self.useFixture(fixtures.MonkeyPatch(
+            'nova.api.metadata.vendordata_dynamic.TARGET_STATS',
+            collections.defaultdict(collections.Counter)))
+        self.useFixture(fixtures.MonkeyPatch(
+            'nova.api.metadata.vendordata_dynamic._IN_FLIGHT', {}))
 
     def test_empty_device_metadata(self):
         fakes.stub_out_key_pair_funcs(self)
@@ -902,7 +917,7 @@ class OpenStackMetadataTestCase(test.TestCase):
         self.assertIn('vendor_data2.json', result)
         # assert that we never created a ksa session for dynamic vendordata if
         # we didn't make a request
-        self.assertIsNone(mdinst.vendordata_providers['DynamicJSON'].session)
+        self.assertIsNone(vendordata_dynamic._SESSION)
 
     def _test_vendordata2_response_inner(self, request_mock, response_code,
                                          include_rest_result=True):
@@ -1056,6 +1071,133 @@ class OpenStackMetadataTestCase(test.TestCase):
                           self._test_vendordata2_response_inner_exceptional,
                           request_mock, log_mock, ks_exceptions.SSLError)
 
+    def _get_dynamic_vendordata(self, targets):
+        self.flags(vendordata_providers=['DynamicJSON'],
+                   vendordata_dynamic_targets=targets, group='api')
+        inst = self.instance.obj_clone()
+        mdinst = fake_InstanceMetadata(self, inst)
+        vdpath = "/openstack/2016-10-06/vendor_data2.json"
+        return jsonutils.loads(mdinst.lookup(vdpath))
+
+    @mock.patch.object(vendordata_dynamic, '_load_ks_session')
+    def test_vendordata2_concurrent_targets(self, mock_load):
+        # Each target only responds once all the targets were called, which
+        # would time out if they were called one after the other.
+        barrier = threading.Barrier(3, timeout=5)
+
+        def fake_request(url, method, **kwargs):
+            barrier.wait()
+            return fake_requests.FakeResponse(
+                requests.codes.OK, content='{"url": "%s"}' % url)
+
+        mock_load.return_value.request.side_effect = fake_request
+        vd = self._get_dynamic_vendordata(
+            ['a@http://a.com', 'b@http://b.com', 'c@http://c.com'])
+
+        self.assertEqual(['a', 'b', 'c'], list(vd))
+        self.assertEqual({'url': 'http://b.com'}, vd['b'])
+        # The session is shared by all the requests.
+        mock_load.assert_called_once_with(vendordata_dynamic.CONF)
+
+        report = vendordata_dynamic.vendordata_report().data
+        self.assertEqual(
+            {'requests': 1, 'errors': 0, 'timeouts': 0},
+            {k: v for k, v in report['a'].items()
+             if k != 'average_latency_ms'})
+
+    @mock.patch.object(vendordata_dynamic.LOG, 'warning')
+    @mock.patch.object(vendordata_dynamic, '_load_ks_session')
+    def test_vendordata2_target_timeout(self, mock_load, mock_log):
+        self.flags(vendordata_dynamic_connect_timeout=3,
+                   vendordata_dynamic_read_timeout=0, group='api')
+        done = threading.Event()
+        futures = []
+        spawn = utils.spawn
+
+        def fake_spawn(*args, **kwargs):
+            future = spawn(*args, **kwargs)
+            futures.append(future)
+            return future
+
+        def cleanup():
+            # Let the requests we gave up on finish, so they are not leaked.
+            done.set()
+            futurist.waiters.wait_for_all(futures)
+
+        self.addCleanup(cleanup)
+        self.useFixture(fixtures.MockPatchObject(
+            utils, 'spawn', side_effect=fake_spawn))
+
+        def fake_request(url, method, **kwargs):
+            if url == 'http://slow.com':
+                done.wait()
+            return fake_requests.FakeResponse(
+                requests.codes.OK, content='{"color": "blue"}')
+
+        mock_request = mock_load.return_value.request
+        mock_request.side_effect = fake_request
+        # Do not wait for the whole timeout in the test.
+        wait_for_all = futurist.waiters.wait_for_all
+        with mock.patch('futurist.waiters.wait_for_all') as mock_wait:
+            mock_wait.side_effect = lambda fs, timeout: wait_for_all(fs, 0.5)
+            vd = self._get_dynamic_vendordata(
+                ['slow@http://slow.com', 'fast@http://fast.com'])
+            mock_wait.assert_called_once_with(mock.ANY, 3)
+
+        # The slow target is skipped, the others are still returned.
+        self.assertEqual({'slow': {}, 'fast': {'color': 'blue'}}, vd)
+        self.assertIn('Timed out', mock_log.call_args[0][0])
+        report = vendordata_dynamic.vendordata_report().data
+        self.assertEqual(1, report['slow']['timeouts'])
+        self.assertEqual(1, report['slow']['errors'])
+
+        self.flags(vendordata_dynamic_failure_fatal=True, group='api')
+        with mock.patch('futurist.waiters.wait_for_all'):
+            self.assertRaises(TimeoutError, self._get_dynamic_vendordata,
+                              ['slow@http://slow.com'])
+        # The request still running for the slow target was waited for again
+        # rather than starting another one.
+        self.assertEqual(2, len(futures))
+        self.assertEqual(2, mock_request.call_count)
+
+    @mock.patch.object(vendordata_dynamic, '_load_ks_session')
+    def test_vendordata2_cache(self, mock_load):
+        self.flags(vendordata_dynamic_cache_expiration=60, group='api')
+        mock_request = mock_load.return_value.request
+        mock_request.side_effect = [
+            fake_requests.FakeResponse(requests.codes.OK, content='{"a": 1}'),
+            ks_exceptions.BadRequest('Ta da!'),
+            ks_exceptions.BadRequest('Ta da!'),
+        ]
+        targets = ['web@http://fake.com', 'bad@http://bad.com']
+
+        with mock.patch.object(vendordata_dynamic, 'time') as mock_time:
+            mock_time.monotonic.return_value = 100
+            self.assertEqual({'web': {'a': 1}, 'bad': {}},
+                             self._get_dynamic_vendordata(targets))
+            # The failed request is not cached and is retried.
+            self.assertEqual({'web': {'a': 1}, 'bad': {}},
+                             self._get_dynamic_vendordata(targets))
+        self.assertEqual(3, mock_request.call_count)
+
+        mock_request.side_effect = [
+            fake_requests.FakeResponse(requests.codes.OK, content='{"a": 2}')]
+        with mock.patch.object(vendordata_dynamic, 'time') as mock_time:
+            mock_time.monotonic.return_value = 160
+            self.assertEqual({'web': {'a': 2}},
+                             self._get_dynamic_vendordata(targets[:1]))
+
+    @mock.patch.object(vendordata_dynamic, '_load_ks_session')
+    def test_vendordata2_cache_disabled(self, mock_load):
+        mock_request = mock_load.return_value.request
+        mock_request.return_value = fake_requests.FakeResponse(
+            requests.codes.OK, content='{"a": 1}')
+
+        self._get_dynamic_vendordata(['web@http://fake.com'])
+        self._get_dynamic_vendordata(['web@http://fake.com'])
+        self.assertEqual(2, mock_request.call_count)
+        self.assertEqual({}, vendordata_dynamic._RESULT_CACHE)
+
     def test_network_data_presence(self):
         inst = self.instance.obj_clone()
         mdinst = fake_InstanceMetadata(self, inst)
@@ -1112,6 +1254,9 @@ class MetadataHandlerTestCase(test.TestCase):
             return "foo"
 
         class CallableMD(object):
+            uuid = uuids.instance
+            address = None
+
             def lookup(self, path_info):
                 return verify
 
@@ -1405,6 +1550,68 @@ class MetadataHandlerTestCase(test.TestCase):
         self._metadata_handler_with_remote_address(hnd)
         self.assertEqual(2, get_by_uuid.call_count)
 
+    @mock.patch.object(base, 'get_metadata_by_address')
+    def test_metadata_handler_concurrent_cache_miss(self, get_by_address):
+        # Concurrent requests missing the cache share a single build of the
+        # metadata.
+        self.flags(metadata_cache_expiration=15, group='api')
+        hnd = handler.MetadataRequestHandler()
+        started = threading.Event()
+        release = threading.Event()
+
+        def get_metadata(address):
+            started.set()
+            release.wait()
+            return self.mdinst
+
+        get_by_address.side_effect = get_metadata
+        results = []
+
+        def request():
+            results.append(hnd.get_metadata_by_remote_address('192.0.2.1'))
+
+        threads = [threading.Thread(target=request) for _ in range(5)]
+        threads[0].start()
+        started.wait()
+        for thread in threads[1:]:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([self.mdinst] * 5, results)
+        get_by_address.assert_called_once_with('192.0.2.1')
+
+    def test_metadata_handler_document_cache(self):
+        self.flags(metadata_cache_expiration=15, group='api')
+        hnd = handler.MetadataRequestHandler()
+        with mock.patch.object(self.mdinst, 'lookup',
+                               wraps=self.mdinst.lookup) as mock_lookup:
+            for _ in range(2):
+                response = fake_request(self, self.mdinst,
+                                        '/openstack/latest/meta_data.json',
+                                        app=hnd)
+                self.assertEqual(200, response.status_int)
+                self.assertEqual('application/json', response.content_type)
+            mock_lookup.assert_called_once_with(
+                '/openstack/latest/meta_data.json')
+            # Other paths are rendered separately.
+            response = fake_request(self, self.mdinst,
+                                    '/2009-04-04/user-data', app=hnd)
+            self.assertEqual(base64.decode_as_bytes(self.instance.user_data),
+                             response.body)
+            self.assertEqual(2, mock_lookup.call_count)
+
+    def test_metadata_handler_document_cache_disabled(self):
+        self.flags(metadata_cache_expiration=0, group='api')
+        hnd = handler.MetadataRequestHandler()
+        with mock.patch.object(self.mdinst, 'lookup',
+                               wraps=self.mdinst.lookup) as mock_lookup:
+            for _ in range(2):
+                fake_request(self, self.mdinst,
+                             '/openstack/latest/meta_data.json', app=hnd)
+            self.assertEqual(2, mock_lookup.call_count)
+
     @mock.patch.object(neutronapi, 'get_client', return_value=mock.Mock())
     def test_metadata_lb_proxy(self, mock_get_client):
 
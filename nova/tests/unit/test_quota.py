@@ -2288,6 +2288,126 @@ class QuotaCountTestCase(test.NoDBTestCase):
                                          mock.sentinel.project_id)
         mock_uid_qfd_populated.assert_not_called()
 
+    def _test_legacy_count_cached(self, user_id=None):
+        patcher = mock.patch('nova.context.scatter_gather_cells')
+        mock_sg = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.flags(usage_cache_ttl=60, group='quota')
+        self.flags(instance_list_per_project_cells=False, group='api')
+        self.useFixture(nova_fixtures.SingleCellSimple())
+        cell_counts = {'project': {'instances': 2, 'cores': 4, 'ram': 1024}}
+        if user_id:
+            cell_counts['user'] = {'instances': 1, 'cores': 2, 'ram': 512}
+        mock_sg.return_value = {uuids.cell1: cell_counts}
+        ctxt = context.RequestContext('fake-user', 'fake-project')
+
+        counts = quota._instances_cores_ram_count_legacy(
+            ctxt, 'fake-project', user_id=user_id)
+        self.assertEqual(cell_counts, counts)
+        # Modifying the returned counts must not modify the cached counts.
+        counts['project']['instances'] = 100
+        counts = quota._instances_cores_ram_count_legacy(
+            ctxt, 'fake-project', user_id=user_id)
+        self.assertEqual(cell_counts, counts)
+        mock_sg.assert_called_once()
+        return mock_sg, ctxt
+
+    def test_instances_cores_ram_count_legacy_cached(self):
+        self._test_legacy_count_cached()
+
+    def test_instances_cores_ram_count_legacy_cached_user(self):
+        self._test_legacy_count_cached(user_id='fake-user')
+
+    def test_instances_cores_ram_count_legacy_cache_expired(self):
+        mock_sg, ctxt = self._test_legacy_count_cached()
+        expired = quota.time.monotonic() + 61
+        with mock.patch.object(quota.time, 'monotonic', return_value=expired):
+            quota._instances_cores_ram_count_legacy(ctxt, 'fake-project')
+        self.assertEqual(2, mock_sg.call_count)
+
+    def test_instances_cores_ram_count_legacy_cache_invalidated(self):
+        mock_sg, ctxt = self._test_legacy_count_cached()
+        quota.invalidate_cached_usage('other-project')
+        quota._instances_cores_ram_count_legacy(ctxt, 'fake-project')
+        self.assertEqual(1, mock_sg.call_count)
+        quota.invalidate_cached_usage('fake-project')
+        quota._instances_cores_ram_count_legacy(ctxt, 'fake-project')
+        self.assertEqual(2, mock_sg.call_count)
+
+    def test_instances_cores_ram_count_legacy_not_cached_after_delete(self):
+        mock_sg, ctxt = self._test_legacy_count_cached()
+        quota.invalidate_cached_usage_for_delete('fake-project')
+        # The counts are not cached while the delete may be in progress.
+        for i in range(2):
+            quota._instances_cores_ram_count_legacy(ctxt, 'fake-project')
+        self.assertEqual(3, mock_sg.call_count)
+        self.assertEqual({}, quota.USAGE_CACHE)
+
+        # But they are cached again once the TTL has passed.
+        later = quota.time.monotonic() + 60
+        with mock.patch.object(quota.time, 'monotonic', return_value=later):
+            for i in range(2):
+                quota._instances_cores_ram_count_legacy(ctxt, 'fake-project')
+        self.assertEqual(4, mock_sg.call_count)
+        self.assertEqual({}, quota.USAGE_DELETED_AT)
+
+    @mock.patch('nova.context.scatter_gather_cells')
+    def test_instances_cores_ram_count_legacy_cell_down_not_cached(
+            self, mock_sg):
+        self.flags(usage_cache_ttl=60, group='quota')
+        self.flags(instance_list_per_project_cells=False, group='api')
+        self.useFixture(nova_fixtures.SingleCellSimple())
+        mock_sg.return_value = {uuids.cell1: context.did_not_respond_sentinel}
+        ctxt = context.RequestContext('fake-user', 'fake-project')
+
+        for i in range(2):
+            counts = quota._instances_cores_ram_count_legacy(
+                ctxt, 'fake-project')
+            self.assertEqual(
+                {'project': {'instances': 0, 'cores': 0, 'ram': 0}}, counts)
+        self.assertEqual(2, mock_sg.call_count)
+
+    @mock.patch('nova.context.scatter_gather_cells')
+    def test_instances_cores_ram_count_legacy_not_cached_by_default(
+            self, mock_sg):
+        self.useFixture(nova_fixtures.SingleCellSimple())
+        mock_sg.return_value = {}
+        ctxt = context.RequestContext('fake-user', 'fake-project')
+
+        quota._instances_cores_ram_count_legacy(ctxt, 'fake-project')
+        quota._instances_cores_ram_count_legacy(ctxt, 'fake-project')
+        self.assertEqual(2, mock_sg.call_count)
+        self.assertEqual({}, quota.USAGE_CACHE)
+
+    def test_adjust_cached_usage(self):
+        self.flags(usage_cache_ttl=60, group='quota')
+        project = {'instances': 2, 'cores': 4, 'ram': 1024}
+        user = {'instances': 1, 'cores': 2, 'ram': 512}
+        quota.USAGE_CACHE.update({
+            ('fake-project', None): (0, {'project': dict(project)}),
+            ('fake-project', 'fake-user'): (
+                0, {'project': dict(project), 'user': dict(user)}),
+            ('fake-project', 'other-user'): (
+                0, {'project': dict(project), 'user': dict(user)}),
+            ('other-project', None): (0, {'project': dict(project)}),
+        })
+
+        quota.adjust_cached_usage('fake-project', 'fake-user', instances=1,
+                                  cores=2, ram=512)
+
+        new_project = {'instances': 3, 'cores': 6, 'ram': 1536}
+        self.assertEqual({'project': new_project},
+                         quota.USAGE_CACHE[('fake-project', None)][1])
+        self.assertEqual(
+            {'project': new_project,
+             'user': {'instances': 2, 'cores': 4, 'ram': 1024}},
+            quota.USAGE_CACHE[('fake-project', 'fake-user')][1])
+        self.assertEqual(
+            {'project': new_project, 'user': user},
+            quota.USAGE_CACHE[('fake-project', 'other-user')][1])
+        self.assertEqual({'project': project},
+                         quota.USAGE_CACHE[('other-project', None)][1])
+
 
 class LegacyGroupMemberQuotaTestCase(test.NoDBTestCase):
     @mock.patch('nova.objects.BuildRequestList.get_by_filters')
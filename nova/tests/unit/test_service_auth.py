@@ -10,10 +10,12 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import datetime
 from unittest import mock
 
 from keystoneauth1 import loading as ks_loading
 from keystoneauth1 import service_token
+from keystoneauth1 import session as ks_session
 
 from nova import context
 from nova import service_auth
@@ -68,3 +70,40 @@ class ServiceAuthTestCase(test.NoDBTestCase):
                 self.ctx, user_auth=user_auth)
 
         self.assertEqual(user_auth, result.user_auth)
+
+    def test_get_service_auth_session_cached(self):
+        session = service_auth.get_service_auth_session('neutron')
+        self.assertIsInstance(session, ks_session.Session)
+        self.assertIs(
+            session, service_auth.get_service_auth_session('neutron'))
+
+    def test_get_service_auth_session_records_responses(self):
+        session = service_auth.get_service_auth_session('neutron')
+        hook = session.session.hooks['response'][-1]
+        for status_code, elapsed in ((200, 0.1), (503, 0.3)):
+            hook(mock.Mock(url='https://neutron:9696/v2.0/ports',
+                           status_code=status_code,
+                           elapsed=datetime.timedelta(seconds=elapsed)))
+        hook(mock.Mock(url='https://keystone/v3/auth/tokens', status_code=201,
+                       elapsed=datetime.timedelta(seconds=0.05)))
+
+        self.assertEqual(
+            {'[neutron] https://neutron:9696': {
+                'requests': 2, 'errors': 1, 'average_latency_ms': 200},
+             '[neutron] https://keystone': {
+                'requests': 1, 'errors': 0, 'average_latency_ms': 50}},
+            dict(service_auth.endpoint_report().data))
+
+        service_auth.reset_globals()
+        self.assertEqual({}, dict(service_auth.endpoint_report().data))
+
+    @mock.patch.object(ks_loading, 'load_adapter_from_conf_options',
+                       wraps=ks_loading.load_adapter_from_conf_options)
+    def test_get_service_adapter_parameters(self, mock_load):
+        self.flags(region_name='RegionTwo', group='neutron')
+
+        for _ in range(2):
+            params = service_auth.get_service_adapter_parameters('neutron')
+            self.assertEqual('network', params['service_type'])
+            self.assertEqual('RegionTwo', params['region_name'])
+        mock_load.assert_called_once_with(mock.ANY, 'neutron', session=None)
@@ -1596,6 +1596,60 @@ class SpawnOnTestCase(test.NoDBTestCase):
             'pool.', 'unknown', task)
 
 
+class RunConcurrentlyTestCase(test.NoDBTestCase):
+
+    def test_run_concurrently_serial(self):
+        calls = []
+
+        def func(item):
+            calls.append((item, threading.current_thread()))
+            return item * 2
+
+        results = utils.run_concurrently(func, [1, 2, 3], 1)
+
+        self.assertEqual([(2, None), (4, None), (6, None)], results)
+        # The calls are made one after another in the calling thread.
+        self.assertEqual([(1, threading.current_thread()),
+                          (2, threading.current_thread()),
+                          (3, threading.current_thread())], calls)
+
+    def test_run_concurrently(self):
+        # Each call waits for the two others, so this would time out if the
+        # calls were made one after another.
+        barrier = threading.Barrier(3, timeout=10)
+
+        def func(item):
+            barrier.wait()
+            return item * 2
+
+        self.assertEqual([(2, None), (4, None), (6, None)],
+                         utils.run_concurrently(func, [1, 2, 3], 5))
+
+    def test_run_concurrently_skip_after_failure(self):
+        error = ValueError()
+        func = mock.Mock(side_effect=[2, error])
+
+        self.assertEqual([(2, None), (None, error), (None, None)],
+                         utils.run_concurrently(func, [1, 2, 3], 1))
+        self.assertEqual([mock.call(1), mock.call(2)], func.call_args_list)
+
+    def test_run_concurrently_failure(self):
+        error = ValueError()
+        barrier = threading.Barrier(2, timeout=10)
+
+        def func(item):
+            barrier.wait()
+            if item == 2:
+                raise error
+            return item * 2
+
+        self.assertEqual([(2, None), (None, error)],
+                         utils.run_concurrently(func, [1, 2], 2))
+
+    def test_run_concurrently_no_items(self):
+        self.assertEqual([], utils.run_concurrently(mock.Mock(), [], 5))
+
+
 class ExecutorStatsTestCase(test.NoDBTestCase):
 
     def setUp(self):
@@ -26450,6 +26450,51 @@ class LibvirtDriverTestCase(test.NoDBTestCase, TraitsComparisonMixin):
                                     None)
         self.assertFalse(mock_inject.called)
 
+    @mock.patch('nova.virt.images.get_info')
+    def test_link_cached_image_by_content_disabled(self, mock_get_info):
+        drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+
+        self.assertIsNone(drvr._link_cached_image_by_content(
+            self.context, uuids.image, 'fname'))
+        mock_get_info.assert_not_called()
+
+    @mock.patch('os.path.exists', return_value=True)
+    @mock.patch('nova.virt.images.get_info')
+    def test_link_cached_image_by_content_already_cached(
+            self, mock_get_info, mock_exists):
+        self.flags(deduplicate_images=True, group='image_cache')
+        drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+
+        self.assertIsNone(drvr._link_cached_image_by_content(
+            self.context, uuids.image, 'fname'))
+        mock_get_info.assert_not_called()
+
+    @mock.patch.object(imagecache.ImageCacheManager, 'link_by_content')
+    @mock.patch('nova.virt.images.get_info')
+    def test_link_cached_image_by_content(self, mock_get_info, mock_link):
+        self.flags(deduplicate_images=True, group='image_cache')
+        mock_get_info.return_value = {
+            'os_hash_algo': 'sha512', 'os_hash_value': 'abc'}
+        drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+        content_fname = imagecache.get_cache_fname('sha512:abc')
+
+        self.assertEqual(content_fname, drvr._link_cached_image_by_content(
+            self.context, uuids.image, 'fname'))
+        mock_get_info.assert_called_once_with(self.context, uuids.image)
+        mock_link.assert_called_once_with('fname', content_fname)
+
+    @mock.patch.object(imagecache.ImageCacheManager, 'link_by_content')
+    @mock.patch('nova.virt.images.get_info')
+    def test_link_cached_image_by_content_no_hash(self, mock_get_info,
+                                                  mock_link):
+        self.flags(deduplicate_images=True, group='image_cache')
+        mock_get_info.return_value = {}
+        drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+
+        self.assertIsNone(drvr._link_cached_image_by_content(
+            self.context, uuids.image, 'fname'))
+        mock_link.assert_not_called()
+
     @mock.patch('nova.virt.libvirt.utils.fetch_image')
     @mock.patch('nova.storage.rbd_utils.RBDDriver')
     @mock.patch.object(imagebackend, 'IMAGE_API')
@@ -31740,6 +31785,9 @@ class _BaseSnapshotTests(test.NoDBTestCase):
 
         self.mock_update_task_state = mock.Mock()
 
+        self.mock_event_reporter = self.useFixture(fixtures.MockPatchObject(
+            compute_utils, 'EventReporter')).mock
+
         test_instance = _create_test_instance()
         self.instance_ref = objects.Instance(**test_instance)
         self.instance_ref.info_cache = objects.InstanceInfoCache(
@@ -31857,6 +31905,21 @@ class LibvirtSnapshotTests(_BaseSnapshotTests):
     def test_ploop(self, mock_convert_image):
         self._test_snapshot(disk_format='ploop')
 
+    @mock.patch('nova.virt.libvirt.utils.get_disk_type_from_path',
+                new=mock.Mock(return_value=None))
+    @mock.patch('nova.virt.libvirt.utils.find_disk',
+                new=mock.Mock(return_value=('filename', 'qcow2')))
+    def test_snapshot_reports_events(self):
+        self._test_snapshot(disk_format='qcow2')
+
+        self.mock_event_reporter.assert_has_calls([
+            mock.call(self.context, 'compute_snapshot_extract', CONF.host,
+                      self.instance_ref.uuid, graceful_exit=True),
+            mock.call(self.context, 'compute_snapshot_upload', CONF.host,
+                      self.instance_ref.uuid, graceful_exit=True),
+        ], any_order=True)
+        self.assertEqual(2, self.mock_event_reporter.call_count)
+
     @mock.patch('nova.virt.libvirt.utils.get_disk_type_from_path',
                 new=mock.Mock(return_value=None))
     @mock.patch('nova.virt.libvirt.utils.find_disk',
@@ -95,6 +95,9 @@ class _ImageTestCase(object):
         # Ensure can_fallocate is not initialised on the class
         if hasattr(self.image_class, 'can_fallocate'):
             del self.image_class.can_fallocate
+        # Ensure can_reflink is not initialised on the class
+        if hasattr(self.image_class, 'can_reflink'):
+            del self.image_class.can_reflink
 
         # This will be used to mock some decorations like utils.synchronize
         def _fake_deco(func):
@@ -402,22 +405,64 @@ class FlatTestCase(_ImageTestCase, test.NoDBTestCase):
             # raise AssertionError which, if we get here, it clearly didn't.
             self.assertFalse(image.resize_image.called)
 
+    @mock.patch.object(imagebackend.Flat, '_can_reflink', return_value=False)
     @mock.patch.object(imagebackend.disk, 'extend')
     @mock.patch('nova.virt.libvirt.utils.copy_image')
     @mock.patch.object(imagebackend.utils, 'synchronized')
     @mock.patch('nova.privsep.path.utime')
-    def test_create_image(self, mock_utime, mock_sync, mock_copy, mock_extend):
+    def test_create_image(self, mock_utime, mock_sync, mock_copy, mock_extend,
+                          mock_reflink):
         mock_sync.side_effect = lambda *a, **kw: self._fake_deco
         fn = mock.MagicMock()
         image = self.image_class(self.INSTANCE, self.NAME)
         image.create_image(fn, self.TEMPLATE_PATH, None, image_id=None)
 
-        mock_copy.assert_called_once_with(self.TEMPLATE_PATH, self.PATH)
+        mock_copy.assert_called_once_with(self.TEMPLATE_PATH, self.PATH,
+                                          reflink=False)
         fn.assert_called_once_with(target=self.TEMPLATE_PATH, image_id=None)
         self.assertTrue(mock_sync.called)
         self.assertFalse(mock_extend.called)
         mock_utime.assert_called()
 
+    @mock.patch.object(imagebackend.Flat, '_can_reflink', return_value=True)
+    @mock.patch('nova.virt.libvirt.utils.copy_image')
+    @mock.patch.object(imagebackend.utils, 'synchronized')
+    @mock.patch('nova.privsep.path.utime')
+    def test_create_image_reflink(self, mock_utime, mock_sync, mock_copy,
+                                  mock_reflink):
+        mock_sync.side_effect = lambda *a, **kw: self._fake_deco
+        fn = mock.MagicMock()
+        image = self.image_class(self.INSTANCE, self.NAME)
+        image.create_image(fn, self.TEMPLATE_PATH, None, image_id=None)
+
+        mock_copy.assert_called_once_with(self.TEMPLATE_PATH, self.PATH,
+                                          reflink=True)
+
+    def test_can_reflink(self):
+        fake_processutils.fake_execute_clear_log()
+        fake_processutils.stub_out_processutils_execute(self)
+        os.makedirs(os.path.dirname(self.PATH))
+        image = self.image_class(self.INSTANCE, self.NAME)
+
+        # Call twice to verify testing reflink is only done once.
+        self.assertTrue(image._can_reflink())
+        self.assertTrue(image._can_reflink())
+
+        test_path = self.PATH + '.reflink_test'
+        self.assertEqual(
+            ['cp --reflink=always %s %s.clone' % (test_path, test_path)],
+            fake_processutils.fake_execute_get_log())
+        self.assertFalse(os.path.exists(test_path))
+
+    @mock.patch('oslo_concurrency.processutils.trycmd',
+                return_value=('', 'Operation not supported'))
+    def test_can_reflink_not_supported(self, mock_trycmd):
+        os.makedirs(os.path.dirname(self.PATH))
+        image = self.image_class(self.INSTANCE, self.NAME)
+
+        self.assertFalse(image._can_reflink())
+        self.assertFalse(os.path.exists(self.PATH + '.reflink_test'))
+
     @mock.patch.object(imagebackend.disk, 'extend')
     @mock.patch('nova.virt.libvirt.utils.copy_image')
     @mock.patch.object(imagebackend.utils, 'synchronized')
@@ -433,6 +478,7 @@ class FlatTestCase(_ImageTestCase, test.NoDBTestCase):
         self.assertTrue(mock_sync.called)
         self.assertFalse(mock_extend.called)
 
+    @mock.patch.object(imagebackend.Flat, '_can_reflink', return_value=False)
     @mock.patch.object(imagebackend.disk, 'extend')
     @mock.patch('nova.virt.libvirt.utils.copy_image')
     @mock.patch.object(imagebackend.utils, 'synchronized')
@@ -440,7 +486,7 @@ class FlatTestCase(_ImageTestCase, test.NoDBTestCase):
                        return_value=imageutils.QemuImgInfo())
     @mock.patch('nova.privsep.path.utime')
     def test_create_image_extend(self, mock_utime, mock_qemu, mock_sync,
-                                 mock_copy, mock_extend):
+                                 mock_copy, mock_extend, mock_reflink):
         mock_sync.side_effect = lambda *a, **kw: self._fake_deco
         fn = mock.MagicMock()
         mock_qemu.return_value.virtual_size = 1024
@@ -450,7 +496,8 @@ class FlatTestCase(_ImageTestCase, test.NoDBTestCase):
         image.create_image(fn, self.TEMPLATE_PATH,
                            self.SIZE, image_id=None)
 
-        mock_copy.assert_called_once_with(self.TEMPLATE_PATH, self.PATH)
+        mock_copy.assert_called_once_with(self.TEMPLATE_PATH, self.PATH,
+                                          reflink=False)
         self.assertTrue(mock_sync.called)
         mock_extend.assert_called_once_with(
             imgmodel.LocalFileImage(self.PATH, imgmodel.FORMAT_RAW),
@@ -20,11 +20,13 @@ import os
 import time
 from unittest import mock
 
+import fixtures
 from oslo_concurrency import lockutils
 from oslo_concurrency import processutils
 from oslo_log import formatters
 from oslo_log import log as logging
 from oslo_utils.fixture import uuidsentinel as uuids
+from oslo_utils import units
 
 from nova.compute import manager as compute_manager
 import nova.conf
@@ -67,6 +69,17 @@ class GetCacheFnameTestCase(test.NoDBTestCase):
         cache_name = imagecache.get_cache_fname(image_id)
         self.assertEqual(expected_cache_name, cache_name)
 
+    def test_get_content_cache_fname(self):
+        image_info = {'os_hash_algo': 'sha512', 'os_hash_value': 'abc'}
+
+        self.assertEqual(imagecache.get_cache_fname('sha512:abc'),
+                         imagecache.get_content_cache_fname(image_info))
+
+    def test_get_content_cache_fname_no_hash(self):
+        self.assertIsNone(imagecache.get_content_cache_fname({}))
+        self.assertIsNone(imagecache.get_content_cache_fname(
+            {'os_hash_algo': 'sha512', 'os_hash_value': None}))
+
 
 class ImageCacheManagerTestCase(test.NoDBTestCase):
 
@@ -609,7 +622,9 @@ class ImageCacheManagerTestCase(test.NoDBTestCase):
                 'soft_deleted': True,
             }
             mock_instance_list.assert_called_once_with(
-                ctxt, filters, expected_attrs=[], use_slave=True)
+                ctxt, filters, expected_attrs=[], use_slave=True,
+                only_fields=['host', 'image_ref', 'kernel_id', 'os_type',
+                             'ramdisk_id', 'task_state', 'vm_state'])
 
     def test_store_swap_image(self):
         image_cache_manager = imagecache.ImageCacheManager()
@@ -800,3 +815,243 @@ class ImageCacheManagerTestCase(test.NoDBTestCase):
         manager = imagecache.ImageCacheManager()
 
         self.assertEqual(0, manager.get_disk_usage())
+
+
+class ImageCacheManifestTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(ImageCacheManifestTestCase, self).setUp()
+        self.tmpdir = self.useFixture(fixtures.TempDir()).path
+        self.flags(instances_path=self.tmpdir)
+        self.flags(use_manifest=True, group='image_cache')
+        self.base_dir = os.path.join(self.tmpdir, '_base')
+        os.mkdir(self.base_dir)
+        self.manager = imagecache.ImageCacheManager()
+        self.ctxt = context.get_admin_context()
+        self.useFixture(fixtures.MockPatch(
+            'nova.objects.BlockDeviceMappingList.bdms_by_instance_uuid',
+            return_value={}))
+
+    def _make_base_file(self, fname, size=1):
+        with open(os.path.join(self.base_dir, fname), 'wb') as f:
+            f.write(b'\0' * size)
+
+    def _fake_instance(self, uuid, image_ref):
+        return fake_instance.fake_instance_obj(
+            self.ctxt, uuid=uuid, image_ref=image_ref, kernel_id=None,
+            ramdisk_id=None, host=CONF.host, vm_state='active',
+            task_state=None)
+
+    def test_record_image_use_and_release(self):
+        fname = imagecache.get_cache_fname(uuids.image)
+        self._make_base_file(fname, size=10)
+        instance = self._fake_instance(uuids.instance, uuids.image)
+
+        self.manager.record_image_use(fname, instance)
+
+        entries = self.manager.manifest.entries()
+        self.assertEqual(10, entries[fname]['size'])
+        self.assertEqual([uuids.instance], entries[fname]['users'])
+
+        self.manager.release_instance(instance)
+
+        entries = self.manager.manifest.entries()
+        self.assertEqual([], entries[fname]['users'])
+
+    def test_record_image_use_disabled(self):
+        self.flags(use_manifest=False, group='image_cache')
+        fname = imagecache.get_cache_fname(uuids.image)
+        self._make_base_file(fname)
+        instance = self._fake_instance(uuids.instance, uuids.image)
+
+        self.manager.record_image_use(fname, instance)
+
+        self.assertFalse(self.manager.manifest.exists())
+
+    def test_record_image_use_not_cached(self):
+        instance = self._fake_instance(uuids.instance, uuids.image)
+
+        self.manager.record_image_use('missing', instance)
+
+        self.assertEqual({}, self.manager.manifest.entries())
+
+    def test_corrupt_manifest_is_ignored(self):
+        with open(self.manager.manifest.path, 'w') as f:
+            f.write('not json')
+
+        self.assertEqual({}, self.manager.manifest.entries())
+
+    def test_update_seeds_manifest_once(self):
+        fname = imagecache.get_cache_fname(uuids.image)
+        self._make_base_file(fname)
+
+        self.manager.update(self.ctxt, [])
+        self.assertIn(fname, self.manager.manifest.entries())
+
+        with mock.patch.object(imagecache.ImageCacheManifest,
+                               'seed') as mock_seed:
+            self.manager.update(self.ctxt, [])
+        mock_seed.assert_not_called()
+
+    def test_update_evicts_old_unused_files(self):
+        self.flags(remove_unused_original_minimum_age_seconds=3600,
+                   group='image_cache')
+        used = imagecache.get_cache_fname(uuids.used)
+        old = imagecache.get_cache_fname(uuids.old)
+        young = imagecache.get_cache_fname(uuids.young)
+        for fname in (used, old, young):
+            self._make_base_file(fname)
+            self.manager.manifest.record_use(fname)
+        instance = self._fake_instance(uuids.instance, uuids.used)
+
+        now = time.time()
+        with mock.patch.object(time, 'time', return_value=now + 1800):
+            self.manager.manifest.record_use(young)
+        with mock.patch.object(time, 'time', return_value=now + 3700):
+            self.manager.update(self.ctxt, [instance])
+
+        entries = self.manager.manifest.entries()
+        self.assertEqual(set([used, young]), set(entries))
+        self.assertTrue(os.path.exists(os.path.join(self.base_dir, used)))
+        self.assertFalse(os.path.exists(os.path.join(self.base_dir, old)))
+
+    def test_update_evicts_lru_files_over_max_size(self):
+        self.flags(max_size_mb=2, group='image_cache')
+        fnames = [imagecache.get_cache_fname(getattr(uuids, 'image%d' % i))
+                  for i in range(3)]
+        now = time.time()
+        for i, fname in enumerate(fnames):
+            self._make_base_file(fname, size=units.Mi)
+            with mock.patch.object(time, 'time', return_value=now + i):
+                self.manager.manifest.record_use(fname)
+
+        self.manager.update(self.ctxt, [])
+
+        # Only the least recently used file had to be evicted to get back
+        # under the limit, even though none of the files are old enough.
+        self.assertEqual(set(fnames[1:]),
+                         set(self.manager.manifest.entries()))
+
+    def test_update_counts_hard_links_once(self):
+        self.flags(max_size_mb=2, group='image_cache')
+        fname = imagecache.get_cache_fname(uuids.image)
+        content_fname = imagecache.get_cache_fname('sha512:abc')
+        other = imagecache.get_cache_fname(uuids.other)
+        self._make_base_file(fname, size=units.Mi)
+        self._make_base_file(other, size=units.Mi)
+        self.manager.index_by_content(fname, content_fname)
+        for name in (fname, content_fname, other):
+            self.manager.manifest.record_use(name)
+
+        self.manager.update(self.ctxt, [])
+
+        # The two names of the same content only take up its size once, so
+        # the cache is not over the limit and nothing is evicted.
+        self.assertEqual({fname, content_fname, other},
+                         set(self.manager.manifest.entries()))
+
+    def test_update_never_evicts_files_in_use(self):
+        self.flags(max_size_mb=1, group='image_cache')
+        self.flags(remove_unused_original_minimum_age_seconds=0,
+                   group='image_cache')
+        fname = imagecache.get_cache_fname(uuids.image)
+        self._make_base_file(fname, size=2 * units.Mi)
+        instance = self._fake_instance(uuids.instance, uuids.image)
+        self.manager.record_image_use(fname, instance)
+
+        self.manager.update(self.ctxt, [instance])
+
+        self.assertTrue(os.path.exists(os.path.join(self.base_dir, fname)))
+        self.assertEqual([uuids.instance],
+                         self.manager.manifest.entries()[fname]['users'])
+
+    def test_update_drops_stale_users(self):
+        self.flags(remove_unused_original_minimum_age_seconds=0,
+                   group='image_cache')
+        fname = imagecache.get_cache_fname(uuids.image)
+        self._make_base_file(fname)
+        instance = self._fake_instance(uuids.instance, uuids.image)
+        self.manager.record_image_use(fname, instance)
+
+        # The instance is gone but was never released, e.g. because the
+        # compute service died while deleting it.
+        self.manager.update(self.ctxt, [])
+
+        self.assertFalse(os.path.exists(os.path.join(self.base_dir, fname)))
+        self.assertEqual({}, self.manager.manifest.entries())
+
+
+class ImageCacheDeduplicationTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(ImageCacheDeduplicationTestCase, self).setUp()
+        self.tmpdir = self.useFixture(fixtures.TempDir()).path
+        self.flags(instances_path=self.tmpdir)
+        self.base_dir = os.path.join(self.tmpdir, '_base')
+        os.mkdir(self.base_dir)
+        self.manager = imagecache.ImageCacheManager()
+        self.fname = imagecache.get_cache_fname(uuids.image)
+        self.content_fname = imagecache.get_cache_fname('sha512:abc')
+
+    def _path(self, fname):
+        return os.path.join(self.base_dir, fname)
+
+    def test_link_by_content(self):
+        with open(self._path(self.content_fname), 'w') as f:
+            f.write('data')
+
+        self.assertTrue(
+            self.manager.link_by_content(self.fname, self.content_fname))
+
+        self.assertTrue(os.path.samefile(self._path(self.fname),
+                                         self._path(self.content_fname)))
+
+    def test_link_by_content_not_cached(self):
+        self.assertFalse(
+            self.manager.link_by_content(self.fname, self.content_fname))
+        self.assertFalse(os.path.exists(self._path(self.fname)))
+
+    def test_link_by_content_already_cached(self):
+        for fname in (self.fname, self.content_fname):
+            with open(self._path(fname), 'w') as f:
+                f.write(fname)
+
+        self.assertFalse(
+            self.manager.link_by_content(self.fname, self.content_fname))
+        self.assertFalse(os.path.samefile(self._path(self.fname),
+                                          self._path(self.content_fname)))
+
+    def test_index_by_content(self):
+        with open(self._path(self.fname), 'w') as f:
+            f.write('data')
+
+        self.manager.index_by_content(self.fname, self.content_fname)
+
+        self.assertTrue(os.path.samefile(self._path(self.fname),
+                                         self._path(self.content_fname)))
+
+    @mock.patch.object(os, 'link', side_effect=OSError)
+    def test_index_by_content_link_fails(self, mock_link):
+        with open(self._path(self.fname), 'w') as f:
+            f.write('data')
+
+        self.manager.index_by_content(self.fname, self.content_fname)
+
+        self.assertFalse(os.path.exists(self._path(self.content_fname)))
+
+    def test_mark_content_links_in_use(self):
+        other_fname = imagecache.get_cache_fname(uuids.other)
+        for fname in (self.fname, other_fname):
+            with open(self._path(fname), 'w') as f:
+                f.write(fname)
+        os.link(self._path(self.fname), self._path(self.content_fname))
+        self.manager.active_base_files = [self._path(self.fname)]
+        self.manager.unexplained_images = [self._path(self.content_fname),
+                                           self._path(other_fname)]
+
+        self.manager._mark_content_links_in_use()
+
+        self.assertEqual([self._path(other_fname)],
+                         self.manager.unexplained_images)
+        self.assertIn(self._path(self.content_fname),
+                      self.manager.active_base_files)
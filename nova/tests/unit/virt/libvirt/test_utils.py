@@ -15,6 +15,7 @@
 
 import functools
 import grp
+import io
 import os
 import pwd
 import tempfile
@@ -52,6 +53,12 @@ class LibvirtUtilsTestCase(test.NoDBTestCase):
         libvirt_utils.copy_image('src', 'dest')
         mock_execute.assert_called_once_with('cp', '-r', 'src', 'dest')
 
+    @mock.patch('oslo_concurrency.processutils.execute')
+    def test_copy_image_local_reflink(self, mock_execute):
+        libvirt_utils.copy_image('src', 'dest', reflink=True)
+        mock_execute.assert_called_once_with(
+            'cp', '-r', '--reflink=auto', 'src', 'dest')
+
     @mock.patch('nova.virt.libvirt.volume.remotefs.SshDriver.copy_file')
     def test_copy_image_remote_ssh(self, mock_rem_fs_remove):
         self.flags(remote_filesystem_transport='ssh', group='libvirt')
@@ -361,6 +368,39 @@ class LibvirtUtilsTestCase(test.NoDBTestCase):
                                        dest_format='ploop',
                                        out_format='parallels')
 
+    @mock.patch('time.monotonic')
+    @mock.patch.object(libvirt_utils, 'LOG')
+    def test_upload_progress_reader(self, mock_log, mock_monotonic):
+        mock_monotonic.side_effect = [0, 10, 40, 50, 60]
+        image_file = io.BytesIO(b'x' * 1024)
+        instance = objects.Instance(uuid=uuids.instance)
+
+        reader = libvirt_utils.UploadProgressReader(
+            image_file, instance, interval=30)
+        self.assertEqual(1024, reader.total_size)
+
+        # first chunk, before the reporting interval
+        self.assertEqual(b'x' * 512, reader.read(512))
+        mock_log.info.assert_not_called()
+        # second chunk, after the reporting interval
+        self.assertEqual(b'x' * 512, reader.read(512))
+        mock_log.info.assert_called_once()
+        self.assertEqual(b'', reader.read(512))
+        self.assertEqual(1024, reader.bytes_read)
+
+        reader.report()
+        self.assertEqual(2, mock_log.info.call_count)
+        self.assertEqual(100, mock_log.info.call_args[0][1]['percent'])
+
+    def test_upload_progress_reader_iter(self):
+        image_file = io.BytesIO(b'x' * 100)
+        instance = objects.Instance(uuid=uuids.instance)
+
+        reader = libvirt_utils.UploadProgressReader(image_file, instance)
+
+        self.assertEqual(b'x' * 100, b''.join(reader))
+        self.assertEqual(100, reader.bytes_read)
+
     def test_load_file(self):
         dst_fd, dst_path = tempfile.mkstemp()
         try:
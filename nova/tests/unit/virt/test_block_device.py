@@ -13,9 +13,12 @@
 #    under the License.
 
 from os_brick import encryptors
+import threading
 from unittest import mock
 
 import ddt
+import fixtures
+import futurist.waiters
 from oslo_serialization import jsonutils
 from oslo_utils.fixture import uuidsentinel as uuids
 
@@ -28,6 +31,7 @@ from nova import test
 from nova.tests.unit import fake_block_device
 from nova.tests.unit import fake_instance
 from nova.tests.unit import matchers
+from nova import utils
 from nova.virt import block_device as driver_block_device
 from nova.virt import driver
 from nova.virt import fake as fake_virt
@@ -1332,6 +1336,117 @@ class TestDriverBlockDevice(test.NoDBTestCase):
                                      self.volblank_driver_bdm,
                                      self.volsnapshot_driver_bdm])
 
+    def _fake_volume_bdms(self, volume_ids):
+        bdms = []
+        for i, volume_id in enumerate(volume_ids):
+            bdm = mock.MagicMock(
+                spec=driver_block_device.DriverVolumeBlockDevice)
+            bdm.volume_id = volume_id
+            bdm.get.side_effect = {'volume_id': volume_id}.get
+            bdm.__getitem__.side_effect = {'mount_device': '/dev/vd%s' % (
+                chr(ord('a') + i))}.__getitem__
+            bdms.append(bdm)
+        return bdms
+
+    def test_attach_block_devices_concurrent(self):
+        self.flags(max_concurrent_volume_attaches=3, group='compute')
+        bdms = self._fake_volume_bdms([uuids.vol1, uuids.vol2, uuids.vol3])
+        # Each attach waits for the two others, so this would time out if the
+        # volumes were attached one after another.
+        barrier = threading.Barrier(3, timeout=10)
+        for bdm in bdms:
+            bdm.attach.side_effect = lambda *args, **kwargs: barrier.wait()
+        instance = fake_instance.fake_instance_obj(self.context)
+
+        self.assertEqual(bdms, driver_block_device.attach_block_devices(
+            bdms, self.context, instance, self.volume_api, self.virt_driver,
+            wait_func=mock.sentinel.wait_func))
+
+        for bdm in bdms:
+            bdm.attach.assert_called_once_with(
+                self.context, instance, self.volume_api, self.virt_driver,
+                wait_func=mock.sentinel.wait_func)
+
+    def test_attach_block_devices_concurrent_failure(self):
+        self.flags(max_concurrent_volume_attaches=2, group='compute')
+        bdms = self._fake_volume_bdms([uuids.vol1, uuids.vol2, uuids.vol3])
+        barrier = threading.Barrier(2, timeout=10)
+        futures = []
+        spawned = threading.Event()
+        spawn_on = utils.spawn_on
+
+        def fake_spawn_on(*args, **kwargs):
+            future = spawn_on(*args, **kwargs)
+            futures.append(future)
+            if len(futures) == 2:
+                spawned.set()
+            return future
+
+        def attach(*args, **kwargs):
+            barrier.wait()
+            # Only free the worker once the failure of the second volume is
+            # recorded, otherwise it could start attaching the third one.
+            self.assertTrue(spawned.wait(10))
+            futurist.waiters.wait_for_all(futures[1:2], 10)
+
+        def fail(*args, **kwargs):
+            barrier.wait()
+            raise exception.VolumeNotCreated(
+                volume_id=uuids.vol2, seconds=1, attempts=1, volume_status='')
+
+        bdms[0].attach.side_effect = attach
+        bdms[1].attach.side_effect = fail
+        self.useFixture(fixtures.MockPatchObject(
+            utils, 'spawn_on', side_effect=fake_spawn_on))
+        instance = fake_instance.fake_instance_obj(self.context)
+
+        self.assertRaises(exception.VolumeNotCreated,
+                          driver_block_device.attach_block_devices,
+                          bdms, self.context, instance, self.volume_api,
+                          self.virt_driver)
+        # The volumes not attached yet when the attach failed are skipped.
+        bdms[2].attach.assert_not_called()
+
+    @mock.patch.object(utils, 'run_concurrently',
+                       wraps=utils.run_concurrently)
+    def test_attach_block_devices_driver_attach_in_order(self, mock_run):
+        self.flags(max_concurrent_volume_attaches=3, group='compute')
+        bdms = self._fake_volume_bdms([uuids.vol1, uuids.vol2])
+        instance = fake_instance.fake_instance_obj(self.context)
+
+        driver_block_device.attach_block_devices(
+            bdms, self.context, instance, self.volume_api, self.virt_driver,
+            do_driver_attach=True)
+
+        mock_run.assert_called_once_with(mock.ANY, bdms, 1)
+        for bdm in bdms:
+            bdm.attach.assert_called_once_with(
+                self.context, instance, self.volume_api, self.virt_driver,
+                do_driver_attach=True)
+
+    def test_create_volumes(self):
+        self.flags(max_concurrent_volume_attaches=2, group='compute')
+        bdms = self._fake_volume_bdms([None, uuids.vol2, None])
+        barrier = threading.Barrier(2, timeout=10)
+        for bdm in bdms:
+            bdm.create_volume.side_effect = (
+                lambda *args, **kwargs: barrier.wait())
+        bdms.append(self.driver_classes['swap'](self.swap_bdm))
+        instance = fake_instance.fake_instance_obj(self.context)
+
+        self.assertEqual([bdms[0], bdms[2]],
+                         driver_block_device.get_volumes_to_create(bdms))
+        self.assertEqual(bdms, driver_block_device.create_volumes(
+            bdms, self.context, instance, self.volume_api,
+            wait_func=mock.sentinel.wait_func))
+
+        for bdm in (bdms[0], bdms[2]):
+            bdm.create_volume.assert_called_once_with(
+                self.context, instance, self.volume_api,
+                wait_func=mock.sentinel.wait_func)
+            bdm.save.assert_called_once_with()
+        bdms[1].create_volume.assert_not_called()
+
     def test_convert_volume(self):
         self.assertIsNone(driver_block_device.convert_volume(self.swap_bdm))
         self.assertEqual(self.volume_driver_bdm,
@@ -1281,6 +1281,38 @@ class CinderClientTestCase(test.NoDBTestCase):
         get_highest_version.assert_called_once_with(
             self.ctxt, self.mock_session.get_endpoint.return_value)
 
+    @mock.patch('nova.volume.cinder._get_highest_client_server_version',
+                return_value=cinder_api_versions.APIVersion('3.50'))
+    @mock.patch('cinderclient.client.get_volume_api_from_url',
+                return_value='3')
+    def test_create_v3_client_with_microversion_cached(self, get_volume_api,
+                                                       get_highest_version):
+        """Tests that the highest version supported by the server is only
+        queried again if the requested microversion is higher than the
+        cached one.
+        """
+        url = self.mock_session.get_endpoint.return_value
+        for microversion in ('3.44', '3.50', '3.44'):
+            client = cinder.cinderclient(self.ctxt, microversion=microversion)
+            self.assertEqual(cinder_api_versions.APIVersion(microversion),
+                             client.api_version)
+        get_highest_version.assert_called_once_with(self.ctxt, url)
+
+        # The server was upgraded since the version was cached.
+        get_highest_version.return_value = cinder_api_versions.APIVersion(
+            '3.60')
+        client = cinder.cinderclient(self.ctxt, microversion='3.60')
+        self.assertEqual(cinder_api_versions.APIVersion('3.60'),
+                         client.api_version)
+        self.assertEqual(2, get_highest_version.call_count)
+
+        # An unsupported microversion is checked again every time.
+        for _ in range(2):
+            self.assertRaises(exception.CinderAPIVersionNotAvailable,
+                              cinder.cinderclient, self.ctxt,
+                              microversion='3.70')
+        self.assertEqual(4, get_highest_version.call_count)
+
     @mock.patch('nova.volume.cinder._get_highest_client_server_version',
                 new_callable=mock.NonCallableMock)  # asserts not called
     @mock.patch('cinderclient.client.get_volume_api_from_url',
@@ -634,6 +634,52 @@ def spawn_on(
     return executor.submit(context_wrapper, *args, **kwargs)
 
 
+def run_concurrently(
+    func: ty.Callable[[ty.Any], ty.Any],
+    items: ty.Sequence[ty.Any],
+    max_workers: int,
+) -> ty.List[ty.Tuple[ty.Any, ty.Optional[Exception]]]:
+    """Call func for each of the items, up to max_workers at a time.
+
+    The calls are made in the calling thread, one after another, if
+    max_workers is 1. Once a call failed, the calls not started yet are
+    skipped.
+
+    :param func: The function to call with each item.
+    :param items: The items.
+    :param max_workers: The maximum number of concurrent calls.
+    :returns: A list of (result, exception) pairs in the order of the items,
+        (None, None) for the skipped calls.
+    """
+    results: ty.List[ty.Tuple[ty.Any, ty.Optional[Exception]]] = [
+        (None, None)] * len(items)
+    failed = threading.Event()
+
+    def run(index, item):
+        if failed.is_set():
+            return
+        try:
+            results[index] = (func(item), None)
+        except Exception as e:
+            failed.set()
+            results[index] = (None, e)
+
+    max_workers = min(max_workers, len(items))
+    if max_workers <= 1:
+        for index, item in enumerate(items):
+            run(index, item)
+        return results
+
+    executor = create_executor(max_workers)
+    try:
+        futures = [spawn_on(executor, run, index, item)
+                   for index, item in enumerate(items)]
+        futurist.waiters.wait_for_all(futures)
+    finally:
+        executor.shutdown()
+    return results
+
+
 def is_none_string(val):
     """Check if a string represents a None value.
     """
@@ -25,6 +25,7 @@ from oslo_utils import excutils
 from nova import block_device
 import nova.conf
 from nova import exception
+from nova import utils
 
 CONF = nova.conf.CONF
 
@@ -442,6 +443,13 @@ class DriverVolumeBlockDevice(DriverBlockDevice):
             except exception.CinderAPIVersionNotAvailable:
                 pass
 
+    def create_volume(self, context, instance, volume_api, wait_func=None):
+        """Create the volume of the block device if it does not exist yet.
+
+        This is a no-op for the block devices of existing volumes.
+        """
+        pass
+
     def _create_volume(self, context, instance, volume_api, size,
                        wait_func=None, **create_kwargs):
         """Create a volume and attachment record.
@@ -833,9 +841,7 @@ class DriverVolSnapshotBlockDevice(DriverVolumeBlockDevice):
     _valid_source = 'snapshot'
     _proxy_as_attr_inherited = set(['snapshot_id'])
 
-    def attach(self, context, instance, volume_api,
-               virt_driver, wait_func=None):
-
+    def create_volume(self, context, instance, volume_api, wait_func=None):
         if not self.volume_id:
             snapshot = volume_api.get_snapshot(context,
                                                self.snapshot_id)
@@ -850,6 +856,11 @@ class DriverVolSnapshotBlockDevice(DriverVolumeBlockDevice):
                 context, instance, volume_api, self.volume_size,
                 wait_func=wait_func, snapshot=snapshot)
 
+    def attach(self, context, instance, volume_api,
+               virt_driver, wait_func=None):
+        self.create_volume(context, instance, volume_api,
+                           wait_func=wait_func)
+
         # Call the volume attach now
         super(DriverVolSnapshotBlockDevice, self).attach(
             context, instance, volume_api, virt_driver)
@@ -860,13 +871,17 @@ class DriverVolImageBlockDevice(DriverVolumeBlockDevice):
     _valid_source = 'image'
     _proxy_as_attr_inherited = set(['image_id'])
 
-    def attach(self, context, instance, volume_api,
-               virt_driver, wait_func=None):
+    def create_volume(self, context, instance, volume_api, wait_func=None):
         if not self.volume_id:
             self.volume_id, self.attachment_id = self._create_volume(
                 context, instance, volume_api, self.volume_size,
                 wait_func=wait_func, image_id=self.image_id)
 
+    def attach(self, context, instance, volume_api,
+               virt_driver, wait_func=None):
+        self.create_volume(context, instance, volume_api,
+                           wait_func=wait_func)
+
         super(DriverVolImageBlockDevice, self).attach(
             context, instance, volume_api, virt_driver)
 
@@ -876,14 +891,18 @@ class DriverVolBlankBlockDevice(DriverVolumeBlockDevice):
     _valid_source = 'blank'
     _proxy_as_attr_inherited = set(['image_id'])
 
-    def attach(self, context, instance, volume_api,
-               virt_driver, wait_func=None):
+    def create_volume(self, context, instance, volume_api, wait_func=None):
         if not self.volume_id:
             vol_name = instance.uuid + '-blank-vol'
             self.volume_id, self.attachment_id = self._create_volume(
                 context, instance, volume_api, self.volume_size,
                 wait_func=wait_func, name=vol_name)
 
+    def attach(self, context, instance, volume_api,
+               virt_driver, wait_func=None):
+        self.create_volume(context, instance, volume_api,
+                           wait_func=wait_func)
+
         super(DriverVolBlankBlockDevice, self).attach(
             context, instance, volume_api, virt_driver)
 
@@ -967,11 +986,49 @@ def attach_block_devices(block_device_mapping, *attach_args, **attach_kwargs):
 
         bdm.attach(*attach_args, **attach_kwargs)
 
-    for device in block_device_mapping:
-        _log_and_attach(device)
+    # NOTE: The block storage service requests of the block devices are
+    # independent, so they can be sent concurrently. The block devices
+    # connected by the driver are still attached in order though as the guest
+    # device names can depend on it.
+    max_workers = CONF.compute.max_concurrent_volume_attaches
+    if attach_kwargs.get('do_driver_attach'):
+        max_workers = 1
+    _raise_first_error(utils.run_concurrently(
+        _log_and_attach, block_device_mapping, max_workers))
     return block_device_mapping
 
 
+def get_volumes_to_create(block_device_mapping):
+    """Get the block devices whose volume needs to be created."""
+    return [bdm for bdm in block_device_mapping
+            if isinstance(bdm, DriverVolumeBlockDevice) and
+            not bdm.volume_id]
+
+
+def create_volumes(block_device_mapping, context, instance, volume_api,
+                   wait_func=None):
+    """Create the volumes of the block devices which do not have one yet.
+
+    The volumes are created concurrently, up to
+    [compute]max_concurrent_volume_attaches at a time, so that they are ready
+    to be attached with attach_block_devices().
+    """
+    def _create_volume(bdm):
+        bdm.create_volume(context, instance, volume_api, wait_func=wait_func)
+        bdm.save()
+
+    _raise_first_error(utils.run_concurrently(
+        _create_volume, get_volumes_to_create(block_device_mapping),
+        CONF.compute.max_concurrent_volume_attaches))
+    return block_device_mapping
+
+
+def _raise_first_error(results):
+    for _, error in results:
+        if error:
+            raise error
+
+
 def refresh_conn_infos(block_device_mapping, *refresh_args, **refresh_kwargs):
     for device in block_device_mapping:
         # NOTE(lyarwood): At present only DriverVolumeBlockDevice derived
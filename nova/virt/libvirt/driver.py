@@ -3304,14 +3304,20 @@ class LibvirtDriver(driver.ComputeDriver):
             with utils.tempdir(dir=snapshot_directory) as tmpdir:
                 try:
                     out_path = os.path.join(tmpdir, snapshot_name)
-                    if live_snapshot:
-                        # NOTE(xqueralt): libvirt needs o+x in the tempdir
-                        os.chmod(tmpdir, 0o701)
-                        self._live_snapshot(context, instance, guest,
-                                            disk_path, out_path, source_format,
-                                            image_format, instance.image_meta)
-                    else:
-                        root_disk.snapshot_extract(out_path, image_format)
+                    with compute_utils.EventReporter(
+                        context, 'compute_snapshot_extract', CONF.host,
+                        instance.uuid, graceful_exit=True,
+                    ):
+                        if live_snapshot:
+                            # NOTE(xqueralt): libvirt needs o+x in the
+                            # tempdir
+                            os.chmod(tmpdir, 0o701)
+                            self._live_snapshot(
+                                context, instance, guest, disk_path,
+                                out_path, source_format, image_format,
+                                instance.image_meta)
+                        else:
+                            root_disk.snapshot_extract(out_path, image_format)
                     LOG.info("Snapshot extracted, beginning image upload",
                              instance=instance)
                 except libvirt.libvirtError as ex:
@@ -3337,12 +3343,19 @@ class LibvirtDriver(driver.ComputeDriver):
                 update_task_state(task_state=task_states.IMAGE_UPLOADING,
                         expected_state=task_states.IMAGE_PENDING_UPLOAD)
                 with libvirt_utils.file_open(out_path, 'rb') as image_file:
+                    reader = libvirt_utils.UploadProgressReader(
+                        image_file, instance)
                     # execute operation with disk concurrency semaphore
                     with compute_utils.disk_ops_semaphore:
-                        self._image_api.update(context,
-                                               image_id,
-                                               metadata,
-                                               image_file)
+                        with compute_utils.EventReporter(
+                            context, 'compute_snapshot_upload', CONF.host,
+                            instance.uuid, graceful_exit=True,
+                        ):
+                            self._image_api.update(context,
+                                                   image_id,
+                                                   metadata,
+                                                   reader)
+                    reader.report()
         except exception.ImageNotFound:
             with excutils.save_and_reraise_exception():
                 LOG.warning("Failed to snapshot image because it was deleted")
@@ -5270,12 +5283,14 @@ class LibvirtDriver(driver.ComputeDriver):
                                 context=context,
                                 filename=fname,
                                 image_id=disk_images['kernel_id'])
+            self.image_cache_manager.record_image_use(fname, instance)
             if disk_images['ramdisk_id']:
                 fname = imagecache.get_cache_fname(disk_images['ramdisk_id'])
                 raw('ramdisk').cache(fetch_func=libvirt_utils.fetch_raw_image,
                                      context=context,
                                      filename=fname,
                                      image_id=disk_images['ramdisk_id'])
+                self.image_cache_manager.record_image_use(fname, instance)
 
         created_disks = self._create_and_inject_local_root(
             context, instance, disk_mapping, booted_from_volume, suffix,
@@ -5308,6 +5323,7 @@ class LibvirtDriver(driver.ComputeDriver):
             disk_image.cache(
                 fetch_func=fn, context=context, filename=fname, size=size,
                 ephemeral_size=ephemeral_gb, safe=True)
+            self.image_cache_manager.record_image_use(fname, instance)
 
         for idx, eph in enumerate(driver.block_device_info_get_ephemerals(
                 block_device_info)):
@@ -5333,6 +5349,7 @@ class LibvirtDriver(driver.ComputeDriver):
                 fetch_func=fn, context=context, filename=fname, size=size,
                 ephemeral_size=eph['size'], specified_fs=specified_fs,
                 safe=True)
+            self.image_cache_manager.record_image_use(fname, instance)
 
         if swap_mb > 0:
             size = swap_mb * units.Mi
@@ -5344,6 +5361,8 @@ class LibvirtDriver(driver.ComputeDriver):
                 fetch_func=self._create_swap, context=context,
                 filename="swap_%s" % swap_mb, size=size, swap_mb=swap_mb,
                 safe=True)
+            self.image_cache_manager.record_image_use(
+                "swap_%s" % swap_mb, instance)
 
         if created_disks:
             LOG.debug('Created local disks', instance=instance)
@@ -5406,9 +5425,20 @@ class LibvirtDriver(driver.ComputeDriver):
             else:
                 fetch_func = libvirt_utils.fetch_image
 
+            content_fname = None
+            if not backend.SUPPORTS_CLONE:
+                content_fname = self._link_cached_image_by_content(
+                    context, disk_images['image_id'], root_fname)
+
             self._try_fetch_image_cache(backend, fetch_func, context,
                                         root_fname, disk_images['image_id'],
                                         instance, size, fallback_from_host)
+            self.image_cache_manager.record_image_use(root_fname, instance)
+            if content_fname:
+                self.image_cache_manager.index_by_content(
+                    root_fname, content_fname)
+                self.image_cache_manager.record_image_use(
+                    content_fname, instance)
 
             # During unshelve or cross cell resize on Qcow2 backend, we spawn()
             # using a snapshot image. Extra work is needed in order to rebase
@@ -5425,6 +5455,36 @@ class LibvirtDriver(driver.ComputeDriver):
 
         return created_disks
 
+    def _link_cached_image_by_content(self, context, image_id, fname):
+        """Reuse a cached image with the same content as the given image.
+
+        When ``[image_cache]/deduplicate_images`` is enabled and the image
+        is not cached yet, look up its content hash in the image service and
+        link the cached file to an already cached image with identical
+        content, if any.
+
+        :returns: The name of the cached file based on the image content
+                  hash, or None if the image is already cached, has no
+                  content hash or deduplication is disabled.
+        """
+        if not CONF.image_cache.deduplicate_images:
+            return None
+        if os.path.exists(os.path.join(
+                self.image_cache_manager.cache_dir, fname)):
+            return None
+
+        try:
+            image_info = images.get_info(context, image_id)
+        except exception.ImageNotFound:
+            # Let the regular fetch path deal with the missing image
+            return None
+
+        content_fname = imagecache.get_content_cache_fname(image_info)
+        if content_fname:
+            fileutils.ensure_tree(self.image_cache_manager.cache_dir)
+            self.image_cache_manager.link_by_content(fname, content_fname)
+        return content_fname
+
     def _needs_rebase_original_qcow2_image(self, instance, backend):
         if not isinstance(backend, imagebackend.Qcow2):
             return False
@@ -13399,6 +13459,7 @@ class LibvirtDriver(driver.ComputeDriver):
             return False
 
         LOG.info('Deletion of %s complete', target_del, instance=instance)
+        self.image_cache_manager.release_instance(instance)
         return True
 
     def default_root_device_name(self, instance, image_meta, root_bdm):
@@ -597,13 +597,40 @@ class Flat(Image):
         if os.path.exists(self.path):
             self.driver_format = self.resolve_driver_format()
 
+    def _can_reflink(self):
+        """Check once per class whether the instances directory supports
+        cloning files with reflinks (FICLONE), as supported by XFS and Btrfs.
+        """
+        can_reflink = getattr(self.__class__, 'can_reflink', None)
+        if can_reflink is None:
+            test_path = self.path + '.reflink_test'
+            clone_path = test_path + '.clone'
+            try:
+                with open(test_path, 'wb') as f:
+                    f.write(b'\0')
+            except OSError:
+                can_reflink = False
+            else:
+                _out, err = processutils.trycmd(
+                    'cp', '--reflink=always', test_path, clone_path)
+                can_reflink = not err
+            fileutils.delete_if_exists(test_path)
+            fileutils.delete_if_exists(clone_path)
+            self.__class__.can_reflink = can_reflink
+            LOG.info('Cloning base images with reflinks is %(state)s for '
+                     'path: %(path)s',
+                     {'state': 'enabled' if can_reflink else 'not supported',
+                      'path': os.path.dirname(self.path)})
+        return can_reflink
+
     def create_image(
         self, prepare_template, base, size, safe=False, *args, **kwargs):
         filename = self._get_lock_name(base)
 
         @utils.synchronized(filename, external=True, lock_path=self.lock_path)
         def copy_raw_image(base, target, size):
-            libvirt_utils.copy_image(base, target)
+            libvirt_utils.copy_image(
+                base, target, reflink=self._can_reflink())
             if size:
                 self.resize_image(size)
 
@@ -20,6 +20,7 @@ http://wiki.openstack.org/nova-image-cache-management.
 
 """
 
+import collections
 import hashlib
 import os
 import re
@@ -28,7 +29,9 @@ import time
 from oslo_concurrency import lockutils
 from oslo_concurrency import processutils
 from oslo_log import log as logging
+from oslo_serialization import jsonutils
 from oslo_utils import encodeutils
+from oslo_utils import units
 
 import nova.conf
 import nova.privsep.path
@@ -40,6 +43,8 @@ LOG = logging.getLogger(__name__)
 
 CONF = nova.conf.CONF
 
+MANIFEST_FNAME = '.manifest.json'
+
 
 def get_cache_fname(image_id):
     """Return a filename based on the SHA1 hash of a given image ID.
@@ -52,6 +57,152 @@ def get_cache_fname(image_id):
     return hashlib.sha1(image_id.encode('utf-8')).hexdigest()
 
 
+def get_content_cache_fname(image_info):
+    """Return a filename based on the content hash of an image.
+
+    The name is derived from the ``os_hash_algo`` and ``os_hash_value``
+    properties the image service computes for the image data, so that
+    images with different IDs but identical content share the same name.
+
+    :param image_info: A dict of image metadata as returned by the image API.
+    :returns: The filename, or None if the image has no content hash.
+    """
+    algo = image_info.get('os_hash_algo')
+    value = image_info.get('os_hash_value')
+    if not algo or not value:
+        return None
+    return get_cache_fname('%s:%s' % (algo, value))
+
+
+class ImageCacheManifest(object):
+    """Index of the files held in the image cache.
+
+    The manifest is a small JSON document stored alongside the cached files
+    which records, for each file, its size and inode, the last time it was
+    used and the instances currently using it. It is updated when instances are
+    created and deleted so that the periodic cache manager pass does not
+    have to list and stat the whole cache directory to find the files it
+    can evict.
+    """
+
+    def __init__(self, base_dir, lock_path):
+        self.base_dir = base_dir
+        self.lock_path = lock_path
+        self.path = os.path.join(base_dir, MANIFEST_FNAME)
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def _load(self):
+        try:
+            with open(self.path, 'rb') as f:
+                entries = jsonutils.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            LOG.warning('Unable to read image cache manifest %(path)s, '
+                        'ignoring it: %(error)s',
+                        {'path': self.path, 'error': e})
+            return {}
+        if not isinstance(entries, dict):
+            return {}
+        return entries
+
+    def _save(self, entries):
+        # NOTE: Write to a temporary file and rename it over the manifest so
+        # that readers on other hosts sharing the cache never see a partially
+        # written document.
+        tmp_path = '%s.%s.tmp' % (self.path, CONF.host)
+        with open(tmp_path, 'w') as f:
+            jsonutils.dump(entries, f)
+        os.replace(tmp_path, self.path)
+
+    def _update(self, func):
+        @utils.synchronized(MANIFEST_FNAME, external=True,
+                            lock_path=self.lock_path)
+        def _inner_update():
+            entries = self._load()
+            result = func(entries)
+            self._save(entries)
+            return result
+
+        return _inner_update()
+
+    def entries(self):
+        """Return a dict of cached file names to their manifest entry."""
+        return self._load()
+
+    def record_use(self, fname, instance_uuid=None):
+        """Record that a cached file is used, optionally by an instance."""
+        try:
+            st = os.stat(os.path.join(self.base_dir, fname))
+        except OSError:
+            # The file may not be in the cache, e.g. because the backend
+            # cloned the image directly rather than fetching it.
+            return
+
+        def _record(entries):
+            entry = entries.setdefault(fname, {'users': []})
+            entry['size'] = st.st_size
+            entry['inode'] = st.st_ino
+            entry['last_use'] = time.time()
+            if instance_uuid and instance_uuid not in entry['users']:
+                entry['users'].append(instance_uuid)
+
+        self._update(_record)
+
+    def release(self, instance_uuid):
+        """Drop an instance from the users of every cached file."""
+        def _release(entries):
+            now = time.time()
+            for entry in entries.values():
+                if instance_uuid in entry['users']:
+                    entry['users'].remove(instance_uuid)
+                    entry['last_use'] = now
+
+        self._update(_release)
+
+    def reconcile(self, instance_uuids, used_fnames):
+        """Drop stale users and refresh the entries still in use.
+
+        :param instance_uuids: The UUIDs of all instances which may be using
+                               the cache.
+        :param used_fnames: The names of the cached files known to be used.
+        """
+        def _reconcile(entries):
+            now = time.time()
+            for fname, entry in entries.items():
+                users = [u for u in entry['users'] if u in instance_uuids]
+                if users != entry['users']:
+                    entry['users'] = users
+                    entry['last_use'] = now
+                if fname in used_fnames:
+                    entry['last_use'] = now
+
+        self._update(_reconcile)
+
+    def forget(self, fname):
+        """Remove a cached file from the manifest."""
+        self._update(lambda entries: entries.pop(fname, None))
+
+    def seed(self, fnames):
+        """Add existing cached files which are not yet in the manifest."""
+        def _seed(entries):
+            for fname in fnames:
+                if fname.startswith('.') or fname in entries:
+                    continue
+                try:
+                    st = os.stat(os.path.join(self.base_dir, fname))
+                except OSError:
+                    continue
+                entries[fname] = {'size': st.st_size,
+                                  'inode': st.st_ino,
+                                  'last_use': st.st_mtime,
+                                  'users': []}
+
+        self._update(_seed)
+
+
 class ImageCacheManager(imagecache.ImageCacheManager):
     def __init__(self):
         super(ImageCacheManager, self).__init__()
@@ -186,6 +337,32 @@ class ImageCacheManager(imagecache.ImageCacheManager):
             if m:
                 yield img
 
+    def _mark_content_links_in_use(self):
+        """Mark the unexplained files sharing an inode with an active base
+        file as in use.
+        """
+        active_inodes = set()
+        for base_file in self.active_base_files:
+            try:
+                st = os.stat(base_file)
+            except OSError:
+                continue
+            if st.st_nlink > 1:
+                active_inodes.add((st.st_dev, st.st_ino))
+
+        if not active_inodes:
+            return
+
+        for img in list(self.unexplained_images):
+            try:
+                st = os.stat(img)
+            except OSError:
+                continue
+            if (st.st_dev, st.st_ino) in active_inodes:
+                LOG.debug('%s is linked to an active base file', img)
+                self.unexplained_images.remove(img)
+                self.active_base_files.append(img)
+
     @staticmethod
     def _get_age_of_file(base_file):
         if not os.path.exists(base_file):
@@ -328,6 +505,10 @@ class ImageCacheManager(imagecache.ImageCacheManager):
             if backing_path not in self.active_base_files:
                 self.active_base_files.append(backing_path)
 
+        # Content hash names are hard links to files named after image IDs,
+        # keep them while any of those files is in use
+        self._mark_content_links_in_use()
+
         # Anything left is an unknown base image
         for img in self.unexplained_images:
             LOG.warning('Unknown base file: %s', img)
@@ -369,10 +550,196 @@ class ImageCacheManager(imagecache.ImageCacheManager):
             return
         return base_dir
 
+    @property
+    def manifest(self):
+        return ImageCacheManifest(self.cache_dir, self.lock_path)
+
+    def record_image_use(self, fname, instance):
+        """Record that a cached file is used by an instance.
+
+        This is a no-op unless ``[image_cache]/use_manifest`` is enabled.
+        """
+        if not CONF.image_cache.use_manifest:
+            return
+        try:
+            self.manifest.record_use(fname, instance.uuid)
+        except OSError as e:
+            LOG.warning('Failed to record use of cached image %(fname)s: '
+                        '%(error)s', {'fname': fname, 'error': e},
+                        instance=instance)
+
+    def release_instance(self, instance):
+        """Record that an instance no longer uses any cached file.
+
+        This is a no-op unless ``[image_cache]/use_manifest`` is enabled.
+        """
+        if not CONF.image_cache.use_manifest or not self.manifest.exists():
+            return
+        try:
+            self.manifest.release(instance.uuid)
+        except OSError as e:
+            LOG.warning('Failed to release cached images: %s', e,
+                        instance=instance)
+
+    def _link_cached_file(self, src_fname, dest_fname):
+        """Hard link a cached file to another name in the cache.
+
+        :returns: True if the link was created, False otherwise.
+        """
+        src = os.path.join(self.cache_dir, src_fname)
+        dest = os.path.join(self.cache_dir, dest_fname)
+
+        @utils.synchronized(dest_fname, external=True,
+                            lock_path=self.lock_path)
+        def _inner_link_cached_file():
+            if os.path.exists(dest) or not os.path.exists(src):
+                return False
+            try:
+                os.link(src, dest)
+            except OSError as e:
+                LOG.debug('Failed to link cached file %(src)s to %(dest)s: '
+                          '%(error)s',
+                          {'src': src, 'dest': dest, 'error': e})
+                return False
+            return True
+
+        return _inner_link_cached_file()
+
+    def link_by_content(self, fname, content_fname):
+        """Populate a cached file from a file with the same content.
+
+        If ``fname`` is not cached yet but a file with the same content hash
+        is, ``fname`` is created as a hard link to it so that the image does
+        not have to be downloaded and stored again.
+
+        :param fname: The name of the cached file, based on the image ID.
+        :param content_fname: The name based on the image content hash.
+        :returns: True if ``fname`` was linked to an existing file.
+        """
+        if self._link_cached_file(content_fname, fname):
+            LOG.info('Reusing cached image content %(content)s for '
+                     '%(fname)s', {'content': content_fname, 'fname': fname})
+            return True
+        return False
+
+    def index_by_content(self, fname, content_fname):
+        """Make a cached file available under its content hash name."""
+        self._link_cached_file(fname, content_fname)
+
+    @staticmethod
+    def _get_used_fnames(running):
+        used_fnames = set(running['used_swap_images'])
+        used_fnames |= running['used_ephemeral_images']
+        for img in running['used_images']:
+            used_fnames.add(get_cache_fname(img))
+        return used_fnames
+
+    def _evict_base_file(self, manifest, fname):
+        """Remove a single cached file listed in the manifest."""
+        base_file = os.path.join(manifest.base_dir, fname)
+
+        @utils.synchronized(fname, external=True, lock_path=self.lock_path)
+        def _inner_evict_base_file():
+            # NOTE: recheck that the file is still unused, as a new user
+            # might have come along while we were waiting for the lock
+            entry = manifest.entries().get(fname)
+            if entry and entry['users']:
+                return False
+
+            LOG.info('Evicting cached file: %s', base_file)
+            try:
+                os.remove(base_file)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                LOG.error('Failed to remove %(base_file)s, '
+                          'error was %(error)s',
+                          {'base_file': base_file, 'error': e})
+                return False
+            manifest.forget(fname)
+            return True
+
+        return _inner_evict_base_file()
+
+    def _get_min_age(self, fname):
+        if len(fname) == hashlib.sha1().digest_size * 2:
+            return CONF.image_cache.remove_unused_original_minimum_age_seconds
+        if fname.startswith('swap_') or fname.startswith('ephemeral_'):
+            return CONF.image_cache.remove_unused_original_minimum_age_seconds
+        return CONF.image_cache.remove_unused_resized_minimum_age_seconds
+
+    def _update_from_manifest(self, context, all_instances, base_dir):
+        """Age and evict cached files using the image cache manifest.
+
+        Unlike the full pass this only looks at the files recorded in the
+        manifest, and only touches on disk those which are candidates for
+        eviction. Unused files are evicted in least recently used order once
+        they are older than the configured minimum age, and regardless of
+        their age while the cache is larger than
+        ``[image_cache]/max_size_mb``.
+        """
+        manifest = self.manifest
+        running = self._list_running_instances(context, all_instances)
+        used_fnames = self._get_used_fnames(running)
+        instance_uuids = set(instance.uuid for instance in all_instances)
+
+        if not manifest.exists():
+            # NOTE: Seed the manifest from the content of the cache. This is
+            # the only time the manifest pass lists the cache directory.
+            manifest.seed(os.listdir(base_dir))
+
+        manifest.reconcile(instance_uuids, used_fnames)
+        entries = manifest.entries()
+
+        if not self.remove_unused_base_images:
+            return
+
+        # NOTE: Files which have the same content are hard links to the same
+        # inode, see link_by_content(), so only count the size of each inode
+        # once and only reclaim it when its last name is evicted. Entries
+        # recorded before the inodes were don't have one.
+        def _data_key(fname, entry):
+            return entry.get('inode', fname)
+
+        names = collections.Counter(
+            _data_key(fname, entry) for fname, entry in entries.items())
+        total_size = sum({_data_key(fname, entry): entry['size']
+                          for fname, entry in entries.items()}.values())
+        max_size = CONF.image_cache.max_size_mb * units.Mi
+        candidates = sorted(
+            ((entry['last_use'], fname, entry)
+             for fname, entry in entries.items()
+             if not entry['users'] and
+                fname.split('_')[0] not in used_fnames and
+                fname not in used_fnames),
+            key=lambda candidate: candidate[0])
+
+        now = time.time()
+        for last_use, fname, entry in candidates:
+            over_size = max_size and total_size > max_size
+            if (not over_size and
+                    now - last_use < self._get_min_age(fname)):
+                continue
+            if self._evict_base_file(manifest, fname):
+                key = _data_key(fname, entry)
+                names[key] -= 1
+                if not names[key]:
+                    total_size -= entry['size']
+
+        if max_size and total_size > max_size:
+            LOG.warning('Image cache size %(size)d MB exceeds the maximum of '
+                        '%(max)d MB but no more unused files can be evicted',
+                        {'size': total_size // units.Mi,
+                         'max': CONF.image_cache.max_size_mb})
+
     def update(self, context, all_instances):
         base_dir = self._get_base()
         if not base_dir:
             return
+        if CONF.image_cache.use_manifest:
+            self._reset_state()
+            self._update_from_manifest(context, all_instances, base_dir)
+            return
         # reset the local statistics
         self._reset_state()
         # read the cached images
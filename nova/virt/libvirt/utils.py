@@ -25,6 +25,7 @@ import pwd
 import re
 import subprocess
 import tempfile
+import time
 import typing as ty
 import uuid
 
@@ -33,6 +34,7 @@ from oslo_concurrency import processutils
 from oslo_log import log as logging
 from oslo_utils import fileutils
 from oslo_utils.imageutils import format_inspector
+from oslo_utils import units
 
 import nova.conf
 from nova import context as nova_context
@@ -324,6 +326,7 @@ def copy_image(
     on_execute: Callable[[subprocess.Popen], None] | None = None,
     on_completion: Callable[[subprocess.Popen], None] | None = None,
     compression: bool = True,
+    reflink: bool = False,
 ) -> None:
     """Copy a disk image to an existing directory
 
@@ -335,6 +338,8 @@ def copy_image(
     :param on_completion: Callback method to remove pid of process from cache
     :param compression: Allows to use rsync operation with or without
                         compression
+    :param reflink: Clone a local image with a reflink when the filesystem
+                    allows it, falling back to a regular copy otherwise
     """
 
     if not host:
@@ -343,7 +348,14 @@ def copy_image(
         # rather recreated efficiently.  In addition, since
         # coreutils 8.11, holes can be read efficiently too.
         # we add '-r' argument because ploop disks are directories
-        processutils.execute('cp', '-r', src, dest)
+        if reflink:
+            # NOTE: With --reflink=auto cp clones the file in constant time
+            # using FICLONE if src and dest are on the same XFS or Btrfs
+            # filesystem, and otherwise falls back to a sparse aware copy
+            # which uses copy_file_range() with coreutils >= 9.0.
+            processutils.execute('cp', '-r', '--reflink=auto', src, dest)
+        else:
+            processutils.execute('cp', '-r', src, dest)
     else:
         if receive:
             src = "%s:%s" % (utils.safe_ip_format(host), src)
@@ -392,6 +404,74 @@ def extract_snapshot(
                          compress=compress)
 
 
+class UploadProgressReader:
+    """Wrap an image file to report the progress of its upload.
+
+    The image service client reads the data in chunks through ``read()``;
+    every ``interval`` seconds the number of bytes sent so far and the
+    upload throughput are logged. They are only logged: the
+    ``compute_snapshot_upload`` instance action event only records when the
+    upload started and finished.
+    """
+
+    def __init__(
+        self,
+        image_file: ty.BinaryIO,
+        instance: 'objects.Instance',
+        interval: int = 30,
+    ) -> None:
+        self.image_file = image_file
+        self.instance = instance
+        self.interval = interval
+        self.bytes_read = 0
+        image_file.seek(0, os.SEEK_END)
+        self.total_size = image_file.tell()
+        image_file.seek(0)
+        self.start_time = time.monotonic()
+        self._last_report = self.start_time
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.image_file.read(size)
+        self.bytes_read += len(data)
+        now = time.monotonic()
+        if now - self._last_report >= self.interval:
+            self._last_report = now
+            self._report(now)
+        return data
+
+    def __iter__(self) -> ty.Iterator[bytes]:
+        while True:
+            data = self.read(64 * units.Ki)
+            if not data:
+                break
+            yield data
+
+    def _throughput(self, now: float) -> float:
+        """Return the average upload throughput in MiB/s."""
+        elapsed = now - self.start_time
+        if not elapsed:
+            return 0.0
+        return self.bytes_read / units.Mi / elapsed
+
+    def _report(self, now: float) -> None:
+        percent = 100
+        if self.total_size:
+            percent = self.bytes_read * 100 // self.total_size
+        LOG.info('Snapshot upload %(percent)d%% complete, %(sent)d of '
+                 '%(total)d MiB sent in %(elapsed)d seconds '
+                 '(%(rate).1f MiB/s)',
+                 {'percent': percent,
+                  'sent': self.bytes_read // units.Mi,
+                  'total': self.total_size // units.Mi,
+                  'elapsed': now - self.start_time,
+                  'rate': self._throughput(now)},
+                 instance=self.instance)
+
+    def report(self) -> None:
+        """Log the final upload statistics."""
+        self._report(time.monotonic())
+
+
 # TODO(stephenfin): This is dumb; remove it.
 def load_file(path: str) -> str:
     """Read contents of file
@@ -45,6 +45,16 @@ CONF = nova.conf.CONF
 
 LOG = logging.getLogger(__name__)
 
+# The highest API versions supported by both the client and the servers keyed
+# by cinder endpoint URL
+_SERVER_VERSIONS = {}
+
+
+def reset_globals():
+    """For async unit test consistency."""
+    global _SERVER_VERSIONS
+    _SERVER_VERSIONS = {}
+
 
 def _load_auth_plugin():
     auth_plugin = service_auth.get_service_auth_plugin(
@@ -158,7 +168,14 @@ def _check_microversion(context, url, microversion):
         construct the cinder v3 client object.
     :raises: CinderAPIVersionNotAvailable if the microversion is not available.
     """
-    max_api_version = _get_highest_client_server_version(context, url)
+    # NOTE: The version document is only queried again if the requested
+    # microversion is higher than the cached one, so that an upgraded cinder
+    # is picked up without a restart while each client we build does not cost
+    # an extra round trip to the server.
+    max_api_version = _SERVER_VERSIONS.get(url)
+    if max_api_version is None or not max_api_version.matches(microversion):
+        max_api_version = _get_highest_client_server_version(context, url)
+        _SERVER_VERSIONS[url] = max_api_version
     # Check if the max_api_version matches the requested minimum microversion.
     if max_api_version.matches(microversion):
         # The requested microversion is supported by the client and the server.